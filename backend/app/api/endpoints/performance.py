@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db, db_optimizer
+from app.core.read_replicas import replica_router
 from app.core.cache import cache_manager
 from app.core.monitoring import performance_monitor, health_checker
 from app.core.config import settings
@@ -103,9 +104,14 @@ async def database_performance(db: Session = Depends(get_db)):
         
         return {
             "connection_pool": pool_status,
+            "pools": db_optimizer.get_all_pool_status(),
+            "read_replicas": replica_router.status(),
             "performance_budgets": {
                 "query_time_budget": settings.DB_QUERY_TIME_BUDGET,
-                "pool_utilization": (pool_status["checked_out"] / pool_status["size"]) * 100
+                "pool_utilization": (
+                    (pool_status["checked_out"] / pool_status["capacity"]) * 100
+                    if pool_status.get("capacity") else 0
+                )
             }
         }
     except Exception as e:
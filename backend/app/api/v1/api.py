@@ -15,7 +15,8 @@ from app.api.v1.endpoints import (
     payments,
     dashboard,
     production_quotes,
-    notifications
+    notifications,
+    exports
 )
 
 api_router = APIRouter()
@@ -35,4 +36,5 @@ api_router.include_router(predictive_analytics.router, prefix="/predictive-analy
 api_router.include_router(payments.router, prefix="/payments", tags=["payments"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 api_router.include_router(production_quotes.router, prefix="/production-quotes", tags=["production-quotes"])
-api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"]) 
\ No newline at end of file
+api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"]) 
+api_router.include_router(exports.router, prefix="/exports", tags=["exports"])
@@ -7,7 +7,7 @@ from sqlalchemy import and_, or_, func, desc
 import io
 import pandas as pd
 
-from app.database import get_db
+from app.core.deps import get_read_db
 from app.core.auth import get_current_user
 from app.models.user import User
 from app.models.quotes import Quote
@@ -23,7 +23,7 @@ async def get_quote_analytics(
     category: Optional[str] = None,
     userId: Optional[int] = None,
     manufacturerId: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get comprehensive quote analytics."""
@@ -57,7 +57,7 @@ async def get_performance_metrics(
     timeRange: str = "30d",
     userId: Optional[int] = None,
     role: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get performance metrics and KPIs."""
@@ -88,7 +88,7 @@ async def get_performance_metrics(
 async def get_revenue_analytics(
     timeRange: str = "30d",
     breakdown: str = "monthly",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get revenue analytics and forecasts."""
@@ -111,7 +111,7 @@ async def get_revenue_analytics(
 @router.get("/customers")
 async def get_customer_analytics(
     timeRange: str = "30d",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get customer analytics and retention metrics."""
@@ -140,7 +140,7 @@ async def get_customer_analytics(
 async def get_competitive_analysis(
     timeRange: str = "30d",
     category: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get competitive analysis and market positioning."""
@@ -162,7 +162,7 @@ async def get_competitive_analysis(
 
 @router.get("/realtime")
 async def get_realtime_dashboard(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get real-time dashboard data."""
@@ -176,7 +176,7 @@ async def export_analytics(
     timeRange: str = "30d",
     category: Optional[str] = None,
     format: str = "excel",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Export analytics data in various formats."""
@@ -236,7 +236,7 @@ async def get_forecast_data(
     timeRange: str = "30d",
     metric: str = "revenue",
     periods: int = 12,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get forecast data for various metrics."""
@@ -260,7 +260,7 @@ async def get_forecast_data(
 @router.get("/funnel")
 async def get_conversion_funnel(
     timeRange: str = "30d",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get conversion funnel analysis."""
@@ -283,7 +283,7 @@ async def get_conversion_funnel(
 async def get_heatmap_data(
     timeRange: str = "30d",
     metric: str = "activity",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get heatmap data for activity patterns."""
@@ -306,7 +306,7 @@ async def get_heatmap_data(
 @router.get("/benchmarks")
 async def get_industry_benchmarks(
     category: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get industry benchmarks and comparisons."""
@@ -325,7 +325,7 @@ async def get_industry_benchmarks(
 async def get_market_trends(
     timeRange: str = "90d",
     category: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get market trends and predictions."""
@@ -1,22 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from datetime import datetime, timedelta
 
-from app.core.deps import get_db, get_current_user
+from app.core.deps import get_async_read_db, get_current_principal
+from app.core.principal_cache import Principal
 from app.models.user import User, UserRole
 from app.models.order import Order, OrderStatus
 from app.models.quote import Quote
-from app.models.producer import Manufacturer
+from app.services.dashboard_counters import (
+    CLIENT,
+    MANUFACTURER,
+    admin_counts_query,
+    client_counts_query,
+    manufacturer_counts_query,
+    read_counters,
+)
 from loguru import logger
 
 router = APIRouter()
 
 
 @router.get("/client")
-def get_client_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_client_dashboard(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get client dashboard statistics"""
     if current_user.role != UserRole.CLIENT:
@@ -25,50 +33,27 @@ def get_client_dashboard(
             detail="This endpoint is for clients only"
         )
     
-    # Total orders
-    total_orders = db.query(func.count(Order.id)).filter(  # pylint: disable=not-callable
-        Order.client_id == current_user.id
-    ).scalar()
-    
-    # Active orders
-    active_orders = db.query(func.count(Order.id)).filter(  # pylint: disable=not-callable
-        Order.client_id == current_user.id,
-        Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED, OrderStatus.IN_PRODUCTION])
-    ).scalar()
-    
-    # Completed orders
-    completed_orders = db.query(func.count(Order.id)).filter(  # pylint: disable=not-callable
-        Order.client_id == current_user.id,
-        Order.status == OrderStatus.COMPLETED
-    ).scalar()
-    
-    # Total quotes received
-    total_quotes = db.query(func.count(Quote.id)).join(Order, Quote.order_id == Order.id).filter(  # pylint: disable=not-callable
-        Order.client_id == current_user.id
-    ).scalar()
-    
-    # Pending quotes
-    pending_quotes = db.query(func.count(Quote.id)).join(Order, Quote.order_id == Order.id).filter(  # pylint: disable=not-callable
-        Order.client_id == current_user.id,
-        Quote.status == "pending"
-    ).scalar()
+    # Materialized counters, or one aggregate pass until they are built
+    counts = await read_counters(db, CLIENT, current_user.id)
+    if counts is None:
+        counts = (await db.execute(client_counts_query(current_user.id))).mappings().one()
     
     # Recent orders
-    recent_orders = db.query(Order).filter(
+    recent_orders = (await db.scalars(select(Order).where(
         Order.client_id == current_user.id
-    ).order_by(Order.created_at.desc()).limit(5).all()
+    ).order_by(Order.created_at.desc()).limit(5))).all()
     
     # Recent quotes
-    recent_quotes = db.query(Quote).join(Order, Quote.order_id == Order.id).filter(
+    recent_quotes = (await db.scalars(select(Quote).join(Order, Quote.order_id == Order.id).where(
         Order.client_id == current_user.id
-    ).order_by(Quote.created_at.desc()).limit(5).all()
+    ).order_by(Quote.created_at.desc()).limit(5))).all()
     
     return {
-        "total_orders": total_orders,
-        "active_orders": active_orders,
-        "completed_orders": completed_orders,
-        "total_quotes": total_quotes,
-        "pending_quotes": pending_quotes,
+        "total_orders": counts["orders_total"],
+        "active_orders": counts["orders_active"],
+        "completed_orders": counts["orders_completed"],
+        "total_quotes": counts["quotes_total"],
+        "pending_quotes": counts["quotes_pending"],
         "recent_orders": [
             {
                 "id": order.id,
@@ -90,9 +75,9 @@ def get_client_dashboard(
 
 
 @router.get("/manufacturer")
-def get_manufacturer_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_manufacturer_dashboard(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get manufacturer dashboard statistics"""
     if current_user.role != UserRole.MANUFACTURER:
@@ -102,55 +87,32 @@ def get_manufacturer_dashboard(
         )
     
     try:
-        # Get manufacturer profile
-        manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-        if not manufacturer:
+        # Manufacturer profile id comes with the cached principal
+        manufacturer_id = current_user.manufacturer_id
+        if manufacturer_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Manufacturer profile not found"
             )
         
-        # Total quotes submitted
-        total_quotes = db.query(func.count(Quote.id)).filter(  # pylint: disable=not-callable
-            Quote.manufacturer_id == manufacturer.id
-        ).scalar()
-        
-        # Accepted quotes
-        accepted_quotes = db.query(func.count(Quote.id)).filter(  # pylint: disable=not-callable
-            Quote.manufacturer_id == manufacturer.id,
-            Quote.status == "accepted"
-        ).scalar()
-        
-        # Pending quotes
-        pending_quotes = db.query(func.count(Quote.id)).filter(  # pylint: disable=not-callable
-            Quote.manufacturer_id == manufacturer.id,
-            Quote.status == "pending"
-        ).scalar()
+        # Materialized counters, or one aggregate pass until they are built
+        counts = await read_counters(db, MANUFACTURER, manufacturer_id)
+        if counts is None:
+            counts = (await db.execute(manufacturer_counts_query(manufacturer_id))).mappings().one()
         
         # Success rate
-        success_rate = (accepted_quotes / total_quotes * 100) if total_quotes > 0 else 0
-        
-        # Active orders (orders in progress)
-        active_orders = db.query(func.count(Order.id)).join(Quote, Quote.order_id == Order.id).filter(  # pylint: disable=not-callable
-            Quote.manufacturer_id == manufacturer.id,
-            Quote.status == "accepted",
-            Order.status == OrderStatus.IN_PRODUCTION
-        ).scalar()
-        
-        # Available orders (open for quotes)
-        available_orders = db.query(func.count(Order.id)).filter(  # pylint: disable=not-callable
-            Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED])
-        ).scalar()
+        total_quotes = counts["quotes_total"]
+        success_rate = (counts["quotes_accepted"] / total_quotes * 100) if total_quotes > 0 else 0
         
         # Recent quotes
-        recent_quotes = db.query(Quote).filter(
-            Quote.manufacturer_id == manufacturer.id
-        ).order_by(Quote.created_at.desc()).limit(5).all()
+        recent_quotes = (await db.scalars(select(Quote).where(
+            Quote.manufacturer_id == manufacturer_id
+        ).order_by(Quote.created_at.desc()).limit(5))).all()
         
         # Recent available orders
-        recent_available = db.query(Order).filter(
+        recent_available = (await db.scalars(select(Order).where(
             Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED])
-        ).order_by(Order.created_at.desc()).limit(5).all()
+        ).order_by(Order.created_at.desc()).limit(5))).all()
         
         # Safely build recent available orders with error handling
         recent_available_orders = []
@@ -179,11 +141,11 @@ def get_manufacturer_dashboard(
         
         return {
             "total_quotes": total_quotes,
-            "accepted_quotes": accepted_quotes,
-            "pending_quotes": pending_quotes,
+            "accepted_quotes": counts["quotes_accepted"],
+            "pending_quotes": counts["quotes_pending"],
             "success_rate": round(success_rate, 2),
-            "active_orders": active_orders,
-            "available_orders": available_orders,
+            "active_orders": counts["orders_in_production"],
+            "available_orders": counts["orders_available"],
             "recent_quotes": [
                 {
                     "id": quote.id,
@@ -207,9 +169,9 @@ def get_manufacturer_dashboard(
 
 
 @router.get("/admin")
-def get_admin_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_admin_dashboard(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get admin dashboard statistics"""
     if current_user.role != UserRole.ADMIN:
@@ -218,41 +180,29 @@ def get_admin_dashboard(
             detail="This endpoint is for admins only"
         )
     
-    # User statistics
-    total_users = db.query(func.count(User.id)).scalar()  # pylint: disable=not-callable
-    active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar()  # pylint: disable=not-callable
-    clients = db.query(func.count(User.id)).filter(User.role == "client").scalar()  # pylint: disable=not-callable
-    manufacturers = db.query(func.count(User.id)).filter(User.role == "manufacturer").scalar()  # pylint: disable=not-callable
-    
-    # Order statistics
-    total_orders = db.query(func.count(Order.id)).scalar()  # pylint: disable=not-callable
-    active_orders = db.query(func.count(Order.id)).filter(  # pylint: disable=not-callable
-        Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED, OrderStatus.IN_PRODUCTION])
-    ).scalar()
-    
-    # Quote statistics
-    total_quotes = db.query(func.count(Quote.id)).scalar()  # pylint: disable=not-callable
+    # Users, orders and quotes counted in one round trip
+    counts = (await db.execute(admin_counts_query())).mappings().one()
     
     # Revenue statistics (if payment model exists)
-    # total_revenue = db.query(func.sum(Payment.amount)).scalar() or 0
+    # total_revenue = db.query(func.sum(Payment.amount))) or 0
     
     # Recent activity
-    recent_users = db.query(User).order_by(User.created_at.desc()).limit(5).all()
-    recent_orders = db.query(Order).order_by(Order.created_at.desc()).limit(5).all()
+    recent_users = (await db.scalars(select(User).order_by(User.created_at.desc()).limit(5))).all()
+    recent_orders = (await db.scalars(select(Order).order_by(Order.created_at.desc()).limit(5))).all()
     
     return {
         "users": {
-            "total": total_users,
-            "active": active_users,
-            "clients": clients,
-            "manufacturers": manufacturers
+            "total": counts["users_total"],
+            "active": counts["users_active"],
+            "clients": counts["clients"],
+            "manufacturers": counts["manufacturers"]
         },
         "orders": {
-            "total": total_orders,
-            "active": active_orders
+            "total": counts["orders_total"],
+            "active": counts["orders_active"]
         },
         "quotes": {
-            "total": total_quotes
+            "total": counts["quotes_total"]
         },
         "recent_users": [
             {
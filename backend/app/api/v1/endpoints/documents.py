@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, asc
 from datetime import datetime, timedelta
@@ -6,14 +6,16 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 import os
 import uuid
-import mimetypes
 from pathlib import Path
 
 from app.core.deps import get_db, get_current_user
+from app.core.pagination import InvalidCursor, KeysetOrder
 from app.models.user import User, UserRole
+from app.services.file_service import FileService
 from loguru import logger
 
 router = APIRouter()
+file_service = FileService()
 
 # Document Models
 class DocumentBase(BaseModel):
@@ -85,18 +87,24 @@ folders_storage: Dict[str, Dict] = {
     "folder-3": {"id": "folder-3", "name": "Design Files", "parent_id": None, "documents_count": 0, "created_at": datetime.now(), "color": "purple"}
 }
 
+# Documents live in memory, so only the cursor handling of a keyset order is used
+DOCUMENT_LIST_ORDER = KeysetOrder('uploaded_at', column=None, id_column=None)
+
 @router.get("/", response_model=List[DocumentResponse])
 async def get_documents(
+    response: Response,
     search: Optional[str] = Query(None, description="Search documents by name or tags"),
     folder_id: Optional[str] = Query(None, description="Filter by folder ID"),
     document_type: Optional[str] = Query(None, description="Filter by document type"),
     shared_only: Optional[bool] = Query(None, description="Show only shared documents"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; all documents when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all documents for the current user with optional filtering"""
     try:
-        user_documents = []
+        matches = []
         
         for doc_id, doc_data in documents_storage.items():
             if doc_data["uploaded_by_id"] != current_user.id:
@@ -111,7 +119,18 @@ async def get_documents(
                 continue
             if shared_only is not None and doc_data.get("is_shared", False) != shared_only:
                 continue
-                
+            matches.append(doc_data)
+        
+        # Newest first, resuming after the cursor when there is one
+        result = DOCUMENT_LIST_ORDER.paginate(
+            matches, cursor, limit or len(matches),
+            value=lambda doc_data: doc_data["uploaded_at"], ident=lambda doc_data: doc_data["id"]
+        )
+        if result.next_cursor:
+            response.headers["X-Next-Cursor"] = result.next_cursor
+        
+        user_documents = []
+        for doc_data in result.items:
             # Get folder name if exists
             folder_name = None
             if doc_data.get("folder_id") and doc_data["folder_id"] in folders_storage:
@@ -137,11 +156,11 @@ async def get_documents(
                 ai_analysis=doc_data.get("ai_analysis")
             )
             user_documents.append(document)
-            
-        # Sort by upload date (newest first)
-        user_documents.sort(key=lambda x: x.uploaded_at, reverse=True)
+        
         return user_documents
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching documents")
@@ -160,14 +179,15 @@ async def upload_document(
         # Generate unique document ID
         doc_id = str(uuid.uuid4())
         
-        # Get file info
-        file_size = 0
-        file_content = await file.read()
-        file_size = len(file_content)
+        # Stream the file to storage
+        file_info = await file_service.save_attachment(
+            file, "documents", doc_id, f"/api/v1/documents/{doc_id}/download"
+        )
+        file_size = file_info["size"]
         
         # Determine file type
         file_extension = Path(file.filename or "").suffix.lower()
-        mime_type = file.content_type or mimetypes.guess_type(file.filename or "")[0] or "application/octet-stream"
+        mime_type = file_info["mime_type"]
         
         doc_type = "Unknown"
         if mime_type.startswith("image/"):
@@ -202,7 +222,8 @@ async def upload_document(
             "is_shared": is_shared,
             "download_count": 0,
             "version": 1,
-            "file_content": file_content  # In production, save to cloud storage
+            "file_path": file_info["path"],
+            "sha256": file_info["sha256"]
         }
         
         documents_storage[doc_id] = document_data
@@ -235,6 +256,8 @@ async def upload_document(
             thumbnail_url=f"/api/v1/documents/{doc_id}/thumbnail" if doc_type.lower() in ["pdf", "image"] else None
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail="Error uploading document")
@@ -377,6 +400,8 @@ async def delete_document(
             
         # Delete document
         del documents_storage[document_id]
+        if doc_data.get("file_path"):
+            file_service.delete_file(doc_data["file_path"])
         
         return {"message": "Document deleted successfully"}
         
@@ -481,7 +506,7 @@ async def download_document(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Download a document"""
+    """Download a document; supports Range requests"""
     try:
         if document_id not in documents_storage:
             raise HTTPException(status_code=404, detail="Document not found")
@@ -495,13 +520,7 @@ async def download_document(
         # Increment download count
         doc_data["download_count"] = doc_data.get("download_count", 0) + 1
         
-        # In production, return file from cloud storage
-        from fastapi.responses import Response
-        return Response(
-            content=doc_data.get("file_content", b"Mock file content"),
-            media_type=doc_data["mime_type"],
-            headers={"Content-Disposition": f"attachment; filename={doc_data['name']}"}
-        )
+        return file_service.file_response(doc_data["file_path"], doc_data["name"], doc_data["mime_type"])
         
     except Exception as e:
         logger.error(f"Error downloading document: {str(e)}")
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from celery.result import AsyncResult
+from typing import Optional
+import os
+
+from app.core.celery_config import celery_app
+from app.core.principal_cache import Principal
+from app.core.security import get_current_active_principal
+from app.models.user import UserRole
+from app.schemas.export import ExportJobCreate, ExportJobResponse
+from app.services.data_exports import EXPORT_DATASETS
+from app.tasks.export_tasks import export_dataset
+from loguru import logger
+
+router = APIRouter()
+
+
+def _finished_export(job_id: str, current_user: Principal) -> Optional[dict]:
+    """Result of a finished export job owned by the current user"""
+    job = AsyncResult(job_id, app=celery_app)
+    if not job.successful():
+        return None
+    result = job.result
+    if result.get("user_id") != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export not found")
+    return result
+
+
+@router.post("/", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    request: ExportJobCreate,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Start a background export; poll the job and download the file once it is ready"""
+    dataset = EXPORT_DATASETS[request.dataset.value]
+    filters = {"status_filter": request.status_filter}
+    if "order_id" in dataset.filters:
+        filters["order_id"] = request.order_id
+
+    try:
+        # Reject bad filters now rather than in the worker
+        dataset.build(current_user, **filters)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid export filter")
+
+    job = export_dataset.delay(
+        dataset.name, current_user.to_json(), request.format.value, request.compress, filters
+    )
+    logger.info(f"Export job {job.id} for {dataset.name} queued by user {current_user.id}")
+    return ExportJobResponse(job_id=job.id, status="PENDING")
+
+
+@router.get("/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """State of an export job, with a download URL once it succeeded"""
+    result = _finished_export(job_id, current_user)
+    if result is None:
+        return ExportJobResponse(job_id=job_id, status=AsyncResult(job_id, app=celery_app).state)
+    return ExportJobResponse(
+        job_id=job_id,
+        status="SUCCESS",
+        filename=result["filename"],
+        bytes=result["bytes"],
+        download_url=f"/api/v1/exports/{job_id}/download"
+    )
+
+
+@router.get("/{job_id}/download")
+async def download_export(
+    job_id: str,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Download the file written by a finished export job"""
+    result = _finished_export(job_id, current_user)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Export is not ready")
+    if not os.path.exists(result["path"]):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export has expired")
+    return FileResponse(result["path"], media_type=result["media_type"], filename=result["filename"])
@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-from io import BytesIO
-import csv
 
-from app.core.database import get_db
-from app.core.security import get_current_active_user, get_current_user_optional
+from app.core.database import get_async_db, get_db
+from app.core.pagination import InvalidCursor, KeysetOrder, count_estimator
+from app.core.principal_cache import Principal
+from app.core.read_replicas import get_read_db
+from app.core.security import get_current_active_principal, get_current_active_user, get_current_user_optional
 from app.models.user import User, UserRole
 from app.models.order import Order, OrderStatus
+from app.services.data_exports import ORDER_EXPORT_COLUMNS, orders_export_statement
 from app.services.matching import MatchingService
+from app.services.streaming_export import ExportFormat, export_response
 from app.schemas.order import (
     OrderCreate,
     OrderUpdate,
@@ -130,60 +134,68 @@ async def create_order(
         )
 
 
+# Newest first, with the id as tie-breaker so that pages never overlap
+ORDER_LIST_ORDER = KeysetOrder('created_at', Order.created_at, Order.id)
+
+
 @router.get("/", response_model=OrderListResponse)
 async def get_orders(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     status_filter: Optional[OrderStatus] = Query(None),
     technology: Optional[str] = Query(None),
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get orders (filtered by user role)"""
     try:
-        query = db.query(Order)
+        query = select(Order)
         
         # Filter by user role - if no user, show public orders only
         if current_user:
             if current_user.role == UserRole.CLIENT:
-                query = query.filter(Order.client_id == current_user.id)
+                query = query.where(Order.client_id == current_user.id)
             elif current_user.role == UserRole.MANUFACTURER:
-                # For manufacturers, show orders they can bid on or have bid on
-                query = query.filter(
-                    Order.status.in_([
-                        OrderStatus.PENDING_MATCHING,
-                        OrderStatus.OFFERS_SENT
-                    ])
-                )
+                # For manufacturers, show orders they can bid on
+                query = query.where(Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED]))
             # Admin can see all orders
         else:
             # For unauthenticated users, show only active orders (for testing)
-            query = query.filter(Order.status == OrderStatus.ACTIVE)
+            query = query.where(Order.status == OrderStatus.ACTIVE)
         
         # Apply filters
         if status_filter:
-            query = query.filter(Order.status == status_filter)
+            query = query.where(Order.status == status_filter)
         if technology:
             # For now, skip technology filtering to avoid JSON query issues
             # TODO: Implement proper JSON field search
             pass
         
-        # Count total
-        total = query.count()
+        # Count total; cursor clients page through the list, so an estimate is enough
+        if cursor:
+            total = await count_estimator.count_async(db, query)
+        else:
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))  # pylint: disable=not-callable
         
         # Apply pagination
-        orders = query.offset((page - 1) * per_page).limit(per_page).all()
+        rows = (await db.scalars(ORDER_LIST_ORDER.apply(query, cursor, per_page, (page - 1) * per_page))).all()
+        result = ORDER_LIST_ORDER.page(rows, per_page)
         
         # Calculate pagination info
         total_pages = (total + per_page - 1) // per_page
         
         return OrderListResponse(
-            orders=[map_order_to_response(order) for order in orders],
+            orders=[map_order_to_response(order) for order in result.items],
             total=total,
             page=page,
             per_page=per_page,
-            total_pages=total_pages
+            total_pages=total_pages,
+            next_cursor=result.next_cursor,
+            total_is_estimate=bool(cursor)
         )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_orders: {str(e)}")
         # Return empty result on error
@@ -200,10 +212,10 @@ async def get_orders(
 async def get_order(
     order_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get specific order by ID"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     
     if not order:
         raise HTTPException(
@@ -457,70 +469,21 @@ async def cancel_order(
     return {"message": "Order cancelled successfully"}
 
 
-@router.get("/export/csv")
-async def export_orders_csv(
+@router.get("/export/{export_format}")
+async def export_orders(
+    export_format: ExportFormat,
     status_filter: Optional[OrderStatus] = Query(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    compress: bool = Query(False, description="gzip the file on the fly"),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: Session = Depends(get_read_db)
 ):
-    """Export orders as CSV"""
+    """Export orders as CSV, NDJSON or Parquet, streamed while rows are read"""
     try:
-        query = db.query(Order)
-        
-        # Filter by user role
-        if current_user.role == UserRole.CLIENT:
-            query = query.filter(Order.client_id == current_user.id)
-        elif current_user.role == UserRole.MANUFACTURER:
-            # For manufacturers, show orders they can bid on or have bid on
-            query = query.filter(
-                Order.status.in_([
-                    OrderStatus.PENDING_MATCHING,
-                    OrderStatus.OFFERS_SENT
-                ])
-            )
-        # Admin can see all orders
-        
-        # Apply filters
-        if status_filter:
-            query = query.filter(Order.status == status_filter)
-        
-        orders = query.all()
-        
-        # Create CSV
-        output = BytesIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'ID', 'Title', 'Description', 'Technology', 'Material', 'Quantity',
-            'Budget (PLN)', 'Status', 'Priority', 'Delivery Deadline', 'Created At'
-        ])
-        
-        # Write data
-        for order in orders:
-            tech_req = order.technical_requirements or {}
-            writer.writerow([
-                order.id,
-                order.title,
-                order.description,
-                tech_req.get('technology', ''),
-                tech_req.get('material', ''),
-                order.quantity,
-                str(order.budget_fixed_pln or 0),
-                order.status.value if hasattr(order.status, 'value') else str(order.status),
-                order.priority,
-                order.delivery_deadline.isoformat() if order.delivery_deadline else '',
-                order.created_at.isoformat()
-            ])
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            BytesIO(output.getvalue()),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=orders_export.csv"}
-        )
+        statement = orders_export_statement(current_user, status_filter)
+        return export_response(db, statement, ORDER_EXPORT_COLUMNS, "orders_export", export_format, compress)
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error exporting orders: {str(e)}")
         raise HTTPException(
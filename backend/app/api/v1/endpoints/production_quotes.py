@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, asc
+from sqlalchemy import and_, or_, desc
 from typing import List, Optional
 from datetime import datetime, timezone
 import logging
 
 from app.core.database import get_db
-from app.core.security import get_current_user, get_current_user_optional
+from app.core.pagination import InvalidCursor, keyset_order
+from app.core.principal_cache import Principal
+from app.core.security import get_current_principal, get_current_user_optional
 from app.models.user import User, UserRole
-from app.models.producer import Manufacturer
 from app.models.quote import ProductionQuote, ProductionQuoteInquiry, ProductionQuoteType
+from app.services.capability_tags import CERTIFICATION, COUNTRY, MATERIAL, PROCESS, tagged_with
+from app.services.full_text_search import PRODUCTION_QUOTE_SEARCH
 from app.schemas.production_quote import (
     ProductionQuoteCreate, ProductionQuoteUpdate, ProductionQuoteResponse,
     ProductionQuoteInquiryCreate, ProductionQuoteInquiryResponse, ProductionQuoteInquiryUpdate,
@@ -20,11 +23,19 @@ from app.schemas.production_quote import (
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+PRODUCTION_QUOTE_SORT_COLUMNS = {
+    "created_at": ProductionQuote.created_at,
+    "updated_at": ProductionQuote.updated_at,
+    "priority_level": ProductionQuote.priority_level,
+    "view_count": ProductionQuote.view_count,
+    "base_price": ProductionQuote.base_price,
+}
+
 
 @router.post("/", response_model=ProductionQuoteResponse, status_code=status.HTTP_201_CREATED)
 def create_production_quote(
     production_quote: ProductionQuoteCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Create a new production quote (manufacturers only)"""
@@ -36,16 +47,16 @@ def create_production_quote(
         )
     
     # Get manufacturer profile
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
         )
     
-    # Create production quote - use manufacturer.id as manufacturer_id
+    # Create production quote
     db_production_quote = ProductionQuote(
-        manufacturer_id=manufacturer.id,
+        manufacturer_id=manufacturer_id,
         **production_quote.dict()
     )
     
@@ -58,6 +69,7 @@ def create_production_quote(
 
 @router.get("/", response_model=List[ProductionQuoteResponse])
 def list_production_quotes(
+    response: Response,
     # Filtering parameters
     production_quote_type: Optional[ProductionQuoteType] = None,
     manufacturing_processes: Optional[str] = Query(None, description="Comma-separated list"),
@@ -79,6 +91,7 @@ def list_production_quotes(
     sort_order: str = Query(default="desc", pattern="^(asc|desc)$"),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; takes precedence over page"),
     
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
@@ -98,29 +111,20 @@ def list_production_quotes(
     if production_quote_type:
         query = query.filter(ProductionQuote.production_quote_type == production_quote_type)
     
-    if manufacturing_processes:
-        processes = [p.strip() for p in manufacturing_processes.split(",")]
-        # Use JSON containment for processes stored in JSON field
-        for process in processes:
-            query = query.filter(ProductionQuote.manufacturing_processes.like(f'%"{process}"%'))
-    
-    if materials:
-        material_list = [m.strip() for m in materials.split(",")]
-        # Use JSON containment for materials stored in JSON field
-        for material in material_list:
-            query = query.filter(ProductionQuote.materials.like(f'%"{material}"%'))
-    
-    if certifications:
-        cert_list = [c.strip() for c in certifications.split(",")]
-        # Use JSON containment for certifications stored in JSON field  
-        for cert in cert_list:
-            query = query.filter(ProductionQuote.certifications.like(f'%"{cert}"%'))
-    
-    if countries:
-        country_list = [c.strip() for c in countries.split(",")]
-        # Store countries in preferred_countries JSON
-        for country in country_list:
-            query = query.filter(ProductionQuote.preferred_countries.like(f'%"{country}"%'))
+    # Capability filters: quotes tagged with every listed value
+    capability_filters = {
+        kind: values.split(",")
+        for kind, values in (
+            (PROCESS, manufacturing_processes),
+            (MATERIAL, materials),
+            (CERTIFICATION, certifications),
+            (COUNTRY, countries),
+        )
+        if values
+    }
+    tag_condition = tagged_with(ProductionQuote, capability_filters)
+    if tag_condition is not None:
+        query = query.filter(tag_condition)
     
     if min_price is not None:
         query = query.filter(ProductionQuote.base_price >= min_price)
@@ -161,30 +165,26 @@ def list_production_quotes(
             )
         )
     
-    if search_query:
-        search_filter = or_(
-            ProductionQuote.title.ilike(f"%{search_query}%"),
-            ProductionQuote.description.ilike(f"%{search_query}%")
-        )
-        query = query.filter(search_filter)
-    
-    # Apply sorting
-    sort_column = getattr(ProductionQuote, sort_by)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
-    else:
-        query = query.order_by(asc(sort_column))
-    
-    # Apply pagination
-    offset = (page - 1) * page_size
-    production_quotes = query.offset(offset).limit(page_size).all()
-    
-    return production_quotes
+    matches = PRODUCTION_QUOTE_SEARCH.matches(db, search_query)
+    if matches is not None:
+        query = query.join(matches, matches.c.id == ProductionQuote.id)
+    
+    # Apply sorting and pagination
+    keyset = keyset_order(PRODUCTION_QUOTE_SORT_COLUMNS, sort_by, sort_order, ProductionQuote.id)
+    try:
+        rows = keyset.apply(query, cursor, page_size, (page - 1) * page_size).all()
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    result = keyset.page(rows, page_size)
+    if result.next_cursor:
+        response.headers["X-Next-Cursor"] = result.next_cursor
+    
+    return result.items
 
 
 @router.get("/my-quotes", response_model=List[ProductionQuoteResponse])
 def get_my_production_quotes(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get current manufacturer's production quotes"""
@@ -194,15 +194,15 @@ def get_my_production_quotes(
             detail="Only manufacturers can access this endpoint"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
         )
     
     production_quotes = db.query(ProductionQuote).filter(
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).order_by(desc(ProductionQuote.created_at)).all()
     
     return production_quotes
@@ -212,7 +212,7 @@ def get_my_production_quotes(
 def get_production_quote(
     production_quote_id: int,
     db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)
+    current_user: Optional[Principal] = Depends(get_current_principal)
 ):
     """Get a specific production quote by ID"""
     production_quote = db.query(ProductionQuote).filter(
@@ -230,8 +230,7 @@ def get_production_quote(
     
     # Increment view count (if not the owner viewing)
     if current_user:
-        manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-        if not manufacturer or manufacturer.id != production_quote.manufacturer_id:
+        if current_user.manufacturer_id != production_quote.manufacturer_id:
             production_quote.view_count = (production_quote.view_count or 0) + 1
             db.commit()
     else:
@@ -245,7 +244,7 @@ def get_production_quote(
 def update_production_quote(
     production_quote_id: int,
     production_quote_update: ProductionQuoteUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Update a production quote (owner only)"""
@@ -255,8 +254,8 @@ def update_production_quote(
             detail="Only manufacturers can update production quotes"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
@@ -264,7 +263,7 @@ def update_production_quote(
     
     production_quote = db.query(ProductionQuote).filter(
         ProductionQuote.id == production_quote_id,
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).first()
     
     if not production_quote:
@@ -289,7 +288,7 @@ def update_production_quote(
 @router.delete("/{production_quote_id}")
 def delete_production_quote(
     production_quote_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Delete a production quote (owner only)"""
@@ -299,8 +298,8 @@ def delete_production_quote(
             detail="Only manufacturers can delete production quotes"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
@@ -308,7 +307,7 @@ def delete_production_quote(
     
     production_quote = db.query(ProductionQuote).filter(
         ProductionQuote.id == production_quote_id,
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).first()
     
     if not production_quote:
@@ -329,7 +328,7 @@ def delete_production_quote(
 def create_inquiry(
     production_quote_id: int,
     inquiry: ProductionQuoteInquiryCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Create an inquiry about a production quote (clients only)"""
@@ -371,7 +370,7 @@ def create_inquiry(
 @router.get("/{production_quote_id}/inquiries", response_model=List[ProductionQuoteInquiryResponse])
 def get_production_quote_inquiries(
     production_quote_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get inquiries for a production quote (manufacturer only)"""
@@ -381,8 +380,8 @@ def get_production_quote_inquiries(
             detail="Only manufacturers can view inquiries"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
@@ -390,7 +389,7 @@ def get_production_quote_inquiries(
     
     production_quote = db.query(ProductionQuote).filter(
         ProductionQuote.id == production_quote_id,
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).first()
     
     if not production_quote:
@@ -410,7 +409,7 @@ def get_production_quote_inquiries(
 def respond_to_inquiry(
     inquiry_id: int,
     response: ProductionQuoteInquiryUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Respond to a production quote inquiry (manufacturer only)"""
@@ -420,8 +419,8 @@ def respond_to_inquiry(
             detail="Only manufacturers can respond to inquiries"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
@@ -429,7 +428,7 @@ def respond_to_inquiry(
     
     inquiry = db.query(ProductionQuoteInquiry).join(ProductionQuote).filter(
         ProductionQuoteInquiry.id == inquiry_id,
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).first()
     
     if not inquiry:
@@ -452,7 +451,7 @@ def respond_to_inquiry(
 
 @router.get("/analytics", response_model=ProductionQuoteAnalytics)
 def get_production_quote_analytics(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get production quote analytics for current manufacturer"""
@@ -462,8 +461,8 @@ def get_production_quote_analytics(
             detail="Only manufacturers can view analytics"
         )
     
-    manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-    if not manufacturer:
+    manufacturer_id = current_user.manufacturer_id
+    if manufacturer_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Manufacturer profile not found"
@@ -471,7 +470,7 @@ def get_production_quote_analytics(
     
     # Get basic metrics
     production_quotes = db.query(ProductionQuote).filter(
-        ProductionQuote.manufacturer_id == manufacturer.id
+        ProductionQuote.manufacturer_id == manufacturer_id
     ).all()
     
     total_production_quotes = len(production_quotes)
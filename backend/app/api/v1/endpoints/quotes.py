@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, UploadFile, File, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional, Dict
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -8,11 +9,11 @@ import logging
 import os
 import uuid
 from pathlib import Path
-from io import BytesIO
-import csv
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.database import get_async_db, get_db
+from app.core.read_replicas import get_read_db
+from app.core.principal_cache import Principal
+from app.core.security import get_current_principal, get_current_user
 from app.models.user import User, UserRole
 from app.models.order import Order, OrderStatus
 from app.models.quote import Quote, QuoteStatus, QuoteAttachment, QuoteNegotiation, QuoteNotification, NegotiationStatus
@@ -27,6 +28,8 @@ from app.services.quote_service import QuoteService
 from app.services.notification_service import NotificationService
 from app.services.file_service import FileService
 from app.services.quote_comparison_service import QuoteComparisonService
+from app.services.data_exports import QUOTE_EXPORT_COLUMNS, quotes_export_statement
+from app.services.streaming_export import ExportFormat, export_response
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -47,40 +50,39 @@ def create_quote(
 
 
 @router.get("/", response_model=List[QuoteResponse])
-def get_quotes(
+async def get_quotes(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     status: Optional[str] = None,
     order_id: Optional[int] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get quotes for the current user."""
-    query = db.query(Quote)
+    query = select(Quote)
     
     if current_user.role == UserRole.CLIENT:
         # Clients can see quotes for their orders
-        order_ids = db.query(Order.id).filter(Order.client_id == current_user.id).subquery()
-        query = query.filter(Quote.order_id.in_(order_ids))
+        order_ids = select(Order.id).where(Order.client_id == current_user.id)
+        query = query.where(Quote.order_id.in_(order_ids))
     elif current_user.role == UserRole.MANUFACTURER:
         # Manufacturers can see their own quotes
-        manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-        if manufacturer:
-            query = query.filter(Quote.manufacturer_id == manufacturer.id)
+        if current_user.manufacturer_id is not None:
+            query = query.where(Quote.manufacturer_id == current_user.manufacturer_id)
     
     if status:
-        query = query.filter(Quote.status == status)
+        query = query.where(Quote.status == status)
     if order_id:
-        query = query.filter(Quote.order_id == order_id)
+        query = query.where(Quote.order_id == order_id)
     
-    quotes = query.offset(skip).limit(limit).all()
+    quotes = (await db.scalars(query.offset(skip).limit(limit))).all()
     return quotes
 
 
 @router.get("/{quote_id}", response_model=QuoteResponse)
 def get_quote(
     quote_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get a specific quote."""
@@ -94,8 +96,7 @@ def get_quote(
         if not order or order.client_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to view this quote")
     elif current_user.role == UserRole.MANUFACTURER:
-        manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-        if not manufacturer or quote.manufacturer_id != manufacturer.id:
+        if current_user.manufacturer_id is None or quote.manufacturer_id != current_user.manufacturer_id:
             raise HTTPException(status_code=403, detail="Not authorized to view this quote")
     
     # Mark as viewed if client is viewing
@@ -406,7 +407,7 @@ async def upload_quote_attachments(
             file_path=file_info["path"],
             file_size=file_info["size"],
             file_type=file_info["type"],
-            mime_type=file.content_type,
+            mime_type=file_info["mime_type"],
             description=descriptions[i] if descriptions and i < len(descriptions) else None,
             uploaded_by=current_user.id
         )
@@ -468,6 +469,40 @@ def get_quote_attachments(
     ]
 
 
+@router.get("/{quote_id}/attachments/{attachment_id}/download")
+def download_quote_attachment(
+    quote_id: int,
+    attachment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a quote attachment; supports Range requests"""
+    attachment = db.query(QuoteAttachment).filter(
+        QuoteAttachment.id == attachment_id,
+        QuoteAttachment.quote_id == quote_id
+    ).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    # Same audience as the attachment list
+    quote = attachment.quote
+    authorized = False
+    if current_user.role == UserRole.CLIENT:
+        order = db.query(Order).filter(Order.id == quote.order_id).first()
+        authorized = order and order.client_id == current_user.id and attachment.is_public
+    elif current_user.role == UserRole.MANUFACTURER:
+        manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
+        authorized = manufacturer and quote.manufacturer_id == manufacturer.id
+
+    if not authorized:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    file_service = FileService()
+    if not file_service.validate_file_access(attachment.file_path, current_user.id, "quotes", quote_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_service.file_response(attachment.file_path, attachment.original_name, attachment.mime_type)
+
+
 @router.delete("/{quote_id}/attachments/{attachment_id}")
 def delete_quote_attachment(
     quote_id: int,
@@ -580,7 +615,10 @@ def get_quote_analytics(
             raise HTTPException(status_code=403, detail="Not authorized")
 
     # Get all quotes for the same order for comparison
-    all_quotes = db.query(Quote).filter(Quote.order_id == quote.order_id).all()
+    all_quotes = (
+        db.query(Quote).options(joinedload(Quote.manufacturer))
+        .filter(Quote.order_id == quote.order_id).all()
+    )
     
     try:
         analytics = quote_comparison_service.calculate_quote_analytics(
@@ -639,6 +677,7 @@ def bulk_update_quotes(
 
 @router.get("/search", response_model=List[QuoteResponse])
 def advanced_search_quotes(
+    response: Response,
     status: Optional[List[str]] = Query(None),
     order_id: Optional[int] = None,
     manufacturer_id: Optional[int] = None,
@@ -651,6 +690,7 @@ def advanced_search_quotes(
     sort_order: Optional[str] = 'desc',
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; takes precedence over skip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -668,16 +708,19 @@ def advanced_search_quotes(
         "sort_order": sort_order,
         "skip": skip,
         "limit": limit,
+        "cursor": cursor,
     }
     service = QuoteService(db)
-    results = service.search_quotes(filters, current_user)
-    return results
+    results = service.search_quotes_page(filters, current_user)
+    if results.next_cursor:
+        response.headers["X-Next-Cursor"] = results.next_cursor
+    return results.items
 
 
 @router.get("/analytics/overview")
 def quote_analytics_overview(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get aggregated analytics across quotes."""
     service = QuoteService(db)
@@ -685,69 +728,22 @@ def quote_analytics_overview(
     return data
 
 
-@router.get("/export/csv")
-async def export_quotes_csv(
+@router.get("/export/{export_format}")
+async def export_quotes(
+    export_format: ExportFormat,
     status_filter: Optional[QuoteStatus] = Query(None),
     order_id: Optional[int] = Query(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    compress: bool = Query(False, description="gzip the file on the fly"),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
 ):
-    """Export quotes as CSV"""
+    """Export quotes as CSV, NDJSON or Parquet, streamed while rows are read"""
     try:
-        query = db.query(Quote)
-        
-        # Filter by user role
-        if current_user.role == UserRole.CLIENT:
-            # Clients can see quotes for their orders
-            order_ids = db.query(Order.id).filter(Order.client_id == current_user.id).subquery()
-            query = query.filter(Quote.order_id.in_(order_ids))
-        elif current_user.role == UserRole.MANUFACTURER:
-            # Manufacturers can see their own quotes
-            manufacturer = db.query(Manufacturer).filter(Manufacturer.user_id == current_user.id).first()
-            if manufacturer:
-                query = query.filter(Quote.manufacturer_id == manufacturer.id)
-        # Admin can see all quotes
-        
-        # Apply filters
-        if status_filter:
-            query = query.filter(Quote.status == status_filter)
-        if order_id:
-            query = query.filter(Quote.order_id == order_id)
-        
-        quotes = query.all()
-        
-        # Create CSV
-        output = BytesIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Quote ID', 'Order ID', 'Manufacturer', 'Total Price', 'Currency',
-            'Delivery Time (days)', 'Status', 'Created At', 'Accepted At'
-        ])
-        
-        # Write data
-        for quote in quotes:
-            writer.writerow([
-                quote.id,
-                quote.order_id,
-                quote.manufacturer.company_name if quote.manufacturer else '',
-                str(quote.total_price_pln),
-                'PLN',
-                quote.delivery_time_days,
-                quote.status.value if hasattr(quote.status, 'value') else str(quote.status),
-                quote.created_at.isoformat(),
-                quote.accepted_at.isoformat() if quote.accepted_at else ''
-            ])
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            BytesIO(output.getvalue()),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=quotes_export.csv"}
-        )
+        statement = quotes_export_statement(current_user, status_filter, order_id)
+        return export_response(db, statement, QUOTE_EXPORT_COLUMNS, "quotes_export", export_format, compress)
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error exporting quotes: {str(e)}")
         raise HTTPException(
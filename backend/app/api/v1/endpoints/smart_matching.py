@@ -11,6 +11,7 @@ from datetime import datetime
 import logging
 
 from app.core.database import get_db
+from app.core.deps import user_rate_limit
 from app.core.security import get_current_user, get_current_user_optional
 from app.models.user import User
 from app.models.order import Order
@@ -37,6 +38,7 @@ from app.schemas.smart_matching import (
     MatchTypeEnum
 )
 from app.services.smart_matching import SmartMatchingService, SmartMatch, MatchType, matching_cache
+from app.services.matching_result_cache import matching_result_cache, order_fingerprint
 
 # Enhanced matching imports
 try:
@@ -78,7 +80,7 @@ class ComplexityAnalysisResponse(BaseModel):
 @router.post("/enhanced/curated-matches")
 async def get_enhanced_curated_matches(
     request: CuratedMatchingRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(user_rate_limit("matching")),
     db: Session = Depends(get_db)
 ):
     """
@@ -344,7 +346,7 @@ async def enhanced_matching_health():
 @router.post("/smart-recommendations", response_model=SmartMatchingResponse)
 async def get_smart_recommendations(
     request: SmartMatchingRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(user_rate_limit("matching")),
     db: Session = Depends(get_db),
     background_tasks: BackgroundTasks = None
 ):
@@ -377,7 +379,8 @@ async def get_smart_recommendations(
             order=order,
             max_recommendations=request.max_recommendations,
             include_ai_insights=request.include_ai_insights,
-            enable_ml_predictions=request.enable_ml_predictions
+            enable_ml_predictions=request.enable_ml_predictions,
+            details=request.details
         )
         
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -464,12 +467,16 @@ async def get_order_recommendations(
     if order.client_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Generate recommendations
+    # Generate recommendations with only the details this response shows
+    details = ['estimated_delivery_time', 'estimated_cost_range', 'competitive_advantages', 'potential_concerns']
+    if include_insights:
+        details.append('ai_insights')
     recommendations = smart_matching_engine.get_smart_recommendations(
         db=db,
         order=order,
         max_recommendations=max_results,
-        include_ai_insights=include_insights
+        include_ai_insights=include_insights,
+        details=details
     )
     
     # Convert to response format
@@ -813,7 +820,7 @@ async def get_matches_for_order(
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Check cache first
-    cache_key = f"order_{order_id}_matches_{limit}_{min_score}"
+    cache_key = order_fingerprint(order, limit=limit, min_score=min_score)
     cached_matches = matching_cache.get_matches(cache_key)
     if cached_matches:
         return [SmartMatchResponse.from_smart_match(match) for match in cached_matches]
@@ -998,7 +1005,8 @@ async def matching_service_health():
     
     return {
         "status": "healthy",
-        "cache_size": len(matching_cache._cache),
+        "cache_size": matching_cache.size(),
+        "cache_stats": matching_result_cache.stats(),
         "service": "smart_matching",
         "version": "1.0.0"
     }
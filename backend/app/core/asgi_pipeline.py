@@ -0,0 +1,220 @@
+"""
+Pure-ASGI middleware pipeline.
+
+Starlette's BaseHTTPMiddleware runs each layer in its own task and pipes
+the response through a memory stream, which costs a task hop per layer and
+breaks streaming responses. Here a list of stages runs inside one ASGI
+callable instead:
+
+- on_request(ctx) runs before the app, in stage order. A stage may return
+  a Response to answer the request itself (rate limited, blocked, ...);
+  the app and later stages are then skipped.
+- on_response_start(ctx, headers) runs, in reverse order, when the
+  http.response.start message goes out, so stages add headers without
+  touching the body.
+- on_error(ctx, exc) may turn an exception into a Response, as long as
+  the response has not started yet.
+- on_complete(ctx) runs after the response was sent or the request failed.
+
+Request bodies are read only when a stage's wants_body(ctx) says so, or
+when a stage iterates over ctx.iter_body() (for example to scan just a
+prefix); whatever was read is replayed to the app, the rest is streamed
+to it untouched. Response bodies are never buffered.
+
+Every stage also works as a standalone middleware, so
+app.add_middleware(RateLimitMiddleware) keeps working, while
+setup_middleware runs all stages in one layer with
+app.add_middleware(MiddlewarePipeline, stages=[...]).
+"""
+
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.rate_limit import client_ip_from_headers
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContext:
+    """Per-request state shared by the stages of a pipeline"""
+
+    def __init__(self, scope: Scope, receive: Receive):
+        self.scope = scope
+        # The request cannot read the body itself; stages that need it
+        # use wants_body() / ctx.body or ctx.iter_body()
+        self.request = Request(scope)
+        self.start_time = time.time()
+        self.body: Optional[bytes] = None
+        self.status_code: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.state: Dict[str, Any] = {}
+        self._client_ip: Optional[str] = None
+        self._server_receive = receive
+        self._buffered: List[Message] = []
+        self._body_complete = False
+        self._replayed = 0
+
+    @property
+    def method(self) -> str:
+        return self.scope["method"]
+
+    @property
+    def path(self) -> str:
+        return self.scope["path"]
+
+    @property
+    def headers(self):
+        return self.request.headers
+
+    @property
+    def client_ip(self) -> str:
+        if self._client_ip is None:
+            client = self.scope.get("client")
+            self._client_ip = client_ip_from_headers(self.request.headers, client[0] if client else None)
+        return self._client_ip
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    async def iter_body(self, limit: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Request body chunks as they arrive, stopping once `limit` bytes
+        have been read. Chunks read by earlier stages are yielded first;
+        the app later receives everything read plus the unread rest.
+        """
+        read = 0
+        index = 0
+        while limit is None or read < limit:
+            if index < len(self._buffered):
+                message = self._buffered[index]
+            elif self._body_complete:
+                return
+            else:
+                message = await self._server_receive()
+                self._buffered.append(message)
+                if message["type"] != "http.request" or not message.get("more_body", False):
+                    self._body_complete = True
+            index += 1
+
+            if message["type"] != "http.request":
+                return
+            chunk = message.get("body", b"")
+            read += len(chunk)
+            yield chunk
+            if not message.get("more_body", False):
+                return
+
+    async def read_body(self) -> bytes:
+        if self.body is None:
+            self.body = b"".join([chunk async for chunk in self.iter_body()])
+        return self.body
+
+    async def receive(self) -> Message:
+        """receive() for the app: replays what stages read, then reads on"""
+        if self._replayed < len(self._buffered):
+            message = self._buffered[self._replayed]
+            self._replayed += 1
+            return message
+        return await self._server_receive()
+
+
+class PipelineStage:
+    """
+    One step of a MiddlewarePipeline; override the hooks you need.
+
+    Constructed with an app, a stage is a complete ASGI middleware on its
+    own (a pipeline of one).
+    """
+
+    def __init__(self, app: Optional[ASGIApp] = None):
+        self.app = app
+        self._pipeline = MiddlewarePipeline(app, [self]) if app is not None else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self._pipeline(scope, receive, send)
+
+    def wants_body(self, ctx: RequestContext) -> bool:
+        return False
+
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        return None
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders) -> None:
+        pass
+
+    async def on_error(self, ctx: RequestContext, exc: Exception) -> Optional[Response]:
+        return None
+
+    async def on_complete(self, ctx: RequestContext) -> None:
+        pass
+
+
+class MiddlewarePipeline:
+    """Runs a list of PipelineStages as a single pure-ASGI middleware"""
+
+    def __init__(self, app: ASGIApp, stages: Sequence[PipelineStage]):
+        self.app = app
+        self.stages = list(stages)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = RequestContext(scope, receive)
+        receive = ctx.receive
+        # Stages whose on_request ran, and those of them that decorate the
+        # response: a stage that answers a request or handles an error
+        # built that response itself, so only the stages outside it do
+        entered: List[PipelineStage] = []
+        decorating = entered
+        response_started = False
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                ctx.status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                for stage in reversed(decorating):
+                    stage.on_response_start(ctx, headers)
+            await send(message)
+
+        try:
+            for stage in self.stages:
+                if ctx.body is None and stage.wants_body(ctx):
+                    await ctx.read_body()
+                entered.append(stage)
+                response = await stage.on_request(ctx)
+                if response is not None:
+                    decorating = entered[:-1]
+                    await response(scope, receive, send_with_headers)
+                    return
+
+            await self.app(scope, receive, send_with_headers)
+
+        except Exception as exc:
+            ctx.error = exc
+            if response_started:
+                raise
+            for index in range(len(entered) - 1, -1, -1):
+                response = await entered[index].on_error(ctx, exc)
+                if response is not None:
+                    decorating = entered[:index]
+                    await response(scope, receive, send_with_headers)
+                    return
+            raise
+
+        finally:
+            for stage in reversed(entered):
+                try:
+                    await stage.on_complete(ctx)
+                except Exception as e:
+                    logger.error(f"Middleware completion hook failed: {e}")
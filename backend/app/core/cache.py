@@ -3,6 +3,7 @@ Advanced caching system with Redis and performance optimization
 """
 import json
 import time
+import fnmatch
 import hashlib
 import logging
 from typing import Any, Optional, Dict, List, Callable
@@ -110,15 +111,29 @@ class CacheManager:
             self.stats['errors'] += 1
             return False
     
-    def clear_pattern(self, pattern: str) -> int:
-        """Clear all keys matching pattern"""
+    def clear_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """
+        Clear all keys matching pattern.
+
+        Walks the keyspace incrementally with SCAN and removes keys with
+        UNLINK in batches; KEYS would block Redis for the whole keyspace.
+        """
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                deleted = self.redis_client.delete(*keys)
-                self.stats['deletes'] += deleted
-                return deleted
-            return 0
+            deleted = 0
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            
+            for key in [key for key in self.memory_cache if fnmatch.fnmatchcase(key, pattern)]:
+                del self.memory_cache[key]
+            
+            self.stats['deletes'] += deleted
+            return deleted
         except Exception as e:
             logger.error(f"Cache clear pattern error for {pattern}: {e}")
             self.stats['errors'] += 1
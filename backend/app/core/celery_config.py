@@ -18,7 +18,8 @@ def create_celery_app() -> Celery:
             'app.tasks.order_tasks',
             'app.tasks.sync_tasks',
             'app.tasks.analytics_tasks',
-            'app.tasks.monitoring_tasks'
+            'app.tasks.monitoring_tasks',
+            'app.tasks.export_tasks'
         ]
     )
     
@@ -56,6 +57,9 @@ def create_celery_app() -> Celery:
             'app.tasks.analytics_tasks.update_dashboard_metrics': {'queue': 'analytics.realtime'},
             'app.tasks.analytics_tasks.process_user_analytics': {'queue': 'analytics.batch'},
             
+            # Export tasks
+            'app.tasks.export_tasks.export_dataset': {'queue': 'analytics.batch'},
+            
             # Monitoring tasks
             'app.tasks.monitoring_tasks.health_check': {'queue': 'monitoring.critical'},
             'app.tasks.monitoring_tasks.collect_metrics': {'queue': 'monitoring.normal'},
@@ -248,6 +252,16 @@ def create_celery_app() -> Celery:
                 'schedule': timedelta(hours=6),
                 'options': {'queue': 'analytics.batch'}
             },
+            'materialize-similar-manufacturers': {
+                'task': 'app.tasks.analytics_tasks.materialize_similar_manufacturers',
+                'schedule': timedelta(hours=24),
+                'options': {'queue': 'analytics.batch'}
+            },
+            'rebuild-dashboard-counters': {
+                'task': 'app.tasks.analytics_tasks.rebuild_dashboard_counters',
+                'schedule': timedelta(hours=24),
+                'options': {'queue': 'analytics.batch'}
+            },
             
             # System monitoring
             'system-health-check': {
@@ -274,7 +288,6 @@ def create_celery_app() -> Celery:
         task_publish_retry=True,
         
         # Security settings
-        task_reject_on_worker_lost=True,
         task_ignore_result=False,
         
         # Advanced features
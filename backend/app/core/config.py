@@ -156,6 +156,10 @@ class Settings(BaseSettings):
     ]
     UPLOAD_FOLDER: str = "uploads"  # Legacy support
     
+    # Background exports
+    EXPORT_DIRECTORY: str = os.getenv("EXPORT_DIRECTORY", "exports")
+    EXPORT_RETENTION_HOURS: int = int(os.getenv("EXPORT_RETENTION_HOURS", "24"))
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "app.log"
@@ -256,6 +260,13 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "30"))
     DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
     DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    
+    # Read replicas (comma-separated URLs) used by get_read_db
+    DB_READ_REPLICA_URLS: str = os.getenv("DB_READ_REPLICA_URLS", "")
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5.0"))
+    DB_REPLICA_LAG_CHECK_SECONDS: float = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "2.0"))
     
     # CDN Configuration
     CDN_ENABLED: bool = os.getenv("CDN_ENABLED", "false").lower() == "true"
@@ -277,6 +288,17 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
+    RATE_LIMIT_MATCHING_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_MATCHING_PER_MINUTE", "30"))  # per user
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))  # fallback buckets per process
+    
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_LOCAL_TTL_SECONDS: float = float(os.getenv("PRINCIPAL_CACHE_LOCAL_TTL_SECONDS", "30"))
+    PRINCIPAL_CACHE_REDIS_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL_SECONDS", "900"))
+    PRINCIPAL_CACHE_MAX_LOCAL_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_LOCAL_ENTRIES", "10000"))
+    
+    # Approximate totals of paginated lists
+    PAGINATION_COUNT_TTL_SECONDS: float = float(os.getenv("PAGINATION_COUNT_TTL_SECONDS", "60"))
+    PAGINATION_COUNT_MAX_ENTRIES: int = int(os.getenv("PAGINATION_COUNT_MAX_ENTRIES", "10000"))
     
     @validator("DATABASE_URL_ASYNC", pre=True)
     @classmethod
@@ -286,6 +308,8 @@ class Settings(BaseSettings):
         db_url = values.get("DATABASE_URL", "")
         if db_url.startswith("postgresql://"):
             return db_url.replace("postgresql://", "postgresql+asyncpg://")
+        if db_url.startswith("sqlite:///"):
+            return db_url.replace("sqlite:///", "sqlite+aiosqlite:///")
         return db_url
     
     @validator("CORS_ORIGINS", "BACKEND_CORS_ORIGINS", pre=True)
@@ -1,28 +1,176 @@
 """
 Database configuration with performance optimizations
 """
+import bisect
 import time
 import logging
+import threading
 from contextlib import contextmanager
-from typing import Generator, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Tuple
 from sqlalchemy import create_engine, event, text, MetaData
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
 
 # Performance monitoring
 logger = logging.getLogger(__name__)
 
-# Optimized engine with connection pooling
-# Force SQLite for development
-database_url = "sqlite:///./manufacturing_platform.db"
+# Upper bounds (seconds) of the checkout wait histogram buckets
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolTelemetry:
+    """
+    Checkout wait times per connection pool.
+
+    Keeps a cumulative histogram per pool for local analysis and forwards
+    every observation to registered observers (PerformanceMonitor exports
+    them to Prometheus).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = POOL_WAIT_BUCKETS):
+        self.buckets = buckets
+        self.engines: Dict[str, Any] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._observers: List[Callable[[str, float, bool], None]] = []
+        self._lock = threading.Lock()
+
+    def register_engine(self, name: str, engine: Any) -> None:
+        """Report occupancy of engine.pool, which is replaced on dispose()"""
+        self.engines[name] = engine
+
+    def add_observer(self, observer: Callable[[str, float, bool], None]) -> None:
+        """observer(pool_name, wait_seconds, timed_out) is called on every checkout"""
+        self._observers.append(observer)
+
+    def observe(self, pool_name: str, wait_seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            histogram = self._histograms.get(pool_name)
+            if histogram is None:
+                histogram = self._histograms[pool_name] = {
+                    'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0, 'timeouts': 0
+                }
+            histogram['counts'][bisect.bisect_left(self.buckets, wait_seconds)] += 1
+            histogram['count'] += 1
+            histogram['sum'] += wait_seconds
+            if timed_out:
+                histogram['timeouts'] += 1
+
+        for observer in self._observers:
+            try:
+                observer(pool_name, wait_seconds, timed_out)
+            except Exception as e:
+                logger.error(f"Pool telemetry observer failed: {e}")
+
+    def wait_quantile(self, pool_name: str, quantile: float) -> Optional[float]:
+        """Bucket upper bound containing the given quantile of checkout waits"""
+        histogram = self._histograms.get(pool_name)
+        if not histogram or not histogram['count']:
+            return None
+        target = quantile * histogram['count']
+        seen = 0
+        for upper_bound, count in zip(self.buckets + (float('inf'),), histogram['counts']):
+            seen += count
+            if seen >= target:
+                return upper_bound
+        return float('inf')
+
+    def snapshot(self, pool_name: str) -> Dict[str, Any]:
+        """Pool occupancy plus checkout wait statistics"""
+        engine = self.engines.get(pool_name)
+        pool = engine.pool if engine is not None else None
+        histogram = self._histograms.get(pool_name, {'count': 0, 'sum': 0.0, 'timeouts': 0})
+        status = {}
+        if pool is not None and hasattr(pool, 'checkedout'):
+            max_overflow = getattr(pool, '_max_overflow', 0)
+            status = {
+                'size': pool.size(),
+                # None when overflow is unbounded
+                'capacity': pool.size() + max_overflow if max_overflow >= 0 else None,
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            }
+        return {
+            **status,
+            'checkouts': histogram['count'],
+            'checkout_timeouts': histogram['timeouts'],
+            'checkout_wait_avg_seconds': histogram['sum'] / histogram['count'] if histogram['count'] else 0.0,
+            'checkout_wait_p95_seconds': self.wait_quantile(pool_name, 0.95),
+            'checkout_wait_p99_seconds': self.wait_quantile(pool_name, 0.99),
+        }
+
+    def snapshot_all(self) -> Dict[str, Dict[str, Any]]:
+        return {name: self.snapshot(name) for name in self.engines}
+
+
+pool_telemetry = PoolTelemetry()
+
+
+class _CheckoutTimingMixin:
+    """Times how long a checkout waits for a usable connection (including connect)"""
+
+    telemetry_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception as e:
+            pool_telemetry.observe(self.telemetry_name, time.perf_counter() - start, timed_out=_is_pool_timeout(e))
+            raise
+        pool_telemetry.observe(self.telemetry_name, time.perf_counter() - start)
+        return connection
+
+
+def _is_pool_timeout(error: Exception) -> bool:
+    return isinstance(error, sqlalchemy_exc.TimeoutError)
+
+
+def _instrumented_pool_class(base: type, name: str) -> type:
+    return type(f"Instrumented{base.__name__}", (_CheckoutTimingMixin, base), {"telemetry_name": name})
+
+
+def _engine_options(url: str, pool_name: str, is_async: bool = False) -> Dict[str, Any]:
+    """Pool and connection options for an engine, driven by settings"""
+    options: Dict[str, Any] = {"echo": settings.DEBUG}  # Log SQL queries in debug mode
+
+    if url.startswith("sqlite"):
+        # Allow multithread access for SQLite
+        options["connect_args"] = {"check_same_thread": False}
+        if make_url(url).database in (None, "", ":memory:"):
+            # In-memory databases keep their own single-connection pool
+            return options
+    elif url.startswith("postgresql"):
+        timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+
+    options.update(
+        poolclass=_instrumented_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, pool_name),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+
+# Engine with connection pooling, configured from settings
+database_url = settings.DATABASE_URL
 engine = create_engine(
     database_url,
-    echo=settings.DEBUG,  # Log SQL queries in debug mode
     future=True,  # Use SQLAlchemy 2.0 style
-    connect_args={"check_same_thread": False},  # Allow multithread access for SQLite
+    **_engine_options(database_url, "primary")
 )
+pool_telemetry.register_engine("primary", engine)
 
 # Query performance monitoring
 @event.listens_for(engine, "before_cursor_execute")
@@ -52,6 +200,36 @@ SessionLocal = sessionmaker(
     expire_on_commit=False  # Prevent lazy loading issues
 )
 
+
+def async_database_url(url: str) -> str:
+    """Same database through its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+# Async engine over the same database for async endpoints. Queries run
+# through the driver's own event-loop integration instead of blocking the
+# worker's loop the way the sync Session does inside `async def` handlers.
+# An explicitly configured DATABASE_URL_ASYNC wins.
+async_url = settings.DATABASE_URL_ASYNC or async_database_url(database_url)
+async_engine = create_async_engine(
+    async_url,
+    **_engine_options(async_url, "primary_async", is_async=True)
+)
+pool_telemetry.register_engine("primary_async", async_engine.sync_engine)
+event.listen(async_engine.sync_engine, "before_cursor_execute", receive_before_cursor_execute)
+event.listen(async_engine.sync_engine, "after_cursor_execute", receive_after_cursor_execute)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # Attribute access after commit must not trigger IO
+)
+
 # Create declarative base
 Base = declarative_base()
 
@@ -89,7 +267,7 @@ def create_tables():
         from app.models import (
             user, order, producer, quote, quote_template, payment,
             financial, payment_escrow, supply_chain, message, 
-            security_models, subscription, production_quote
+            security_models, subscription, production_quote, dashboard_counter
         )
         
         # Create all tables
@@ -120,6 +298,27 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get an async database session for `async def` endpoints.
+
+    Relationships are not lazy loaded on an AsyncSession; load what the
+    response needs explicitly (selectinload / joinedload).
+    """
+    start_time = time.time()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Async database session error: {e}")
+            raise
+        finally:
+            session_duration = time.time() - start_time
+            if session_duration > 1.0:  # Log long-running sessions
+                logger.warning(f"Long async database session: {session_duration:.3f}s")
+
+
 @contextmanager
 def get_db_context() -> Generator[Session, None, None]:
     """
@@ -169,16 +368,14 @@ class DatabaseOptimizer:
             return {'error': str(e)}
     
     @staticmethod
-    def get_connection_pool_status() -> dict:
-        """Get connection pool statistics"""
-        pool = engine.pool
-        return {
-            'size': pool.size(),
-            'checked_in': pool.checkedin(),
-            'checked_out': pool.checkedout(),
-            'overflow': pool.overflow(),
-            'invalid': pool.invalid()
-        }
+    def get_connection_pool_status(pool_name: str = "primary") -> dict:
+        """Get connection pool statistics including checkout wait times"""
+        return pool_telemetry.snapshot(pool_name)
+    
+    @staticmethod
+    def get_all_pool_status() -> dict:
+        """Connection pool statistics for every engine"""
+        return pool_telemetry.snapshot_all()
     
     @staticmethod
     def optimize_table_indexes(db: Session, table_name: str) -> dict:
@@ -5,9 +5,39 @@ This module provides commonly used dependencies for FastAPI endpoints,
 including database sessions and user authentication.
 """
 
+from fastapi import Depends, HTTPException, status
+
 # Simply re-export the functions from their original locations
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.database import get_async_db, get_db
+from app.core.rate_limit import rate_limit_engine
+from app.core.read_replicas import get_async_read_db, get_read_db
+from app.core.security import (
+    get_current_active_principal, get_current_principal, get_current_user, require_principal_role,
+)
+from app.models.user import User
 
 # For backwards compatibility, also export the original functions
-__all__ = ["get_db", "get_current_user"] 
\ No newline at end of file
+__all__ = [
+    "get_async_db", "get_async_read_db", "get_db", "get_read_db", "get_current_user",
+    "get_current_principal", "get_current_active_principal", "require_principal_role", "user_rate_limit",
+]
+
+
+def user_rate_limit(policy_name: str):
+    """
+    Dependency that limits the current user by a named rate limit policy.
+
+    Use it in place of get_current_user:
+        current_user: User = Depends(user_rate_limit("matching"))
+    """
+    async def check_user_rate_limit(current_user: User = Depends(get_current_user)) -> User:
+        result = (await rate_limit_engine.ahit([(policy_name, f"user:{current_user.id}")]))[0]
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=result.headers()
+            )
+        return current_user
+
+    return check_user_rate_limit
@@ -10,10 +10,14 @@ from typing import Dict, List, Optional, Tuple
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
 from fastapi import Request, Response, HTTPException, status
-from fastapi.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp
 import logging
 
+from app.core.asgi_pipeline import PipelineStage, RequestContext
+from app.core.rate_limit import RateLimitEngine, client_ip_from_headers, rate_limit_engine
+
 logger = logging.getLogger(__name__)
 
 class SecurityHeaders:
@@ -71,32 +75,18 @@ class SecurityHeaders:
 
 
 class RateLimiter:
-    """Advanced rate limiting with sliding window"""
+    """Per-client rate limiting on the shared rate limit engine"""
     
-    def __init__(self):
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        self.blocked_ips: Dict[str, datetime] = {}
-        
-        # Rate limiting rules
-        self.rules = {
-            "auth": {"requests": 5, "window": 60, "block_duration": 300},  # 5 req/min, block 5min
-            "api": {"requests": 100, "window": 60, "block_duration": 60},   # 100 req/min, block 1min
-            "public": {"requests": 1000, "window": 3600, "block_duration": 300}  # 1000 req/hour, block 5min
-        }
+    # Seconds a client is blocked after exceeding its category's limit
+    LOCKOUT_SECONDS = {"auth": 300, "api": 60, "public": 300}
+    
+    def __init__(self, engine: Optional[RateLimitEngine] = None):
+        self.engine = engine or rate_limit_engine
     
     def get_client_id(self, request: Request) -> str:
         """Get client identifier for rate limiting"""
-        # Try to get real IP from headers (for reverse proxy setups)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        # Fallback to direct client IP
-        return request.client.host if request.client else "unknown"
+        peer = request.client.host if request.client else None
+        return client_ip_from_headers(request.headers, peer)
     
     def get_rate_limit_category(self, path: str) -> str:
         """Determine rate limit category based on path"""
@@ -107,60 +97,30 @@ class RateLimiter:
         else:
             return "public"
     
-    def is_allowed(self, request: Request) -> Tuple[bool, Optional[Dict]]:
+    async def is_allowed(self, request: Request) -> Tuple[bool, Optional[Dict]]:
         """Check if request is allowed under rate limits"""
         client_id = self.get_client_id(request)
-        path = request.url.path
-        category = self.get_rate_limit_category(path)
-        
-        # Check if IP is currently blocked
-        if client_id in self.blocked_ips:
-            if datetime.now() < self.blocked_ips[client_id]:
-                remaining_time = int((self.blocked_ips[client_id] - datetime.now()).total_seconds())
-                return False, {
-                    "error": "Rate limit exceeded",
-                    "retry_after": remaining_time,
-                    "category": category
-                }
-            else:
-                # Unblock IP
-                del self.blocked_ips[client_id]
-        
-        # Get rate limit rule
-        rule = self.rules[category]
-        now = datetime.now()
-        window_start = now - timedelta(seconds=rule["window"])
+        category = self.get_rate_limit_category(request.url.path)
+        result = (await self.engine.ahit(
+            [(category, client_id)], lockout_seconds=self.LOCKOUT_SECONDS[category]
+        ))[0]
+        headers = result.headers()
         
-        # Clean old requests
-        client_requests = self.requests[f"{client_id}:{category}"]
-        while client_requests and client_requests[0] < window_start:
-            client_requests.popleft()
-        
-        # Check if limit exceeded
-        if len(client_requests) >= rule["requests"]:
-            # Block IP
-            block_until = now + timedelta(seconds=rule["block_duration"])
-            self.blocked_ips[client_id] = block_until
-            
+        if not result.allowed:
             logger.warning(f"Rate limit exceeded for {client_id} on {category} endpoints")
-            
             return False, {
                 "error": "Rate limit exceeded",
-                "retry_after": rule["block_duration"],
+                "retry_after": int(headers["Retry-After"]),
+                "limit": result.policy.limit,
+                "remaining": 0,
+                "reset": int(headers["X-RateLimit-Reset"]),
                 "category": category
             }
         
-        # Add current request
-        client_requests.append(now)
-        
-        # Return rate limit headers info
-        remaining = rule["requests"] - len(client_requests)
-        reset_time = int((window_start + timedelta(seconds=rule["window"])).timestamp())
-        
         return True, {
-            "limit": rule["requests"],
-            "remaining": remaining,
-            "reset": reset_time,
+            "limit": result.policy.limit,
+            "remaining": result.remaining,
+            "reset": int(headers["X-RateLimit-Reset"]),
             "category": category
         }
 
@@ -226,10 +186,10 @@ class InputValidator:
         return issues
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware(PipelineStage):
     """Comprehensive security middleware"""
     
-    def __init__(self, app, enable_rate_limiting: bool = True):
+    def __init__(self, app: Optional[ASGIApp] = None, enable_rate_limiting: bool = True):
         super().__init__(app)
         self.rate_limiter = RateLimiter() if enable_rate_limiting else None
         self.security_headers = SecurityHeaders()
@@ -249,93 +209,94 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         self.security_events.append(event)
         logger.warning(f"Security event: {event_type} from {client_ip} - {details}")
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request through security middleware"""
-        start_time = time.time()
-        client_ip = self.rate_limiter.get_client_id(request) if self.rate_limiter else "unknown"
+    def wants_body(self, ctx: RequestContext) -> bool:
+        """Only JSON bodies of write requests are validated"""
+        return (
+            ctx.method in ["POST", "PUT", "PATCH"]
+            and "application/json" in ctx.headers.get("content-type", "")
+        )
+    
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        """Rate limiting and input validation, before the app runs"""
+        client_ip = ctx.client_ip if self.rate_limiter else "unknown"
         
-        try:
-            # 1. Rate limiting check
-            if self.rate_limiter:
-                is_allowed, rate_info = self.rate_limiter.is_allowed(request)
-                if not is_allowed:
-                    self.log_security_event("rate_limit_exceeded", client_ip, rate_info)
-                    return JSONResponse(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        content={
-                            "detail": rate_info["error"],
-                            "retry_after": rate_info["retry_after"]
-                        },
-                        headers={
-                            "Retry-After": str(rate_info["retry_after"]),
-                            "X-RateLimit-Limit": str(rate_info.get("limit", 0)),
-                            "X-RateLimit-Remaining": str(rate_info.get("remaining", 0)),
-                            "X-RateLimit-Reset": str(rate_info.get("reset", 0))
-                        }
-                    )
-            
-            # 2. Input validation for POST/PUT requests
-            if request.method in ["POST", "PUT", "PATCH"]:
-                try:
-                    # Only validate JSON content
-                    content_type = request.headers.get("content-type", "")
-                    if "application/json" in content_type:
-                        body = await request.body()
-                        if body:
-                            try:
-                                data = json.loads(body)
-                                validation_issues = self.input_validator.validate_request_data(data)
-                                
-                                if validation_issues:
-                                    self.log_security_event("input_validation_failed", client_ip, {
-                                        "issues": validation_issues,
-                                        "path": request.url.path
-                                    })
-                                    return JSONResponse(
-                                        status_code=status.HTTP_400_BAD_REQUEST,
-                                        content={"detail": "Invalid input detected"}
-                                    )
-                            except json.JSONDecodeError:
-                                # Invalid JSON - let the application handle it
-                                pass
-                except Exception as e:
-                    # Don't block request if validation fails
-                    logger.error(f"Input validation error: {e}")
-            
-            # 3. Process request
-            response = await call_next(request)
-            
-            # 4. Add security headers
-            for header, value in self.security_headers.get_security_headers().items():
-                response.headers[header] = value
-            
-            # 5. Add rate limit headers if available
-            if self.rate_limiter and rate_info:
-                response.headers["X-RateLimit-Limit"] = str(rate_info.get("limit", 0))
-                response.headers["X-RateLimit-Remaining"] = str(rate_info.get("remaining", 0))
-                response.headers["X-RateLimit-Reset"] = str(rate_info.get("reset", 0))
-            
-            # 6. Log slow requests
-            process_time = time.time() - start_time
-            if process_time > 2.0:  # Log requests taking more than 2 seconds
-                logger.warning(f"Slow request: {request.method} {request.url.path} took {process_time:.2f}s")
-            
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
-        except Exception as e:
-            self.log_security_event("middleware_error", client_ip, {
-                "error": str(e),
-                "path": request.url.path
-            })
-            logger.error(f"Security middleware error: {e}")
-            
-            # Return a generic error response
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={"detail": "Internal server error"}
-            )
+        # 1. Rate limiting check
+        if self.rate_limiter:
+            is_allowed, rate_info = await self.rate_limiter.is_allowed(ctx.request)
+            if not is_allowed:
+                self.log_security_event("rate_limit_exceeded", client_ip, rate_info)
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "detail": rate_info["error"],
+                        "retry_after": rate_info["retry_after"]
+                    },
+                    headers={
+                        "Retry-After": str(rate_info["retry_after"]),
+                        "X-RateLimit-Limit": str(rate_info.get("limit", 0)),
+                        "X-RateLimit-Remaining": str(rate_info.get("remaining", 0)),
+                        "X-RateLimit-Reset": str(rate_info.get("reset", 0))
+                    }
+                )
+            ctx.state["rate_info"] = rate_info
+        
+        # 2. Input validation for JSON POST/PUT requests
+        if ctx.body:
+            try:
+                data = json.loads(ctx.body)
+                if isinstance(data, dict):
+                    validation_issues = self.input_validator.validate_request_data(data)
+                    
+                    if validation_issues:
+                        self.log_security_event("input_validation_failed", client_ip, {
+                            "issues": validation_issues,
+                            "path": ctx.path
+                        })
+                        return JSONResponse(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"detail": "Invalid input detected"}
+                        )
+            except json.JSONDecodeError:
+                # Invalid JSON - let the application handle it
+                pass
+            except Exception as e:
+                # Don't block request if validation fails
+                logger.error(f"Input validation error: {e}")
+        
+        return None
+    
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        # 3. Add security headers
+        headers.update(self.security_headers.get_security_headers())
+        
+        # 4. Add rate limit headers if available
+        rate_info = ctx.state.get("rate_info")
+        if rate_info:
+            headers["X-RateLimit-Limit"] = str(rate_info.get("limit", 0))
+            headers["X-RateLimit-Remaining"] = str(rate_info.get("remaining", 0))
+            headers["X-RateLimit-Reset"] = str(rate_info.get("reset", 0))
+        
+        headers["X-Process-Time"] = str(ctx.elapsed)
+    
+    async def on_error(self, ctx: RequestContext, exc: Exception) -> Optional[Response]:
+        client_ip = ctx.client_ip if self.rate_limiter else "unknown"
+        self.log_security_event("middleware_error", client_ip, {
+            "error": str(exc),
+            "path": ctx.path
+        })
+        logger.error(f"Security middleware error: {exc}")
+        
+        # Return a generic error response
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"detail": "Internal server error"}
+        )
+    
+    async def on_complete(self, ctx: RequestContext):
+        # Log slow requests
+        process_time = ctx.elapsed
+        if process_time > 2.0:  # Log requests taking more than 2 seconds
+            logger.warning(f"Slow request: {ctx.method} {ctx.path} took {process_time:.2f}s")
 
 
 # Utility functions for security monitoring
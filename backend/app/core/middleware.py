@@ -1,203 +1,69 @@
-import time
 import logging
-from typing import Dict, Optional
-from collections import defaultdict, deque
-from fastapi import FastAPI, Request, Response, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware
-import asyncio
-from app.core.config import get_settings  # local import to avoid cycles
+from starlette.types import ASGIApp
+from app.core.asgi_pipeline import MiddlewarePipeline, PipelineStage, RequestContext
+from app.core.rate_limit import RateLimitEngine, rate_limit_engine, route_policy
 
 logger = logging.getLogger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware(PipelineStage):
     """
-    Rate limiting middleware with sliding window algorithm.
-    
+    Per-IP rate limiting backed by the shared rate limit engine.
+
     Different limits for different endpoint types:
     - Auth endpoints: 5 requests per minute
     - API endpoints: 100 requests per minute
     - Public endpoints: 1000 requests per hour
+
+    Buckets live in Redis, so every worker enforces the same limit; see
+    app.core.rate_limit for the policies and the in-process fallback.
     """
-    
-    def __init__(self, app: FastAPI):
-        super().__init__(app)
-        self.auth_limits = defaultdict(lambda: deque())  # 5 req/min for auth
-        self.api_limits = defaultdict(lambda: deque())   # 100 req/min for API
-        self.public_limits = defaultdict(lambda: deque()) # 1000 req/hour for public
-        
-        # Load dynamic rate-limit configuration from settings so we can tune
-        # limits per-environment (e.g. looser limits on staging / local) and
-        # manage them from a single place.
-        settings = get_settings()
 
-        # Default sliding-window sizes (in seconds)
-        self.AUTH_WINDOW = 60      # 1 minute
-        self.API_WINDOW = 60       # 1 minute
-        self.PUBLIC_WINDOW = 3600  # 1 hour
+    def __init__(self, app: Optional[ASGIApp] = None, engine: Optional[RateLimitEngine] = None):
+        super().__init__(app)
+        self.engine = engine or rate_limit_engine
 
-        # Base limits come from settings; they can be overridden below for
-        # specific environments like "staging" where we want higher ceilings
-        self.AUTH_LIMIT = getattr(settings, "RATE_LIMIT_AUTH_REQUESTS", 5)
-        self.API_LIMIT = getattr(settings, "RATE_LIMIT_PER_MINUTE", 100)
-        self.PUBLIC_LIMIT = getattr(settings, "RATE_LIMIT_PUBLIC_REQUESTS", 1000)
+    async def on_request(self, ctx: RequestContext):
+        """Check the limit before the app runs."""
+        result = (await self.engine.ahit([(route_policy(ctx.path), ctx.client_ip)]))[0]
+        headers = result.headers()
 
-        # If we are running in staging (or still in development) we lift the
-        # API limits so that load-tests / rapid manual testing aren't blocked
-        # by too-aggressive thresholds. Production keeps the stricter values
-        # defined in the .env / config.
-        if settings.ENVIRONMENT in {"staging", "development"}:
-            # Allow a bigger burst in non-production environments.
-            self.API_LIMIT = max(self.API_LIMIT, 300)
-            self.AUTH_LIMIT = max(self.AUTH_LIMIT, 50)
-    
-    def get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        # Check for forwarded headers (behind proxy)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    def is_rate_limited(self, client_ip: str, endpoint_type: str) -> tuple[bool, int]:
-        """
-        Check if client is rate limited.
-        
-        Returns:
-            tuple: (is_limited, retry_after_seconds)
-        """
-        current_time = time.time()
-        
-        if endpoint_type == "auth":
-            limit = self.AUTH_LIMIT
-            window = self.AUTH_WINDOW
-            requests = self.auth_limits[client_ip]
-        elif endpoint_type == "api":
-            limit = self.API_LIMIT
-            window = self.API_WINDOW
-            requests = self.api_limits[client_ip]
-        else:  # public
-            limit = self.PUBLIC_LIMIT
-            window = self.PUBLIC_WINDOW
-            requests = self.public_limits[client_ip]
-        
-        # Remove expired requests
-        while requests and requests[0] <= current_time - window:
-            requests.popleft()
-        
-        # Check if limit exceeded
-        if len(requests) >= limit:
-            oldest_request = requests[0] if requests else current_time
-            retry_after = int(oldest_request + window - current_time) + 1
-            return True, retry_after
-        
-        # Add current request
-        requests.append(current_time)
-        return False, 0
-    
-    def get_endpoint_type(self, path: str) -> str:
-        """Determine endpoint type based on path."""
-        auth_endpoints = [
-            "/api/v1/auth/login",
-            "/api/v1/auth/register",
-            "/api/v1/auth/forgot-password",
-            "/api/v1/auth/reset-password",
-            "/api/v1/auth/verify-email",
-            "/api/v1/auth/refresh-token"
-        ]
-        
-        if path in auth_endpoints:
-            return "auth"
-        elif path.startswith("/api/"):
-            return "api"
-        else:
-            return "public"
-    
-    async def dispatch(self, request: Request, call_next):
-        """Process request with rate limiting."""
-        client_ip = self.get_client_ip(request)
-        endpoint_type = self.get_endpoint_type(request.url.path)
-        
-        # Check rate limit
-        is_limited, retry_after = self.is_rate_limited(client_ip, endpoint_type)
-        
-        if is_limited:
-            logger.warning(f"Rate limit exceeded for {client_ip} on {request.url.path}")
+        if not result.allowed:
+            logger.warning(f"Rate limit exceeded for {ctx.client_ip} on {ctx.path}")
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Rate limit exceeded",
-                    "retry_after": retry_after
+                    "retry_after": int(headers["Retry-After"])
                 },
-                headers={"Retry-After": str(retry_after)}
+                headers=headers
             )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        remaining = self._get_remaining_requests(client_ip, endpoint_type)
-        response.headers["X-RateLimit-Limit"] = str(self._get_limit(endpoint_type))
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(time.time() + self._get_window(endpoint_type)))
-        
-        return response
-    
-    def _get_limit(self, endpoint_type: str) -> int:
-        """Get rate limit for endpoint type."""
-        return {
-            "auth": self.AUTH_LIMIT,
-            "api": self.API_LIMIT,
-            "public": self.PUBLIC_LIMIT
-        }.get(endpoint_type, self.PUBLIC_LIMIT)
-    
-    def _get_window(self, endpoint_type: str) -> int:
-        """Get time window for endpoint type."""
-        return {
-            "auth": self.AUTH_WINDOW,
-            "api": self.API_WINDOW,
-            "public": self.PUBLIC_WINDOW
-        }.get(endpoint_type, self.PUBLIC_WINDOW)
-    
-    def _get_remaining_requests(self, client_ip: str, endpoint_type: str) -> int:
-        """Get remaining requests for client."""
-        if endpoint_type == "auth":
-            requests = self.auth_limits[client_ip]
-            limit = self.AUTH_LIMIT
-        elif endpoint_type == "api":
-            requests = self.api_limits[client_ip]
-            limit = self.API_LIMIT
-        else:
-            requests = self.public_limits[client_ip]
-            limit = self.PUBLIC_LIMIT
-        
-        return max(0, limit - len(requests))
 
+        ctx.state["rate_limit_headers"] = headers
+        return None
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        headers.update(ctx.state["rate_limit_headers"])
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+
+class SecurityHeadersMiddleware(PipelineStage):
     """Add security headers to all responses."""
-    
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
+
+    HEADERS = {
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "X-XSS-Protection": "1; mode=block",
+        "Referrer-Policy": "strict-origin-when-cross-origin",
+        "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
         # Content Security Policy
-        csp = (
+        "Content-Security-Policy": (
             "default-src 'self'; "
             "script-src 'self' 'unsafe-inline'; "
             "style-src 'self' 'unsafe-inline'; "
@@ -205,70 +71,49 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "font-src 'self'; "
             "connect-src 'self'; "
             "frame-ancestors 'none';"
-        )
-        response.headers["Content-Security-Policy"] = csp
-        
+        ),
+    }
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        headers.update(self.HEADERS)
+
         # HSTS (only in production with HTTPS)
-        if request.url.scheme == "https":
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        return response
+        if ctx.scope.get("scheme") == "https":
+            headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware(PipelineStage):
     """Log all requests with timing and error information."""
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        client_ip = self._get_client_ip(request)
-        
-        # Log request
+
+    async def on_request(self, ctx: RequestContext):
         logger.info(
-            f"Request started: {request.method} {request.url.path} "
-            f"from {client_ip}"
+            f"Request started: {ctx.method} {ctx.path} "
+            f"from {ctx.client_ip}"
         )
-        
-        try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Log response
-            logger.info(
-                f"Request completed: {request.method} {request.url.path} "
-                f"- Status: {response.status_code} "
-                f"- Time: {process_time:.3f}s "
-                f"- IP: {client_ip}"
-            )
-            
-            # Add timing header
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
-        except Exception as e:
-            # Log error
-            process_time = time.time() - start_time
+        return None
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        # Time until the response starts; streamed bodies are not included
+        headers["X-Process-Time"] = str(ctx.elapsed)
+
+    async def on_complete(self, ctx: RequestContext):
+        process_time = ctx.elapsed
+
+        if ctx.error is not None:
             logger.error(
-                f"Request failed: {request.method} {request.url.path} "
-                f"- Error: {str(e)} "
+                f"Request failed: {ctx.method} {ctx.path} "
+                f"- Error: {str(ctx.error)} "
                 f"- Time: {process_time:.3f}s "
-                f"- IP: {client_ip}"
+                f"- IP: {ctx.client_ip}"
             )
-            raise
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
+            return
+
+        logger.info(
+            f"Request completed: {ctx.method} {ctx.path} "
+            f"- Status: {ctx.status_code} "
+            f"- Time: {process_time:.3f}s "
+            f"- IP: {ctx.client_ip}"
+        )
 
 
 def setup_middleware(app: FastAPI, settings):
@@ -314,6 +159,7 @@ def setup_middleware(app: FastAPI, settings):
             "X-RateLimit-Remaining",
             "X-RateLimit-Reset",
             "X-Process-Time",
+            "X-Next-Cursor",
         ]
     )
     
@@ -325,25 +171,16 @@ def setup_middleware(app: FastAPI, settings):
         https_only=not settings.DEBUG
     )
     
-    # 4. Security Headers Middleware
-    app.add_middleware(SecurityHeadersMiddleware)
-    
-    # 5. Rate Limiting Middleware
-    app.add_middleware(RateLimitMiddleware)
-    
-    # 6. Request Logging Middleware (last, to capture all requests)
-    app.add_middleware(RequestLoggingMiddleware)
+    # 4. Logging, rate limiting and security headers in one pure-ASGI
+    # layer; logging runs first to capture all requests, rate limiting
+    # answers before the app is called
+    app.add_middleware(
+        MiddlewarePipeline,
+        stages=[
+            RequestLoggingMiddleware(),
+            RateLimitMiddleware(),
+            SecurityHeadersMiddleware(),
+        ]
+    )
     
     logger.info("All middleware configured successfully")
-
-
-# Cleanup task for rate limiting
-async def cleanup_rate_limits():
-    """Periodic cleanup of expired rate limit entries."""
-    while True:
-        await asyncio.sleep(300)  # Clean up every 5 minutes
-        current_time = time.time()
-        
-        # This would ideally be implemented with a proper cache like Redis
-        # For now, this is a simple in-memory cleanup
-        logger.debug("Cleaning up expired rate limit entries") 
\ No newline at end of file
@@ -16,6 +16,7 @@ from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTEN
 import statsd
 
 from app.core.config import settings
+from app.core.database import POOL_WAIT_BUCKETS, pool_telemetry
 
 logger = logging.getLogger(__name__)
 
@@ -136,6 +137,48 @@ class PerformanceMonitor:
                     self.cpu_usage = collector
                     break
         
+        try:
+            self.pool_checkout_wait = Histogram(
+                'database_pool_checkout_wait_seconds',
+                'Time spent waiting for a pooled database connection',
+                ['pool'],
+                buckets=POOL_WAIT_BUCKETS
+            )
+        except ValueError:
+            from prometheus_client import REGISTRY
+            for collector in list(REGISTRY._collector_to_names.keys()):
+                if hasattr(collector, '_name') and collector._name == 'database_pool_checkout_wait_seconds':
+                    self.pool_checkout_wait = collector
+                    break
+        
+        try:
+            self.pool_checkout_timeouts = Counter(
+                'database_pool_checkout_timeouts_total',
+                'Checkouts that gave up waiting for a pooled connection',
+                ['pool']
+            )
+        except ValueError:
+            from prometheus_client import REGISTRY
+            for collector in list(REGISTRY._collector_to_names.keys()):
+                if hasattr(collector, '_name') and collector._name == 'database_pool_checkout_timeouts':
+                    self.pool_checkout_timeouts = collector
+                    break
+        
+        try:
+            self.pool_connections = Gauge(
+                'database_pool_connections',
+                'Pooled database connections by state',
+                ['pool', 'state']
+            )
+        except ValueError:
+            from prometheus_client import REGISTRY
+            for collector in list(REGISTRY._collector_to_names.keys()):
+                if hasattr(collector, '_name') and collector._name == 'database_pool_connections':
+                    self.pool_connections = collector
+                    break
+        
+        pool_telemetry.add_observer(self.track_pool_checkout)
+        
         # Performance tracking
         self.performance_data = {
             'requests': [],
@@ -198,6 +241,12 @@ class PerformanceMonitor:
         if duration > settings.DB_QUERY_TIME_BUDGET:
             self.alert_slow_query(query_type, table, duration)
     
+    def track_pool_checkout(self, pool_name: str, wait_seconds: float, timed_out: bool):
+        """Track how long a request waited for a pooled connection"""
+        self.pool_checkout_wait.labels(pool=pool_name).observe(wait_seconds)
+        if timed_out:
+            self.pool_checkout_timeouts.labels(pool=pool_name).inc()
+    
     def track_cache_operation(self, operation: str, backend: str, status: str):
         """Track cache operations"""
         self.cache_operations.labels(
@@ -245,6 +294,13 @@ class PerformanceMonitor:
         cpu_percent = psutil.cpu_percent(interval=1)
         self.cpu_usage.set(cpu_percent)
         
+        # Connection pool occupancy
+        pools = pool_telemetry.snapshot_all()
+        for pool_name, status in pools.items():
+            for state in ('checked_out', 'checked_in', 'overflow'):
+                if status.get(state) is not None:
+                    self.pool_connections.labels(pool=pool_name, state=state).set(status[state])
+        
         # Send to StatsD
         if self.statsd_client:
             self.statsd_client.gauge('system.memory.used', memory.used)
@@ -0,0 +1,330 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET pagination makes the database produce and discard every skipped
+row, so deep pages cost a scan of everything before them. A keyset page
+instead resumes right after the last row of the previous one:
+
+    ORDER BY created_at DESC, id DESC
+    WHERE (created_at, id) < (:last_created_at, :last_id)
+    LIMIT :per_page + 1
+
+which an index on the sort column answers in time proportional to the page
+size. The id tie-breaker makes the order total, so rows sharing a sort
+value are neither skipped nor repeated. NULLs sort as larger than any
+value (PostgreSQL's default, which lets a plain btree index serve both
+directions).
+
+A cursor is the opaque, URL-safe encoding of (sort column, direction, sort
+value, id) of the last row served. It carries no authority: it only adds a
+WHERE condition to a statement that already applies the caller's
+visibility filters.
+
+    keyset = keyset_order(SORT_COLUMNS, sort_by, sort_order, Order.id)
+    rows = db.scalars(keyset.apply(statement, cursor, per_page)).all()
+    page = keyset.page(rows, per_page)      # page.items, page.next_cursor
+
+Lists that report a total can take an approximate one from
+count_estimator: planner statistics for whole tables on PostgreSQL,
+otherwise an exact count reused for a short TTL.
+"""
+
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Generic, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import Table, and_, func, or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+
+T = TypeVar('T')
+
+
+class InvalidCursor(ValueError):
+    """A cursor that is malformed or was issued for another ordering"""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    (kind, raw), = value.items()
+    if kind == 'dt':
+        return datetime.fromisoformat(raw)
+    if kind == 'd':
+        return date.fromisoformat(raw)
+    if kind == 'dec':
+        return Decimal(raw)
+    raise ValueError(kind)
+
+
+@dataclass
+class KeysetPage(Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class KeysetOrder:
+    """A total order on (sort column, id) and the condition resuming it after a cursor"""
+    name: str
+    column: Any
+    id_column: Any
+    descending: bool = True
+
+    @property
+    def direction(self) -> str:
+        return 'desc' if self.descending else 'asc'
+
+    # Cursors
+
+    def encode(self, value: Any, ident: Any) -> str:
+        payload = json.dumps(
+            {'s': self.name, 'o': self.direction, 'v': _dump_value(value), 'i': _dump_value(ident)},
+            separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor: str) -> Tuple[Any, Any]:
+        """(sort value, id) of a cursor issued for this ordering"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if payload['s'] != self.name or payload['o'] != self.direction:
+                raise InvalidCursor("Cursor was issued for a different sort order")
+            return _load_value(payload['v']), _load_value(payload['i'])
+        except InvalidCursor:
+            raise
+        except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, ValueError) as e:
+            raise InvalidCursor("Malformed cursor") from e
+
+    # SQL
+
+    def order_by(self) -> Tuple[Any, Any]:
+        if self.descending:
+            return self.column.desc().nulls_first(), self.id_column.desc()
+        return self.column.asc().nulls_last(), self.id_column.asc()
+
+    def after(self, value: Any, ident: Any) -> Any:
+        """WHERE condition selecting the rows that follow (value, ident)"""
+        column, id_column = self.column, self.id_column
+        if value is None:
+            if self.descending:
+                return or_(column.isnot(None), and_(column.is_(None), id_column < ident))
+            return and_(column.is_(None), id_column > ident)
+        if self.descending:
+            return tuple_(column, id_column) < tuple_(value, ident)
+        return or_(tuple_(column, id_column) > tuple_(value, ident), column.is_(None))
+
+    def apply(self, statement: Any, cursor: Optional[str], limit: int, offset: int = 0) -> Any:
+        """
+        Order a Select or Query, resume it after cursor (or skip offset rows
+        when there is none) and fetch one extra row to tell whether another
+        page follows.
+        """
+        if cursor:
+            value, ident = self.decode(cursor)
+            statement = statement.where(self.after(value, ident)).order_by(*self.order_by())
+        else:
+            statement = statement.order_by(*self.order_by()).offset(offset or None)
+        return statement.limit(limit + 1)
+
+    def page(self, rows: Sequence[T], limit: int) -> KeysetPage[T]:
+        """First limit rows of a result of apply(), with the cursor of the next page"""
+        items = list(rows[:limit])
+        if len(rows) <= limit or not items:
+            return KeysetPage(items)
+        last = items[-1]
+        return KeysetPage(items, self.encode(getattr(last, self.column.key), getattr(last, self.id_column.key)))
+
+    # In-memory lists
+
+    def paginate(
+        self,
+        items: Sequence[T],
+        cursor: Optional[str],
+        limit: int,
+        value: Callable[[T], Any],
+        ident: Callable[[T], Any],
+        offset: int = 0
+    ) -> KeysetPage[T]:
+        """The same pagination over a list, for stores that are not SQL tables"""
+        def key(item_value: Any, item_ident: Any) -> Tuple[Any, ...]:
+            return (item_value is None, item_value, item_ident)
+
+        ordered = sorted(items, key=lambda item: key(value(item), ident(item)), reverse=self.descending)
+        if cursor:
+            position = key(*self.decode(cursor))
+            if self.descending:
+                ordered = [item for item in ordered if key(value(item), ident(item)) < position]
+            else:
+                ordered = [item for item in ordered if key(value(item), ident(item)) > position]
+        else:
+            ordered = ordered[offset:]
+
+        page = ordered[:limit]
+        if len(ordered) <= limit or not page:
+            return KeysetPage(page)
+        return KeysetPage(page, self.encode(value(page[-1]), ident(page[-1])))
+
+
+def keyset_order(
+    columns: Mapping[str, Any],
+    sort_by: str,
+    sort_order: str,
+    id_column: Any
+) -> KeysetOrder:
+    """KeysetOrder on one of the allowed sort columns"""
+    if sort_by not in columns:
+        raise ValueError(f"Cannot sort by {sort_by}")
+    return KeysetOrder(sort_by, columns[sort_by], id_column, descending=sort_order != 'asc')
+
+
+# Approximate totals
+
+def _count_source(statement: Any) -> Any:
+    """The Select of a Select or Query, without ordering or limits"""
+    statement = getattr(statement, 'statement', statement)
+    return statement.order_by(None).limit(None).offset(None)
+
+
+def _whole_table(statement: Any) -> Optional[Table]:
+    """The table an unfiltered single-table SELECT reads, if that is what it is"""
+    if statement.whereclause is not None or statement._having_criteria or statement._group_by_clauses:
+        return None
+    froms = statement.get_final_froms()
+    if len(froms) == 1 and isinstance(froms[0], Table):
+        return froms[0]
+    return None
+
+
+def _reltuples(table: Table) -> Any:
+    return text(
+        "SELECT CAST(reltuples AS BIGINT) FROM pg_class WHERE oid = CAST(:table AS regclass)"
+    ).bindparams(table=table.fullname)
+
+
+@dataclass
+class CountEstimatorStats:
+    estimates: int = 0      # Answered from planner statistics
+    hits: int = 0           # Answered from the count cache
+    counts: int = 0         # Counted in the database
+
+
+class CountEstimator:
+    """
+    Totals for paginated lists that need not be exact.
+
+    On PostgreSQL an unfiltered table is sized from pg_class.reltuples,
+    which ANALYZE and autovacuum keep current. Any other statement is
+    counted exactly, and the count is reused for ttl_seconds by requests
+    with the same SQL and parameters.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (sql, parameters) -> (monotonic expiry, count)
+        self._counts: 'OrderedDict[Tuple[str, str], Tuple[float, int]]' = OrderedDict()
+        self._stats = CountEstimatorStats()
+        self._lock = threading.Lock()
+
+    def count(self, db: Session, statement: Any) -> int:
+        statement = _count_source(statement)
+        table = _whole_table(statement)
+        if table is not None and db.get_bind().dialect.name == 'postgresql':
+            estimate = db.scalar(_reltuples(table))
+            if estimate is not None and estimate >= 0:
+                return self._estimated(estimate)
+
+        key = self._key(statement)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        return self._store(key, db.scalar(select(func.count()).select_from(statement.subquery())))  # pylint: disable=not-callable
+
+    async def count_async(self, db: AsyncSession, statement: Any) -> int:
+        statement = _count_source(statement)
+        table = _whole_table(statement)
+        if table is not None and db.get_bind().dialect.name == 'postgresql':
+            estimate = await db.scalar(_reltuples(table))
+            if estimate is not None and estimate >= 0:
+                return self._estimated(estimate)
+
+        key = self._key(statement)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        return self._store(key, await db.scalar(select(func.count()).select_from(statement.subquery())))  # pylint: disable=not-callable
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats.__dict__, 'entries': len(self._counts)}
+
+    def _key(self, statement: Any) -> Tuple[str, str]:
+        compiled = statement.compile()
+        return str(compiled), repr(sorted(compiled.params.items()))
+
+    def _estimated(self, estimate: int) -> int:
+        with self._lock:
+            self._stats.estimates += 1
+        return int(estimate)
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[int]:
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None:
+                return None
+            expires_at, count = entry
+            if expires_at <= time.monotonic():
+                del self._counts[key]
+                return None
+            self._counts.move_to_end(key)
+            self._stats.hits += 1
+            return count
+
+    def _store(self, key: Tuple[str, str], count: Optional[int]) -> int:
+        count = int(count or 0)
+        with self._lock:
+            self._stats.counts += 1
+            self._counts[key] = (time.monotonic() + self.ttl_seconds, count)
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+
+def _estimator_from_settings() -> CountEstimator:
+    settings = get_settings()
+    return CountEstimator(
+        ttl_seconds=getattr(settings, 'PAGINATION_COUNT_TTL_SECONDS', 60),
+        max_entries=getattr(settings, 'PAGINATION_COUNT_MAX_ENTRIES', 10000),
+    )
+
+
+# Global count estimator instance
+count_estimator = _estimator_from_settings()
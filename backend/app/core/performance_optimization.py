@@ -15,7 +15,7 @@ import psutil
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from .database import get_db, engine
+from .database import get_db, engine, pool_telemetry
 from .config import get_settings
 
 settings = get_settings()
@@ -231,23 +231,46 @@ class DatabaseOptimizer:
         metrics = {}
         
         try:
-            pool = self.db_engine.pool
+            status = pool_telemetry.snapshot("primary")
             
-            # Connection pool metrics
-            pool_size = pool.size()
-            checked_in = pool.checkedin()
-            checked_out = pool.checkedout()
-            pool_utilization = (checked_out / pool_size * 100) if pool_size > 0 else 0
+            # Utilization against the most connections the pool will hand out,
+            # overflow included; pools without a fixed size report no utilization
+            capacity = status.get('capacity')
+            if capacity:
+                pool_utilization = status['checked_out'] / capacity * 100
+                metrics['pool_utilization'] = PerformanceMetric(
+                    name='Connection Pool Utilization',
+                    value=pool_utilization,
+                    unit='%',
+                    threshold=80.0,
+                    status='good' if pool_utilization < 70 else 'warning' if pool_utilization < 85 else 'critical',
+                    timestamp=datetime.now(),
+                    recommendations=['Increase DB_POOL_SIZE or DB_MAX_OVERFLOW', 'Release sessions promptly', 'Move long reports off the request path']
+                )
             
-            metrics['pool_utilization'] = PerformanceMetric(
-                name='Connection Pool Utilization',
-                value=pool_utilization,
-                unit='%',
-                threshold=80.0,
-                status='good' if pool_utilization < 70 else 'warning' if pool_utilization < 85 else 'critical',
-                timestamp=datetime.now(),
-                recommendations=['Increase pool size', 'Optimize connection usage', 'Implement connection pooling']
-            )
+            wait_p95 = status.get('checkout_wait_p95_seconds')
+            if wait_p95 is not None:
+                wait_p95_ms = wait_p95 * 1000
+                metrics['pool_checkout_wait_p95'] = PerformanceMetric(
+                    name='Connection Checkout Wait (p95)',
+                    value=wait_p95_ms,
+                    unit='ms',
+                    threshold=50.0,
+                    status='good' if wait_p95_ms <= 10 else 'warning' if wait_p95_ms <= 50 else 'critical',
+                    timestamp=datetime.now(),
+                    recommendations=['Increase DB_POOL_SIZE', 'Shorten transactions holding connections', 'Check DB_POOL_TIMEOUT']
+                )
+            
+            if status['checkout_timeouts']:
+                metrics['pool_checkout_timeouts'] = PerformanceMetric(
+                    name='Connection Checkout Timeouts',
+                    value=float(status['checkout_timeouts']),
+                    unit='count',
+                    threshold=0.0,
+                    status='critical',
+                    timestamp=datetime.now(),
+                    recommendations=['Increase DB_POOL_SIZE or DB_MAX_OVERFLOW', 'Look for leaked sessions']
+                )
             
         except Exception as e:
             logger.error(f"Connection pool analysis failed: {e}")
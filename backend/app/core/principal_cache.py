@@ -0,0 +1,361 @@
+"""
+Cache of authenticated principals for request authorization.
+
+Every authenticated request used to load the User (and its manufacturer
+profile) from the database just to check a role or a status. A Principal
+is an immutable snapshot of the fields authorization needs, cached per
+user id (the access token's `sub`) and stamped with a per-user version:
+
+    auth:principal:{user_id}          JSON snapshot, with the version it was built at
+    auth:principal_version:{user_id}  INCRed whenever the user changes
+
+Lookups go to a bounded in-process LRU with a short TTL first, then to
+Redis, where a snapshot only counts if its version is still the current
+one; both are read in one round trip. After a commit that changed a
+user's role, status, email or manufacturer profile the version is bumped,
+the snapshot deleted and the user id published on a channel, so every
+process drops its local entry at once. The local TTL bounds staleness if
+an invalidation message is missed.
+
+Without Redis the cache is process-local and invalidation only reaches the
+current process; other processes pick up changes within the local TTL.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from itertools import chain
+from typing import Any, Callable, Dict, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.user import RegistrationStatus, UserRole
+
+logger = logging.getLogger(__name__)
+
+# User attributes a Principal is built from
+PRINCIPAL_USER_FIELDS = ('id', 'email', 'role', 'registration_status', 'email_verified', 'is_active')
+
+
+@dataclass(frozen=True)
+class Principal:
+    """What authorization needs to know about the authenticated user"""
+    id: int
+    email: str
+    role: UserRole
+    registration_status: RegistrationStatus
+    email_verified: bool
+    is_active: bool
+    manufacturer_id: Optional[int] = None
+    version: int = 0
+
+    @property
+    def is_manufacturer(self) -> bool:
+        return self.role == UserRole.MANUFACTURER
+
+    def to_json(self) -> str:
+        payload = asdict(self)
+        payload['role'] = self.role.value
+        payload['registration_status'] = self.registration_status.value
+        return json.dumps(payload)
+
+    @classmethod
+    def from_json(cls, payload: Any) -> 'Principal':
+        data = json.loads(payload)
+        data['role'] = UserRole(data['role'])
+        data['registration_status'] = RegistrationStatus(data['registration_status'])
+        return cls(**data)
+
+
+@dataclass
+class PrincipalCacheStats:
+    hits: int = 0           # Served from either tier
+    local_hits: int = 0     # Served from the in-process LRU
+    redis_hits: int = 0     # Served from Redis and promoted to the LRU
+    misses: int = 0         # Loaded from the database
+    invalidations: int = 0
+    errors: int = 0         # Redis failures, treated as misses
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {**asdict(self), 'hit_ratio': self.hits / total if total else 0.0}
+
+
+# Loads the PRINCIPAL_USER_FIELDS plus manufacturer_id of a user, or None
+PrincipalLoader = Callable[[int], Optional[Mapping[str, Any]]]
+
+
+class PrincipalCache:
+    """Short-lived local LRU in front of versioned snapshots in Redis"""
+
+    SNAPSHOT_KEY = 'auth:principal:{}'
+    VERSION_KEY = 'auth:principal_version:{}'
+    CHANNEL = 'auth:principal_invalidations'
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        use_redis: bool = True,
+        max_local_entries: int = 10000,
+        local_ttl_seconds: float = 30,
+        redis_ttl_seconds: int = 900,
+        redis_retry_seconds: int = 30
+    ):
+        """
+        Args:
+            redis_client: Client to use; by default one is created lazily
+                from settings.REDIS_URL
+            use_redis: Set to False for a process-local cache only
+            max_local_entries: Principals kept in the in-process LRU
+            local_ttl_seconds: How long a process trusts its local copy
+            redis_ttl_seconds: Lifetime of snapshots in Redis
+            redis_retry_seconds: Delay before reconnecting after Redis
+                turned out to be unavailable
+        """
+        self.use_redis = use_redis
+        self.max_local_entries = max_local_entries
+        self.local_ttl_seconds = local_ttl_seconds
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.redis_retry_seconds = redis_retry_seconds
+
+        self._redis = redis_client
+        self._redis_retry_at = 0.0
+        # user id -> (monotonic expiry, principal)
+        self._local: 'OrderedDict[int, Tuple[float, Principal]]' = OrderedDict()
+        # Bumped on every invalidation, so a load that raced one is not kept locally
+        self._generation = 0
+        self._stats = PrincipalCacheStats()
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.RLock()
+
+    # Public API
+
+    def get_local(self, user_id: int) -> Optional[Principal]:
+        """Principal from the in-process LRU only; never does I/O"""
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[user_id]
+                return None
+            self._local.move_to_end(user_id)
+            self._stats.hits += 1
+            self._stats.local_hits += 1
+            return entry[1]
+
+    def get(self, user_id: int, loader: PrincipalLoader) -> Optional[Principal]:
+        """Principal for a user id, loading it with loader() on a miss; None if the user does not exist"""
+        principal = self.get_local(user_id)
+        if principal is not None:
+            return principal
+
+        client = self._client()
+        generation = self._generation
+        version = 0
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.get(self.SNAPSHOT_KEY.format(user_id))
+                pipe.get(self.VERSION_KEY.format(user_id))
+                payload, current = pipe.execute()
+                version = int(current or 0)
+                if payload is not None:
+                    principal = Principal.from_json(payload)
+                    if principal.version == version:
+                        self._store_local(principal, generation)
+                        with self._lock:
+                            self._stats.hits += 1
+                            self._stats.redis_hits += 1
+                        return principal
+            except Exception as e:
+                logger.error(f"Principal cache get error for user {user_id}: {e}")
+                with self._lock:
+                    self._stats.errors += 1
+                client = None
+
+        fields = loader(user_id)
+        with self._lock:
+            self._stats.misses += 1
+        if fields is None:
+            return None
+
+        principal = Principal(
+            manufacturer_id=fields.get('manufacturer_id'),
+            version=version,
+            **{field: fields[field] for field in PRINCIPAL_USER_FIELDS}
+        )
+        self._store_local(principal, generation)
+        if client is not None:
+            try:
+                # Stamped with the version read before loading: if the user
+                # changed meanwhile the version moved on and this is ignored
+                client.setex(self.SNAPSHOT_KEY.format(user_id), self.redis_ttl_seconds, principal.to_json())
+            except Exception as e:
+                logger.error(f"Principal cache set error for user {user_id}: {e}")
+                with self._lock:
+                    self._stats.errors += 1
+        return principal
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the cached principal of a user in all processes"""
+        self._drop_local(user_id)
+
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.incr(self.VERSION_KEY.format(user_id))
+                pipe.delete(self.SNAPSHOT_KEY.format(user_id))
+                pipe.publish(self.CHANNEL, user_id)
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Principal cache invalidation error for user {user_id}: {e}")
+                with self._lock:
+                    self._stats.errors += 1
+        with self._lock:
+            self._stats.invalidations += 1
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._local.clear()
+
+    def local_size(self) -> int:
+        return len(self._local)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats.to_dict()
+
+    # Internals
+
+    def _store_local(self, principal: Principal, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._local[principal.id] = (time.monotonic() + self.local_ttl_seconds, principal)
+            self._local.move_to_end(principal.id)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def _drop_local(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._local.pop(user_id, None)
+
+    def _client(self) -> Any:
+        """Redis client, or None while Redis is disabled or unavailable"""
+        if not self.use_redis:
+            return None
+        if self._redis is None:
+            if time.monotonic() < self._redis_retry_at:
+                return None
+            try:
+                import redis
+                from app.core.config import settings
+
+                client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+                client.ping()
+                self._redis = client
+            except Exception as e:
+                logger.warning(f"Principal cache running without Redis: {e}")
+                self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+                return None
+        self._ensure_listener(self._redis)
+        return self._redis
+
+    def _ensure_listener(self, client: Any) -> None:
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            # Local entries may have missed invalidations while nobody listened
+            self.clear_local()
+            self._listener = threading.Thread(
+                target=self._listen, args=(client,), name='principal-cache-invalidations', daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, client: Any) -> None:
+        """Drop local principals invalidated by other processes"""
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.CHANNEL)
+            for message in pubsub.listen():
+                try:
+                    self._drop_local(int(message['data']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        except Exception as e:
+            # The next _client() call resubscribes
+            logger.error(f"Principal cache invalidation listener stopped: {e}")
+
+
+def install_principal_invalidation(cache: PrincipalCache, user_model: type, manufacturer_model: type) -> None:
+    """
+    Invalidate principals after a commit that changed them.
+
+    A principal changes with its user's PRINCIPAL_USER_FIELDS, and when a
+    manufacturer profile is created, deleted or moved to another user.
+    Changes are collected on flush and only acted on once the transaction
+    commits, so a rolled back update never invalidates anything.
+    """
+    # Session.info key private to this installation
+    changed_key = ('principal_cache_changed', id(cache))
+
+    def changed_users(session) -> Set[int]:
+        return session.info.setdefault(changed_key, set())
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_principal_changes(session, flush_context):
+        users = changed_users(session)
+        for instance in chain(session.new, session.deleted):
+            if isinstance(instance, user_model) and instance.id is not None:
+                users.add(instance.id)
+            elif isinstance(instance, manufacturer_model) and instance.user_id is not None:
+                users.add(instance.user_id)
+        for instance in session.dirty:
+            if isinstance(instance, user_model) and _changed(instance, PRINCIPAL_USER_FIELDS):
+                users.add(instance.id)
+            elif isinstance(instance, manufacturer_model):
+                history = inspect(instance).attrs.user_id.history
+                users.update(user_id for user_id in chain(history.added, history.deleted) if user_id is not None)
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate_principals(session):
+        for user_id in session.info.pop(changed_key, ()):
+            cache.invalidate(user_id)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_principal_changes(session):
+        session.info.pop(changed_key, None)
+
+
+def _changed(instance: Any, fields: Tuple[str, ...]) -> bool:
+    attrs = inspect(instance).attrs
+    return any(attrs[field].history.has_changes() for field in fields)
+
+
+def _cache_from_settings() -> PrincipalCache:
+    settings = get_settings()
+    return PrincipalCache(
+        max_local_entries=getattr(settings, 'PRINCIPAL_CACHE_MAX_LOCAL_ENTRIES', 10000),
+        local_ttl_seconds=getattr(settings, 'PRINCIPAL_CACHE_LOCAL_TTL_SECONDS', 30),
+        redis_ttl_seconds=getattr(settings, 'PRINCIPAL_CACHE_REDIS_TTL_SECONDS', 900),
+    )
+
+
+# Global principal cache instance
+principal_cache = _cache_from_settings()
+
+from app.models.producer import Manufacturer  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+install_principal_invalidation(principal_cache, User, Manufacturer)
@@ -0,0 +1,421 @@
+"""
+Rate limiting shared by every worker.
+
+Limits are enforced with GCRA (the generic cell rate algorithm, a token
+bucket that stores a single "theoretical arrival time" per key). In Redis
+the check-and-update runs as one Lua script, so every uvicorn and Celery
+worker draws from the same bucket, and all policies that apply to a
+request are evaluated in a single pipelined round trip. The script reads
+the clock with TIME, so worker clock skew does not matter.
+
+When Redis is not configured or unreachable, limits are enforced per
+process by a bounded LRU of buckets; evicting a key only ever forgets
+how much of its budget a client had used.
+
+Callers may ask for a lockout: a client that exceeds a policy is then
+denied for the whole lockout period instead of regaining one request per
+emission interval.
+
+Policies are named (auth, api, public, login, ...) and keyed by an
+identity chosen by the caller: client IP for route policies in
+RateLimitMiddleware, user id for per-user policies (see
+app.core.deps.user_rate_limit).
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] bucket, KEYS[2] lockout; ARGV emission interval (us), burst,
+# cost, lockout (us)
+# Returns {allowed, remaining, retry_after_us, reset_after_us}
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000000 + tonumber(now_parts[2])
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lockout = tonumber(ARGV[4])
+
+local locked_ms = redis.call('PTTL', KEYS[2])
+if locked_ms > 0 then
+    return {0, 0, locked_ms * 1000, locked_ms * 1000}
+end
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission * cost
+local allow_at = new_tat - emission * burst
+
+if now < allow_at then
+    if lockout > 0 then
+        redis.call('SET', KEYS[2], '1', 'PX', math.ceil(lockout / 1000))
+        return {0, 0, lockout, math.max(lockout, math.ceil(tat - now))}
+    end
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', math.ceil((new_tat - now) / 1000))
+return {1, math.floor((now - allow_at) / emission), 0, math.ceil(new_tat - now)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """`limit` requests per `period_seconds`, with bursts of up to `burst`"""
+    name: str
+    limit: int
+    period_seconds: float
+    burst: Optional[int] = None
+
+    @property
+    def emission_interval(self) -> float:
+        """Seconds of budget one request uses"""
+        return self.period_seconds / self.limit
+
+    @property
+    def burst_size(self) -> int:
+        return self.burst or self.limit
+
+
+@dataclass
+class RateLimitResult:
+    policy: RateLimitPolicy
+    allowed: bool
+    remaining: int
+    retry_after: float  # Seconds until the request would be allowed
+    reset_after: float  # Seconds until the bucket is full again
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.policy.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(time.time() + math.ceil(self.reset_after))),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def gcra(tat: Optional[float], now: float, policy: RateLimitPolicy, cost: int = 1) -> Tuple[RateLimitResult, float]:
+    """One GCRA step; returns the result and the new theoretical arrival time"""
+    emission = policy.emission_interval
+    tat = max(tat if tat is not None else now, now)
+    new_tat = tat + emission * cost
+    allow_at = new_tat - emission * policy.burst_size
+    if now < allow_at:
+        return RateLimitResult(policy, False, 0, allow_at - now, tat - now), tat
+    remaining = int((now - allow_at) / emission)
+    return RateLimitResult(policy, True, remaining, 0.0, new_tat - now), new_tat
+
+
+class LocalRateLimitBackend:
+    """Per-process buckets in a bounded LRU"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, float]' = OrderedDict()
+        self._lockouts: 'OrderedDict[str, float]' = OrderedDict()  # Bucket key -> locked until
+        self._lock = threading.Lock()
+
+    def hit(
+        self,
+        checks: Sequence[Tuple[str, RateLimitPolicy]],
+        cost: int = 1,
+        lockout_seconds: float = 0
+    ) -> List[RateLimitResult]:
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key, policy in checks:
+                locked_until = self._lockouts.get(key)
+                if locked_until is not None:
+                    if now < locked_until:
+                        results.append(RateLimitResult(policy, False, 0, locked_until - now, locked_until - now))
+                        continue
+                    del self._lockouts[key]
+
+                result, tat = gcra(self._buckets.get(key), now, policy, cost)
+                if result.allowed:
+                    self._remember(self._buckets, key, tat)
+                elif lockout_seconds:
+                    self._remember(self._lockouts, key, now + lockout_seconds)
+                    result = RateLimitResult(
+                        policy, False, 0, lockout_seconds, max(lockout_seconds, result.reset_after)
+                    )
+                results.append(result)
+        return results
+
+    def _remember(self, entries: 'OrderedDict[str, float]', key: str, value: float) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_keys:
+            entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisRateLimitBackend:
+    """Buckets in Redis, updated atomically by GCRA_SCRIPT"""
+
+    def __init__(self, client: Any = None, async_client: Any = None):
+        self.client = client
+        self.async_client = async_client
+        self._script = client.register_script(GCRA_SCRIPT) if client is not None else None
+        self._async_script = async_client.register_script(GCRA_SCRIPT) if async_client is not None else None
+
+    @staticmethod
+    def _args(policy: RateLimitPolicy, cost: int, lockout_seconds: float) -> List[int]:
+        return [int(policy.emission_interval * 1_000_000), policy.burst_size, cost, int(lockout_seconds * 1_000_000)]
+
+    @staticmethod
+    def _result(policy: RateLimitPolicy, reply: Sequence[int]) -> RateLimitResult:
+        allowed, remaining, retry_after_us, reset_after_us = (int(value) for value in reply)
+        return RateLimitResult(policy, bool(allowed), remaining, retry_after_us / 1_000_000, reset_after_us / 1_000_000)
+
+    def hit(
+        self,
+        checks: Sequence[Tuple[str, RateLimitPolicy]],
+        cost: int = 1,
+        lockout_seconds: float = 0
+    ) -> List[RateLimitResult]:
+        pipe = self.client.pipeline(transaction=False)
+        for key, policy in checks:
+            self._script(keys=[key, f"{key}:lockout"], args=self._args(policy, cost, lockout_seconds), client=pipe)
+        replies = pipe.execute()
+        return [self._result(policy, reply) for (_, policy), reply in zip(checks, replies)]
+
+    async def ahit(
+        self,
+        checks: Sequence[Tuple[str, RateLimitPolicy]],
+        cost: int = 1,
+        lockout_seconds: float = 0
+    ) -> List[RateLimitResult]:
+        pipe = self.async_client.pipeline(transaction=False)
+        for key, policy in checks:
+            await self._async_script(
+                keys=[key, f"{key}:lockout"], args=self._args(policy, cost, lockout_seconds), client=pipe
+            )
+        replies = await pipe.execute()
+        return [self._result(policy, reply) for (_, policy), reply in zip(checks, replies)]
+
+
+# SecurityConfig.RATE_LIMITS types whose policy is named differently;
+# "api" there is hourly, while the "api" route policy is per minute
+SECURITY_POLICY_NAMES = {'api': 'api_hourly'}
+
+
+def security_policy_name(limit_type: str) -> str:
+    """Policy for a SecurityConfig.RATE_LIMITS type"""
+    return SECURITY_POLICY_NAMES.get(limit_type, limit_type)
+
+
+def default_policies() -> Dict[str, RateLimitPolicy]:
+    """Named policies configured from settings and SecurityConfig.RATE_LIMITS"""
+    # Imported here: app.core.security imports this module
+    from app.core.security import SecurityConfig
+
+    settings = get_settings()
+    auth_limit = getattr(settings, "RATE_LIMIT_AUTH_REQUESTS", 5)
+    api_limit = getattr(settings, "RATE_LIMIT_PER_MINUTE", 100)
+    public_limit = getattr(settings, "RATE_LIMIT_PUBLIC_REQUESTS", 1000)
+    matching_limit = getattr(settings, "RATE_LIMIT_MATCHING_PER_MINUTE", 30)
+
+    # Staging and development get bigger bursts so load tests and rapid
+    # manual testing are not blocked; production keeps the configured values
+    if settings.ENVIRONMENT in {"staging", "development"}:
+        api_limit = max(api_limit, 300)
+        auth_limit = max(auth_limit, 50)
+
+    policies = [
+        RateLimitPolicy("auth", auth_limit, 60),
+        RateLimitPolicy("api", api_limit, 60),
+        RateLimitPolicy("public", public_limit, 3600),
+        # Per user, for endpoints that run the matching engines
+        RateLimitPolicy("matching", matching_limit, 60),
+    ]
+    policies += [
+        RateLimitPolicy(security_policy_name(limit_type), limit["requests"], limit["window"])
+        for limit_type, limit in SecurityConfig.RATE_LIMITS.items()
+    ]
+    return {policy.name: policy for policy in policies}
+
+
+# Exact paths limited by the "auth" policy
+AUTH_PATHS = frozenset({
+    "/api/v1/auth/login",
+    "/api/v1/auth/register",
+    "/api/v1/auth/forgot-password",
+    "/api/v1/auth/reset-password",
+    "/api/v1/auth/verify-email",
+    "/api/v1/auth/refresh-token",
+})
+
+
+def route_policy(path: str) -> str:
+    """Policy name for a request path"""
+    if path in AUTH_PATHS:
+        return "auth"
+    if path.startswith("/api/"):
+        return "api"
+    return "public"
+
+
+def client_ip_from_headers(headers: Any, peer: Optional[str]) -> str:
+    """Client address, preferring proxy headers"""
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    real_ip = headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+    return peer or "unknown"
+
+
+class RateLimitEngine:
+    """Named policies evaluated against Redis, or locally without it"""
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RateLimitPolicy]] = None,
+        redis_client: Any = None,
+        async_redis_client: Any = None,
+        use_redis: bool = True,
+        max_local_keys: Optional[int] = None,
+        redis_retry_seconds: int = 30
+    ):
+        """
+        Args:
+            policies: Named policies; defaults to default_policies()
+            redis_client / async_redis_client: Clients to use; by default
+                they are created lazily from settings.REDIS_URL
+            use_redis: Set to False to enforce limits per process only
+            max_local_keys: Buckets kept by the in-process fallback;
+                defaults to settings.RATE_LIMIT_LOCAL_MAX_KEYS
+            redis_retry_seconds: Delay before reconnecting after Redis
+                turned out to be unavailable
+        """
+        self._policies = policies
+        self.use_redis = use_redis
+        self.redis_retry_seconds = redis_retry_seconds
+        if max_local_keys is None:
+            max_local_keys = getattr(get_settings(), "RATE_LIMIT_LOCAL_MAX_KEYS", 10000)
+        self.local = LocalRateLimitBackend(max_local_keys)
+
+        self._redis: Optional[RedisRateLimitBackend] = None
+        if redis_client is not None or async_redis_client is not None:
+            self._redis = RedisRateLimitBackend(redis_client, async_redis_client)
+        self._redis_retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def policies(self) -> Dict[str, RateLimitPolicy]:
+        """Named policies; the defaults are built on first use"""
+        if self._policies is None:
+            self._policies = default_policies()
+        return self._policies
+
+    def policy(self, name: str) -> RateLimitPolicy:
+        return self.policies[name]
+
+    def _checks(self, identities: Iterable[Tuple[str, str]]) -> List[Tuple[str, RateLimitPolicy]]:
+        return [
+            (f"{self.KEY_PREFIX}:{policy_name}:{identity}", self.policies[policy_name])
+            for policy_name, identity in identities
+        ]
+
+    def hit(
+        self,
+        identities: Iterable[Tuple[str, str]],
+        cost: int = 1,
+        lockout_seconds: float = 0
+    ) -> List[RateLimitResult]:
+        """
+        Consume budget for each (policy name, identity) pair
+
+        Args:
+            lockout_seconds: When set, an identity exceeding a policy is
+                denied by that policy for this long
+        """
+        checks = self._checks(identities)
+        backend = self._backend()
+        if backend is not None and backend.client is not None:
+            try:
+                return backend.hit(checks, cost, lockout_seconds)
+            except Exception as e:
+                self._redis_failed(e)
+        return self.local.hit(checks, cost, lockout_seconds)
+
+    async def ahit(
+        self,
+        identities: Iterable[Tuple[str, str]],
+        cost: int = 1,
+        lockout_seconds: float = 0
+    ) -> List[RateLimitResult]:
+        """hit() for async callers, without blocking the event loop on Redis"""
+        checks = self._checks(identities)
+        backend = self._backend()
+        if backend is not None and backend.async_client is not None:
+            try:
+                return await backend.ahit(checks, cost, lockout_seconds)
+            except Exception as e:
+                self._redis_failed(e)
+        return self.local.hit(checks, cost, lockout_seconds)
+
+    def is_limited(self, policy_name: str, identity: str) -> bool:
+        return not self.hit([(policy_name, identity)])[0].allowed
+
+    @staticmethod
+    def most_restrictive(results: Sequence[RateLimitResult]) -> RateLimitResult:
+        """The denial with the longest wait, or the allowance with the least left"""
+        denied = [result for result in results if not result.allowed]
+        if denied:
+            return max(denied, key=lambda result: result.retry_after)
+        return min(results, key=lambda result: result.remaining)
+
+    def _backend(self) -> Optional[RedisRateLimitBackend]:
+        if not self.use_redis:
+            return None
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._redis_retry_at:
+            return None
+
+        with self._lock:
+            if self._redis is None and time.monotonic() >= self._redis_retry_at:
+                try:
+                    import redis
+                    import redis.asyncio as redis_asyncio
+
+                    url = get_settings().REDIS_URL
+                    client = redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+                    client.ping()
+                    async_client = redis_asyncio.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+                    self._redis = RedisRateLimitBackend(client, async_client)
+                except Exception as e:
+                    logger.warning(f"Rate limiting per process, Redis unavailable: {e}")
+                    self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.error(f"Rate limit Redis error, falling back to per-process limits: {error}")
+        with self._lock:
+            self._redis = None
+            self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+
+
+# Global rate limit engine
+rate_limit_engine = RateLimitEngine()
@@ -0,0 +1,273 @@
+"""
+Read-replica routing for read-only units of work.
+
+Heavy aggregate reads (dashboards, analytics) opt in with the get_read_db /
+get_async_read_db dependencies and are sent to a replica from
+settings.DB_READ_REPLICA_URLS. A replica is only used while its replication
+lag is within settings.DB_REPLICA_MAX_LAG_SECONDS; otherwise, or when no
+replicas are configured, reads go to the primary.
+
+Within one request, once anything has been written to the primary every
+later read of that request is served by the primary too, so a request
+never reads data older than its own writes. ReadRoutingMiddleware scopes
+that state to the request.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import (
+    _engine_options,
+    async_database_url,
+    async_engine,
+    engine,
+    pool_telemetry,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a replica is behind the primary; 0 when it has replayed everything
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+WRITE_STATEMENTS = frozenset({"INSERT", "UPDATE", "DELETE", "MERGE "})
+
+
+class ReadOnlySessionError(Exception):
+    """A read-routed session tried to write"""
+
+
+@dataclass
+class RequestRoutingState:
+    """Per-request routing state shared by every session of the request"""
+    wrote_to_primary: bool = False
+
+
+_request_state: ContextVar[Optional[RequestRoutingState]] = ContextVar('read_routing_state', default=None)
+
+
+def mark_primary_write() -> None:
+    """Pin the rest of the current request to the primary"""
+    state = _request_state.get()
+    if state is not None:
+        state.wrote_to_primary = True
+
+
+def request_wrote_to_primary() -> bool:
+    state = _request_state.get()
+    return state is not None and state.wrote_to_primary
+
+
+def _track_primary_writes(conn, cursor, statement, parameters, context, executemany):
+    # text() statements carry no isinsert/isupdate/isdelete flags
+    if (context is not None and (context.isinsert or context.isupdate or context.isdelete)) \
+            or statement.lstrip()[:6].upper() in WRITE_STATEMENTS:
+        mark_primary_write()
+
+
+event.listen(engine, "after_cursor_execute", _track_primary_writes)
+event.listen(async_engine.sync_engine, "after_cursor_execute", _track_primary_writes)
+
+
+class ReadRoutingMiddleware:
+    """Gives every HTTP request its own routing state"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_state.set(RequestRoutingState())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_state.reset(token)
+
+
+@dataclass
+class Replica:
+    """One read replica with its measured replication lag"""
+    name: str
+    engine: Any
+    async_engine: Any = None
+    lag_seconds: float = float('inf')
+    lag_checked_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def _measure_lag(replica: Replica) -> float:
+    """Replication lag of a replica in seconds"""
+    if replica.engine.dialect.name != 'postgresql':
+        # SQLite stand-ins share the primary's file or are copies of it
+        return 0.0
+    with replica.engine.connect() as connection:
+        return float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0.0)
+
+
+class ReplicaRouter:
+    """Chooses the engine a read-only unit of work runs on"""
+
+    def __init__(
+        self,
+        primary: Any,
+        primary_async: Any = None,
+        replicas: Optional[List[Replica]] = None,
+        max_lag_seconds: float = 5.0,
+        lag_check_interval_seconds: float = 2.0,
+        lag_probe: Callable[[Replica], float] = _measure_lag
+    ):
+        """
+        Args:
+            primary: Sync engine of the primary
+            primary_async: AsyncEngine of the primary
+            replicas: Replicas reads are spread over
+            max_lag_seconds: Replication lag above which a replica is skipped
+            lag_check_interval_seconds: How long a lag measurement is reused
+            lag_probe: Measures the lag of a replica
+        """
+        self.primary = primary
+        self.primary_async = primary_async
+        self.replicas = replicas or []
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_interval_seconds = lag_check_interval_seconds
+        self.lag_probe = lag_probe
+        self.routed: Dict[str, int] = {'primary': 0, 'primary_sticky': 0, **{r.name: 0 for r in self.replicas}}
+        self._next_replica = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        # Guards routed; choose() runs in threadpool workers
+        self._lock = threading.Lock()
+
+    def choose(self, use_async: bool = False) -> Any:
+        """Sync engine to bind a read-only unit of work to (for async, its sync_engine)"""
+        if request_wrote_to_primary():
+            self._count('primary_sticky')
+            return self._primary(use_async)
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next_replica)]
+            if self._lag(replica) <= self.max_lag_seconds:
+                self._count(replica.name)
+                return replica.async_engine.sync_engine if use_async else replica.engine
+
+        self._count('primary')
+        return self._primary(use_async)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = dict(self.routed)
+        return {
+            'max_lag_seconds': self.max_lag_seconds,
+            'replicas': {r.name: {'lag_seconds': r.lag_seconds} for r in self.replicas},
+            'routed': routed,
+        }
+
+    def _count(self, target: str) -> None:
+        with self._lock:
+            self.routed[target] += 1
+
+    def _primary(self, use_async: bool) -> Any:
+        return self.primary_async.sync_engine if use_async else self.primary
+
+    def _lag(self, replica: Replica) -> float:
+        """Cached lag, re-measured at most once per check interval"""
+        now = time.monotonic()
+        if now - replica.lag_checked_at < self.lag_check_interval_seconds:
+            return replica.lag_seconds
+        with replica.lock:
+            if now - replica.lag_checked_at >= self.lag_check_interval_seconds:
+                try:
+                    replica.lag_seconds = self.lag_probe(replica)
+                except Exception as e:
+                    logger.error(f"Replica {replica.name} lag check failed: {e}")
+                    replica.lag_seconds = float('inf')
+                replica.lag_checked_at = now
+        return replica.lag_seconds
+
+
+class ReadRoutingSession(Session):
+    """Read-only Session whose bind is chosen by a ReplicaRouter"""
+
+    def __init__(self, router: ReplicaRouter, use_async: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self.use_async = use_async
+        self.info['read_only'] = True
+        self._replica_bind = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if request_wrote_to_primary():
+            return self.router._primary(self.use_async)
+        if self._replica_bind is None:
+            self._replica_bind = self.router.choose(self.use_async)
+        return self._replica_bind
+
+
+@event.listens_for(ReadRoutingSession, "before_flush")
+def _reject_writes(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise ReadOnlySessionError("Read-routed sessions cannot write; use get_db for this unit of work")
+
+
+def build_replicas(urls: List[str]) -> List[Replica]:
+    """Engines for the configured replica URLs"""
+    replicas = []
+    for index, url in enumerate(urls):
+        name = f"replica_{index}"
+        replica_engine = create_engine(url, future=True, **_engine_options(url, name))
+        replica_async = create_async_engine(
+            async_database_url(url), **_engine_options(async_database_url(url), f"{name}_async", is_async=True)
+        )
+        pool_telemetry.register_engine(name, replica_engine)
+        pool_telemetry.register_engine(f"{name}_async", replica_async.sync_engine)
+        replicas.append(Replica(name=name, engine=replica_engine, async_engine=replica_async))
+    return replicas
+
+
+replica_router = ReplicaRouter(
+    primary=engine,
+    primary_async=async_engine,
+    replicas=build_replicas([url.strip() for url in settings.DB_READ_REPLICA_URLS.split(",") if url.strip()]),
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    lag_check_interval_seconds=settings.DB_REPLICA_LAG_CHECK_SECONDS
+)
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Dependency for read-only units of work that tolerate replica lag.
+
+    Writes raise ReadOnlySessionError; endpoints that write use get_db.
+    """
+    db = ReadRoutingSession(replica_router, autoflush=False, expire_on_commit=False)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async counterpart of get_read_db for `async def` endpoints"""
+    async with AsyncSession(
+        sync_session_class=ReadRoutingSession,
+        router=replica_router,
+        use_async=True,
+        autoflush=False,
+        expire_on_commit=False
+    ) as db:
+        yield db
@@ -30,12 +30,16 @@ import re
 from urllib.parse import urljoin
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session, joinedload
 import logging
 
 from app.core.config import get_settings
 from app.core.database import get_db
+from app.core.principal_cache import PRINCIPAL_USER_FIELDS, Principal, principal_cache
+from app.core.rate_limit import RateLimitEngine, rate_limit_engine, security_policy_name
+from app.models.producer import Manufacturer
 from app.models.user import User, UserRole, RegistrationStatus
 
 settings = get_settings()
@@ -359,35 +363,25 @@ class SecurityAuditLogger:
         self.log_security_event(event)
 
 class RateLimiter:
-    """Rate limiting implementation"""
+    """Rate limiting by SecurityConfig.RATE_LIMITS type, using the shared engine"""
     
-    def __init__(self):
-        self.attempts = {}
+    def __init__(self, engine: Optional[RateLimitEngine] = None):
+        self.engine = engine or rate_limit_engine
+    
+    @staticmethod
+    def policy_name(limit_type: str) -> str:
+        """Engine policy for a limit type; unknown types get the API limit"""
+        if limit_type not in SecurityConfig.RATE_LIMITS:
+            limit_type = 'api'
+        return security_policy_name(limit_type)
     
     def is_rate_limited(self, identifier: str, limit_type: str) -> bool:
-        """Check if identifier is rate limited"""
-        limit_config = SecurityConfig.RATE_LIMITS.get(limit_type, {})
-        max_requests = limit_config.get('requests', 100)
-        window = limit_config.get('window', 3600)
-        
-        current_time = time.time()
-        
-        if identifier not in self.attempts:
-            self.attempts[identifier] = []
-        
-        # Clean old attempts
-        self.attempts[identifier] = [
-            attempt_time for attempt_time in self.attempts[identifier]
-            if current_time - attempt_time < window
-        ]
-        
-        # Check if limit exceeded
-        if len(self.attempts[identifier]) >= max_requests:
-            return True
-        
-        # Record this attempt
-        self.attempts[identifier].append(current_time)
-        return False
+        """Check if identifier is rate limited, counting this attempt"""
+        return self.engine.is_limited(self.policy_name(limit_type), identifier)
+    
+    async def ais_rate_limited(self, identifier: str, limit_type: str) -> bool:
+        """is_rate_limited() for async callers"""
+        return not (await self.engine.ahit([(self.policy_name(limit_type), identifier)]))[0].allowed
 
 class InputSanitizer:
     """Input validation and sanitization"""
@@ -675,6 +669,25 @@ def verify_password_reset_token(token: str) -> Optional[str]:
     return payload.get("email") if payload else None
 
 
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_user_id(token: str) -> Optional[int]:
+    """User id from the subject of a valid access token, or None"""
+    payload = TokenManager.verify_token(token, TOKEN_TYPE_ACCESS)
+    if payload is None:
+        return None
+    try:
+        return int(payload.get("sub"))
+    except (ValueError, TypeError):
+        return None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -682,37 +695,58 @@ async def get_current_user(
     """
     Get current user from JWT token.
     Decodes the token, validates it, and fetches the user from the database.
+    Endpoints that only authorize by role, status or manufacturer profile
+    should use get_current_principal, which usually skips the database.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    payload = TokenManager.verify_token(credentials.credentials, TOKEN_TYPE_ACCESS)
-    if payload is None:
-        raise credentials_exception
-        
-    user_id = payload.get("sub")
+    user_id = _token_user_id(credentials.credentials)
     if user_id is None:
-        raise credentials_exception
-
-    try:
-        user_id = int(user_id)
-    except (ValueError, TypeError):
-        raise credentials_exception
+        raise _credentials_exception()
     
     # Eagerly load manufacturer_profile to prevent separate queries later
     user = db.query(User).options(joinedload(User.manufacturer_profile)).filter(User.id == user_id).first()
     
     if user is None:
         logger.warning(f"User with ID {user_id} not found from token.")
-        raise credentials_exception
+        raise _credentials_exception()
     
-    logger.info(f"User {user.email} authenticated successfully.")
+    logger.debug(f"User {user.email} authenticated successfully.")
     return user
 
 
+def _load_principal_fields(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    """Principal fields of a user and the id of their manufacturer profile, in one query"""
+    row = db.query(
+        *(getattr(User, field) for field in PRINCIPAL_USER_FIELDS),
+        Manufacturer.id.label("manufacturer_id")
+    ).outerjoin(Manufacturer, Manufacturer.user_id == User.id).filter(User.id == user_id).first()
+    return dict(row._mapping) if row is not None else None
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Get a cached snapshot of the current user from JWT token.
+    The database is only queried when the principal is in neither the
+    local cache nor Redis; the snapshot exposes id, role, status flags
+    and manufacturer_id.
+    """
+    user_id = _token_user_id(credentials.credentials)
+    if user_id is None:
+        raise _credentials_exception()
+
+    principal = principal_cache.get_local(user_id)
+    if principal is None:
+        principal = await run_in_threadpool(
+            principal_cache.get, user_id, lambda uid: _load_principal_fields(db, uid)
+        )
+    if principal is None:
+        logger.warning(f"User with ID {user_id} not found from token.")
+        raise _credentials_exception()
+    return principal
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -760,6 +794,40 @@ def require_role(required_roles: Union[UserRole, List[UserRole]]):
     return role_checker
 
 
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """get_current_active_user for endpoints that only need the principal."""
+    if principal.registration_status != RegistrationStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user account"
+        )
+    
+    if not principal.email_verified:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email not verified"
+        )
+    
+    return principal
+
+
+def require_principal_role(required_roles: Union[UserRole, List[UserRole]]):
+    """require_role for endpoints that only need the principal."""
+    if isinstance(required_roles, UserRole):
+        required_roles = [required_roles]
+    
+    def principal_role_checker(principal: Principal = Depends(get_current_active_principal)):
+        if principal.role not in required_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
+        return principal
+    return principal_role_checker
+
+
 def require_admin():
     """Require admin role."""
     return require_role(UserRole.ADMIN)
@@ -818,7 +886,7 @@ async def get_current_user_optional(
             logger.warning(f"User with ID {user_id} not found from token.")
             return None
         
-        logger.info(f"User {user.email} authenticated successfully.")
+        logger.debug(f"User {user.email} authenticated successfully.")
         return user
     except Exception as e:
         logger.warning(f"Optional authentication failed: {e}")
@@ -5,20 +5,22 @@ Implements comprehensive security controls for request/response processing
 
 import time
 import json
-import re
 import hashlib
 from datetime import datetime, timedelta
 from typing import Callable, Dict, List, Optional, Set, Tuple, Any
 from fastapi import Request, Response, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp
 import ipaddress
 import user_agents
 from urllib.parse import urlparse
 import asyncio
 import logging
 
+from app.core.asgi_pipeline import MiddlewarePipeline, PipelineStage, RequestContext
+from app.core.threat_scanner import threat_scanner
 from app.core.security import (
     SecurityConfig, SecurityModels, SecurityAuditLogger,
     RateLimiter, InputSanitizer, SecurityHeaders,
@@ -27,113 +29,78 @@ from app.core.security import (
 
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware(PipelineStage):
     """Comprehensive security middleware for request processing"""
     
-    def __init__(self, app, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, app: Optional[ASGIApp] = None, config: Optional[Dict[str, Any]] = None):
         super().__init__(app)
         self.config = config or {}
         self.audit_logger = SecurityAuditLogger()
         self.rate_limiter = RateLimiter()
         self.blocked_ips: Set[str] = set()
-        self.suspicious_patterns = self._load_threat_patterns()
-        
-    def _load_threat_patterns(self) -> List[re.Pattern]:
-        """Load threat detection patterns"""
-        patterns = [
-            # SQL Injection patterns
-            r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION)\b)",
-            r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
-            r"('|\"|`).*(OR|AND|SELECT|INSERT|UPDATE|DELETE).*('|\"|`)",
-            
-            # XSS patterns
-            r"<script[^>]*>.*</script>",
-            r"javascript:",
-            r"on\w+\s*=",
-            r"<iframe[^>]*>",
-            
-            # Command injection patterns
-            r"(\||&|;|\$\(|\`)",
-            r"(cat|ls|ps|whoami|id|uname|wget|curl)\s",
-            
-            # Path traversal patterns
-            r"\.\./",
-            r"\.\.\\",
-            r"/etc/passwd",
-            r"/proc/",
-            
-            # NoSQL injection patterns
-            r"\$where",
-            r"\$ne",
-            r"\$gt",
-            r"\$regex",
-        ]
+        self.threat_scanner = threat_scanner
+        # Bytes of each request body scanned for threats; the rest is
+        # passed to the app unscanned
+        self.max_body_scan_bytes = self.config.get("max_body_scan_bytes", 1024 * 1024)
         
-        return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Main middleware processing"""
-        start_time = time.time()
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        """Security checks, before the app runs"""
+        client_ip = ctx.client_ip
         
-        # Security checks
-        try:
-            # 1. IP blocking check
-            if self._is_blocked_ip(client_ip):
-                await self._log_security_event(
-                    "BLOCKED_IP_ACCESS",
-                    client_ip,
-                    {"reason": "IP address blocked"}
-                )
-                return JSONResponse(
-                    status_code=403,
-                    content={"error": "Access denied"}
-                )
-            
-            # 2. Rate limiting
-            if self._check_rate_limit(client_ip, request):
-                await self._log_security_event(
-                    "RATE_LIMIT_EXCEEDED",
-                    client_ip,
-                    {"path": str(request.url.path), "method": request.method}
-                )
-                return JSONResponse(
-                    status_code=429,
-                    content={"error": "Rate limit exceeded"}
-                )
-            
-            # 3. Request validation
-            threat_detected = await self._validate_request(request, client_ip)
-            if threat_detected:
-                return JSONResponse(
-                    status_code=400,
-                    content={"error": "Invalid request"}
-                )
-            
-            # 4. Process request
-            response = await call_next(request)
-            
-            # 5. Response security headers
-            response = self._apply_security_headers(response)
-            
-            # 6. Log successful request
-            processing_time = time.time() - start_time
-            await self._log_request(request, response, client_ip, processing_time)
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Security middleware error: {str(e)}")
+        # 1. IP blocking check
+        if self._is_blocked_ip(client_ip):
             await self._log_security_event(
-                "MIDDLEWARE_ERROR",
+                "BLOCKED_IP_ACCESS",
                 client_ip,
-                {"error": str(e)}
+                {"reason": "IP address blocked"}
             )
             return JSONResponse(
-                status_code=500,
-                content={"error": "Internal server error"}
+                status_code=403,
+                content={"error": "Access denied"}
             )
+        
+        # 2. Rate limiting
+        if await self._check_rate_limit(client_ip, ctx.request):
+            await self._log_security_event(
+                "RATE_LIMIT_EXCEEDED",
+                client_ip,
+                {"path": ctx.path, "method": ctx.method}
+            )
+            return JSONResponse(
+                status_code=429,
+                content={"error": "Rate limit exceeded"}
+            )
+        
+        # 3. Request validation
+        threat_detected = await self._validate_request(ctx, client_ip)
+        if threat_detected:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Invalid request"}
+            )
+        
+        return None
+    
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        """Response security headers"""
+        self._apply_security_headers(headers)
+    
+    async def on_error(self, ctx: RequestContext, exc: Exception) -> Optional[Response]:
+        logger.error(f"Security middleware error: {str(exc)}")
+        await self._log_security_event(
+            "MIDDLEWARE_ERROR",
+            ctx.client_ip,
+            {"error": str(exc)}
+        )
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal server error"}
+        )
+    
+    async def on_complete(self, ctx: RequestContext):
+        """Log the request"""
+        if ctx.status_code is not None:
+            await self._log_request(ctx, ctx.client_ip, ctx.elapsed)
     
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP address"""
@@ -171,55 +138,55 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         
         return False
     
-    def _check_rate_limit(self, ip: str, request: Request) -> bool:
+    async def _check_rate_limit(self, ip: str, request: Request) -> bool:
         """Check rate limiting"""
         # Different limits for different endpoints
         if request.url.path.startswith("/api/v1/auth/"):
-            return self.rate_limiter.is_rate_limited(ip, "login")
+            return await self.rate_limiter.ais_rate_limited(ip, "login")
         elif request.url.path.startswith("/api/"):
-            return self.rate_limiter.is_rate_limited(ip, "api")
+            return await self.rate_limiter.ais_rate_limited(ip, "api")
         
         return False
     
-    async def _validate_request(self, request: Request, client_ip: str) -> bool:
+    async def _validate_request(self, ctx: RequestContext, client_ip: str) -> bool:
         """Validate request for security threats"""
+        request = ctx.request
         try:
             # Check URL for threats
             url_str = str(request.url)
-            if self._check_threats_in_string(url_str):
+            threat = self.threat_scanner.scan(url_str)
+            if threat:
                 await self._log_security_event(
                     "THREAT_IN_URL",
                     client_ip,
-                    {"url": url_str, "method": request.method}
+                    {"url": url_str, "method": request.method, "category": threat}
                 )
                 return True
             
-            # Check headers for threats
+            # Check headers for threats; values like User-Agent repeat
+            # across requests, so their verdicts are cached
             for header_name, header_value in request.headers.items():
-                if self._check_threats_in_string(header_value):
+                threat = self.threat_scanner.scan_cached(header_value)
+                if threat:
                     await self._log_security_event(
                         "THREAT_IN_HEADERS",
                         client_ip,
-                        {"header": header_name, "value": header_value[:100]}
+                        {"header": header_name, "value": header_value[:100], "category": threat}
                     )
                     return True
             
-            # Check request body for threats (if present)
-            if request.method in ["POST", "PUT", "PATCH"]:
-                try:
-                    body = await request.body()
-                    if body:
-                        body_str = body.decode("utf-8", errors="ignore")
-                        if self._check_threats_in_string(body_str):
-                            await self._log_security_event(
-                                "THREAT_IN_BODY",
-                                client_ip,
-                                {"method": request.method, "body_size": len(body)}
-                            )
-                            return True
-                except Exception:
-                    # If we can't read the body, allow the request to continue
-                    pass
+            # Check request body for threats as it arrives, up to the budget
+            if ctx.method in ["POST", "PUT", "PATCH"]:
+                scan = self.threat_scanner.body_scan(self.max_body_scan_bytes)
+                async for chunk in ctx.iter_body(self.max_body_scan_bytes):
+                    threat = scan.feed(chunk)
+                    if threat:
+                        await self._log_security_event(
+                            "THREAT_IN_BODY",
+                            client_ip,
+                            {"method": request.method, "body_size": scan.bytes_scanned, "category": threat}
+                        )
+                        return True
             
             return False
             
@@ -229,19 +196,11 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     
     def _check_threats_in_string(self, text: str) -> bool:
         """Check if string contains threat patterns"""
-        if not text:
-            return False
-        
-        # Check against threat patterns
-        for pattern in self.suspicious_patterns:
-            if pattern.search(text):
-                return True
-        
-        return False
+        return self.threat_scanner.scan(text) is not None
     
-    def _apply_security_headers(self, response: Response) -> Response:
+    def _apply_security_headers(self, headers: MutableHeaders) -> None:
         """Apply security headers to response"""
-        return SecurityHeaders.apply_headers(response)
+        headers.update(SecurityHeaders.get_security_headers())
     
     async def _log_security_event(self, event_type: str, ip: str, details: Dict[str, Any]):
         """Log security event"""
@@ -254,15 +213,15 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         )
         self.audit_logger.log_security_event(event)
     
-    async def _log_request(self, request: Request, response: Response, ip: str, processing_time: float):
+    async def _log_request(self, ctx: RequestContext, ip: str, processing_time: float):
         """Log request details"""
         log_data = {
-            "method": request.method,
-            "path": str(request.url.path),
-            "status_code": response.status_code,
+            "method": ctx.method,
+            "path": ctx.path,
+            "status_code": ctx.status_code,
             "processing_time": processing_time,
             "ip_address": ip,
-            "user_agent": request.headers.get("user-agent", ""),
+            "user_agent": ctx.headers.get("user-agent", ""),
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -333,10 +292,10 @@ class AuthenticationMiddleware:
         
         return await call_next(request)
 
-class CORSSecurityMiddleware(BaseHTTPMiddleware):
+class CORSSecurityMiddleware(PipelineStage):
     """Secure CORS middleware with strict controls"""
     
-    def __init__(self, app, allowed_origins: List[str] = None):
+    def __init__(self, app: Optional[ASGIApp] = None, allowed_origins: List[str] = None):
         super().__init__(app)
         self.allowed_origins = allowed_origins or ["http://localhost:3000"]
         self.allowed_methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
@@ -346,12 +305,11 @@ class CORSSecurityMiddleware(BaseHTTPMiddleware):
         ]
         self.max_age = 86400  # 24 hours
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process CORS"""
-        origin = request.headers.get("origin")
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        """Handle preflight requests"""
+        origin = ctx.headers.get("origin")
         
-        # Handle preflight requests
-        if request.method == "OPTIONS":
+        if ctx.method == "OPTIONS":
             if origin in self.allowed_origins:
                 response = Response()
                 response.headers["Access-Control-Allow-Origin"] = origin
@@ -363,41 +321,40 @@ class CORSSecurityMiddleware(BaseHTTPMiddleware):
             else:
                 return Response(status_code=403)
         
-        # Process actual request
-        response = await call_next(request)
-        
-        # Add CORS headers for allowed origins
+        return None
+    
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders):
+        """Add CORS headers for allowed origins"""
+        origin = ctx.headers.get("origin")
         if origin in self.allowed_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        return response
+            headers["Access-Control-Allow-Origin"] = origin
+            headers["Access-Control-Allow-Credentials"] = "true"
 
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+class CSRFProtectionMiddleware(PipelineStage):
     """CSRF protection middleware"""
     
-    def __init__(self, app, secret_key: str):
+    def __init__(self, app: Optional[ASGIApp] = None, secret_key: str = ""):
         super().__init__(app)
         self.secret_key = secret_key
         self.safe_methods = ["GET", "HEAD", "OPTIONS", "TRACE"]
         self.excluded_paths = ["/api/v1/auth/"]
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
         """Process CSRF protection"""
         # Skip CSRF for safe methods and excluded paths
-        if (request.method in self.safe_methods or 
-            any(request.url.path.startswith(path) for path in self.excluded_paths)):
-            return await call_next(request)
+        if (ctx.method in self.safe_methods or 
+            any(ctx.path.startswith(path) for path in self.excluded_paths)):
+            return None
         
         # Check CSRF token
-        csrf_token = request.headers.get("X-CSRF-Token")
+        csrf_token = ctx.headers.get("X-CSRF-Token")
         if not csrf_token or not self._verify_csrf_token(csrf_token):
             return JSONResponse(
                 status_code=403,
                 content={"error": "CSRF token missing or invalid"}
             )
         
-        return await call_next(request)
+        return None
     
     def _verify_csrf_token(self, token: str) -> bool:
         """Verify CSRF token"""
@@ -413,16 +370,16 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
         import secrets
         return secrets.token_urlsafe(32)
 
-class RequestSizeMiddleware(BaseHTTPMiddleware):
+class RequestSizeMiddleware(PipelineStage):
     """Request size limitation middleware"""
     
-    def __init__(self, app, max_size: int = 10 * 1024 * 1024):  # 10MB default
+    def __init__(self, app: Optional[ASGIApp] = None, max_size: int = 10 * 1024 * 1024):  # 10MB default
         super().__init__(app)
         self.max_size = max_size
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
         """Check request size"""
-        content_length = request.headers.get("content-length")
+        content_length = ctx.headers.get("content-length")
         
         if content_length and int(content_length) > self.max_size:
             return JSONResponse(
@@ -430,7 +387,7 @@ class RequestSizeMiddleware(BaseHTTPMiddleware):
                 content={"error": "Request entity too large"}
             )
         
-        return await call_next(request)
+        return None
 
 class SecurityEventDetector:
     """Advanced security event detection"""
@@ -492,25 +449,16 @@ security_event_detector = SecurityEventDetector()
 def create_security_middleware_stack(app, config: Dict[str, Any]):
     """Create complete security middleware stack"""
     
-    # Request size middleware
-    app.add_middleware(
-        RequestSizeMiddleware,
-        max_size=config.get("max_request_size", 10 * 1024 * 1024)
-    )
-    
-    # CORS middleware
+    # One pure-ASGI layer; the request size check runs before the security
+    # middleware reads request bodies
     app.add_middleware(
-        CORSSecurityMiddleware,
-        allowed_origins=config.get("allowed_origins", ["http://localhost:3000"])
-    )
-    
-    # CSRF protection middleware
-    app.add_middleware(
-        CSRFProtectionMiddleware,
-        secret_key=config.get("csrf_secret", "your-csrf-secret-key")
+        MiddlewarePipeline,
+        stages=[
+            RequestSizeMiddleware(max_size=config.get("max_request_size", 10 * 1024 * 1024)),
+            SecurityMiddleware(config=config),
+            CSRFProtectionMiddleware(secret_key=config.get("csrf_secret", "your-csrf-secret-key")),
+            CORSSecurityMiddleware(allowed_origins=config.get("allowed_origins", ["http://localhost:3000"])),
+        ]
     )
     
-    # Main security middleware
-    app.add_middleware(SecurityMiddleware, config=config)
-    
-    return app 
\ No newline at end of file
+    return app
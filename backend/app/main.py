@@ -11,7 +11,9 @@ import logging
 # Import configuration and core modules
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.asgi_pipeline import MiddlewarePipeline
 from app.core.middleware import RateLimitMiddleware
+from app.core.read_replicas import ReadRoutingMiddleware
 from app.api.v1.router import api_router
 
 # Configure logging
@@ -56,10 +58,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
+    # Keyset pagination cursor of the list endpoints
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Rate limiting middleware
-app.add_middleware(RateLimitMiddleware)
+# Rate limiting, as a pure-ASGI pipeline stage
+app.add_middleware(MiddlewarePipeline, stages=[RateLimitMiddleware()])
+
+# Per-request read replica routing state
+app.add_middleware(ReadRoutingMiddleware)
 
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
@@ -41,6 +41,15 @@ from .subscription import ClientSubscription, SubscriptionPayment
 # Production quote models
 from .production_quote import LegacyProductionQuote, LegacyProductionQuoteInquiry
 
+# Materialized dashboard counts
+from .dashboard_counter import DashboardCounter
+
+# Normalized capability tags
+from .capability_tag import ProductionQuoteTag, ManufacturerCapabilityTag
+
+# Quote benchmark sketches
+from .quote_benchmark import QuoteBenchmarkSketch
+
 __all__ = [
     # Core models
     "User", "UserRole", "RegistrationStatus",
@@ -75,4 +84,13 @@ __all__ = [
     
     # Production quote models
     "LegacyProductionQuote", "LegacyProductionQuoteInquiry",
+    
+    # Materialized dashboard counts
+    "DashboardCounter",
+    
+    # Normalized capability tags
+    "ProductionQuoteTag", "ManufacturerCapabilityTag",
+    
+    # Quote benchmark sketches
+    "QuoteBenchmarkSketch",
 ] 
\ No newline at end of file
@@ -0,0 +1,48 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
+
+from app.core.database import Base
+
+
+class ProductionQuoteTag(Base):
+    """
+    One normalized process, material, certification or country of a
+    production quote.
+
+    Derived from the JSON lists of ProductionQuote by
+    app.services.capability_tags on every flush that changes them. The
+    primary key (kind, value, production_quote_id) is the lookup index of
+    the list filters.
+    """
+    __tablename__ = "production_quote_tags"
+    __table_args__ = (
+        Index('idx_production_quote_tags_quote', 'production_quote_id'),
+    )
+
+    kind = Column(String(20), primary_key=True)  # process, material, certification, country
+    value = Column(String(200), primary_key=True)  # normalized, see normalize_tag()
+    production_quote_id = Column(
+        Integer, ForeignKey("production_quotes.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    def __repr__(self):
+        return f"<ProductionQuoteTag({self.production_quote_id} {self.kind}={self.value})>"
+
+
+class ManufacturerCapabilityTag(Base):
+    """
+    One normalized process, material or certification from
+    Manufacturer.capabilities, maintained like ProductionQuoteTag.
+    """
+    __tablename__ = "manufacturer_capability_tags"
+    __table_args__ = (
+        Index('idx_manufacturer_capability_tags_manufacturer', 'manufacturer_id'),
+    )
+
+    kind = Column(String(20), primary_key=True)  # process, material, certification
+    value = Column(String(200), primary_key=True)
+    manufacturer_id = Column(
+        Integer, ForeignKey("manufacturers.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    def __repr__(self):
+        return f"<ManufacturerCapabilityTag({self.manufacturer_id} {self.kind}={self.value})>"
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class DashboardCounter(Base):
+    """
+    Materialized dashboard count for one owner.
+
+    Kept up to date by app.services.dashboard_counters as orders and quotes
+    change state, and rebuilt from the source tables by the nightly
+    consistency job.
+    """
+    __tablename__ = "dashboard_counters"
+
+    owner_type = Column(String(20), primary_key=True)  # client, manufacturer, global
+    owner_id = Column(Integer, primary_key=True)  # users.id, manufacturers.id, 0 for global
+    metric = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DashboardCounter({self.owner_type}:{self.owner_id} {self.metric}={self.value})>"
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, LargeBinary
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class QuoteBenchmarkSketch(Base):
+    """
+    Price distribution and running means of the quotes in one benchmark group.
+
+    A group is an industry category, process, material and quantity bucket,
+    any of which may be '*' to cover all values. Sketches are updated by
+    app.services.quote_benchmarks as quotes are sent and accepted, and
+    rebuilt from the quotes table by scripts/rebuild_quote_benchmarks.py.
+    """
+    __tablename__ = "quote_benchmark_sketches"
+
+    scope = Column(String(20), primary_key=True)  # quoted, accepted
+    industry_category = Column(String(100), primary_key=True)
+    process = Column(String(200), primary_key=True)
+    material = Column(String(200), primary_key=True)
+    quantity_bucket = Column(String(20), primary_key=True)
+    quote_count = Column(Integer, nullable=False, default=0)
+    price_sum = Column(Float, nullable=False, default=0)
+    delivery_sum = Column(Float, nullable=False, default=0)
+    price_digest = Column(LargeBinary, nullable=True)  # serialized TDigest of total_price_pln
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return (
+            f"<QuoteBenchmarkSketch({self.scope}:{self.industry_category}/{self.process}/"
+            f"{self.material}/{self.quantity_bucket} n={self.quote_count})>"
+        )
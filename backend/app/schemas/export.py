@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+
+from app.services.streaming_export import ExportFormat
+
+
+class ExportDatasetName(str, Enum):
+    ORDERS = "orders"
+    QUOTES = "quotes"
+
+
+class ExportJobCreate(BaseModel):
+    dataset: ExportDatasetName
+    format: ExportFormat = ExportFormat.CSV
+    compress: bool = False
+    status_filter: Optional[str] = None
+    order_id: Optional[int] = Field(None, description="Quotes only")
+
+
+class ExportJobResponse(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    bytes: Optional[int] = None
+    download_url: Optional[str] = None
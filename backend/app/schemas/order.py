@@ -77,6 +77,8 @@ class OrderListResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None       # Pass as ?cursor= for the next page
+    total_is_estimate: bool = False
 
 
 class OrderStatusUpdate(BaseModel):
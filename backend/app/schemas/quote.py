@@ -260,10 +260,13 @@ class QuoteFilterCriteria(BaseModel):
 
 
 class QuoteBenchmark(BaseModel):
-    """Quote benchmarking data"""
-    industry_average_price: float
-    industry_average_delivery: int
-    market_percentile: int  # where this quote ranks (0-100)
+    """Quote benchmarking data; averages and percentile are None until similar quotes have been sent"""
+    industry_average_price: Optional[float] = None
+    industry_average_delivery: Optional[int] = None
+    market_percentile: Optional[int] = None  # share of similar quotes priced at or below this one (0-100)
+    accepted_average_price: Optional[float] = None  # of similar quotes that clients accepted
+    sample_size: int = 0  # quotes in the benchmark group
+    benchmark_group: Optional[Dict[str, str]] = None  # industry_category, process, material, quantity_bucket; '*' for any
     competitive_advantage: List[str]
     improvement_suggestions: List[str]
 
@@ -3,7 +3,7 @@ Pydantic schemas for Smart Matching Engine API
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -31,6 +31,14 @@ class FeedbackType(str, Enum):
     IRRELEVANT = "irrelevant"
 
 
+# Recommendation fields that are only computed when asked for, as in
+# app.services.smart_matching_engine.RECOMMENDATION_DETAILS
+RecommendationDetail = Literal[
+    'estimated_delivery_time', 'estimated_cost_range', 'risk_assessment', 'competitive_advantages',
+    'potential_concerns', 'similar_past_projects', 'ai_insights'
+]
+
+
 class SmartMatchingRequest(BaseModel):
     """Request model for smart matching recommendations"""
     order_id: int = Field(..., description="Order ID to generate recommendations for")
@@ -39,6 +47,9 @@ class SmartMatchingRequest(BaseModel):
     enable_ml_predictions: bool = Field(True, description="Enable machine learning predictions")
     custom_weights: Optional[Dict[str, float]] = Field(None, description="Custom scoring weights")
     filters: Optional[Dict[str, Any]] = Field(None, description="Additional filters")
+    details: Optional[List[RecommendationDetail]] = Field(
+        None, description="Recommendation details to compute (default: all); the others are returned as null"
+    )
 
 
 class MatchScoreBreakdown(BaseModel):
@@ -62,13 +73,13 @@ class SmartRecommendationData(BaseModel):
     manufacturer_name: str = Field(..., description="Manufacturer business name")
     match_score: MatchScoreBreakdown = Field(..., description="Detailed match score")
     predicted_success_rate: float = Field(..., ge=0, le=1, description="AI-predicted success rate")
-    estimated_delivery_time: int = Field(..., description="Estimated delivery time in days")
-    estimated_cost_range: Dict[str, float] = Field(..., description="Estimated cost range")
-    risk_assessment: Dict[str, Any] = Field(..., description="Risk assessment details")
-    competitive_advantages: List[str] = Field(default_factory=list, description="Key advantages")
-    potential_concerns: List[str] = Field(default_factory=list, description="Potential concerns")
-    similar_past_projects: List[Dict[str, Any]] = Field(default_factory=list, description="Similar projects")
-    ai_insights: Dict[str, Any] = Field(default_factory=dict, description="AI-generated insights")
+    estimated_delivery_time: Optional[int] = Field(None, description="Estimated delivery time in days")
+    estimated_cost_range: Optional[Dict[str, float]] = Field(None, description="Estimated cost range")
+    risk_assessment: Optional[Dict[str, Any]] = Field(None, description="Risk assessment details")
+    competitive_advantages: Optional[List[str]] = Field(None, description="Key advantages")
+    potential_concerns: Optional[List[str]] = Field(None, description="Potential concerns")
+    similar_past_projects: Optional[List[Dict[str, Any]]] = Field(None, description="Similar projects")
+    ai_insights: Optional[Dict[str, Any]] = Field(None, description="AI-generated insights")
 
 
 class SmartMatchingResponse(BaseModel):
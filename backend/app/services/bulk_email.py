@@ -0,0 +1,227 @@
+"""
+Bulk email delivery
+
+Sends one template to many recipients. Unsubscribes are checked with one
+Redis MGET per 1000 addresses, the template is compiled once per language
+and rendered per recipient, and recipients whose rendered emails are
+identical share one SendGrid v3 mail/send request of up to 1000
+personalizations. Requests go out concurrently over one HTTP client, and
+each recipient's status is written to the tracker as its request completes.
+
+Without a SendGrid API key, requests are answered by a local mock that only
+logs them.
+"""
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+from app.services.email import EmailStatus, email_service
+from app.services.email_templates import EmailTemplateManager, template_manager
+
+SENDGRID_API_URL = "https://api.sendgrid.com"
+# SendGrid's limit on personalizations per mail/send request
+MAX_PERSONALIZATIONS = 1000
+DEFAULT_CONCURRENCY = 8
+
+
+def _mock_mail_send(request: httpx.Request) -> httpx.Response:
+    """Stand-in for SendGrid's mail/send when no API key is configured"""
+    payload = json.loads(request.content)
+    logger.info(
+        f"[MOCK EMAIL] '{payload['subject']}' to {len(payload['personalizations'])} recipients"
+    )
+    return httpx.Response(202)
+
+
+class BulkEmailSender:
+    """Batched, concurrent SendGrid delivery of one template to many recipients"""
+
+    def __init__(
+        self,
+        api_key: str,
+        from_email: str,
+        from_name: str,
+        tracker=None,
+        unsubscribe_manager=None,
+        templates: EmailTemplateManager = template_manager,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        transport: httpx.AsyncBaseTransport = None
+    ):
+        self.api_key = api_key
+        self.from_email = from_email
+        self.from_name = from_name
+        self.tracker = tracker
+        self.unsubscribe_manager = unsubscribe_manager
+        self.templates = templates
+        self.concurrency = concurrency
+        self.transport = transport or (None if api_key else httpx.MockTransport(_mock_mail_send))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Kept open between campaigns, so it must stay on the loop that created it
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=SENDGRID_API_URL,
+                headers={'Authorization': f"Bearer {self.api_key}"},
+                transport=self.transport,
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=self.concurrency)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send(
+        self,
+        template_name: str,
+        recipients: List[Dict[str, Any]],
+        common_context: Dict[str, Any] = None,
+        email_type: str = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Send template_name to each recipient: a dict of email and optionally
+        name, context (merged over common_context) and language.
+
+        Returns one result per recipient, in order: email, status ('sent',
+        'failed' or 'unsubscribed'), email_id when it was rendered and error
+        when it failed.
+        """
+        email_type = email_type or template_name
+        results = [{'email': recipient['email'], 'status': 'pending'} for recipient in recipients]
+
+        unsubscribed = set()
+        if self.unsubscribe_manager:
+            unsubscribed = self.unsubscribe_manager.unsubscribed_among(
+                [recipient['email'] for recipient in recipients], email_type
+            )
+
+        compiled = {}
+        # Rendered (subject, html, text) -> indexes of the recipients who get it
+        groups = defaultdict(list)
+        for index, recipient in enumerate(recipients):
+            if recipient['email'] in unsubscribed:
+                results[index]['status'] = 'unsubscribed'
+                continue
+            try:
+                language = recipient.get('language', 'en')
+                if language not in compiled:
+                    compiled[language] = self.templates.compile_template(template_name, language)
+                rendered = compiled[language].render({**(common_context or {}), **recipient.get('context', {})})
+            except Exception as e:
+                results[index].update(status='failed', error=str(e))
+                continue
+            results[index]['email_id'] = str(uuid.uuid4())
+            groups[(rendered['subject'], rendered['html_content'], rendered['text_content'])].append(index)
+
+        if self.tracker:
+            self.tracker.track_many([
+                {
+                    'email_id': results[index]['email_id'],
+                    'email_type': email_type,
+                    'to_email': recipients[index]['email'],
+                    'subject': subject
+                }
+                for (subject, _, _), indexes in groups.items() for index in indexes
+            ])
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(content, indexes):
+            async with semaphore:
+                error = await self._post(self._mail(content, [(recipients[i], results[i]) for i in indexes]))
+            email_ids = [results[index]['email_id'] for index in indexes]
+            if error:
+                for index in indexes:
+                    results[index].update(status='failed', error=error)
+                if self.tracker:
+                    self.tracker.update_many(email_ids, EmailStatus.FAILED, {'error': error})
+            else:
+                for index in indexes:
+                    results[index]['status'] = 'sent'
+                if self.tracker:
+                    self.tracker.update_many(email_ids, EmailStatus.SENT, {'sent_at': datetime.now().isoformat()})
+
+        await asyncio.gather(*(
+            deliver(content, indexes[start:start + MAX_PERSONALIZATIONS])
+            for content, indexes in groups.items()
+            for start in range(0, len(indexes), MAX_PERSONALIZATIONS)
+        ))
+        return results
+
+    def _mail(self, content, recipients) -> Dict[str, Any]:
+        """mail/send body sending content to (recipient, result) pairs, one personalization each"""
+        subject, html_content, text_content = content
+        personalizations = []
+        for recipient, result in recipients:
+            to = {'email': recipient['email']}
+            if recipient.get('name'):
+                to['name'] = recipient['name']
+            personalizations.append({'to': [to], 'custom_args': {'email_id': result['email_id']}})
+
+        # SendGrid requires text/plain before text/html
+        contents = [{'type': 'text/plain', 'value': text_content}] if text_content else []
+        contents.append({'type': 'text/html', 'value': html_content})
+        return {
+            'personalizations': personalizations,
+            'from': {'email': self.from_email, 'name': self.from_name},
+            'subject': subject,
+            'content': contents
+        }
+
+    async def _post(self, mail: Dict[str, Any]) -> Optional[str]:
+        """Send one mail/send request; the error, or None once SendGrid accepted it"""
+        try:
+            response = await self._get_client().post('/v3/mail/send', json=mail)
+        except httpx.HTTPError as e:
+            logger.error(f"SendGrid request for {len(mail['personalizations'])} recipients failed: {e}")
+            return str(e) or type(e).__name__
+        if response.status_code in (200, 201, 202):
+            return None
+        logger.error(f"SendGrid rejected {len(mail['personalizations'])} recipients. Status: {response.status_code}")
+        return f"SendGrid error {response.status_code}: {response.text[:200]}"
+
+
+_sender: Optional[BulkEmailSender] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_pid: Optional[int] = None
+
+
+def bulk_email_sender() -> BulkEmailSender:
+    """The sender shared by this process, using email_service's tracking and unsubscribes"""
+    global _sender
+    if _sender is None:
+        _sender = BulkEmailSender(
+            api_key=settings.SENDGRID_API_KEY,
+            from_email=email_service.from_email,
+            from_name=email_service.from_name,
+            tracker=email_service.tracker,
+            unsubscribe_manager=email_service.unsubscribe_manager
+        )
+    return _sender
+
+
+def run_in_worker_loop(coroutine):
+    """
+    Run a coroutine to completion on this process's event loop, which stays
+    open between calls so that the shared sender keeps its connections.
+    Created after a fork, so Celery's prefork children never share one.
+    """
+    global _sender, _worker_loop, _worker_pid
+    if _worker_loop is None or _worker_loop.is_closed() or _worker_pid != os.getpid():
+        if _worker_pid != os.getpid():
+            # The parent's client and its connections belong to the parent's loop
+            _sender = None
+        _worker_loop = asyncio.new_event_loop()
+        _worker_pid = os.getpid()
+    return _worker_loop.run_until_complete(coroutine)
@@ -0,0 +1,155 @@
+"""
+Capability vocabulary index for fuzzy capability matching.
+
+Matching a required term (process, material, industry, certification)
+against a manufacturer used to run substring checks, word-set Jaccard,
+technical-group similarity and fuzz.token_sort_ratio for every capability
+string of every manufacturer on every request. The vocabulary behind those
+strings is small and changes rarely, so this index:
+
+- normalizes each distinct capability term once and gives it an integer id
+- stores every manufacturer's capability lists as tuples of term ids
+- memoizes a similarity row per required term against the whole vocabulary,
+  extending it only for terms added since the row was computed
+
+"Similarity of required term X to manufacturer M" then becomes a max over a
+handful of list lookups. Manufacturer entries are re-indexed incrementally:
+each lookup compares the stored capability list with the current one and
+re-indexes that category when the profile has changed.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_term(term: str) -> str:
+    """Normalized form used for both required and capability terms"""
+    return term.lower().strip()
+
+
+class CapabilityIndex:
+    """Term-to-term similarity table over the manufacturer capability vocabulary"""
+
+    def __init__(
+        self,
+        pair_similarity: Callable[[str, str], float],
+        finalize: Callable[[float], float],
+        max_required_terms: int = 10000
+    ):
+        """
+        Args:
+            pair_similarity: Similarity of a normalized required term to a
+                normalized capability term
+            finalize: Maps the best pair similarity to the final match score
+            max_required_terms: Similarity rows kept before the least recently
+                used required term is evicted
+        """
+        self.pair_similarity = pair_similarity
+        self.finalize = finalize
+        self.max_required_terms = max_required_terms
+
+        self._vocabulary: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        # manufacturer id -> category -> (capability list as indexed, term ids)
+        self._manufacturers: Dict[Any, Dict[str, Tuple[List[str], Tuple[int, ...]]]] = {}
+        # normalized required term -> similarity to each vocabulary term
+        self._similarity_rows: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._vocabulary)
+
+    def __len__(self) -> int:
+        return len(self._manufacturers)
+
+    def rebuild(self, manufacturers: Iterable[Any]) -> None:
+        """Index every capability list of the given manufacturers from scratch"""
+        with self._lock:
+            self._manufacturers.clear()
+            for manufacturer in manufacturers:
+                self.update_manufacturer(manufacturer.id, manufacturer.capabilities)
+        logger.info(
+            f"Capability index built: {len(self._manufacturers)} manufacturers, "
+            f"{len(self._vocabulary)} terms"
+        )
+
+    def update_manufacturer(self, manufacturer_id: Any, capabilities: Dict[str, Any]) -> None:
+        """Re-index all list-valued capability categories of one manufacturer"""
+        with self._lock:
+            entry = {}
+            for category, terms in (capabilities or {}).items():
+                if isinstance(terms, list):
+                    entry[category] = (list(terms), self._term_ids_for(terms))
+            self._manufacturers[manufacturer_id] = entry
+
+    def remove_manufacturer(self, manufacturer_id: Any) -> None:
+        with self._lock:
+            self._manufacturers.pop(manufacturer_id, None)
+
+    def match(self, required: str, manufacturer: Any, category: str) -> float:
+        """
+        Similarity of a required term to a manufacturer's capability category.
+
+        Equivalent to running the per-pair matcher over
+        manufacturer.capabilities[category].
+        """
+        if not required:
+            return 0.0
+
+        term_ids = self._category_term_ids(manufacturer, category)
+        if not term_ids:
+            return 0.0
+
+        row = self._similarity_row(normalize_term(required))
+        best_match = 0.0
+        for term_id in term_ids:
+            if row[term_id] > best_match:
+                best_match = row[term_id]
+        return self.finalize(best_match)
+
+    def _category_term_ids(self, manufacturer: Any, category: str) -> Tuple[int, ...]:
+        """Term ids for one category, re-indexing it if the profile changed"""
+        available = (manufacturer.capabilities or {}).get(category, [])
+        entry = self._manufacturers.get(manufacturer.id)
+        indexed = entry.get(category) if entry is not None else None
+        if indexed is not None and indexed[0] == available:
+            return indexed[1]
+
+        with self._lock:
+            term_ids = self._term_ids_for(available)
+            self._manufacturers.setdefault(manufacturer.id, {})[category] = (list(available), term_ids)
+        return term_ids
+
+    def _term_ids_for(self, terms: List[str]) -> Tuple[int, ...]:
+        """Ids for capability terms, adding unseen terms to the vocabulary"""
+        term_ids = []
+        for term in terms:
+            normalized = normalize_term(term)
+            term_id = self._term_ids.get(normalized)
+            if term_id is None:
+                term_id = len(self._vocabulary)
+                self._vocabulary.append(normalized)
+                self._term_ids[normalized] = term_id
+            term_ids.append(term_id)
+        return tuple(term_ids)
+
+    def _similarity_row(self, required: str) -> List[float]:
+        """Similarity of a normalized required term to every vocabulary term"""
+        with self._lock:
+            row = self._similarity_rows.get(required, [])
+            if len(row) < len(self._vocabulary):
+                # Only terms added since the row was computed need scoring
+                row = row + [
+                    self.pair_similarity(required, term)
+                    for term in self._vocabulary[len(row):]
+                ]
+                self._similarity_rows[required] = row
+            self._similarity_rows.move_to_end(required)
+            while len(self._similarity_rows) > self.max_required_terms:
+                self._similarity_rows.popitem(last=False)
+            return row
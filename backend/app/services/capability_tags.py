@@ -0,0 +1,231 @@
+"""
+Normalized capability tags for production quotes and manufacturers.
+
+Production quotes keep their processes, materials, certifications and
+preferred countries, and manufacturers their capabilities, as JSON lists.
+Filtering those with LIKE '%"value"%' reads every row and also matches
+values that merely contain the quoted text. The tag tables hold one
+(kind, value, owner id) row per list element instead, with the value
+normalized by normalize_tag(), so that
+
+    "quotes tagged process=cnc machining, process=welding and country=pl"
+
+is a range read of the primary key per value, intersected with one
+GROUP BY / HAVING COUNT. Tags are rewritten in the transaction of every flush that
+creates, deletes or reassigns one of the lists. Changes that bypass the
+ORM (bulk updates, raw SQL) are repaired by rebuild_capability_tags().
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.capability_tag import ManufacturerCapabilityTag, ProductionQuoteTag
+from app.models.producer import Manufacturer
+from app.models.quote import ProductionQuote
+
+logger = logging.getLogger(__name__)
+
+PROCESS = 'process'
+MATERIAL = 'material'
+CERTIFICATION = 'certification'
+COUNTRY = 'country'
+
+# Tag kind -> ProductionQuote JSON list attribute
+PRODUCTION_QUOTE_TAG_FIELDS = {
+    PROCESS: 'manufacturing_processes',
+    MATERIAL: 'materials',
+    CERTIFICATION: 'certifications',
+    COUNTRY: 'preferred_countries',
+}
+
+# Tag kind -> key of the list in Manufacturer.capabilities
+MANUFACTURER_TAG_FIELDS = {
+    PROCESS: 'manufacturing_processes',
+    MATERIAL: 'materials',
+    CERTIFICATION: 'certifications',
+}
+
+MAX_TAG_LENGTH = 200
+
+Tag = Tuple[str, str]
+
+
+def normalize_tag(value: Any) -> str:
+    """Case- and whitespace-insensitive form of a list element"""
+    return ' '.join(str(value).split()).casefold()[:MAX_TAG_LENGTH]
+
+
+def _tags(lists: Mapping[str, Any]) -> Set[Tag]:
+    tags = set()
+    for kind, values in lists.items():
+        if isinstance(values, str):
+            values = [values]
+        elif not isinstance(values, (list, tuple)):
+            continue
+        for value in values:
+            tag = normalize_tag(value) if value is not None else ''
+            if tag:
+                tags.add((kind, tag))
+    return tags
+
+
+def production_quote_tags(quote: Any) -> Set[Tag]:
+    return _tags({kind: getattr(quote, field) for kind, field in PRODUCTION_QUOTE_TAG_FIELDS.items()})
+
+
+def manufacturer_tags(manufacturer: Any) -> Set[Tag]:
+    capabilities = manufacturer.capabilities if isinstance(manufacturer.capabilities, dict) else {}
+    return _tags({kind: capabilities.get(key) for kind, key in MANUFACTURER_TAG_FIELDS.items()})
+
+
+def required_tags(technical_requirements: Any) -> Set[Tag]:
+    """Tags an order's technical requirements ask for"""
+    if not isinstance(technical_requirements, dict):
+        return set()
+    return _tags({
+        PROCESS: technical_requirements.get('manufacturing_process'),
+        MATERIAL: technical_requirements.get('material'),
+        CERTIFICATION: technical_requirements.get('certifications'),
+    })
+
+
+# Owner model -> (tag model, owner id column of the tag, tags of an owner, attributes they come from)
+_OWNERS = {
+    ProductionQuote: (
+        ProductionQuoteTag, ProductionQuoteTag.production_quote_id,
+        production_quote_tags, tuple(PRODUCTION_QUOTE_TAG_FIELDS.values())
+    ),
+    Manufacturer: (
+        ManufacturerCapabilityTag, ManufacturerCapabilityTag.manufacturer_id,
+        manufacturer_tags, ('capabilities',)
+    ),
+}
+
+
+# Maintenance
+
+def collect_tag_changes(session: Session) -> Dict[type, Dict[int, Set[Tag]]]:
+    """New tag sets of the owners a flush created, changed or deleted; deleted ones get none"""
+    changes: Dict[type, Dict[int, Set[Tag]]] = {model: {} for model in _OWNERS}
+
+    for instance in session.new:
+        owner = _OWNERS.get(type(instance))
+        if owner is not None:
+            changes[type(instance)][instance.id] = owner[2](instance)
+
+    for instance in session.dirty:
+        owner = _OWNERS.get(type(instance))
+        if owner is None or not session.is_modified(instance):
+            continue
+        attrs = inspect(instance).attrs
+        if any(attrs[field].history.has_changes() for field in owner[3]):
+            changes[type(instance)][instance.id] = owner[2](instance)
+
+    for instance in session.deleted:
+        if type(instance) in _OWNERS:
+            changes[type(instance)][instance.id] = set()
+
+    return changes
+
+
+def write_tags(connection: Any, model: type, tags_by_owner: Dict[int, Set[Tag]]) -> None:
+    """Replace the tags of the given owners"""
+    if not tags_by_owner:
+        return
+    tag_model, owner_column = _OWNERS[model][:2]
+    owner_ids = sorted(tags_by_owner)
+    connection.execute(delete(tag_model).where(owner_column.in_(owner_ids)))
+    rows = [
+        {'kind': kind, 'value': value, owner_column.key: owner_id}
+        for owner_id in owner_ids
+        for kind, value in sorted(tags_by_owner[owner_id])
+    ]
+    if rows:
+        connection.execute(insert(tag_model), rows)
+
+
+def install_tag_maintenance() -> None:
+    """Rewrite the tags of every owner a flush changed, in the same transaction"""
+
+    @event.listens_for(Session, 'after_flush')
+    def _maintain_capability_tags(session, flush_context):
+        if session.info.get('read_only'):
+            return
+        changes = collect_tag_changes(session)
+        connection = session.connection()
+        for model, tags_by_owner in changes.items():
+            write_tags(connection, model, tags_by_owner)
+
+
+class _Row:
+    """Attribute access to selected JSON columns, for the tag functions"""
+
+    def __init__(self, fields: Iterable[str], values: Iterable[Any]):
+        self.__dict__.update(zip(fields, values))
+
+
+def rebuild_capability_tags(db: Session, batch_size: int = 1000) -> Dict[str, int]:
+    """Recompute every tag from the JSON lists, e.g. after bulk updates"""
+    rebuilt = {}
+    for model, (tag_model, _, tags_of, fields) in _OWNERS.items():
+        db.execute(delete(tag_model))
+        owners = 0
+        statement = select(model.id, *(getattr(model, field) for field in fields)).order_by(model.id)
+        for rows in db.execute(statement.execution_options(yield_per=batch_size)).partitions():
+            tags_by_owner = {row[0]: tags_of(_Row(fields, row[1:])) for row in rows}
+            write_tags(db.connection(), model, tags_by_owner)
+            owners += len(rows)
+        rebuilt[model.__tablename__] = owners
+    db.commit()
+    logger.info(f"Capability tags rebuilt: {rebuilt}")
+    return rebuilt
+
+
+# Querying
+
+def tagged_with(owner_model: type, filters: Mapping[str, Iterable[Any]]) -> Optional[Any]:
+    """
+    Condition on owner_model.id: tagged with every value of every kind in
+    filters. None when no value survives normalization.
+
+    All kinds are intersected in one pass over the tag primary key: the
+    rows of the wanted (kind, value) pairs grouped by owner, keeping owners
+    that have all of them.
+    """
+    tag_model, owner_column = _OWNERS[owner_model][:2]
+    wanted = {
+        kind: sorted({normalize_tag(value) for value in values if value is not None} - {''})
+        for kind, values in filters.items()
+    }
+    wanted = {kind: values for kind, values in wanted.items() if values}
+    if not wanted:
+        return None
+    statement = select(owner_column).where(or_(*(
+        and_(tag_model.kind == kind, tag_model.value.in_(values)) for kind, values in wanted.items()
+    )))
+    total = sum(len(values) for values in wanted.values())
+    if total > 1:
+        # The primary key makes each (kind, value) count once per owner
+        statement = statement.group_by(owner_column).having(func.count() == total)  # pylint: disable=not-callable
+    return owner_model.id.in_(statement)
+
+
+def tag_hits(owner_model: type, tags: Iterable[Tag]) -> Optional[Any]:
+    """Subquery of (owner_id, hits): how many of the given tags each owner has"""
+    tag_model, owner_column = _OWNERS[owner_model][:2]
+    tags = sorted({(kind, normalize_tag(value)) for kind, value in tags if value is not None})
+    tags = [(kind, value) for kind, value in tags if value]
+    if not tags:
+        return None
+    return (
+        select(owner_column.label('owner_id'), func.count().label('hits'))  # pylint: disable=not-callable
+        .where(or_(*(and_(tag_model.kind == kind, tag_model.value == value) for kind, value in tags)))
+        .group_by(owner_column)
+        .subquery()
+    )
+
+
+install_tag_maintenance()
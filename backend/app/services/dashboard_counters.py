@@ -0,0 +1,388 @@
+"""
+Dashboard counts: single-pass aggregates and materialized counters.
+
+Each dashboard reads its counts from the dashboard_counters table with one
+primary-key range read. The counters are maintained in the same
+transaction as the order and quote changes that move them: after every
+flush the difference between the old and new contribution of each changed
+row is applied with an UPSERT increment.
+
+Changes that bypass the ORM unit of work (bulk Query.update / delete, raw
+SQL) are not seen by the flush hook. rebuild_counters() recomputes every
+counter from the source tables, corrects the drift and reports it; it runs
+nightly and its first run marks the counters as usable. Until then the
+dashboards fall back to the single-pass aggregate queries below.
+"""
+
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, inspect, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.dashboard_counter import DashboardCounter
+from app.models.order import Order, OrderStatus
+from app.models.quote import Quote, QuoteStatus
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+CLIENT = 'client'
+MANUFACTURER = 'manufacturer'
+GLOBAL = 'global'
+
+# Metric of the global row written by rebuild_counters()
+REBUILT_AT = 'rebuilt_at'
+
+ACTIVE_ORDER_STATUSES = (OrderStatus.ACTIVE, OrderStatus.QUOTED, OrderStatus.IN_PRODUCTION)
+AVAILABLE_ORDER_STATUSES = (OrderStatus.ACTIVE, OrderStatus.QUOTED)
+# Quotes sent to the client and still awaiting a decision
+PENDING_QUOTE_STATUSES = (QuoteStatus.SENT, QuoteStatus.VIEWED, QuoteStatus.NEGOTIATING)
+
+CLIENT_METRICS = ('orders_total', 'orders_active', 'orders_completed', 'quotes_total', 'quotes_pending')
+MANUFACTURER_METRICS = ('quotes_total', 'quotes_accepted', 'quotes_pending', 'orders_in_production')
+GLOBAL_METRICS = ('orders_available',)
+
+CounterKey = Tuple[str, int, str]
+
+
+# Contributions of single rows
+
+def order_contributions(client_id: Optional[int], status: Any) -> Counter:
+    """Counters one order adds to"""
+    counts = Counter()
+    if client_id is not None:
+        counts[(CLIENT, client_id, 'orders_total')] += 1
+        if status in ACTIVE_ORDER_STATUSES:
+            counts[(CLIENT, client_id, 'orders_active')] += 1
+        if status == OrderStatus.COMPLETED:
+            counts[(CLIENT, client_id, 'orders_completed')] += 1
+    if status in AVAILABLE_ORDER_STATUSES:
+        counts[(GLOBAL, 0, 'orders_available')] += 1
+    return counts
+
+
+def quote_contributions(
+    manufacturer_id: Optional[int],
+    status: Any,
+    client_id: Optional[int],
+    order_status: Any
+) -> Counter:
+    """Counters one quote adds to, given the state of its order"""
+    counts = Counter()
+    pending = status in PENDING_QUOTE_STATUSES
+    if client_id is not None:
+        counts[(CLIENT, client_id, 'quotes_total')] += 1
+        if pending:
+            counts[(CLIENT, client_id, 'quotes_pending')] += 1
+    if manufacturer_id is not None:
+        counts[(MANUFACTURER, manufacturer_id, 'quotes_total')] += 1
+        if status == QuoteStatus.ACCEPTED:
+            counts[(MANUFACTURER, manufacturer_id, 'quotes_accepted')] += 1
+            if order_status == OrderStatus.IN_PRODUCTION:
+                counts[(MANUFACTURER, manufacturer_id, 'orders_in_production')] += 1
+        if pending:
+            counts[(MANUFACTURER, manufacturer_id, 'quotes_pending')] += 1
+    return counts
+
+
+# Maintenance on flush
+
+def _values(instance: Any, keys: Iterable[str], old: bool) -> Tuple[Any, ...]:
+    """Attribute values before (old=True) or after the flush"""
+    state = inspect(instance)
+    values = []
+    for key in keys:
+        history = state.attrs[key].history
+        if old and history.deleted:
+            values.append(history.deleted[0])
+        else:
+            # Also taken as the old value when that was expired before the
+            # change; the consistency job corrects such rows
+            values.append(state.dict.get(key))
+    return tuple(values)
+
+
+def _order_state(session: Session, quote: Quote, order_id: Optional[int], old: bool) -> Tuple[Any, Any]:
+    """(client_id, status) of a quote's order before or after the flush"""
+    order = quote.__dict__.get('order')
+    if order is None or (order_id is not None and order.id != order_id):
+        order = session.get(Order, order_id) if order_id is not None else None
+    if order is None:
+        return None, None
+    return _values(order, ('client_id', 'status'), old)
+
+
+def _quote_contributions(session: Session, quote: Quote, old: bool) -> Counter:
+    manufacturer_id, status, order_id = _values(quote, ('manufacturer_id', 'status', 'order_id'), old)
+    # Old values of a quote belong with the old state of its order
+    client_id, order_status = _order_state(session, quote, order_id, old)
+    return quote_contributions(manufacturer_id, status, client_id, order_status)
+
+
+def collect_counter_deltas(session: Session) -> Counter:
+    """Counter changes implied by the pending changes of a session"""
+    deltas = Counter()
+    flushed_quote_ids = set()
+
+    for instance in session.new:
+        if isinstance(instance, Order):
+            deltas.update(order_contributions(instance.client_id, instance.status))
+        elif isinstance(instance, Quote):
+            deltas.update(_quote_contributions(session, instance, old=False))
+
+    for instance in session.deleted:
+        if isinstance(instance, Order):
+            deltas.subtract(order_contributions(*_values(instance, ('client_id', 'status'), old=True)))
+        elif isinstance(instance, Quote):
+            flushed_quote_ids.add(instance.id)
+            deltas.subtract(_quote_contributions(session, instance, old=True))
+
+    changed_orders = []
+    for instance in session.dirty:
+        if isinstance(instance, Quote) and session.is_modified(instance):
+            flushed_quote_ids.add(instance.id)
+            deltas.subtract(_quote_contributions(session, instance, old=True))
+            deltas.update(_quote_contributions(session, instance, old=False))
+        elif isinstance(instance, Order) and session.is_modified(instance):
+            old = _values(instance, ('client_id', 'status'), old=True)
+            new = _values(instance, ('client_id', 'status'), old=False)
+            if old != new:
+                deltas.subtract(order_contributions(*old))
+                deltas.update(order_contributions(*new))
+                if (old[1] == OrderStatus.IN_PRODUCTION) != (new[1] == OrderStatus.IN_PRODUCTION):
+                    changed_orders.append((instance.id, new[1] == OrderStatus.IN_PRODUCTION))
+
+    # Accepted quotes untouched by this flush follow their order in and out of production
+    for order_id, in_production in changed_orders:
+        accepted = session.execute(
+            select(Quote.id, Quote.manufacturer_id).where(
+                Quote.order_id == order_id,
+                Quote.status == QuoteStatus.ACCEPTED
+            )
+        ).all()
+        for quote_id, manufacturer_id in accepted:
+            if quote_id not in flushed_quote_ids:
+                deltas[(MANUFACTURER, manufacturer_id, 'orders_in_production')] += 1 if in_production else -1
+
+    return Counter({key: value for key, value in deltas.items() if value})
+
+
+def apply_counter_deltas(connection: Any, deltas: Dict[CounterKey, int], increment: bool = True) -> None:
+    """UPSERT counter rows, adding to (or with increment=False replacing) their values"""
+    if not deltas:
+        return
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = DashboardCounter.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.owner_type, table.c.owner_id, table.c.metric],
+        set_={
+            'value': table.c.value + statement.excluded.value if increment else statement.excluded.value,
+            'updated_at': func.now(),
+        }
+    )
+    # Sorted so concurrent transactions lock counter rows in the same order
+    rows = [
+        {'owner_type': owner_type, 'owner_id': owner_id, 'metric': metric, 'value': value}
+        for (owner_type, owner_id, metric), value in sorted(deltas.items())
+    ]
+    connection.execute(statement, rows)
+
+
+def install_counter_maintenance() -> None:
+    """Apply counter changes in the transaction of every flush that moves them"""
+
+    @event.listens_for(Session, 'after_flush')
+    def _maintain_dashboard_counters(session, flush_context):
+        if session.info.get('read_only'):
+            return
+        try:
+            deltas = collect_counter_deltas(session)
+        except Exception as e:
+            # The consistency job repairs counters we could not derive here
+            logger.error(f"Dashboard counter delta collection failed: {e}")
+            return
+        apply_counter_deltas(session.connection(), deltas)
+
+
+# Reading
+
+def _counters_query(owner_type: str, owner_id: int):
+    """Counter rows of one owner plus the global rows"""
+    counters = DashboardCounter.__table__.c
+    return select(counters.owner_type, counters.metric, counters.value).where(or_(
+        and_(counters.owner_type == owner_type, counters.owner_id == owner_id),
+        and_(counters.owner_type == GLOBAL, counters.owner_id == 0)
+    ))
+
+
+async def read_counters(db: AsyncSession, owner_type: str, owner_id: int) -> Optional[Dict[str, int]]:
+    """Materialized counts of an owner, or None until the counters have been built"""
+    rows = (await db.execute(_counters_query(owner_type, owner_id))).all()
+    values = {(row_owner_type, metric): value for row_owner_type, metric, value in rows}
+    if (GLOBAL, REBUILT_AT) not in values:
+        return None
+
+    metrics = CLIENT_METRICS if owner_type == CLIENT else MANUFACTURER_METRICS
+    counts = {metric: values.get((owner_type, metric), 0) for metric in metrics}
+    counts.update({metric: values.get((GLOBAL, metric), 0) for metric in GLOBAL_METRICS})
+    return counts
+
+
+# Single-pass aggregates
+
+def _count_if(condition):
+    return func.count(case((condition, 1)))  # pylint: disable=not-callable
+
+
+def _one_row(*subqueries):
+    """Columns of single-row aggregate subqueries side by side"""
+    from_clause = subqueries[0]
+    for subquery in subqueries[1:]:
+        from_clause = from_clause.join(subquery, true())
+    return select(*subqueries).select_from(from_clause)
+
+
+def client_counts_query(client_id: int):
+    """Client dashboard counts in one round trip, one pass per table"""
+    orders = select(
+        func.count(Order.id).label('orders_total'),  # pylint: disable=not-callable
+        _count_if(Order.status.in_(ACTIVE_ORDER_STATUSES)).label('orders_active'),
+        _count_if(Order.status == OrderStatus.COMPLETED).label('orders_completed'),
+    ).where(Order.client_id == client_id).subquery()
+    quotes = select(
+        func.count(Quote.id).label('quotes_total'),  # pylint: disable=not-callable
+        _count_if(Quote.status.in_(PENDING_QUOTE_STATUSES)).label('quotes_pending'),
+    ).join(Order, Quote.order_id == Order.id).where(Order.client_id == client_id).subquery()
+    return _one_row(orders, quotes)
+
+
+def manufacturer_counts_query(manufacturer_id: int):
+    """Manufacturer dashboard counts in one round trip, one pass per table"""
+    accepted = Quote.status == QuoteStatus.ACCEPTED
+    quotes = select(
+        func.count(Quote.id).label('quotes_total'),  # pylint: disable=not-callable
+        _count_if(accepted).label('quotes_accepted'),
+        _count_if(Quote.status.in_(PENDING_QUOTE_STATUSES)).label('quotes_pending'),
+        _count_if(and_(accepted, Order.status == OrderStatus.IN_PRODUCTION)).label('orders_in_production'),
+    ).outerjoin(Order, Quote.order_id == Order.id).where(Quote.manufacturer_id == manufacturer_id).subquery()
+    available = select(
+        func.count(Order.id).label('orders_available')  # pylint: disable=not-callable
+    ).where(Order.status.in_(AVAILABLE_ORDER_STATUSES)).subquery()
+    return _one_row(quotes, available)
+
+
+def admin_counts_query():
+    """Platform-wide counts in one round trip, one pass per table"""
+    users = select(
+        func.count(User.id).label('users_total'),  # pylint: disable=not-callable
+        _count_if(User.is_active == True).label('users_active'),
+        _count_if(User.role == UserRole.CLIENT).label('clients'),
+        _count_if(User.role == UserRole.MANUFACTURER).label('manufacturers'),
+    ).subquery()
+    orders = select(
+        func.count(Order.id).label('orders_total'),  # pylint: disable=not-callable
+        _count_if(Order.status.in_(ACTIVE_ORDER_STATUSES)).label('orders_active'),
+    ).subquery()
+    quotes = select(func.count(Quote.id).label('quotes_total')).subquery()  # pylint: disable=not-callable
+    return _one_row(users, orders, quotes)
+
+
+# Consistency job
+
+def compute_counters(db: Session) -> Counter:
+    """Every counter recomputed from the source tables"""
+    expected = Counter()
+
+    for client_id, total, active, completed in db.execute(
+        select(
+            Order.client_id,
+            func.count(Order.id),  # pylint: disable=not-callable
+            _count_if(Order.status.in_(ACTIVE_ORDER_STATUSES)),
+            _count_if(Order.status == OrderStatus.COMPLETED),
+        ).group_by(Order.client_id)
+    ):
+        expected[(CLIENT, client_id, 'orders_total')] = total
+        expected[(CLIENT, client_id, 'orders_active')] = active
+        expected[(CLIENT, client_id, 'orders_completed')] = completed
+
+    for client_id, total, pending in db.execute(
+        select(
+            Order.client_id,
+            func.count(Quote.id),  # pylint: disable=not-callable
+            _count_if(Quote.status.in_(PENDING_QUOTE_STATUSES)),
+        ).join(Order, Quote.order_id == Order.id).group_by(Order.client_id)
+    ):
+        expected[(CLIENT, client_id, 'quotes_total')] = total
+        expected[(CLIENT, client_id, 'quotes_pending')] = pending
+
+    accepted = Quote.status == QuoteStatus.ACCEPTED
+    for manufacturer_id, total, accepted_count, pending, in_production in db.execute(
+        select(
+            Quote.manufacturer_id,
+            func.count(Quote.id),  # pylint: disable=not-callable
+            _count_if(accepted),
+            _count_if(Quote.status.in_(PENDING_QUOTE_STATUSES)),
+            _count_if(and_(accepted, Order.status == OrderStatus.IN_PRODUCTION)),
+        ).outerjoin(Order, Quote.order_id == Order.id).group_by(Quote.manufacturer_id)
+    ):
+        expected[(MANUFACTURER, manufacturer_id, 'quotes_total')] = total
+        expected[(MANUFACTURER, manufacturer_id, 'quotes_accepted')] = accepted_count
+        expected[(MANUFACTURER, manufacturer_id, 'quotes_pending')] = pending
+        expected[(MANUFACTURER, manufacturer_id, 'orders_in_production')] = in_production
+
+    expected[(GLOBAL, 0, 'orders_available')] = db.scalar(
+        select(func.count(Order.id)).where(Order.status.in_(AVAILABLE_ORDER_STATUSES))  # pylint: disable=not-callable
+    )
+    return Counter({key: value for key, value in expected.items() if value})
+
+
+def rebuild_counters(db: Session, sample_size: int = 20) -> Dict[str, Any]:
+    """Recompute every counter, correct drift and report it"""
+    expected = compute_counters(db)
+    counters = DashboardCounter.__table__.c
+    actual = {
+        (owner_type, owner_id, metric): value
+        for owner_type, owner_id, metric, value in db.execute(select(
+            counters.owner_type, counters.owner_id, counters.metric, counters.value
+        ))
+        if metric != REBUILT_AT
+    }
+
+    drift = {
+        key: expected.get(key, 0) - actual.get(key, 0)
+        for key in set(expected) | set(actual)
+        if expected.get(key, 0) != actual.get(key, 0)
+    }
+
+    # Corrections are increments so that changes committed while the
+    # counters were being recomputed are not overwritten
+    apply_counter_deltas(db.connection(), drift)
+    apply_counter_deltas(db.connection(), {(GLOBAL, 0, REBUILT_AT): int(time.time())}, increment=False)
+    db.commit()
+
+    report = {
+        'counters': len(expected),
+        'drifted': len(drift),
+        'absolute_drift': sum(abs(value) for value in drift.values()),
+        'samples': [
+            {'owner_type': owner_type, 'owner_id': owner_id, 'metric': metric,
+             'expected': expected.get((owner_type, owner_id, metric), 0),
+             'actual': actual.get((owner_type, owner_id, metric), 0)}
+            for owner_type, owner_id, metric in sorted(drift)[:sample_size]
+        ],
+    }
+    if drift:
+        logger.warning(f"Dashboard counters drifted: {report['drifted']} counters off by {report['absolute_drift']}")
+    return report
+
+
+install_counter_maintenance()
@@ -0,0 +1,116 @@
+"""
+Order and quote exports, shared by the streaming export endpoints and the
+export_dataset background task.
+
+Each dataset is its columns plus a function building the SELECT that a
+principal is allowed to export, so both paths apply the same visibility
+rules.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import Select, literal
+
+from app.core.principal_cache import Principal
+from app.models.order import Order, OrderStatus
+from app.models.producer import Manufacturer
+from app.models.quote import Quote, QuoteStatus
+from app.models.user import UserRole
+from app.services.streaming_export import ExportColumn, export_statement
+
+
+def _requirement(name: str) -> Callable[[Any], Any]:
+    return lambda requirements: (requirements or {}).get(name, '')
+
+
+ORDER_EXPORT_COLUMNS: List[ExportColumn] = [
+    ExportColumn('ID', 'id', Order.id, kind='int'),
+    ExportColumn('Title', 'title', Order.title),
+    ExportColumn('Description', 'description', Order.description),
+    ExportColumn('Technology', 'technology', Order.technical_requirements, _requirement('technology')),
+    ExportColumn('Material', 'material', Order.technical_requirements, _requirement('material')),
+    ExportColumn('Quantity', 'quantity', Order.quantity, kind='int'),
+    ExportColumn('Budget (PLN)', 'budget_pln', Order.budget_fixed_pln, lambda budget: str(budget or 0)),
+    ExportColumn('Status', 'status', Order.status),
+    ExportColumn('Priority', 'priority', Order.priority),
+    ExportColumn('Delivery Deadline', 'delivery_deadline', Order.delivery_deadline, kind='timestamp'),
+    ExportColumn('Created At', 'created_at', Order.created_at, kind='timestamp'),
+]
+
+QUOTE_EXPORT_COLUMNS: List[ExportColumn] = [
+    ExportColumn('Quote ID', 'id', Quote.id, kind='int'),
+    ExportColumn('Order ID', 'order_id', Quote.order_id, kind='int'),
+    ExportColumn('Manufacturer', 'manufacturer', Manufacturer.business_name),
+    ExportColumn('Total Price', 'total_price', Quote.total_price_pln, str),
+    ExportColumn('Currency', 'currency', literal('PLN').label('currency')),
+    ExportColumn('Delivery Time (days)', 'lead_time_days', Quote.lead_time_days, kind='int'),
+    ExportColumn('Status', 'status', Quote.status),
+    ExportColumn('Created At', 'created_at', Quote.created_at, kind='timestamp'),
+    ExportColumn('Accepted At', 'accepted_at', Quote.accepted_at, kind='timestamp'),
+]
+
+
+def orders_export_statement(principal: Principal, status_filter: Optional[OrderStatus] = None) -> Select:
+    statement = export_statement(ORDER_EXPORT_COLUMNS)
+
+    # Filter by user role
+    if principal.role == UserRole.CLIENT:
+        statement = statement.where(Order.client_id == principal.id)
+    elif principal.role == UserRole.MANUFACTURER:
+        # For manufacturers, show orders they can bid on
+        statement = statement.where(Order.status.in_([OrderStatus.ACTIVE, OrderStatus.QUOTED]))
+    # Admin can see all orders
+
+    if status_filter:
+        statement = statement.where(Order.status == status_filter)
+    return statement.order_by(Order.id)
+
+
+def quotes_export_statement(
+    principal: Principal,
+    status_filter: Optional[QuoteStatus] = None,
+    order_id: Optional[int] = None
+) -> Select:
+    statement = export_statement(QUOTE_EXPORT_COLUMNS).select_from(Quote).outerjoin(
+        Manufacturer, Manufacturer.id == Quote.manufacturer_id
+    )
+
+    # Filter by user role
+    if principal.role == UserRole.CLIENT:
+        # Clients can see quotes for their orders
+        statement = statement.join(Order, Order.id == Quote.order_id).where(Order.client_id == principal.id)
+    elif principal.role == UserRole.MANUFACTURER:
+        # Manufacturers can see their own quotes, none without a profile
+        statement = statement.where(Quote.manufacturer_id == principal.manufacturer_id)
+    # Admin can see all quotes
+
+    if status_filter:
+        statement = statement.where(Quote.status == status_filter)
+    if order_id:
+        statement = statement.where(Quote.order_id == order_id)
+    return statement.order_by(Quote.id)
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    name: str
+    columns: Sequence[ExportColumn]
+    statement: Callable[..., Select]
+    # Filter name -> parser of its JSON value
+    filters: Dict[str, Callable[[Any], Any]] = field(default_factory=dict)
+
+    def build(self, principal: Principal, **filters: Any) -> Select:
+        """statement() for filter values given as sent to a background job"""
+        parsed = {name: self.filters[name](value) for name, value in filters.items() if value is not None}
+        return self.statement(principal, **parsed)
+
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    'orders': ExportDataset(
+        'orders', ORDER_EXPORT_COLUMNS, orders_export_statement, {'status_filter': OrderStatus}
+    ),
+    'quotes': ExportDataset(
+        'quotes', QUOTE_EXPORT_COLUMNS, quotes_export_statement, {'status_filter': QuoteStatus, 'order_id': int}
+    ),
+}
@@ -87,6 +87,43 @@ class EmailTracker:
             
             self.redis.setex(key, timedelta(days=30), json.dumps(email_data))
     
+    def track_many(self, emails: List[Dict[str, str]]):
+        """Track many emails in one round trip
+
+        Each email is a dict of email_id, email_type, to_email and subject.
+        """
+        created_at = datetime.now().isoformat()
+        pipeline = self.redis.pipeline(transaction=False)
+        for email in emails:
+            data = {
+                'email_type': email['email_type'],
+                'to_email': email['to_email'],
+                'subject': email['subject'],
+                'status': EmailStatus.PENDING.value,
+                'created_at': created_at
+            }
+            pipeline.setex(f"{self.key_prefix}{email['email_id']}", timedelta(days=30), json.dumps(data))
+        pipeline.execute()
+    
+    def update_many(self, email_ids: List[str], status: EmailStatus, metadata: Dict = None):
+        """Update the status of many emails in two round trips, as update_status() does for one"""
+        if not email_ids:
+            return
+        keys = [f"{self.key_prefix}{email_id}" for email_id in email_ids]
+        updated_at = datetime.now().isoformat()
+        pipeline = self.redis.pipeline(transaction=False)
+        for key, data in zip(keys, self.redis.mget(keys)):
+            if data:
+                email_data = json.loads(data)
+                email_data['status'] = status.value
+                email_data['updated_at'] = updated_at
+                
+                if metadata:
+                    email_data.update(metadata)
+                
+                pipeline.setex(key, timedelta(days=30), json.dumps(email_data))
+        pipeline.execute()
+    
     def get_email_status(self, email_id: str) -> Optional[Dict]:
         """Get email status"""
         key = f"{self.key_prefix}{email_id}"
@@ -123,15 +160,27 @@ class UnsubscribeManager:
     def is_unsubscribed(self, email: str, email_type: str = None) -> bool:
         """Check if email is unsubscribed"""
         key = f"{self.key_prefix}{email.lower()}"
-        data = self.redis.get(key)
-        
+        return self._covers(self.redis.get(key), email_type)
+    
+    def unsubscribed_among(self, emails: List[str], email_type: str = None, batch_size: int = 1000) -> set:
+        """Addresses among emails that are unsubscribed, checked with one MGET per batch_size addresses"""
+        unsubscribed = set()
+        for start in range(0, len(emails), batch_size):
+            batch = emails[start:start + batch_size]
+            values = self.redis.mget([f"{self.key_prefix}{email.lower()}" for email in batch])
+            unsubscribed.update(email for email, data in zip(batch, values) if self._covers(data, email_type))
+        return unsubscribed
+    
+    @staticmethod
+    def _covers(data: Optional[bytes], email_type: Optional[str]) -> bool:
+        """Whether a stored unsubscribe record applies to email_type"""
         if not data:
             return False
         
         unsub_data = json.loads(data)
         email_types = unsub_data.get('email_types', [])
         
-        return 'all' in email_types or (email_type and email_type in email_types)
+        return 'all' in email_types or bool(email_type and email_type in email_types)
 
 
 class EmailService:
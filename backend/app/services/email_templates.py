@@ -1,7 +1,7 @@
 import os
 from typing import Dict, Any, Optional
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape, TemplateNotFound
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape, TemplateNotFound
 from datetime import datetime
 from loguru import logger
 
@@ -60,54 +60,80 @@ class EmailTemplateManager:
             return value.strftime(format)
         return str(value)
     
-    def render_template(self, template_name: str, context: Dict[str, Any], language: str = 'en') -> Dict[str, str]:
-        """Render email template with context"""
+    def common_context(self) -> Dict[str, Any]:
+        """Variables available to every template"""
+        return {
+            'platform_name': 'Manufacturing Platform',
+            'support_email': 'support@manufacturingplatform.com',
+            'company_address': 'Manufacturing Platform, Warsaw, Poland',
+            'unsubscribe_url': f"https://manufacturingplatform.com/unsubscribe",
+            'current_year': datetime.now().year,
+        }
+    
+    def compile_template(self, template_name: str, language: str = 'en') -> 'CompiledEmailTemplate':
+        """Load an email's subject, HTML and text templates once, to render for many recipients"""
         jinja_env = self.jinja_envs.get(language, self.jinja_envs.get('en'))
         if not jinja_env:
             raise ValueError(f"No Jinja environment available")
         
         try:
-            # Add common context variables
-            common_context = {
-                'platform_name': 'Manufacturing Platform',
-                'support_email': 'support@manufacturingplatform.com',
-                'company_address': 'Manufacturing Platform, Warsaw, Poland',
-                'unsubscribe_url': f"https://manufacturingplatform.com/unsubscribe",
-                'current_year': datetime.now().year,
-                **context
-            }
-            
-            # Get subject template
             try:
                 subject_template = jinja_env.get_template(f"{template_name}_subject.txt")
-                subject = subject_template.render(common_context).strip()
             except TemplateNotFound:
-                # Fallback subject
-                subject = f"Manufacturing Platform - {template_name.replace('_', ' ').title()}"
+                subject_template = None
             
-            # Get HTML template
             html_template = jinja_env.get_template(f"{template_name}.html")
-            html_content = html_template.render(common_context)
             
-            # Get text template if available
-            text_content = None
             try:
                 text_template = jinja_env.get_template(f"{template_name}.txt")
-                text_content = text_template.render(common_context)
             except TemplateNotFound:
+                text_template = None
                 logger.debug(f"Text template {template_name}.txt not found for language {language}")
+        
+        except TemplateNotFound as e:
+            logger.error(f"Template not found: {e}")
+            raise
+        
+        return CompiledEmailTemplate(
+            template_name, subject_template, html_template, text_template, self.common_context()
+        )
+    
+    def render_template(self, template_name: str, context: Dict[str, Any], language: str = 'en') -> Dict[str, str]:
+        """Render email template with context"""
+        return self.compile_template(template_name, language).render(context)
+
+
+class CompiledEmailTemplate:
+    """An email's loaded templates, rendered with per-recipient context"""
+    
+    def __init__(self, template_name: str, subject_template: Optional[Template], html_template: Template,
+                 text_template: Optional[Template], common_context: Dict[str, Any]):
+        self.template_name = template_name
+        self.subject_template = subject_template
+        self.html_template = html_template
+        self.text_template = text_template
+        self.common_context = common_context
+        # Fallback subject
+        self.default_subject = f"Manufacturing Platform - {template_name.replace('_', ' ').title()}"
+    
+    def render(self, context: Dict[str, Any]) -> Dict[str, str]:
+        """Render subject, HTML and text content; context overrides the common variables"""
+        try:
+            full_context = {**self.common_context, **context}
+            
+            if self.subject_template:
+                subject = self.subject_template.render(full_context).strip()
+            else:
+                subject = self.default_subject
             
             return {
                 'subject': subject,
-                'html_content': html_content,
-                'text_content': text_content
+                'html_content': self.html_template.render(full_context),
+                'text_content': self.text_template.render(full_context) if self.text_template else None
             }
         
-        except TemplateNotFound as e:
-            logger.error(f"Template not found: {e}")
-            raise
         except Exception as e:
-            logger.error(f"Error rendering template {template_name}: {e}")
+            logger.error(f"Error rendering template {self.template_name}: {e}")
             raise
 
 
@@ -21,6 +21,7 @@ from app.models.order import Order
 from app.models.quote import Quote
 from app.models.user import User
 from app.core.config import settings
+from app.services.matching_result_cache import matching_result_cache, order_fingerprint, register_result_types
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +102,9 @@ class CuratedMatch:
     risk_assessment: Dict[str, Any]
 
 
+register_result_types(ComplexityLevel, ExplanationLevel, EnhancedMatchScore, MatchExplanation, CuratedMatch)
+
+
 class EnhancedSmartMatchingEngine:
     """
     Enhanced Smart Matching Engine - Phase 1 Implementation
@@ -146,6 +150,11 @@ class EnhancedSmartMatchingEngine:
             'personalization': 0.10,
             'market_context': 0.05
         }
+        
+        # Shared result cache, invalidated when the manufacturer catalog changes
+        self.result_cache = matching_result_cache
+        self.use_result_cache = True
+        self.result_cache_ttl_seconds = 900
     
     def get_curated_matches(
         self,
@@ -160,6 +169,18 @@ class EnhancedSmartMatchingEngine:
         Enhanced with Phase 2 feedback learning integration
         """
         try:
+            fingerprint = None
+            if self.use_result_cache:
+                fingerprint = order_fingerprint(
+                    order,
+                    customer_profile=customer_profile,
+                    explanation_level=explanation_level,
+                    use_learned_weights=use_learned_weights
+                )
+                cached = self.result_cache.get('enhanced', fingerprint)
+                if cached is not None:
+                    return list(cached)
+            
             logger.info(f"Generating curated matches for order {order.id}")
             start_time = datetime.now()
             
@@ -186,14 +207,20 @@ class EnhancedSmartMatchingEngine:
             num_options = self._determine_option_count(complexity_analysis)
             logger.info(f"Presenting {num_options} options based on complexity")
             
-            # Step 4: Get base recommendations (fallback if base engine not available)
+            # Step 4: Get base recommendations (fallback if base engine not available).
+            # Only the top num_options are curated, and of their details only
+            # the timeline, costs, risks and, for expert explanations, past
+            # projects are presented
             if self.base_engine:
+                details = ['estimated_delivery_time', 'estimated_cost_range', 'risk_assessment']
+                if explanation_level == ExplanationLevel.EXPERT:
+                    details.append('similar_past_projects')
                 base_recommendations = self.base_engine.get_smart_recommendations(
-                    db, order, max_recommendations=num_options * 3
+                    db, order, max_recommendations=num_options, details=details
                 )
             else:
                 # Fallback implementation
-                base_recommendations = self._get_fallback_recommendations(db, order, num_options * 3)
+                base_recommendations = self._get_fallback_recommendations(db, order, num_options)
             
             if not base_recommendations:
                 logger.warning(f"No base recommendations found for order {order.id}")
@@ -219,6 +246,9 @@ class EnhancedSmartMatchingEngine:
             processing_time = (datetime.now() - start_time).total_seconds()
             logger.info(f"Curated matching completed: {len(enhanced_matches)} matches in {processing_time:.2f}s")
             
+            if fingerprint is not None:
+                self.result_cache.set('enhanced', fingerprint, enhanced_matches, self.result_cache_ttl_seconds)
+            
             return enhanced_matches
             
         except Exception as e:
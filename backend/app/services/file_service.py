@@ -1,9 +1,13 @@
+import hashlib
 import os
+import shutil
 import uuid
 import aiofiles
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Union
 from fastapi import UploadFile, HTTPException
+from fastapi.responses import FileResponse
 import mimetypes
 import logging
 
@@ -11,6 +15,142 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Bytes of an upload inspected for its MIME type
+SNIFF_BYTES = 512
+
+# Leading bytes -> MIME type
+FILE_SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (b'AC10', 'image/vnd.dwg'),
+    (b'ISO-10303-21', 'model/step'),
+)
+
+# Formats that are a ZIP or OLE container underneath (docx, xlsx, doc, ...);
+# the extension tells which one
+CONTAINER_TYPES = {'application/zip', 'application/x-ole-storage'}
+
+
+def detect_mime_type(head: bytes, filename: Optional[str]) -> str:
+    """MIME type from the first bytes of a file, refined by its extension"""
+    guessed, _ = mimetypes.guess_type(filename or '')
+    sniffed = next((mime for signature, mime in FILE_SIGNATURES if head.startswith(signature)), None)
+    if sniffed and not (sniffed in CONTAINER_TYPES and guessed):
+        return sniffed
+    if guessed:
+        return guessed
+    try:
+        head.decode('utf-8')
+        return 'text/plain'
+    except UnicodeDecodeError:
+        # May also be a multi-byte character cut at the end of the head
+        return 'application/octet-stream'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single 'bytes=' range; None to serve the whole
+    file instead, ValueError when the range lies outside the file
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        # Not a single byte range; multiple ranges are answered with the whole file
+        return None
+    first, dash, last = (part.strip() for part in spec.partition('-'))
+    if not dash or not (first or last) or not (first.isdigit() or not first) or not (last.isdigit() or not last):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class RangeFileResponse(FileResponse):
+    """
+    FileResponse that answers single-range requests with 206 Partial
+    Content, and hands the file to the server with the ASGI zero-copy send
+    extension (sendfile) when the server offers it
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Union[str, Path], **kwargs: Any):
+        kwargs.setdefault('stat_result', os.stat(path))
+        super().__init__(path, **kwargs)
+        self.headers['accept-ranges'] = 'bytes'
+
+    def _requested_range(self, scope: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope.get('headers', [])}
+        if 'range' not in headers or scope.get('method', 'GET') not in ('GET', 'HEAD'):
+            return None
+        if_range = headers.get('if-range')
+        if if_range and if_range != self.headers.get('etag'):
+            # If-Range with a date or an old ETag: the file may have changed
+            try:
+                if parsedate_to_datetime(if_range).timestamp() < int(self.stat_result.st_mtime):
+                    return None
+            except (TypeError, ValueError):
+                return None
+        return parse_range(headers['range'], self.stat_result.st_size)
+
+    async def __call__(self, scope, receive, send) -> None:
+        size = self.stat_result.st_size
+        try:
+            byte_range = self._requested_range(scope)
+        except ValueError:
+            await send({
+                'type': 'http.response.start',
+                'status': 416,
+                'headers': [(b'content-range', f'bytes */{size}'.encode()), (b'content-length', b'0')],
+            })
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        start, end = byte_range or (0, size - 1)
+        count = end - start + 1
+        status_code = self.status_code
+        if byte_range is not None:
+            status_code = 206
+            self.headers['content-range'] = f'bytes {start}-{end}/{size}'
+            self.headers['content-length'] = str(count)
+
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': self.raw_headers})
+        if scope.get('method') == 'HEAD' or count <= 0:
+            await send({'type': 'http.response.body', 'body': b''})
+        elif 'http.response.zerocopysend' in scope.get('extensions', {}):
+            with open(self.path, 'rb') as file:
+                await send({'type': 'http.response.zerocopysend', 'file': file, 'offset': start, 'count': count})
+        else:
+            async with aiofiles.open(self.path, 'rb') as file:
+                await file.seek(start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+                if remaining > 0:
+                    # File shrank while being sent; end the body anyway
+                    await send({'type': 'http.response.body', 'body': b''})
+        if self.background is not None:
+            await self.background()
+
 
 class FileService:
     def __init__(self):
@@ -23,119 +163,161 @@ class FileService:
             'dwg', 'dxf', 'step', 'stp', 'iges', 'igs', 'stl'
         }
         self.max_file_size = 50 * 1024 * 1024  # 50MB
+        self.chunk_size = 1024 * 1024
 
-    async def save_quote_attachment(
-        self,
-        file: UploadFile,
-        quote_id: int,
-        user_id: int
-    ) -> Dict[str, Any]:
-        """Save a quote attachment file"""
-        
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No filename provided")
-        
-        file_extension = Path(file.filename).suffix.lower().lstrip('.')
-        if file_extension not in self.allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type '{file_extension}' not allowed. Allowed types: {', '.join(self.allowed_extensions)}"
-            )
+    # Content-addressed storage
+    #
+    # Every upload is streamed into temp/, hashed on the way, and renamed to
+    # blobs/<sha256[:2]>/<sha256> unless an identical file is stored already.
+    # The paths handed out per quote, order or document are hard links to
+    # that blob, so identical files take disk space once. The stored path is
+    # linked before a new blob is published, so prune_blobs never sees a
+    # blob of an upload in progress without a second link.
 
-        # Read file content to check size
-        content = await file.read()
-        if len(content) > self.max_file_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {self.max_file_size / (1024*1024):.1f}MB"
-            )
+    def blob_path(self, sha256: str) -> Path:
+        return self.upload_base_path / "blobs" / sha256[:2] / sha256
 
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
-        
-        # Create directory structure
-        quote_dir = self.upload_base_path / "quotes" / str(quote_id)
-        quote_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = quote_dir / unique_filename
-        
-        # Save file
+    async def store_upload(self, file: UploadFile, file_path: Path) -> Dict[str, Any]:
+        """
+        Stream an upload into the blob store in chunk_size pieces, enforcing
+        max_file_size as it arrives, and link file_path to the blob. Returns
+        the blob path, size, SHA-256 and the MIME type detected from the
+        first chunk.
+        """
+        temp_dir = self.upload_base_path / "temp"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = temp_dir / f"{uuid.uuid4().hex}.part"
+
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
         try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
+            async with aiofiles.open(temp_path, 'wb') as f:
+                while chunk := await file.read(self.chunk_size):
+                    size += len(chunk)
+                    if size > self.max_file_size:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File too large. Maximum size: {self.max_file_size / (1024*1024):.1f}MB"
+                        )
+                    if len(head) < SNIFF_BYTES:
+                        head += chunk[:SNIFF_BYTES - len(head)]
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            sha256 = digest.hexdigest()
+            blob = self.blob_path(sha256)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            if self._link_blob(blob, file_path):
+                temp_path.unlink()
+            else:
+                # New content, or the blob was pruned meanwhile: link the
+                # stored path first, then publish the blob atomically
+                self._link_blob(temp_path, file_path)
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, blob)
+        except HTTPException:
+            temp_path.unlink(missing_ok=True)
+            raise
         except Exception as e:
-            logger.error(f"Failed to save file {file.filename}: {e}")
+            temp_path.unlink(missing_ok=True)
+            file_path.unlink(missing_ok=True)
+            logger.error(f"Failed to store upload {file.filename}: {e}")
             raise HTTPException(status_code=500, detail="Failed to save file")
 
-        # Get mime type
-        mime_type, _ = mimetypes.guess_type(file.filename)
-        
         return {
-            "name": unique_filename,
-            "original_name": file.filename,
-            "path": str(file_path),
-            "size": len(content),
-            "type": file_extension,
-            "mime_type": mime_type,
-            "url": f"/api/v1/quotes/{quote_id}/attachments/download/{unique_filename}"
+            "blob_path": blob,
+            "size": size,
+            "sha256": sha256,
+            "mime_type": detect_mime_type(head, file.filename),
         }
 
-    async def save_order_attachment(
+    def _link_blob(self, source: Path, file_path: Path) -> bool:
+        """Hard link file_path to source; False if source does not exist"""
+        try:
+            try:
+                os.link(source, file_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # No hard links on this filesystem: store a copy
+                shutil.copyfile(source, file_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    async def save_attachment(
         self,
         file: UploadFile,
-        order_id: int,
-        user_id: int
+        resource_type: str,
+        resource_id: Union[int, str],
+        url: str
     ) -> Dict[str, Any]:
-        """Save an order attachment file"""
-        
-        # Similar validation as quote attachments
+        """
+        Validate and store an upload under <resource_type>/<resource_id>.
+        url may refer to {name}, the stored file name.
+        """
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
-        
+
         file_extension = Path(file.filename).suffix.lower().lstrip('.')
         if file_extension not in self.allowed_extensions:
             raise HTTPException(
                 status_code=400,
-                detail=f"File type '{file_extension}' not allowed"
-            )
-
-        content = await file.read()
-        if len(content) > self.max_file_size:
-            raise HTTPException(
-                status_code=400,
-                detail="File too large"
+                detail=f"File type '{file_extension}' not allowed. Allowed types: {', '.join(sorted(self.allowed_extensions))}"
             )
 
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
-        
-        # Create directory structure
-        order_dir = self.upload_base_path / "orders" / str(order_id)
-        order_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = order_dir / unique_filename
-        
-        # Save file
-        try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
-        except Exception as e:
-            logger.error(f"Failed to save order file {file.filename}: {e}")
-            raise HTTPException(status_code=500, detail="Failed to save file")
+        # Generate unique filename, without any directory part of the client's name
+        original_name = Path(file.filename).name
+        unique_filename = f"{uuid.uuid4().hex}_{original_name}"
+        file_path = self.upload_base_path / resource_type / str(resource_id) / unique_filename
+        stored = await self.store_upload(file, file_path)
 
-        mime_type, _ = mimetypes.guess_type(file.filename)
-        
         return {
             "name": unique_filename,
             "original_name": file.filename,
             "path": str(file_path),
-            "size": len(content),
+            "size": stored["size"],
             "type": file_extension,
-            "mime_type": mime_type,
-            "url": f"/api/v1/orders/{order_id}/attachments/download/{unique_filename}"
+            "mime_type": stored["mime_type"],
+            "sha256": stored["sha256"],
+            "url": url.format(name=unique_filename)
         }
 
+    async def save_quote_attachment(
+        self,
+        file: UploadFile,
+        quote_id: int,
+        user_id: int
+    ) -> Dict[str, Any]:
+        """Save a quote attachment file"""
+        return await self.save_attachment(
+            file, "quotes", quote_id, f"/api/v1/quotes/{quote_id}/attachments/download/{{name}}"
+        )
+
+    async def save_order_attachment(
+        self,
+        file: UploadFile,
+        order_id: int,
+        user_id: int
+    ) -> Dict[str, Any]:
+        """Save an order attachment file"""
+        return await self.save_attachment(
+            file, "orders", order_id, f"/api/v1/orders/{order_id}/attachments/download/{{name}}"
+        )
+
+    def file_response(
+        self,
+        file_path: str,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None
+    ) -> RangeFileResponse:
+        """Download response for a stored file, with Range support"""
+        path = Path(file_path)
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail="File not found")
+        return RangeFileResponse(path, filename=filename or path.name, media_type=media_type)
+
     def delete_file(self, file_path: str) -> bool:
         """Delete a file from storage"""
         try:
@@ -220,6 +402,25 @@ class FileService:
                     logger.error(f"Failed to delete temp file {file_path}: {e}")
         
         logger.info(f"Cleaned up {deleted_count} temporary files")
+        self.prune_blobs()
+
+    def prune_blobs(self) -> int:
+        """Delete blobs no stored file links to any more"""
+        blob_dir = self.upload_base_path / "blobs"
+        if not blob_dir.exists():
+            return 0
+
+        pruned = 0
+        for blob in blob_dir.glob("*/*"):
+            try:
+                if blob.is_file() and blob.stat().st_nlink <= 1:
+                    blob.unlink()
+                    pruned += 1
+            except Exception as e:
+                logger.error(f"Failed to prune blob {blob}: {e}")
+
+        logger.info(f"Pruned {pruned} unreferenced blobs")
+        return pruned
 
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage usage statistics"""
@@ -229,12 +430,17 @@ class FileService:
             "by_type": {}
         }
         
+        # Hard links to one blob take its space once
+        seen_inodes = set()
         try:
             for file_path in self.upload_base_path.rglob("*"):
-                if file_path.is_file():
+                if file_path.is_file() and file_path.parent.parent.name != "blobs":
                     stats["total_files"] += 1
-                    size = file_path.stat().st_size
-                    stats["total_size"] += size
+                    stat = file_path.stat()
+                    size = stat.st_size
+                    if (stat.st_dev, stat.st_ino) not in seen_inodes:
+                        seen_inodes.add((stat.st_dev, stat.st_ino))
+                        stats["total_size"] += size
                     
                     # Track by parent directory type
                     parent = file_path.parent.name
@@ -0,0 +1,263 @@
+"""
+Full-text search over messages, quotes and production quotes.
+
+Message, quote and production quote search used ILIKE '%text%', which no
+index can answer: every search read every row. Each searchable table now
+has a full-text index kept current by the database itself:
+
+    SQLite      an external-content FTS5 table <table>_fts, updated by
+                AFTER INSERT / UPDATE OF / DELETE triggers
+    PostgreSQL  a generated tsvector column search_vector with a GIN index
+
+Both are created when the table is (metadata.create_all, table.create)
+and by the full_text_search migration. Other databases fall back to
+ILIKE per term.
+
+SearchIndex.matches() turns search text into a subquery of (id, score):
+every term must occur, each as a word prefix unless prefix=False, and a
+higher score ranks better. Both backends use the 'simple' case folding
+without stemming or accent removal, so that highlight() marks exactly the
+words a row matched on. rebuild_search_indexes() (scripts/
+rebuild_search_index.py) recreates missing indexes and rebuilds them.
+"""
+
+import html
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, column, event, func, literal, literal_column, or_, select, table, text
+
+from app.models.message import Message
+from app.models.quote import ProductionQuote, Quote
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of the PostgreSQL labels, as ts_rank's defaults; also the
+# FTS5 bm25() column weights
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+MAX_TERMS = 16
+MAX_TERM_LENGTH = 64
+
+# Words as the FTS5 unicode61 tokenizer sees them: letters and digits
+_WORD = re.compile(r'[^\W_]+')
+
+
+def search_terms(search_text: Optional[str]) -> List[str]:
+    """Distinct casefolded words of the search text, in order"""
+    terms: List[str] = []
+    for word in _WORD.findall((search_text or '').casefold()):
+        word = word[:MAX_TERM_LENGTH]
+        if word not in terms:
+            terms.append(word)
+    return terms[:MAX_TERMS]
+
+
+def _dialect_name(bind: Any) -> str:
+    """Dialect of a Session, AsyncSession, Connection or Engine"""
+    if hasattr(bind, 'get_bind'):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+class SearchIndex:
+    """Full-text index over text columns of one table"""
+
+    def __init__(self, model: type, columns: Sequence[Tuple[str, str]]):
+        """
+        Args:
+            model: Mapped class with an integer id primary key
+            columns: (column name, weight label 'A'..'D'), most important first
+        """
+        self.model = model
+        self.table = model.__table__
+        self.columns = tuple(columns)
+        self.name = self.table.name
+        self.fts_table = f"{self.name}_fts"
+        self.gin_index = f"idx_{self.name}_search_vector"
+
+    # Schema
+
+    def _tsvector(self) -> str:
+        return " || ".join(
+            f"setweight(to_tsvector('simple', coalesce({name}, '')), '{weight}')"
+            for name, weight in self.columns
+        )
+
+    def create_statements(self, dialect_name: str) -> List[str]:
+        """DDL that creates the index and what keeps it current; idempotent"""
+        names = [name for name, _ in self.columns]
+        if dialect_name == 'sqlite':
+            column_list = ", ".join(names)
+            new_values = ", ".join(f"new.{name}" for name in names)
+            old_values = ", ".join(f"old.{name}" for name in names)
+            delete_old = (
+                f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {column_list}) "
+                f"VALUES ('delete', old.id, {old_values});"
+            )
+            insert_new = f"INSERT INTO {self.fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});"
+            return [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                f"{column_list}, content='{self.name}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 0')",
+                f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ai AFTER INSERT ON {self.name} BEGIN "
+                f"{insert_new} END",
+                f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ad AFTER DELETE ON {self.name} BEGIN "
+                f"{delete_old} END",
+                f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_au AFTER UPDATE OF {column_list} ON {self.name} "
+                f"BEGIN {delete_old} {insert_new} END",
+            ]
+        if dialect_name == 'postgresql':
+            return [
+                f"ALTER TABLE {self.name} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({self._tsvector()}) STORED",
+                f"CREATE INDEX IF NOT EXISTS {self.gin_index} ON {self.name} USING gin (search_vector)",
+            ]
+        return []
+
+    def drop_statements(self, dialect_name: str) -> List[str]:
+        if dialect_name == 'sqlite':
+            # The triggers go with the content table
+            return [f"DROP TABLE IF EXISTS {self.fts_table}"]
+        return []
+
+    def rebuild_statements(self, dialect_name: str) -> List[str]:
+        if dialect_name == 'sqlite':
+            return [f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"]
+        if dialect_name == 'postgresql':
+            # The generated column cannot drift; only the GIN index can bloat
+            return [f"REINDEX INDEX {self.gin_index}"]
+        return []
+
+    def install(self, connection: Any) -> None:
+        for statement in self.create_statements(connection.dialect.name):
+            connection.execute(text(statement))
+
+    def rebuild(self, connection: Any) -> None:
+        """Create the index if missing and rebuild it from the table"""
+        self.install(connection)
+        for statement in self.rebuild_statements(connection.dialect.name):
+            connection.execute(text(statement))
+
+    # Querying
+
+    def matches(self, db: Any, search_text: Optional[str], prefix: bool = True) -> Optional[Any]:
+        """
+        Subquery of (id, score) of the rows containing every term of
+        search_text, best first by score. None when it has no terms.
+        """
+        terms = search_terms(search_text)
+        if not terms:
+            return None
+        dialect_name = _dialect_name(db)
+
+        if dialect_name == 'sqlite':
+            # Quoted terms cannot be read as FTS5 operators or column filters
+            match = " ".join(f'"{term}"' + ("*" if prefix else "") for term in terms)
+            fts = table(self.fts_table, column('rowid'))
+            fts_name = literal_column(self.fts_table)
+            weights = [WEIGHTS[weight] for _, weight in self.columns]
+            statement = select(
+                fts.c.rowid.label('id'),
+                # bm25() is lower for better matches
+                (-func.bm25(fts_name, *weights)).label('score')
+            ).where(fts_name.op('MATCH')(match))
+
+        elif dialect_name == 'postgresql':
+            query = func.to_tsquery('simple', " & ".join(term + (":*" if prefix else "") for term in terms))
+            vector = literal_column(f"{self.name}.search_vector")
+            statement = select(
+                self.table.c.id.label('id'), func.ts_rank(vector, query).label('score')
+            ).where(vector.op('@@')(query))
+
+        else:
+            targets = [self.table.c[name] for name, _ in self.columns]
+            statement = select(self.table.c.id.label('id'), literal(0.0).label('score')).where(and_(*(
+                or_(*(target.ilike(f"%{term}%") for target in targets)) for term in terms
+            )))
+
+        return statement.subquery(f"{self.name}_matches")
+
+
+def highlight(
+    content: Optional[str],
+    search_text: Optional[str],
+    prefix: bool = True,
+    max_length: int = 200,
+    start: str = '<mark>',
+    end: str = '</mark>'
+) -> str:
+    """
+    HTML-escaped excerpt of content around its first matching word, with
+    the words matching a search term wrapped in start/end
+    """
+    content = content or ''
+    terms = search_terms(search_text)
+    if not terms:
+        return html.escape(content[:max_length])
+    words = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    pattern = re.compile(
+        rf"(?<![^\W_])(?:{words})" + (r"[^\W_]*" if prefix else r"(?![^\W_])"), re.IGNORECASE
+    )
+
+    first = pattern.search(content)
+    excerpt_start = 0
+    if first is not None and first.start() > max_length // 3:
+        excerpt_start = first.start() - max_length // 4
+        # Start on a word boundary
+        space = content.find(' ', excerpt_start, first.start())
+        excerpt_start = space + 1 if space >= 0 else excerpt_start
+    excerpt_end = min(len(content), excerpt_start + max_length)
+    excerpt = content[excerpt_start:excerpt_end]
+
+    parts, position = [], 0
+    for found in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[position:found.start()]))
+        parts.append(start + html.escape(found.group()) + end)
+        position = found.end()
+    parts.append(html.escape(excerpt[position:]))
+    return (
+        ("…" if excerpt_start > 0 else "")
+        + "".join(parts)
+        + ("…" if excerpt_end < len(content) else "")
+    )
+
+
+MESSAGE_SEARCH = SearchIndex(Message, [('content', 'A')])
+QUOTE_SEARCH = SearchIndex(Quote, [('client_message', 'A')])
+PRODUCTION_QUOTE_SEARCH = SearchIndex(ProductionQuote, [('title', 'A'), ('description', 'B')])
+
+SEARCH_INDEXES: Dict[str, SearchIndex] = {
+    index.name: index for index in (MESSAGE_SEARCH, QUOTE_SEARCH, PRODUCTION_QUOTE_SEARCH)
+}
+
+
+def rebuild_search_indexes(connection: Any, names: Optional[Iterable[str]] = None) -> List[str]:
+    """Create missing indexes and rebuild the given ones (all by default)"""
+    names = list(names) if names else list(SEARCH_INDEXES)
+    unknown = [name for name in names if name not in SEARCH_INDEXES]
+    if unknown:
+        raise ValueError(f"Unknown search indexes: {', '.join(unknown)}")
+    for name in names:
+        SEARCH_INDEXES[name].rebuild(connection)
+        logger.info(f"Search index rebuilt: {name}")
+    return names
+
+
+def install_search_indexes() -> None:
+    """Create each index with its table, and drop it before the table"""
+    for index in SEARCH_INDEXES.values():
+
+        def after_create(target, connection, index=index, **kw):
+            index.install(connection)
+
+        def before_drop(target, connection, index=index, **kw):
+            for statement in index.drop_statements(connection.dialect.name):
+                connection.execute(text(statement))
+
+        event.listen(index.table, 'after_create', after_create)
+        event.listen(index.table, 'before_drop', before_drop)
+
+
+install_search_indexes()
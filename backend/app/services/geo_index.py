@@ -0,0 +1,226 @@
+"""
+Geospatial lookups shared by the matching engines.
+
+- haversine_km(): great-circle distance, for one pair of points or a whole
+  candidate set at once (NumPy arrays, NaN where coordinates are missing)
+- proximity_score(): the one distance -> score curve every engine scales
+  into its own range
+- GeoIndex: BallTree (haversine metric) over the manufacturers with
+  coordinates, answering radius and k-nearest queries; the manufacturer
+  catalog builds one per snapshot on first use
+- order_location(): where an order is delivered, as far as it is known
+
+Orders carry no coordinates. An order's preferred city is located at the
+centre of the catalog's manufacturers in that city; failing that, its
+preferred country is located at the capital.
+
+Radius filters only drop manufacturers known to be farther than the
+radius; manufacturers without coordinates are kept and scored neutrally.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from app.services.capability_tags import normalize_tag
+
+EARTH_RADIUS_KM = 6371.0
+
+# Full proximity within this distance unless an engine configures its own
+LOCAL_RADIUS_KM = 50
+
+# (distance km, proximity) beyond the local radius; interpolated in
+# between and flat past the last point
+PROXIMITY_CURVE = ((200, 0.8), (500, 0.6), (1000, 0.4), (2000, 0.2), (5000, 0.1))
+
+# ISO code -> (name, latitude, longitude) of the capital
+COUNTRY_LOCATIONS = {
+    'PL': ("Poland", 52.2297, 21.0122),
+    'DE': ("Germany", 52.5200, 13.4050),
+    'CZ': ("Czech Republic", 50.0755, 14.4378),
+    'SK': ("Slovakia", 48.1486, 17.1077),
+    'AT': ("Austria", 48.2082, 16.3738),
+    'HU': ("Hungary", 47.4979, 19.0402),
+    'LT': ("Lithuania", 54.6872, 25.2797),
+    'FR': ("France", 48.8566, 2.3522),
+    'NL': ("Netherlands", 52.3676, 4.9041),
+    'BE': ("Belgium", 50.8503, 4.3517),
+    'LU': ("Luxembourg", 49.6116, 6.1319),
+    'CH': ("Switzerland", 46.9480, 7.4474),
+    'GB': ("United Kingdom", 51.5074, -0.1278),
+    'IE': ("Ireland", 53.3498, -6.2603),
+    'SE': ("Sweden", 59.3293, 18.0686),
+    'NO': ("Norway", 59.9139, 10.7522),
+    'DK': ("Denmark", 55.6761, 12.5683),
+    'FI': ("Finland", 60.1699, 24.9384),
+    'IT': ("Italy", 41.9028, 12.4964),
+    'ES': ("Spain", 40.4168, -3.7038),
+    'PT': ("Portugal", 38.7223, -9.1393),
+    'GR': ("Greece", 37.9838, 23.7275),
+    'RO': ("Romania", 44.4268, 26.1025),
+    'BG': ("Bulgaria", 42.6977, 23.3219),
+    'HR': ("Croatia", 45.8150, 15.9819),
+    'SI': ("Slovenia", 46.0569, 14.5058),
+    'UA': ("Ukraine", 50.4501, 30.5234),
+    'TR': ("Turkey", 39.9334, 32.8597),
+    'US': ("United States", 38.9072, -77.0369),
+    'CA': ("Canada", 45.4215, -75.6972),
+    'MX': ("Mexico", 19.4326, -99.1332),
+    'CN': ("China", 39.9042, 116.4074),
+    'JP': ("Japan", 35.6762, 139.6503),
+    'KR': ("South Korea", 37.5665, 126.9780),
+    'IN': ("India", 28.6139, 77.2090),
+    'TH': ("Thailand", 13.7563, 100.5018),
+    'VN': ("Vietnam", 21.0278, 105.8342),
+}
+
+_COUNTRY_CODES = {normalize_tag(name): code for code, (name, _, _) in COUNTRY_LOCATIONS.items()}
+
+Location = Tuple[float, float]
+
+
+def haversine_km(latitude1: Any, longitude1: Any, latitude2: Any, longitude2: Any) -> Any:
+    """Great-circle distance in km; any argument may be an array"""
+    latitude1, longitude1, latitude2, longitude2 = (
+        np.radians(np.asarray(value, dtype=float)) for value in (latitude1, longitude1, latitude2, longitude2)
+    )
+    a = (
+        np.sin((latitude2 - latitude1) / 2) ** 2 +
+        np.cos(latitude1) * np.cos(latitude2) * np.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def proximity_score(distance_km: Any, local_radius_km: float = LOCAL_RADIUS_KM) -> Any:
+    """1.0 within the local radius, falling to 0.1 at 5000 km; NaN stays NaN"""
+    curve = [(distance, score) for distance, score in PROXIMITY_CURVE if distance > local_radius_km]
+    return np.interp(
+        distance_km,
+        [local_radius_km] + [distance for distance, _ in curve],
+        [1.0] + [score for _, score in curve]
+    )
+
+
+def coordinates(manufacturers: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitude and longitude columns; NaN where a manufacturer has none"""
+    latitudes = np.full(len(manufacturers), np.nan)
+    longitudes = np.full(len(manufacturers), np.nan)
+    for index, manufacturer in enumerate(manufacturers):
+        location = manufacturer_location(manufacturer)
+        if location is not None:
+            latitudes[index], longitudes[index] = location
+    return latitudes, longitudes
+
+
+def manufacturer_location(manufacturer: Any) -> Optional[Location]:
+    latitude = getattr(manufacturer, 'latitude', None)
+    longitude = getattr(manufacturer, 'longitude', None)
+    if latitude is None or longitude is None:
+        return None
+    return float(latitude), float(longitude)
+
+
+def country_code(country: Any) -> Optional[str]:
+    """ISO code of a country given by ISO code or English name"""
+    if not isinstance(country, str):
+        return None
+    code = country.strip().upper()
+    if code in COUNTRY_LOCATIONS:
+        return code
+    return _COUNTRY_CODES.get(normalize_tag(country))
+
+
+def country_location(country: Any) -> Optional[Location]:
+    """Capital of a country given by ISO code or English name"""
+    code = country_code(country)
+    if code is None:
+        return None
+    _, latitude, longitude = COUNTRY_LOCATIONS[code]
+    return latitude, longitude
+
+
+def order_location(order: Any, geo: Optional['GeoIndex'] = None) -> Optional[Location]:
+    """Preferred city of an order, located among the indexed manufacturers, else its preferred country"""
+    country = getattr(order, 'preferred_country', None)
+    city = getattr(order, 'preferred_city', None)
+    if geo is not None and isinstance(city, str) and city.strip():
+        location = geo.city_location(city, country_code(country))
+        if location is not None:
+            return location
+    return country_location(country)
+
+
+class GeoIndex:
+    """Immutable BallTree over the manufacturers with coordinates"""
+
+    def __init__(self, manufacturers: Iterable[Any]):
+        located = []
+        for manufacturer in manufacturers:
+            if manufacturer_location(manufacturer) is not None:
+                located.append(manufacturer)
+        self.manufacturers = located
+        self.latitudes, self.longitudes = coordinates(located)
+        self._ids = {manufacturer.id for manufacturer in located}
+        self._tree = (
+            BallTree(np.radians(np.column_stack((self.latitudes, self.longitudes))), metric='haversine')
+            if located else None
+        )
+
+        # City centres, by (country, city) and by city alone
+        totals: Dict[Tuple[Optional[str], str], List[float]] = {}
+        for manufacturer, latitude, longitude in zip(located, self.latitudes, self.longitudes):
+            if not manufacturer.city:
+                continue
+            city = normalize_tag(manufacturer.city)
+            for key in ((manufacturer.country, city), (None, city)):
+                total = totals.setdefault(key, [0.0, 0.0, 0])
+                total[0] += latitude
+                total[1] += longitude
+                total[2] += 1
+        self._cities = {key: (latitude / count, longitude / count) for key, (latitude, longitude, count) in totals.items()}
+
+    def __len__(self) -> int:
+        return len(self.manufacturers)
+
+    def __contains__(self, manufacturer_id: int) -> bool:
+        return manufacturer_id in self._ids
+
+    def city_location(self, city: str, country: Optional[str] = None) -> Optional[Location]:
+        """Centre of the indexed manufacturers in a city"""
+        return self._cities.get((country, normalize_tag(city)))
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> Dict[int, float]:
+        """Manufacturer id -> distance in km, for those within the radius"""
+        if self._tree is None:
+            return {}
+        indices, distances = self._tree.query_radius(
+            np.radians([[latitude, longitude]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True
+        )
+        return {
+            self.manufacturers[index].id: float(distance) * EARTH_RADIUS_KM
+            for index, distance in zip(indices[0], distances[0])
+        }
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> List[Tuple[Any, float]]:
+        """The k nearest manufacturers and their distances in km, nearest first"""
+        if self._tree is None or k <= 0:
+            return []
+        distances, indices = self._tree.query(np.radians([[latitude, longitude]]), k=min(k, len(self)))
+        return [
+            (self.manufacturers[index], float(distance) * EARTH_RADIUS_KM)
+            for index, distance in zip(indices[0], distances[0])
+        ]
+
+
+def within_radius(
+    manufacturers: List[Any],
+    geo: GeoIndex,
+    location: Location,
+    radius_km: float
+) -> List[Any]:
+    """Manufacturers not known to be farther than radius_km from location"""
+    if not radius_km:
+        return manufacturers
+    nearby = geo.within(location[0], location[1], radius_km)
+    return [manufacturer for manufacturer in manufacturers if manufacturer.id in nearby or manufacturer.id not in geo]
@@ -2,8 +2,9 @@ import os
 import math
 import logging
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime, timedelta
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, text
 from fuzzywuzzy import fuzz, process
@@ -13,6 +14,9 @@ from enum import Enum
 from app.models.producer import Manufacturer
 from app.models.order import Order
 from app.core.config import settings
+from app.services.geo_index import coordinates, haversine_km, order_location, proximity_score, within_radius
+from app.services.manufacturer_catalog import manufacturer_catalog
+from app.services.matching_result_cache import matching_result_cache, order_fingerprint, register_result_types
 
 
 # Configure logging for algorithm tuning and A/B testing
@@ -90,6 +94,9 @@ class MatchResult:
         }
 
 
+register_result_types(MatchResult)
+
+
 class IntelligentMatchingService:
     """Advanced manufacturer matching algorithm with AI-powered scoring"""
     
@@ -108,6 +115,10 @@ class IntelligentMatchingService:
         # Performance optimization settings
         self.enable_caching = os.getenv('ENABLE_MATCHING_CACHE', 'true').lower() == 'true'
         self.cache_ttl_minutes = int(os.getenv('CACHE_TTL_MINUTES', 30))
+        self.result_cache = matching_result_cache
+        
+        # Shared in-memory manufacturer catalog candidates are taken from
+        self.catalog = manufacturer_catalog
     
     def find_best_matches(
         self,
@@ -130,6 +141,20 @@ class IntelligentMatchingService:
         start_time = datetime.now()
         
         try:
+            fingerprint = None
+            if self.enable_caching:
+                fingerprint = order_fingerprint(
+                    order,
+                    max_results=max_results,
+                    weights=asdict(self.weights),
+                    fuzzy_threshold=self.fuzzy_threshold,
+                    min_match_score=self.min_match_score,
+                    max_distance_km=self.max_distance_km
+                )
+                cached_matches = self._get_cached_matches(db, fingerprint)
+                if cached_matches is not None:
+                    return cached_matches
+            
             # Log matching request
             logger.info(f"Starting match for order {order.id}", extra={
                 'order_id': order.id,
@@ -180,6 +205,9 @@ class IntelligentMatchingService:
                 'ab_test_group': ab_test_group
             })
             
+            if fingerprint is not None:
+                self._cache_matches(fingerprint, final_matches)
+            
             return final_matches
             
         except Exception as e:
@@ -190,54 +218,67 @@ class IntelligentMatchingService:
             })
             return []
     
+    def _cache_matches(self, fingerprint: str, matches: List[MatchResult]) -> None:
+        """Store matches without their ORM rows, which are re-attached on read"""
+        detached = [(match.manufacturer.id, replace(match, manufacturer=None)) for match in matches]
+        self.result_cache.set('intelligent', fingerprint, detached, self.cache_ttl_minutes * 60)
+    
+    def _get_cached_matches(self, db: Session, fingerprint: str) -> Optional[List[MatchResult]]:
+        """Cached matches with manufacturers taken from the catalog, or None"""
+        cached = self.result_cache.get('intelligent', fingerprint)
+        if cached is None:
+            return None
+        
+        snapshot = self.catalog.snapshot(db)
+        if any(snapshot.get(manufacturer_id) is None for manufacturer_id, _ in cached):
+            return None
+        
+        return [replace(match, manufacturer=snapshot.get(manufacturer_id)) for manufacturer_id, match in cached]
+    
     def _get_eligible_manufacturers(self, db: Session, order: Order) -> List[Manufacturer]:
-        """Get manufacturers eligible for matching with performance optimization"""
-        
-        # Base query with essential filters
-        query = db.query(Manufacturer).filter(
-            and_(
-                Manufacturer.is_active == True,
-                Manufacturer.is_verified == True,
-                Manufacturer.stripe_onboarding_completed == True
-            )
-        )
+        """Get manufacturers eligible for matching from the shared catalog"""
+        
+        # Active, verified and onboarded for payments
+        snapshot = self.catalog.snapshot(db)
+        manufacturers = snapshot.matchable()
         
         # MOQ filtering
         if order.quantity:
-            query = query.filter(
-                or_(
-                    Manufacturer.min_order_quantity <= order.quantity,
-                    Manufacturer.min_order_quantity.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.min_order_quantity is None or m.min_order_quantity <= order.quantity
+            ]
         
         # Budget filtering
         if order.budget_max_pln:
-            query = query.filter(
-                or_(
-                    Manufacturer.min_order_value_pln <= order.budget_max_pln,
-                    Manufacturer.min_order_value_pln.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.min_order_value_pln is None or m.min_order_value_pln <= order.budget_max_pln
+            ]
         
         # Lead time filtering
         if order.delivery_deadline:
             days_until_deadline = (order.delivery_deadline - datetime.now()).days
-            query = query.filter(
-                or_(
-                    Manufacturer.standard_lead_time_days <= days_until_deadline,
-                    Manufacturer.standard_lead_time_days.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.standard_lead_time_days is None or m.standard_lead_time_days <= days_until_deadline
+            ]
         
         # Geographic pre-filtering if specific location required
         if order.preferred_country:
-            query = query.filter(Manufacturer.country == order.preferred_country)
+            manufacturers = [m for m in manufacturers if m.country == order.preferred_country]
         
-        # Order by recent activity for better performance
-        query = query.order_by(Manufacturer.last_activity_date.desc())
+        # Radius pre-filtering around the order's location
+        location = self._order_location(order)
+        if order.max_distance_km and location is not None:
+            manufacturers = within_radius(manufacturers, snapshot.geo, location, order.max_distance_km)
         
-        return query.all()
+        # Order by recent activity, never active last
+        active = sorted(
+            (m for m in manufacturers if m.last_activity_date is not None),
+            key=lambda m: m.last_activity_date, reverse=True
+        )
+        return active + [m for m in manufacturers if m.last_activity_date is None]
     
     def _calculate_comprehensive_score(self, manufacturer: Manufacturer, order: Order) -> MatchResult:
         """Calculate comprehensive matching score with detailed breakdown"""
@@ -388,53 +429,36 @@ class IntelligentMatchingService:
         distance_km = self._calculate_distance(manufacturer, order)
         
         if distance_km is not None:
-            if distance_km <= self.local_radius_km:
-                score += 0.6  # Local manufacturer bonus
-            elif distance_km <= 200:
-                score += 0.5  # Regional
-            elif distance_km <= 500:
-                score += 0.3  # National
-            elif distance_km <= 1000:
-                score += 0.2  # Extended range
-            else:
-                score += 0.1  # International
+            score += 0.6 * float(proximity_score(distance_km, self.local_radius_km))
         else:
             score += 0.3  # Neutral if coordinates not available
         
         return min(score, 1.0)
     
     def _calculate_distance(self, manufacturer: Manufacturer, order: Order) -> Optional[float]:
-        """Calculate distance using haversine formula"""
-        
-        if not all([manufacturer.latitude, manufacturer.longitude]):
-            return None
+        """Distance in km between a manufacturer and the order's location, when both are known"""
         
-        # For demonstration, we'll calculate distance to Warsaw (Poland's capital)
-        # In production, you would get the client's coordinates from the order
-        warsaw_lat, warsaw_lng = 52.2297, 21.0122
+        distance_km = self._calculate_distances([manufacturer], order)[0]
+        return None if math.isnan(distance_km) else float(distance_km)
+    
+    def _calculate_distances(self, manufacturers: List[Manufacturer], order: Order) -> np.ndarray:
+        """Haversine distances in km for a whole candidate set; NaN where unknown"""
+        
+        location = self._order_location(order)
+        if location is None:
+            return np.full(len(manufacturers), np.nan)
+        latitudes, longitudes = coordinates(manufacturers)
+        return haversine_km(location[0], location[1], latitudes, longitudes)
+    
+    def _order_location(self, order: Order) -> Optional[Tuple[float, float]]:
+        """Where the order is delivered: its preferred city, else its preferred country"""
         
-        return self._haversine_distance(
-            float(manufacturer.latitude), 
-            float(manufacturer.longitude),
-            warsaw_lat, 
-            warsaw_lng
-        )
+        snapshot = self.catalog.current
+        return order_location(order, snapshot.geo if snapshot is not None else None)
     
     def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate the great circle distance between two points on earth"""
-        # Convert decimal degrees to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Radius of earth in kilometers
-        r = 6371
-        
-        return c * r
+        return float(haversine_km(lat1, lon1, lat2, lon2))
     
     def _calculate_performance_score(self, manufacturer: Manufacturer, order: Order) -> float:
         """Calculate historical performance score"""
@@ -627,13 +651,20 @@ class IntelligentMatchingService:
         
         logger.info(f"Applying fallback strategy for order {order.id}")
         
-        # Strategy 1: Relax capability requirements
-        relaxed_manufacturers = db.query(Manufacturer).filter(
-            and_(
-                Manufacturer.is_active == True,
-                Manufacturer.is_verified == True
-            )
-        ).limit(max_results * 2).all()
+        # Strategy 1: Relax capability requirements, nearest manufacturers first
+        snapshot = self.catalog.snapshot(db)
+        relaxed_manufacturers = []
+        location = self._order_location(order)
+        if location is not None:
+            relaxed_manufacturers = [
+                manufacturer for manufacturer, _ in snapshot.geo.nearest(location[0], location[1], max_results * 2)
+                if manufacturer.is_verified
+            ]
+        nearest_ids = {manufacturer.id for manufacturer in relaxed_manufacturers}
+        relaxed_manufacturers += [
+            manufacturer for manufacturer in snapshot
+            if manufacturer.is_verified and manufacturer.id not in nearest_ids
+        ][:max_results * 2 - len(relaxed_manufacturers)]
         
         if relaxed_manufacturers:
             matches = []
@@ -0,0 +1,353 @@
+"""
+Process-wide snapshot of the manufacturer catalog for the matching engines.
+
+Every matching engine used to query and hydrate full Manufacturer rows,
+JSON columns and all, on every call. The catalog keeps one compact record
+per active manufacturer instead:
+
+- only the columns the engines read, in a __slots__ object
+- the capabilities JSON parsed once, with its strings interned so that the
+  vocabulary shared by thousands of profiles is stored once
+- the capability tags (as in the manufacturer_capability_tags table) and
+  the eligibility flag the engines filter on, computed once
+
+Records are never modified once published. A snapshot is the records in
+id order next to an array of their ids; a refresh copies the id -> record
+map, replaces the records that changed and publishes a new snapshot, so
+a request still iterating over the previous one is unaffected.
+
+Refreshes are incremental: rows with updated_at at or after the watermark
+are re-read at most every sync_interval_seconds, and at once when the
+matching result cache announces a catalog change. A change notification
+also reconciles the ids against the table, since a deleted row leaves
+nothing behind to re-read.
+
+The catalog follows a single database: it is built from the session of
+the first caller and refreshed through the sessions of later ones, which
+may be read replicas of it. Tests against a database of their own use a
+ManufacturerCatalog of their own.
+"""
+
+import logging
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.producer import Manufacturer
+from app.services.capability_tags import manufacturer_tags
+from app.services.geo_index import GeoIndex
+from app.services.matching_result_cache import matching_result_cache
+
+logger = logging.getLogger(__name__)
+
+# Manufacturer columns read by the matching engines
+CATALOG_COLUMNS = (
+    'id',
+    'business_name',
+    'country',
+    'state_province',
+    'city',
+    'latitude',
+    'longitude',
+    'capabilities',
+    'capacity_utilization_pct',
+    'min_order_quantity',
+    'max_order_quantity',
+    'min_order_value_pln',
+    'standard_lead_time_days',
+    'rush_order_available',
+    'rush_order_lead_time_days',
+    'quality_certifications',
+    'years_in_business',
+    'overall_rating',
+    'quality_rating',
+    'communication_rating',
+    'total_orders_completed',
+    'on_time_delivery_rate',
+    'stripe_onboarding_completed',
+    'is_active',
+    'is_verified',
+    'last_activity_date',
+    'created_at',
+    'updated_at',
+)
+
+# Columns whose strings repeat across manufacturers
+_INTERNED_INDEXES = tuple(
+    CATALOG_COLUMNS.index(column)
+    for column in ('business_name', 'country', 'state_province', 'city', 'capabilities', 'quality_certifications')
+)
+
+
+def _interned(value: Any) -> Any:
+    """JSON value with its strings interned"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(item) if type(item) is str else _interned(item) for item in value]
+    if isinstance(value, dict):
+        return {sys.intern(key) if isinstance(key, str) else key: _interned(item) for key, item in value.items()}
+    return value
+
+
+class CatalogManufacturer:
+    """
+    Read-only stand-in for a Manufacturer row with the CATALOG_COLUMNS
+    attributes, plus:
+
+    - tags: frozenset of (kind, value) capability tags
+    - is_matchable: active, verified and onboarded for payments
+    """
+
+    __slots__ = CATALOG_COLUMNS + ('tags', 'is_matchable')
+
+    def __init__(self, **values: Any):
+        self._set_values(values.get(column) for column in CATALOG_COLUMNS)
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'CatalogManufacturer':
+        """Record from a row of _catalog_select()"""
+        values = list(row)
+        for index in _INTERNED_INDEXES:
+            values[index] = _interned(values[index])
+        manufacturer = cls.__new__(cls)
+        manufacturer._set_values(values)
+        return manufacturer
+
+    def _set_values(self, values: Iterable[Any]) -> None:
+        set_value = object.__setattr__
+        for column, value in zip(CATALOG_COLUMNS, values):
+            set_value(self, column, value)
+        set_value(self, 'tags', frozenset(manufacturer_tags(self)))
+        set_value(self, 'is_matchable', bool(
+            self.is_active and self.is_verified and self.stripe_onboarding_completed
+        ))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Catalog records are read-only; cannot set {name}")
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CatalogManufacturer):
+            return NotImplemented
+        return all(getattr(self, column) == getattr(other, column) for column in CATALOG_COLUMNS)
+
+    __hash__ = object.__hash__
+
+    def __repr__(self) -> str:
+        return f"<CatalogManufacturer(id={self.id}, business_name={self.business_name!r})>"
+
+
+def active_since(value: datetime, days: int) -> bool:
+    """Whether a timestamp is within the last days; naive and aware values alike"""
+    return value >= datetime.now(value.tzinfo) - timedelta(days=days)
+
+
+class CatalogSnapshot:
+    """Immutable set of catalog records, ordered by id"""
+
+    __slots__ = ('ids', 'manufacturers', 'watermark', 'version', '_by_id', '_geo')
+
+    def __init__(
+        self,
+        by_id: Dict[int, CatalogManufacturer],
+        watermark: Optional[datetime],
+        version: Optional[int],
+        ordered: Optional['CatalogSnapshot'] = None
+    ):
+        """ordered: snapshot with the same records, whose ordering is reused"""
+        if ordered is not None:
+            self.ids, self.manufacturers, self._geo = ordered.ids, ordered.manufacturers, ordered._geo
+        else:
+            ids = sorted(by_id)
+            self.ids = array('q', ids)
+            self.manufacturers = tuple(by_id[manufacturer_id] for manufacturer_id in ids)
+            self._geo = None
+        self.watermark = watermark
+        self.version = version
+        self._by_id = by_id
+
+    def __len__(self) -> int:
+        return len(self.manufacturers)
+
+    def __iter__(self) -> Iterator[CatalogManufacturer]:
+        return iter(self.manufacturers)
+
+    def get(self, manufacturer_id: int) -> Optional[CatalogManufacturer]:
+        return self._by_id.get(manufacturer_id)
+
+    def get_many(self, manufacturer_ids: Iterable[int]) -> List[CatalogManufacturer]:
+        """Records of the ids that are in the catalog, in the given order"""
+        return [self._by_id[i] for i in manufacturer_ids if i in self._by_id]
+
+    @property
+    def geo(self) -> GeoIndex:
+        """Geospatial index of the records, built on first use"""
+        if self._geo is None:
+            self._geo = GeoIndex(self.manufacturers)
+        return self._geo
+
+    def matchable(self) -> List[CatalogManufacturer]:
+        """Active, verified manufacturers onboarded for payments, by id"""
+        return [manufacturer for manufacturer in self.manufacturers if manufacturer.is_matchable]
+
+    def replaced(
+        self,
+        changed: Dict[int, Optional[CatalogManufacturer]],
+        watermark: Optional[datetime],
+        version: Optional[int]
+    ) -> 'CatalogSnapshot':
+        """New snapshot with records replaced, or removed where None"""
+        if not changed:
+            return CatalogSnapshot(self._by_id, watermark, version, ordered=self)
+        by_id = dict(self._by_id)
+        for manufacturer_id, manufacturer in changed.items():
+            if manufacturer is None:
+                by_id.pop(manufacturer_id, None)
+            else:
+                by_id[manufacturer_id] = manufacturer
+        return CatalogSnapshot(by_id, watermark, version)
+
+
+class ManufacturerCatalog:
+    """Shared, incrementally refreshed snapshot of the active manufacturers"""
+
+    def __init__(
+        self,
+        sync_interval_seconds: float = 5.0,
+        version_source: Optional[Callable[[], int]] = None
+    ):
+        """
+        Args:
+            sync_interval_seconds: Minimum time between checks for changed profiles
+            version_source: Returns the catalog version, which changes whenever
+                a catalog change is committed; the matching result cache's by default
+        """
+        self.sync_interval_seconds = sync_interval_seconds
+        self.version_source = version_source or matching_result_cache.catalog_version
+
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def current(self) -> Optional[CatalogSnapshot]:
+        """Latest snapshot, as is; None before the first build"""
+        return self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot) if self._snapshot is not None else 0
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        """Current snapshot, built on first use and refreshed when due"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._rebuild(db)
+            return self._snapshot
+
+        version = self.version_source()
+        if version != snapshot.version or time.monotonic() - self._last_sync >= self.sync_interval_seconds:
+            # Whoever holds the lock is refreshing; the others read the current snapshot
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._refresh(db, version)
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def get(self, db: Session, manufacturer_id: int) -> Optional[CatalogManufacturer]:
+        return self.snapshot(db).get(manufacturer_id)
+
+    def rebuild(self, db: Session) -> CatalogSnapshot:
+        """Load every active manufacturer"""
+        with self._lock:
+            self._rebuild(db)
+        return self._snapshot
+
+    def refresh(self, db: Session) -> int:
+        """Apply committed changes now; returns the records changed"""
+        if self._snapshot is None:
+            self.rebuild(db)
+            return len(self._snapshot)
+        with self._lock:
+            return self._refresh(db, self.version_source())
+
+    def _rebuild(self, db: Session) -> None:
+        version = self.version_source()
+        by_id = {}
+        watermark = None
+        for row in db.execute(_catalog_select().where(_manufacturers.is_active == True)):
+            manufacturer = CatalogManufacturer.from_row(row)
+            by_id[manufacturer.id] = manufacturer
+            watermark = _later(watermark, manufacturer.updated_at)
+
+        self._snapshot = CatalogSnapshot(by_id, watermark, version)
+        self._last_sync = time.monotonic()
+        logger.info(f"Manufacturer catalog built: {len(by_id)} manufacturers")
+
+    def _refresh(self, db: Session, version: int) -> int:
+        snapshot = self._snapshot
+        statement = _catalog_select()
+        if snapshot.watermark is not None:
+            # Rows stamped exactly at the watermark may have been written after it was read
+            statement = statement.where(_manufacturers.updated_at >= snapshot.watermark)
+
+        changed: Dict[int, Optional[CatalogManufacturer]] = {}
+        watermark = snapshot.watermark
+        for row in db.execute(statement):
+            manufacturer = CatalogManufacturer.from_row(row)
+            watermark = _later(watermark, manufacturer.updated_at)
+            current = snapshot.get(manufacturer.id)
+            if not manufacturer.is_active:
+                if current is not None:
+                    changed[manufacturer.id] = None
+            elif current != manufacturer:
+                changed[manufacturer.id] = manufacturer
+
+        if version != snapshot.version:
+            # Deleted rows and rows written without a newer updated_at
+            active_ids = set(db.execute(select(_manufacturers.id).where(_manufacturers.is_active == True)).scalars())
+            for manufacturer_id in snapshot.ids:
+                if manufacturer_id not in active_ids:
+                    changed[manufacturer_id] = None
+            missing = [i for i in active_ids if snapshot.get(i) is None and i not in changed]
+            if missing:
+                for row in db.execute(_catalog_select().where(_manufacturers.id.in_(missing))):
+                    manufacturer = CatalogManufacturer.from_row(row)
+                    changed[manufacturer.id] = manufacturer
+
+        if changed or version != snapshot.version or watermark != snapshot.watermark:
+            self._snapshot = snapshot.replaced(changed, watermark, version)
+        self._last_sync = time.monotonic()
+        if changed:
+            logger.info(f"Manufacturer catalog refreshed: {len(changed)} manufacturers changed")
+        return len(changed)
+
+
+# Table columns: Core rows are cheaper to fetch than ORM column entities
+_manufacturers = Manufacturer.__table__.c
+
+
+def _catalog_select():
+    return select(*(_manufacturers[column] for column in CATALOG_COLUMNS))
+
+
+def _later(watermark: Optional[datetime], updated_at: Optional[datetime]) -> Optional[datetime]:
+    if updated_at is not None and (watermark is None or updated_at > watermark):
+        return updated_at
+    return watermark
+
+
+# Global manufacturer catalog shared by the matching engines
+manufacturer_catalog = ManufacturerCatalog()
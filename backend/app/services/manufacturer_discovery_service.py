@@ -1,11 +1,11 @@
 from typing import List, Dict, Any, Optional, Tuple
+import os
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, text
 from datetime import datetime, timedelta
 import math
 import json
 from loguru import logger
-from geopy.distance import geodesic
 from geopy.geocoders import Nominatim
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -16,6 +16,10 @@ from app.models.order import Order
 from app.models.quote import Quote
 from app.models.user import User, UserRole
 from app.core.config import settings
+from app.services.geo_index import haversine_km, proximity_score, within_radius
+from app.services.manufacturer_catalog import manufacturer_catalog
+from app.services.manufacturer_text_index import ManufacturerTextIndex, _filter_attributes, _matches_filters
+from app.services.manufacturer_similarity_index import ManufacturerSimilarityIndex, ManufacturerFeatures
 
 
 class ManufacturerDiscoveryService:
@@ -28,6 +32,15 @@ class ManufacturerDiscoveryService:
             stop_words='english',
             ngram_range=(1, 2)
         )
+        self.text_index = ManufacturerTextIndex(
+            text_fn=self._prepare_manufacturer_text,
+            vectorizer=self.tfidf_vectorizer,
+            index_path=os.path.join(settings.ML_MODELS_PATH, 'manufacturer_text_index')
+        )
+        self.use_text_index = True
+        self.similarity_index = ManufacturerSimilarityIndex()
+        self.use_similarity_index = True
+        self.catalog = manufacturer_catalog
     
     def discover_manufacturers(
         self,
@@ -45,32 +58,43 @@ class ManufacturerDiscoveryService:
             limit: Maximum number of results to return
         """
         
-        # Build base query
-        query = db.query(Manufacturer).filter(
-            Manufacturer.is_active == True,
-            Manufacturer.is_verified == True
-        )
-        
-        # Apply filters
-        query = self._apply_search_filters(query, search_criteria)
-        
-        # Get all matching manufacturers
-        manufacturers = query.all()
+        # Active, verified manufacturers from the shared catalog, with the
+        # search filters evaluated as _apply_search_filters() does in SQL
+        snapshot = self.catalog.snapshot(db)
+        manufacturers = [
+            manufacturer for manufacturer in snapshot
+            if manufacturer.is_verified and _matches_filters(_filter_attributes(manufacturer), search_criteria)
+        ]
+        
+        # Radius filter around the user
+        if user_location and search_criteria.get("max_distance_km"):
+            manufacturers = within_radius(
+                manufacturers, snapshot.geo, (user_location["lat"], user_location["lng"]),
+                search_criteria["max_distance_km"]
+            )
         
         if not manufacturers:
             return []
         
         # Score and rank manufacturers
+        scored = [
+            (manufacturer, self._calculate_manufacturer_score(manufacturer, search_criteria, user_location))
+            for manufacturer in manufacturers
+        ]
+        scored.sort(key=lambda item: item[1]["total_score"], reverse=True)
+        scored = scored[:limit]
+        
+        # Descriptions are not kept in the catalog; load them for the results only
+        descriptions = dict(db.query(Manufacturer.id, Manufacturer.business_description).filter(
+            Manufacturer.id.in_([manufacturer.id for manufacturer, _ in scored])
+        ).all())
+        
         scored_manufacturers = []
-        for manufacturer in manufacturers:
-            score_data = self._calculate_manufacturer_score(
-                manufacturer, search_criteria, user_location
-            )
-            
+        for manufacturer, score_data in scored:
             manufacturer_data = {
                 "id": manufacturer.id,
                 "business_name": manufacturer.business_name,
-                "description": manufacturer.business_description,
+                "description": descriptions.get(manufacturer.id),
                 "location": {
                     "city": manufacturer.city,
                     "state": manufacturer.state_province,
@@ -94,9 +118,7 @@ class ManufacturerDiscoveryService:
             
             scored_manufacturers.append(manufacturer_data)
         
-        # Sort by score and return top results
-        scored_manufacturers.sort(key=lambda x: x["score"], reverse=True)
-        return scored_manufacturers[:limit]
+        return scored_manufacturers
     
     def find_similar_manufacturers(
         self,
@@ -113,6 +135,12 @@ class ManufacturerDiscoveryService:
         if not target_manufacturer:
             return []
         
+        if self.use_similarity_index:
+            try:
+                return self._find_similar_indexed(db, target_manufacturer, limit)
+            except Exception as e:
+                logger.error(f"Error searching manufacturer similarity index: {str(e)}")
+        
         # Get all other active manufacturers
         other_manufacturers = db.query(Manufacturer).filter(
             and_(
@@ -159,6 +187,55 @@ class ManufacturerDiscoveryService:
         
         return results
     
+    def _find_similar_indexed(
+        self,
+        db: Session,
+        target_manufacturer: Manufacturer,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Similar manufacturers from the nightly neighbour lists, or the live k-NN index"""
+        
+        hits = self.similarity_index.materialized_neighbours(target_manufacturer.id, limit)
+        if hits is None:
+            self.similarity_index.ensure_ready(db)
+            hits = self.similarity_index.nearest(
+                ManufacturerFeatures.from_manufacturer(target_manufacturer), limit
+            )
+        if not hits:
+            return []
+        
+        manufacturers = {
+            manufacturer.id: manufacturer
+            for manufacturer in db.query(Manufacturer).filter(
+                Manufacturer.id.in_([manufacturer_id for manufacturer_id, _ in hits]),
+                Manufacturer.is_active == True,
+                Manufacturer.is_verified == True
+            ).all()
+        }
+        
+        results = []
+        for manufacturer_id, similarity_score in hits:
+            manufacturer = manufacturers.get(manufacturer_id)
+            if manufacturer is None:
+                continue  # Deactivated since the neighbours were computed
+            results.append({
+                "id": manufacturer.id,
+                "business_name": manufacturer.business_name,
+                "description": manufacturer.business_description,
+                "location": {
+                    "city": manufacturer.city,
+                    "country": manufacturer.country
+                },
+                "rating": manufacturer.overall_rating,
+                "capabilities": manufacturer.capabilities,
+                "similarity_score": round(similarity_score, 3),
+                "match_reasons": self._generate_similarity_reasons(
+                    target_manufacturer, manufacturer
+                )
+            })
+        
+        return results
+    
     def get_manufacturer_recommendations(
         self,
         db: Session,
@@ -221,6 +298,13 @@ class ManufacturerDiscoveryService:
     ) -> List[Dict[str, Any]]:
         """Search manufacturers using text-based search with AI similarity"""
         
+        if self.use_text_index:
+            try:
+                self.text_index.ensure_ready(db)
+                return self._search_text_index(db, search_text, filters, limit)
+            except Exception as e:
+                logger.error(f"Error searching manufacturer text index: {str(e)}")
+        
         # Get all active manufacturers
         query = db.query(Manufacturer).filter(
             Manufacturer.is_active == True,
@@ -288,6 +372,51 @@ class ManufacturerDiscoveryService:
         
         return []
     
+    def _search_text_index(
+        self,
+        db: Session,
+        search_text: str,
+        filters: Optional[Dict[str, Any]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Rank manufacturers with the persistent TF-IDF index and load only the top hits"""
+        
+        hits = self.text_index.search(search_text, filters=filters, limit=limit)
+        if not hits:
+            return []
+        
+        manufacturers = {
+            manufacturer.id: manufacturer
+            for manufacturer in db.query(Manufacturer).filter(
+                Manufacturer.id.in_([manufacturer_id for manufacturer_id, _ in hits]),
+                Manufacturer.is_active == True,
+                Manufacturer.is_verified == True
+            ).all()
+        }
+        
+        results = []
+        for manufacturer_id, similarity in hits:
+            manufacturer = manufacturers.get(manufacturer_id)
+            if manufacturer is None:
+                continue  # Removed since the index last synced
+            results.append({
+                "id": manufacturer.id,
+                "business_name": manufacturer.business_name,
+                "description": manufacturer.business_description,
+                "location": {
+                    "city": manufacturer.city,
+                    "country": manufacturer.country
+                },
+                "rating": manufacturer.overall_rating,
+                "capabilities": manufacturer.capabilities,
+                "similarity_score": round(similarity, 3),
+                "match_highlights": self._generate_match_highlights(
+                    manufacturer, search_text
+                )
+            })
+        
+        return results
+    
     def get_manufacturer_analytics(
         self,
         db: Session,
@@ -538,27 +667,14 @@ class ManufacturerDiscoveryService:
         """Calculate distance between two locations in kilometers"""
         
         try:
-            point1 = (location1["lat"], location1["lng"])
-            point2 = (location2["lat"], location2["lng"])
-            return geodesic(point1, point2).kilometers
+            return float(haversine_km(location1["lat"], location1["lng"], location2["lat"], location2["lng"]))
         except Exception:
             return 1000  # Default large distance if calculation fails
     
     def _distance_to_score(self, distance_km: float) -> float:
         """Convert distance to proximity score (0-100)"""
         
-        if distance_km <= 50:
-            return 100
-        elif distance_km <= 200:
-            return 80
-        elif distance_km <= 500:
-            return 60
-        elif distance_km <= 1000:
-            return 40
-        elif distance_km <= 2000:
-            return 20
-        else:
-            return 10
+        return 100 * float(proximity_score(distance_km))
     
     def _calculate_reliability_score(self, manufacturer: Manufacturer) -> float:
         """Calculate reliability score"""
@@ -590,15 +706,14 @@ class ManufacturerDiscoveryService:
     ) -> float:
         """Calculate similarity score between two manufacturers"""
         
-        similarity = 0
-        factors = 0
+        # Factor weights sum to 1.0, so the weighted sum is already in [0, 1]
+        similarity = 0.0
         
         # Location similarity
         if (manufacturer1.country == manufacturer2.country):
             similarity += 0.2
             if manufacturer1.state_province == manufacturer2.state_province:
                 similarity += 0.1
-        factors += 1
         
         # Capability similarity
         if manufacturer1.capabilities and manufacturer2.capabilities:
@@ -606,14 +721,12 @@ class ManufacturerDiscoveryService:
                 manufacturer1.capabilities, manufacturer2.capabilities
             )
             similarity += cap_similarity * 0.4
-        factors += 1
         
         # Rating similarity
         if manufacturer1.overall_rating and manufacturer2.overall_rating:
-            rating_diff = abs(manufacturer1.overall_rating - manufacturer2.overall_rating)
+            rating_diff = abs(float(manufacturer1.overall_rating) - float(manufacturer2.overall_rating))
             rating_similarity = max(0, 1 - (rating_diff / 5))
             similarity += rating_similarity * 0.2
-        factors += 1
         
         # Size similarity (based on order volume)
         orders1 = manufacturer1.total_orders_completed or 0
@@ -622,9 +735,8 @@ class ManufacturerDiscoveryService:
         if orders1 > 0 and orders2 > 0:
             size_ratio = min(orders1, orders2) / max(orders1, orders2)
             similarity += size_ratio * 0.1
-        factors += 1
         
-        return similarity / factors if factors > 0 else 0
+        return similarity
     
     def _calculate_capability_similarity(
         self,
@@ -0,0 +1,343 @@
+"""
+Nearest-neighbour index for similar-manufacturer lookups.
+
+find_similar_manufacturers used to load every other active manufacturer and
+call _calculate_similarity_score pairwise in Python. This index keeps one
+feature row per active, verified manufacturer:
+
+- multi-hot sparse matrices for processes, materials and certifications
+- integer-coded country and state
+- overall rating and completed order count
+
+The exact similarity against every row is then a handful of sparse
+matrix-vector products (set intersections for the Jaccard terms) and array
+operations, followed by an argpartition top-k. The score is the same as the
+per-row reference, evaluated in the same float order.
+
+A nightly job materializes the top neighbours of every manufacturer into
+memory-mapped .npy files so profile pages can read them without touching
+the feature matrix.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.producer import Manufacturer
+
+# Capability lists compared with Jaccard similarity, in the reference order
+CAPABILITY_SETS = ("manufacturing_processes", "materials", "certifications")
+
+
+@dataclass(frozen=True)
+class ManufacturerFeatures:
+    """Inputs of the similarity score for one manufacturer"""
+    id: int
+    country: Optional[str]
+    state: Optional[str]
+    has_capabilities: bool
+    capability_sets: Tuple[FrozenSet[str], ...]
+    rating: Optional[float]  # None when missing or zero
+    orders: float
+
+    @classmethod
+    def from_manufacturer(cls, manufacturer: Manufacturer) -> 'ManufacturerFeatures':
+        capabilities = manufacturer.capabilities or {}
+        return cls(
+            id=manufacturer.id,
+            country=manufacturer.country,
+            state=manufacturer.state_province,
+            has_capabilities=bool(manufacturer.capabilities),
+            capability_sets=tuple(frozenset(capabilities.get(key, [])) for key in CAPABILITY_SETS),
+            rating=float(manufacturer.overall_rating) if manufacturer.overall_rating else None,
+            orders=float(manufacturer.total_orders_completed or 0)
+        )
+
+
+class ManufacturerSimilarityIndex:
+    """Columnar feature store with exact top-k similarity search"""
+
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        neighbours: int = 50,
+        min_similarity: float = 0.3,
+        sync_interval_seconds: float = 5.0
+    ):
+        """
+        Args:
+            index_path: Directory materialized neighbour lists are saved to
+            neighbours: Neighbours materialized per manufacturer
+            min_similarity: Scores at or below this are not returned
+            sync_interval_seconds: Minimum time between checks for changed profiles
+        """
+        self.index_path = index_path or os.path.join(settings.ML_MODELS_PATH, 'manufacturer_neighbours')
+        self.neighbours = neighbours
+        self.min_similarity = min_similarity
+        self.sync_interval_seconds = sync_interval_seconds
+
+        self.watermark: Optional[datetime] = None
+        self._features: Dict[int, ManufacturerFeatures] = {}
+        self._columns: Optional[Dict[str, Any]] = None
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+
+        self._materialized: Optional[Dict[str, np.ndarray]] = None
+        self._materialized_mtime: Optional[float] = None
+        self._materialized_checked = 0.0
+
+    @property
+    def is_ready(self) -> bool:
+        return self._columns is not None
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    # Building and incremental updates
+
+    def ensure_ready(self, db: Session) -> None:
+        """Build the feature store on first use, then sync changed profiles"""
+        if not self.is_ready:
+            with self._lock:
+                if not self.is_ready:
+                    self.rebuild(db)
+        self.refresh(db)
+
+    def rebuild(self, db: Session) -> None:
+        """Load features for every active, verified manufacturer"""
+        manufacturers = db.query(Manufacturer).filter(
+            Manufacturer.is_active == True,
+            Manufacturer.is_verified == True
+        ).all()
+
+        with self._lock:
+            self._features = {
+                manufacturer.id: ManufacturerFeatures.from_manufacturer(manufacturer)
+                for manufacturer in manufacturers
+            }
+            updated = [manufacturer.updated_at for manufacturer in manufacturers if manufacturer.updated_at]
+            self.watermark = max(updated) if updated else None
+            self._compile()
+            self._last_sync = time.monotonic()
+        logger.info(f"Manufacturer similarity index built: {len(self._features)} manufacturers")
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Apply profiles updated since the watermark; returns rows changed"""
+        if not force and time.monotonic() - self._last_sync < self.sync_interval_seconds:
+            return 0
+
+        with self._lock:
+            query = db.query(Manufacturer)
+            if self.watermark is not None:
+                # Rows stamped exactly at the watermark may have been written after it was read
+                query = query.filter(Manufacturer.updated_at >= self.watermark)
+            changed = query.all()
+
+            dirty = False
+            for manufacturer in changed:
+                features = (
+                    ManufacturerFeatures.from_manufacturer(manufacturer)
+                    if manufacturer.is_active and manufacturer.is_verified else None
+                )
+                if self._features.get(manufacturer.id) != features:
+                    dirty = True
+                    if features is None:
+                        self._features.pop(manufacturer.id, None)
+                    else:
+                        self._features[manufacturer.id] = features
+                if manufacturer.updated_at and (self.watermark is None or manufacturer.updated_at > self.watermark):
+                    self.watermark = manufacturer.updated_at
+
+            if dirty:
+                self._compile()
+            self._last_sync = time.monotonic()
+        return len(changed)
+
+    def _compile(self) -> None:
+        """Turn the feature rows into sparse matrices and arrays"""
+        rows = sorted(self._features.values(), key=lambda features: features.id)
+        countries = {value: code for code, value in enumerate(sorted({r.country for r in rows if r.country is not None}))}
+        states = {value: code for code, value in enumerate(sorted({r.state for r in rows if r.state is not None}))}
+
+        columns = {
+            'ids': np.array([r.id for r in rows], dtype=np.int64),
+            'country': np.array([countries.get(r.country, -1) for r in rows], dtype=np.int64),
+            'state': np.array([states.get(r.state, -1) for r in rows], dtype=np.int64),
+            'has_capabilities': np.array([r.has_capabilities for r in rows], dtype=bool),
+            'rating': np.array([np.nan if r.rating is None else r.rating for r in rows], dtype=float),
+            'orders': np.array([r.orders for r in rows], dtype=float),
+            'country_codes': countries,
+            'state_codes': states,
+            'sets': [],
+        }
+        for set_index in range(len(CAPABILITY_SETS)):
+            vocabulary: Dict[str, int] = {}
+            indices, indptr = [], [0]
+            for r in rows:
+                indices.extend(vocabulary.setdefault(term, len(vocabulary)) for term in r.capability_sets[set_index])
+                indptr.append(len(indices))
+            matrix = sparse.csr_matrix(
+                (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                shape=(len(rows), max(len(vocabulary), 1))
+            )
+            sizes = np.diff(matrix.indptr).astype(float)
+            columns['sets'].append((vocabulary, matrix, sizes))
+        self._columns = columns
+
+    # Querying
+
+    def similarities(self, target: ManufacturerFeatures) -> np.ndarray:
+        """Similarity of target to every indexed manufacturer"""
+        c = self._columns
+        n = len(c['ids'])
+        zeros = np.zeros(n)
+
+        # Location similarity
+        # Missing values are coded -1 (None == None in the reference), unseen ones -2
+        country = -1 if target.country is None else c['country_codes'].get(target.country, -2)
+        state = -1 if target.state is None else c['state_codes'].get(target.state, -2)
+        same_country = c['country'] == country
+        same_state = c['state'] == state
+        similarity = zeros + np.where(same_country, 0.2, 0.0)
+        similarity = similarity + np.where(same_country & same_state, 0.1, 0.0)
+
+        # Capability similarity
+        if target.has_capabilities:
+            capability_sum = zeros
+            comparisons = zeros
+            for (vocabulary, matrix, sizes), target_set in zip(c['sets'], target.capability_sets):
+                target_vector = np.zeros(matrix.shape[1])
+                target_vector[[vocabulary[term] for term in target_set if term in vocabulary]] = 1.0
+                intersection = matrix @ target_vector
+                union = sizes + len(target_set) - intersection
+                applies = union > 0
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    capability_sum = capability_sum + np.where(applies, intersection / union, 0.0)
+                comparisons = comparisons + applies
+            with np.errstate(divide='ignore', invalid='ignore'):
+                capability_similarity = np.where(comparisons > 0, capability_sum / comparisons, 0)
+            similarity = similarity + np.where(c['has_capabilities'], capability_similarity * 0.4, 0.0)
+
+        # Rating similarity
+        if target.rating is not None:
+            rating_diff = np.abs(target.rating - c['rating'])
+            rating_similarity = np.maximum(0, 1 - (rating_diff / 5))
+            similarity = similarity + np.where(np.isnan(c['rating']), 0.0, rating_similarity * 0.2)
+
+        # Size similarity (based on order volume)
+        if target.orders > 0:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                size_ratio = np.minimum(target.orders, c['orders']) / np.maximum(target.orders, c['orders'])
+            similarity = similarity + np.where(c['orders'] > 0, size_ratio * 0.1, 0.0)
+
+        return similarity
+
+    def nearest(self, target: ManufacturerFeatures, limit: int) -> List[Tuple[int, float]]:
+        """Top manufacturers by similarity to target, excluding target itself"""
+        if not self.is_ready:
+            raise RuntimeError("Manufacturer similarity index has not been built")
+
+        with self._lock:
+            columns = self._columns
+            scores = self.similarities(target)
+        ids = columns['ids']
+
+        candidates = np.flatnonzero((scores > self.min_similarity) & (ids != target.id))
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        # Highest score first, lowest id first among ties
+        order = np.lexsort((ids[candidates], -scores[candidates]))
+        return [(int(ids[candidates[i]]), float(scores[candidates[i]])) for i in order]
+
+    # Materialized neighbour lists
+
+    def materialize(self) -> int:
+        """Compute and save the top neighbours of every indexed manufacturer"""
+        with self._lock:
+            rows = sorted(self._features.values(), key=lambda features: features.id)
+            neighbour_ids = np.full((len(rows), self.neighbours), -1, dtype=np.int64)
+            neighbour_scores = np.zeros((len(rows), self.neighbours))
+            for position, features in enumerate(rows):
+                for rank, (neighbour_id, score) in enumerate(self.nearest(features, self.neighbours)):
+                    neighbour_ids[position, rank] = neighbour_id
+                    neighbour_scores[position, rank] = score
+
+            staging_path = f"{self.index_path}.tmp-{os.getpid()}"
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+            np.save(os.path.join(staging_path, "ids.npy"), np.array([r.id for r in rows], dtype=np.int64))
+            np.save(os.path.join(staging_path, "neighbour_ids.npy"), neighbour_ids)
+            np.save(os.path.join(staging_path, "neighbour_scores.npy"), neighbour_scores)
+            with open(os.path.join(staging_path, "meta.json"), "w") as meta_file:
+                json.dump({
+                    "built_at": datetime.utcnow().isoformat(),
+                    "neighbours": self.neighbours,
+                    "min_similarity": self.min_similarity,
+                }, meta_file)
+
+            previous_path = f"{self.index_path}.old-{os.getpid()}"
+            if os.path.exists(self.index_path):
+                os.replace(self.index_path, previous_path)
+            os.replace(staging_path, self.index_path)
+            shutil.rmtree(previous_path, ignore_errors=True)
+
+        logger.info(f"Materialized neighbour lists for {len(rows)} manufacturers")
+        return len(rows)
+
+    def materialized_neighbours(self, manufacturer_id: int, limit: int) -> Optional[List[Tuple[int, float]]]:
+        """Neighbours saved by the nightly job, or None if the manufacturer has none"""
+        materialized = self._load_materialized()
+        if materialized is None:
+            return None
+
+        ids = materialized['ids']
+        position = int(np.searchsorted(ids, manufacturer_id))
+        if position >= len(ids) or ids[position] != manufacturer_id:
+            return None
+
+        return [
+            (int(neighbour_id), float(score))
+            for neighbour_id, score in zip(
+                materialized['neighbour_ids'][position, :limit],
+                materialized['neighbour_scores'][position, :limit]
+            )
+            if neighbour_id >= 0
+        ]
+
+    def _load_materialized(self) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-map the saved lists, reloading when the nightly job replaced them"""
+        now = time.monotonic()
+        if self._materialized_checked and now - self._materialized_checked < self.sync_interval_seconds:
+            return self._materialized
+        self._materialized_checked = now
+
+        meta_path = os.path.join(self.index_path, "meta.json")
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            self._materialized = None
+            return None
+
+        if mtime != self._materialized_mtime:
+            try:
+                self._materialized = {
+                    name: np.load(os.path.join(self.index_path, f"{name}.npy"), mmap_mode="r")
+                    for name in ("ids", "neighbour_ids", "neighbour_scores")
+                }
+                self._materialized_mtime = mtime
+            except Exception as e:
+                logger.error(f"Error loading materialized neighbour lists: {str(e)}")
+                self._materialized = None
+        return self._materialized
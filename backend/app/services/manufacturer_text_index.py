@@ -0,0 +1,388 @@
+"""
+Persistent TF-IDF index for manufacturer text search.
+
+search_manufacturers_by_text used to load every active, verified
+manufacturer, rebuild its text and refit a TfidfVectorizer on the whole
+corpus for every query. This index fits the vectorizer and the L2-normalized
+document matrix once, saves both under ML_MODELS_PATH and memory-maps the
+matrix arrays when loaded again. A query is then a single transform, one
+sparse matrix-vector product and a top-k selection.
+
+Search filters (country, state, city, minimum rating, processes, materials,
+certifications) are answered from per-row attribute arrays kept next to the
+matrix and turned into boolean id masks, cached per filter value.
+
+Profile changes are picked up incrementally from Manufacturer.updated_at:
+changed rows are re-vectorized with the fitted vocabulary and kept as
+override rows that shadow their base row. Once overrides outgrow
+compact_ratio of the corpus the index is refitted and saved again.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from loguru import logger
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy.orm import Session
+
+from app.models.producer import Manufacturer
+
+INDEX_FORMAT_VERSION = 1
+
+# Capability filters from _apply_search_filters: filter key -> capabilities key
+CAPABILITY_FILTERS = {
+    "capabilities": "manufacturing_processes",
+    "materials": "materials",
+    "certifications": "certifications",
+}
+
+
+def _capability_text(capabilities: Optional[Dict[str, Any]], key: str) -> str:
+    """Lowercased JSON text of one capability list, as json_extract renders it"""
+    value = (capabilities or {}).get(key)
+    if value is None:
+        return ""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).lower()
+
+
+def _filter_attributes(manufacturer: Manufacturer) -> Dict[str, Any]:
+    """Values the search filters are evaluated against"""
+    attributes = {
+        "country": manufacturer.country or "",
+        "state": manufacturer.state_province or "",
+        "city": (manufacturer.city or "").lower(),
+        "rating": float(manufacturer.overall_rating) if manufacturer.overall_rating is not None else np.nan,
+    }
+    for filter_key, capability_key in CAPABILITY_FILTERS.items():
+        attributes[filter_key] = _capability_text(manufacturer.capabilities, capability_key)
+    return attributes
+
+
+def _matches_filters(attributes: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Evaluate search filters against a single row's attributes"""
+    if filters.get("country") and attributes["country"] != filters["country"]:
+        return False
+    if filters.get("state") and attributes["state"] != filters["state"]:
+        return False
+    if filters.get("city") and filters["city"].lower() not in attributes["city"]:
+        return False
+    if filters.get("min_rating") and not attributes["rating"] >= filters["min_rating"]:
+        return False
+    for filter_key in CAPABILITY_FILTERS:
+        for term in filters.get(filter_key) or []:
+            if term.lower() not in attributes[filter_key]:
+                return False
+    return True
+
+
+class ManufacturerTextIndex:
+    """Fitted TF-IDF matrix over active, verified manufacturers"""
+
+    ATTRIBUTE_FIELDS = ("country", "state", "city", "rating") + tuple(CAPABILITY_FILTERS)
+    max_cached_masks = 1024
+
+    def __init__(
+        self,
+        text_fn: Callable[[Manufacturer], str],
+        vectorizer: TfidfVectorizer,
+        index_path: str,
+        sync_interval_seconds: float = 5.0,
+        compact_ratio: float = 0.2,
+        compact_min_rows: int = 100
+    ):
+        """
+        Args:
+            text_fn: Builds the searchable text of a manufacturer
+            vectorizer: Unfitted vectorizer whose parameters the index uses
+            index_path: Directory the fitted index is saved to
+            sync_interval_seconds: Minimum time between checks for changed profiles
+            compact_ratio: Share of override rows that triggers a refit
+            compact_min_rows: Override rows tolerated regardless of corpus size
+        """
+        self.text_fn = text_fn
+        self.vectorizer_template = vectorizer
+        self.index_path = index_path
+        self.sync_interval_seconds = sync_interval_seconds
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.attributes: Dict[str, np.ndarray] = {}
+        self.watermark: Optional[datetime] = None
+
+        self._positions: Dict[int, int] = {}
+        # Base rows shadowed by an override or removed
+        self._live = np.zeros(0, dtype=bool)
+        # manufacturer id -> (row vector, filter attributes), None when removed
+        self._overrides: Dict[int, Optional[Tuple[sparse.csr_matrix, Dict[str, Any]]]] = {}
+        self._mask_cache: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.vectorizer is not None
+
+    def __len__(self) -> int:
+        live_overrides = sum(1 for override in self._overrides.values() if override is not None)
+        return int(self._live.sum()) + live_overrides
+
+    # Building and persistence
+
+    def ensure_ready(self, db: Session) -> None:
+        """Load the saved index, or build it when none exists, then sync changes"""
+        if not self.is_ready:
+            with self._lock:
+                if not self.is_ready and not self.load():
+                    self.rebuild(db)
+        self.refresh(db)
+
+    def rebuild(self, db: Session) -> None:
+        """Fit the vectorizer and document matrix from scratch and save them"""
+        manufacturers = db.query(Manufacturer).filter(
+            Manufacturer.is_active == True,
+            Manufacturer.is_verified == True
+        ).order_by(Manufacturer.id).all()
+
+        vectorizer = clone(self.vectorizer_template)
+        texts = [self.text_fn(manufacturer) for manufacturer in manufacturers]
+        matrix = vectorizer.fit_transform(texts).tocsr()
+
+        attribute_rows = [_filter_attributes(manufacturer) for manufacturer in manufacturers]
+        attributes = {
+            field: np.array([row[field] for row in attribute_rows], dtype=float if field == "rating" else str)
+            for field in self.ATTRIBUTE_FIELDS
+        }
+        updated = [manufacturer.updated_at for manufacturer in manufacturers if manufacturer.updated_at]
+
+        with self._lock:
+            self._install(
+                vectorizer, matrix,
+                np.array([manufacturer.id for manufacturer in manufacturers], dtype=np.int64),
+                attributes, max(updated) if updated else None
+            )
+            self._last_sync = time.monotonic()
+        logger.info(f"Manufacturer text index built: {matrix.shape[0]} documents, {matrix.shape[1]} terms")
+
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Error saving manufacturer text index: {str(e)}")
+
+    def save(self) -> None:
+        """Write the index to index_path, replacing any previous copy"""
+        with self._lock:
+            staging_path = f"{self.index_path}.tmp-{os.getpid()}"
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+
+            joblib.dump(self.vectorizer, os.path.join(staging_path, "vectorizer.joblib"))
+            np.save(os.path.join(staging_path, "data.npy"), self.matrix.data)
+            np.save(os.path.join(staging_path, "indices.npy"), self.matrix.indices)
+            np.save(os.path.join(staging_path, "indptr.npy"), self.matrix.indptr)
+            np.save(os.path.join(staging_path, "ids.npy"), self.ids)
+            for field, values in self.attributes.items():
+                np.save(os.path.join(staging_path, f"attr_{field}.npy"), values)
+            with open(os.path.join(staging_path, "meta.json"), "w") as meta_file:
+                json.dump({
+                    "version": INDEX_FORMAT_VERSION,
+                    "shape": list(self.matrix.shape),
+                    "watermark": self.watermark.isoformat() if self.watermark else None,
+                }, meta_file)
+
+            previous_path = f"{self.index_path}.old-{os.getpid()}"
+            if os.path.exists(self.index_path):
+                os.replace(self.index_path, previous_path)
+            os.replace(staging_path, self.index_path)
+            shutil.rmtree(previous_path, ignore_errors=True)
+
+    def load(self) -> bool:
+        """Memory-map a saved index; returns False when none is usable"""
+        meta_path = os.path.join(self.index_path, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                logger.info("Manufacturer text index format changed, rebuilding")
+                return False
+
+            def array(name: str) -> np.ndarray:
+                return np.load(os.path.join(self.index_path, f"{name}.npy"), mmap_mode="r")
+
+            matrix = sparse.csr_matrix(
+                (array("data"), array("indices"), array("indptr")),
+                shape=tuple(meta["shape"]), copy=False
+            )
+            attributes = {field: array(f"attr_{field}") for field in self.ATTRIBUTE_FIELDS}
+            vectorizer = joblib.load(os.path.join(self.index_path, "vectorizer.joblib"))
+            watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+
+            with self._lock:
+                self._install(vectorizer, matrix, array("ids"), attributes, watermark)
+            logger.info(f"Manufacturer text index loaded: {matrix.shape[0]} documents")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading manufacturer text index: {str(e)}")
+            return False
+
+    def _install(
+        self,
+        vectorizer: TfidfVectorizer,
+        matrix: sparse.csr_matrix,
+        ids: np.ndarray,
+        attributes: Dict[str, np.ndarray],
+        watermark: Optional[datetime]
+    ) -> None:
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.ids = ids
+        self.attributes = attributes
+        self.watermark = watermark
+        self._positions = {int(manufacturer_id): position for position, manufacturer_id in enumerate(ids)}
+        self._live = np.ones(len(ids), dtype=bool)
+        self._overrides = {}
+        self._mask_cache = {}
+
+    # Incremental updates
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Re-index manufacturers updated since the watermark; returns rows changed"""
+        if not force and time.monotonic() - self._last_sync < self.sync_interval_seconds:
+            return 0
+
+        with self._lock:
+            query = db.query(Manufacturer)
+            if self.watermark is not None:
+                # Rows stamped exactly at the watermark may have been written after it was read
+                query = query.filter(Manufacturer.updated_at >= self.watermark)
+            changed = query.all()
+
+            for manufacturer in changed:
+                self.update_manufacturer(manufacturer)
+                if manufacturer.updated_at and (self.watermark is None or manufacturer.updated_at > self.watermark):
+                    self.watermark = manufacturer.updated_at
+            self._last_sync = time.monotonic()
+
+            if len(self._overrides) > max(self.compact_min_rows, self.compact_ratio * len(self.ids)):
+                logger.info(f"Compacting manufacturer text index ({len(self._overrides)} override rows)")
+                self.rebuild(db)
+
+        return len(changed)
+
+    def update_manufacturer(self, manufacturer: Manufacturer) -> None:
+        """Re-vectorize one manufacturer with the fitted vocabulary"""
+        with self._lock:
+            if manufacturer.is_active and manufacturer.is_verified:
+                vector = self.vectorizer.transform([self.text_fn(manufacturer)]).tocsr()
+                override = (vector, _filter_attributes(manufacturer))
+            else:
+                override = None
+            self._set_override(manufacturer.id, override)
+
+    def remove_manufacturer(self, manufacturer_id: int) -> None:
+        with self._lock:
+            self._set_override(manufacturer_id, None)
+
+    def _set_override(self, manufacturer_id: int, override) -> None:
+        position = self._positions.get(manufacturer_id)
+        if position is not None and self._live[position]:
+            # Copy on write so concurrent searches keep a consistent mask
+            live = self._live.copy()
+            live[position] = False
+            self._live = live
+        self._overrides[manufacturer_id] = override
+
+    # Querying
+
+    def search(
+        self,
+        search_text: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 20,
+        min_similarity: float = 0.1
+    ) -> List[Tuple[int, float]]:
+        """Top manufacturer ids by cosine similarity to the search text"""
+        if not self.is_ready:
+            raise RuntimeError("Manufacturer text index has not been built")
+
+        filters = filters or {}
+        with self._lock:
+            vectorizer, matrix, ids = self.vectorizer, self.matrix, self.ids
+            mask = self._live & self._filter_mask(filters)
+            overrides = list(self._overrides.items())
+
+        query_vector = vectorizer.transform([search_text]).tocsr()
+
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        scores = np.asarray((matrix @ query_vector.T).todense()).ravel()
+        keep = mask & (scores > min_similarity)
+        candidate_ids = ids[keep]
+        candidate_scores = scores[keep]
+
+        extra_ids, extra_scores = [], []
+        query_t = query_vector.T
+        for manufacturer_id, override in overrides:
+            if override is None or not _matches_filters(override[1], filters):
+                continue
+            score = float((override[0] @ query_t).toarray()[0, 0])
+            if score > min_similarity:
+                extra_ids.append(manufacturer_id)
+                extra_scores.append(score)
+        if extra_ids:
+            candidate_ids = np.concatenate([candidate_ids, np.array(extra_ids, dtype=ids.dtype)])
+            candidate_scores = np.concatenate([candidate_scores, np.array(extra_scores)])
+
+        if len(candidate_scores) > limit:
+            top = np.argpartition(-candidate_scores, limit - 1)[:limit]
+            candidate_ids, candidate_scores = candidate_ids[top], candidate_scores[top]
+        order = np.argsort(-candidate_scores, kind="stable")
+        return [(int(candidate_ids[i]), float(candidate_scores[i])) for i in order]
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask over base rows for the given filters"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        terms = []
+        for field in ("country", "state"):
+            if filters.get(field):
+                terms.append((field, filters[field]))
+        if filters.get("city"):
+            terms.append(("city", filters["city"].lower()))
+        if filters.get("min_rating"):
+            terms.append(("rating", filters["min_rating"]))
+        for filter_key in CAPABILITY_FILTERS:
+            for term in filters.get(filter_key) or []:
+                terms.append((filter_key, term.lower()))
+
+        for term in terms:
+            term_mask = self._mask_cache.get(term)
+            if term_mask is None:
+                term_mask = self._compute_mask(*term)
+                if len(self._mask_cache) >= self.max_cached_masks:
+                    self._mask_cache.clear()
+                self._mask_cache[term] = term_mask
+            mask &= term_mask
+        return mask
+
+    def _compute_mask(self, field: str, value: Any) -> np.ndarray:
+        values = self.attributes[field]
+        if field in ("country", "state"):
+            return values == value
+        if field == "rating":
+            with np.errstate(invalid="ignore"):
+                return values >= value
+        # Substring match, as ILIKE / LIKE '%value%' in the SQL filters
+        return np.char.find(values, value) >= 0
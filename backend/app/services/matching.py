@@ -4,6 +4,7 @@ import logging
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, text
 from fuzzywuzzy import fuzz, process
@@ -13,6 +14,9 @@ from enum import Enum
 from app.models.producer import Manufacturer
 from app.models.order import Order
 from app.core.config import settings
+from app.services.geo_index import coordinates, haversine_km, order_location, proximity_score, within_radius
+from app.services.manufacturer_catalog import manufacturer_catalog
+from app.services.matching_kernel import IntelligentScoringKernel
 
 
 # Configure logging for algorithm tuning and A/B testing
@@ -108,6 +112,9 @@ class IntelligentMatchingService:
         # Performance optimization settings
         self.enable_caching = os.getenv('ENABLE_MATCHING_CACHE', 'true').lower() == 'true'
         self.cache_ttl_minutes = int(os.getenv('CACHE_TTL_MINUTES', 30))
+        
+        # Shared in-memory manufacturer catalog candidates are taken from
+        self.catalog = manufacturer_catalog
     
     def find_best_matches(
         self,
@@ -115,7 +122,8 @@ class IntelligentMatchingService:
         order: Order,
         max_results: int = 10,
         enable_fallback: bool = True,
-        ab_test_group: Optional[str] = None
+        ab_test_group: Optional[str] = None,
+        vectorized: bool = True
     ) -> List[MatchResult]:
         """
         Find best manufacturer matches for an order using intelligent scoring
@@ -126,6 +134,8 @@ class IntelligentMatchingService:
             max_results: Maximum number of results to return
             enable_fallback: Whether to enable fallback mechanisms
             ab_test_group: A/B testing group identifier
+            vectorized: Score candidates as columns with IntelligentScoringKernel
+                instead of one manufacturer at a time
         """
         start_time = datetime.now()
         
@@ -153,12 +163,15 @@ class IntelligentMatchingService:
                 return []
             
             # Score all manufacturers
-            scored_matches = []
-            for manufacturer in manufacturers:
-                match_result = self._calculate_comprehensive_score(manufacturer, order)
-                
-                if match_result.total_score >= self.min_match_score:
-                    scored_matches.append(match_result)
+            if vectorized:
+                scored_matches = self._score_manufacturers_vectorized(manufacturers, order)
+            else:
+                scored_matches = []
+                for manufacturer in manufacturers:
+                    match_result = self._calculate_comprehensive_score(manufacturer, order)
+                    
+                    if match_result.total_score >= self.min_match_score:
+                        scored_matches.append(match_result)
             
             # Sort by total score descending
             scored_matches.sort(key=lambda x: x.total_score, reverse=True)
@@ -191,53 +204,67 @@ class IntelligentMatchingService:
             return []
     
     def _get_eligible_manufacturers(self, db: Session, order: Order) -> List[Manufacturer]:
-        """Get manufacturers eligible for matching with performance optimization"""
-        
-        # Base query with essential filters
-        query = db.query(Manufacturer).filter(
-            and_(
-                Manufacturer.is_active == True,
-                Manufacturer.is_verified == True,
-                Manufacturer.stripe_onboarding_completed == True
-            )
-        )
+        """Get manufacturers eligible for matching from the shared catalog"""
+        
+        # Active, verified and onboarded for payments
+        snapshot = self.catalog.snapshot(db)
+        manufacturers = snapshot.matchable()
         
         # MOQ filtering
         if order.quantity:
-            query = query.filter(
-                or_(
-                    Manufacturer.min_order_quantity <= order.quantity,
-                    Manufacturer.min_order_quantity.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.min_order_quantity is None or m.min_order_quantity <= order.quantity
+            ]
         
         # Budget filtering
         if order.budget_max_pln:
-            query = query.filter(
-                or_(
-                    Manufacturer.min_order_value_pln <= order.budget_max_pln,
-                    Manufacturer.min_order_value_pln.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.min_order_value_pln is None or m.min_order_value_pln <= order.budget_max_pln
+            ]
         
         # Lead time filtering
         if order.delivery_deadline:
             days_until_deadline = (order.delivery_deadline - datetime.now()).days
-            query = query.filter(
-                or_(
-                    Manufacturer.standard_lead_time_days <= days_until_deadline,
-                    Manufacturer.standard_lead_time_days.is_(None)
-                )
-            )
+            manufacturers = [
+                m for m in manufacturers
+                if m.standard_lead_time_days is None or m.standard_lead_time_days <= days_until_deadline
+            ]
         
         # Geographic pre-filtering if specific location required
         if order.preferred_country:
-            query = query.filter(Manufacturer.country == order.preferred_country)
+            manufacturers = [m for m in manufacturers if m.country == order.preferred_country]
         
-        # Order by recent activity for better performance
-        query = query.order_by(Manufacturer.last_activity_date.desc())
+        # Radius pre-filtering around the order's location
+        location = self._order_location(order)
+        if order.max_distance_km and location is not None:
+            manufacturers = within_radius(manufacturers, snapshot.geo, location, order.max_distance_km)
         
-        return query.all()
+        # Order by recent activity, never active last
+        active = sorted(
+            (m for m in manufacturers if m.last_activity_date is not None),
+            key=lambda m: m.last_activity_date, reverse=True
+        )
+        return active + [m for m in manufacturers if m.last_activity_date is None]
+    
+    def _score_manufacturers_vectorized(self, manufacturers: List[Manufacturer], order: Order) -> List[MatchResult]:
+        """Score all manufacturers as columns and build results for those above the minimum score"""
+        
+        kernel = IntelligentScoringKernel(self)
+        scores = kernel.score(kernel.build_features(manufacturers, order), order)
+        survivors = scores.select(scores['total_score'] >= self.min_match_score)
+        
+        return [
+            self._build_match_result(
+                manufacturer, order,
+                capability_score=float(survivors['capability'][index]),
+                geographic_score=float(survivors['geographic'][index]),
+                performance_score=float(survivors['performance'][index]),
+                total_score=float(survivors['total_score'][index])
+            )
+            for index, manufacturer in enumerate(survivors.manufacturers)
+        ]
     
     def _calculate_comprehensive_score(self, manufacturer: Manufacturer, order: Order) -> MatchResult:
         """Calculate comprehensive matching score with detailed breakdown"""
@@ -254,6 +281,21 @@ class IntelligentMatchingService:
             performance_score * self.weights.performance_weight
         )
         
+        return self._build_match_result(
+            manufacturer, order, capability_score, geographic_score, performance_score, total_score
+        )
+    
+    def _build_match_result(
+        self,
+        manufacturer: Manufacturer,
+        order: Order,
+        capability_score: float,
+        geographic_score: float,
+        performance_score: float,
+        total_score: float
+    ) -> MatchResult:
+        """Assemble a MatchResult with reasons, availability and risks from computed scores"""
+        
         # Calculate additional metrics
         distance_km = self._calculate_distance(manufacturer, order)
         match_reasons = self._generate_match_reasons(manufacturer, order, {
@@ -392,32 +434,32 @@ class IntelligentMatchingService:
         distance_km = self._calculate_distance(manufacturer, order)
         
         if distance_km is not None:
-            if distance_km <= self.local_radius_km:
-                score += 0.6  # Local manufacturer bonus
-            elif distance_km <= 200:
-                score += 0.5  # Regional
-            elif distance_km <= 500:
-                score += 0.3  # National
-            elif distance_km <= 1000:
-                score += 0.2  # Extended range
-            else:
-                score += 0.1  # International
+            score += 0.6 * float(proximity_score(distance_km, self.local_radius_km))
         else:
             score += 0.3  # Neutral if coordinates not available
         
         return min(score, 1.0)
     
     def _calculate_distance(self, manufacturer: Manufacturer, order: Order) -> Optional[float]:
-        """Calculate distance using haversine formula"""
+        """Distance in km between a manufacturer and the order's location, when both are known"""
         
-        # For now, return None if coordinates not available
-        # In production, you might geocode addresses or use default city coordinates
-        if not manufacturer.latitude or not manufacturer.longitude:
-            return None
+        distance_km = self._calculate_distances([manufacturer], order)[0]
+        return None if math.isnan(distance_km) else float(distance_km)
+    
+    def _calculate_distances(self, manufacturers: List[Manufacturer], order: Order) -> np.ndarray:
+        """Haversine distances in km for a whole candidate set; NaN where unknown"""
+        
+        location = self._order_location(order)
+        if location is None:
+            return np.full(len(manufacturers), np.nan)
+        latitudes, longitudes = coordinates(manufacturers)
+        return haversine_km(location[0], location[1], latitudes, longitudes)
+    
+    def _order_location(self, order: Order) -> Optional[Tuple[float, float]]:
+        """Where the order is delivered: its preferred city, else its preferred country"""
         
-        # You would need order location coordinates here
-        # For now, return a placeholder calculation
-        return None
+        snapshot = self.catalog.current
+        return order_location(order, snapshot.geo if snapshot is not None else None)
     
     def _calculate_performance_score(self, manufacturer: Manufacturer, order: Order) -> float:
         """Calculate historical performance score"""
@@ -610,13 +652,20 @@ class IntelligentMatchingService:
         
         logger.info(f"Applying fallback strategy for order {order.id}")
         
-        # Strategy 1: Relax capability requirements
-        relaxed_manufacturers = db.query(Manufacturer).filter(
-            and_(
-                Manufacturer.is_active == True,
-                Manufacturer.is_verified == True
-            )
-        ).limit(max_results * 2).all()
+        # Strategy 1: Relax capability requirements, nearest manufacturers first
+        snapshot = self.catalog.snapshot(db)
+        relaxed_manufacturers = []
+        location = self._order_location(order)
+        if location is not None:
+            relaxed_manufacturers = [
+                manufacturer for manufacturer, _ in snapshot.geo.nearest(location[0], location[1], max_results * 2)
+                if manufacturer.is_verified
+            ]
+        nearest_ids = {manufacturer.id for manufacturer in relaxed_manufacturers}
+        relaxed_manufacturers += [
+            manufacturer for manufacturer in snapshot
+            if manufacturer.is_verified and manufacturer.id not in nearest_ids
+        ][:max_results * 2 - len(relaxed_manufacturers)]
         
         if relaxed_manufacturers:
             matches = []
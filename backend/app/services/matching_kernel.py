@@ -0,0 +1,630 @@
+"""
+Columnar scoring kernel for the matching engines.
+
+The per-row scorers in smart_matching_engine.py and matching.py walk one
+manufacturer at a time through Python dicts. This module builds a
+candidates x features matrix once per order - ratings, on-time rate,
+utilization, lead time, country match, prefetched history and the fuzzy
+capability scores - and then applies weights, thresholds, penalties and
+confidence as NumPy array operations over the whole candidate set.
+
+String matching (certification relevance, region lookups) still runs per
+manufacturer while the matrix is built; fuzzy capability terms are looked
+up in the engine's CapabilityIndex. Each term is matched once and reused
+by both the capability score and the mismatch penalties. Arithmetic is
+performed in the same order as the per-row scorers so both paths produce
+the same floats; the per-row code is the reference implementation and
+tests/test_matching_kernel.py checks parity.
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.geo_index import proximity_score
+
+logger = logging.getLogger(__name__)
+
+
+# Order in which SmartMatchingEngine collects its component scores; the
+# confidence variance is computed over this sequence.
+SMART_SCORE_COMPONENTS = (
+    'capability', 'performance', 'geographic', 'quality', 'cost_efficiency', 'availability'
+)
+
+
+@dataclass
+class CandidateFeatures:
+    """Candidates x features matrix for one order, stored column-wise"""
+    manufacturers: List[Any]
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.manufacturers)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+@dataclass
+class KernelScores:
+    """Per-candidate score columns produced by a scoring kernel"""
+    manufacturers: List[Any]
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.manufacturers)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def select(self, mask: np.ndarray) -> 'KernelScores':
+        """Keep only the candidates where mask is true"""
+        indices = np.flatnonzero(mask)
+        return KernelScores(
+            manufacturers=[self.manufacturers[i] for i in indices],
+            columns={name: values[indices] for name, values in self.columns.items()}
+        )
+
+
+def _value_or_zero(value: Any) -> float:
+    """Numeric column value; None becomes 0.0 so truthiness checks become != 0"""
+    return float(value) if value else 0.0
+
+
+def _accumulate(total: np.ndarray, applies: np.ndarray, values: Any) -> np.ndarray:
+    """Add values where the term applies; adding 0.0 elsewhere keeps floats exact"""
+    return total + np.where(applies, values, 0.0)
+
+
+class SmartScoringKernel:
+    """Vectorized equivalent of SmartMatchingEngine._calculate_enhanced_match_score"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def build_features(
+        self,
+        manufacturers: List[Any],
+        order: Any,
+        stats_by_manufacturer: Dict[int, Any],
+        now: Optional[datetime] = None
+    ) -> CandidateFeatures:
+        """Extract every input the scorers need into one column per feature"""
+
+        now = now or datetime.now()
+        tech_reqs = order.technical_requirements or {}
+        required_certs = tech_reqs.get('certifications', []) if 'certifications' in tech_reqs else []
+        days_until_deadline = (order.delivery_deadline - now).days if order.delivery_deadline else None
+
+        rows = {name: [] for name in (
+            'has_capability_data', 'has_capabilities', 'process_match', 'material_match',
+            'industry_match', 'certification_match', 'industry_mismatch', 'certification_gap',
+            'capacity_mismatch', 'overall_rating', 'on_time_delivery_rate', 'orders_completed',
+            'quality_rating', 'certification_relevance', 'has_latitude', 'same_country',
+            'distance_penalty', 'logistics', 'has_utilization', 'utilization', 'lead_time_days',
+            'rush_available', 'rush_lead_time_days', 'days_since_activity',
+            'quote_count', 'priced_quote_count', 'unit_price_sum', 'recent_quote_count',
+            'recent_accepted_count', 'recent_accepted_orders', 'industry_orders',
+            'industry_successful_orders'
+        )}
+        kept = []
+
+        for manufacturer in manufacturers:
+            try:
+                row = self._extract_row(
+                    manufacturer, order, tech_reqs, required_certs, now,
+                    stats_by_manufacturer.get(manufacturer.id)
+                )
+            except Exception as e:
+                logger.error(f"Error extracting features for manufacturer {manufacturer.id}: {str(e)}")
+                continue
+            kept.append(manufacturer)
+            for name, value in row.items():
+                rows[name].append(value)
+
+        features = CandidateFeatures(manufacturers=kept)
+        for name, values in rows.items():
+            features.columns[name] = np.array(values, dtype=float)
+        features.columns['days_until_deadline'] = np.full(
+            len(kept), np.nan if days_until_deadline is None else float(days_until_deadline)
+        )
+        features.columns['distance_km'] = self.engine._distances_km(kept, order)
+        return features
+
+    def _extract_row(
+        self,
+        manufacturer: Any,
+        order: Any,
+        tech_reqs: Dict[str, Any],
+        required_certs: List[str],
+        now: datetime,
+        stats: Any
+    ) -> Dict[str, float]:
+        """Feature values for a single manufacturer"""
+
+        engine = self.engine
+        capabilities = manufacturer.capabilities or {}
+        has_capability_data = bool(manufacturer.capabilities) and bool(order.technical_requirements)
+        nan = math.nan
+
+        process_match = material_match = industry_match = certification_match = nan
+        industry_mismatch = capacity_mismatch = False
+        certification_gap = 0.0
+
+        if has_capability_data:
+            # Each fuzzy term is matched once and shared by capability and penalties
+            available_processes = capabilities.get('manufacturing_processes', [])
+            if 'manufacturing_process' in tech_reqs and available_processes:
+                process_match = engine._match_capability(
+                    tech_reqs['manufacturing_process'], manufacturer, 'manufacturing_processes'
+                )
+
+            available_materials = capabilities.get('materials', [])
+            if 'material' in tech_reqs and available_materials:
+                material_match = engine._match_capability(
+                    tech_reqs['material'], manufacturer, 'materials'
+                )
+
+            served_industries = capabilities.get('industries_served', [])
+            if order.industry_category and served_industries:
+                industry_match = engine._match_capability(
+                    order.industry_category, manufacturer, 'industries_served'
+                )
+                industry_mismatch = not any(
+                    order.industry_category.lower() in industry.lower()
+                    for industry in served_industries
+                )
+
+            available_certs = capabilities.get('certifications', [])
+            if 'certifications' in tech_reqs and required_certs:
+                if available_certs:
+                    cert_matches = [
+                        engine._match_capability(req_cert, manufacturer, 'certifications')
+                        for req_cert in required_certs
+                    ]
+                    certification_match = sum(cert_matches) / len(cert_matches)
+                missing = sum(
+                    1 for req_cert in required_certs
+                    if not any(req_cert.lower() in avail_cert.lower() for avail_cert in available_certs)
+                )
+                certification_gap = missing / len(required_certs)
+
+            if 'quantity' in tech_reqs and hasattr(manufacturer, 'min_order_quantity'):
+                required_qty = tech_reqs.get('quantity', 0)
+                min_qty = getattr(manufacturer, 'min_order_quantity', 0) or 0
+                max_qty = getattr(manufacturer, 'max_order_quantity', float('inf')) or float('inf')
+                capacity_mismatch = required_qty < min_qty or required_qty > max_qty
+
+        certification_relevance = nan
+        if manufacturer.capabilities and manufacturer.capabilities.get('certifications'):
+            certification_relevance = engine._assess_certification_relevance(
+                manufacturer.capabilities['certifications'], order
+            )
+
+        same_country = bool(order.preferred_country) and manufacturer.country == order.preferred_country
+        distance_penalty = 0.0
+        if order.preferred_country and not same_country:
+            distance_penalty = engine._calculate_distance_penalty(
+                manufacturer.country, order.preferred_country
+            )
+
+        days_since_activity = nan
+        if manufacturer.last_activity_date:
+            days_since_activity = (now - manufacturer.last_activity_date).days
+
+        return {
+            'has_capability_data': has_capability_data,
+            'has_capabilities': bool(manufacturer.capabilities),
+            'process_match': process_match,
+            'material_match': material_match,
+            'industry_match': industry_match,
+            'certification_match': certification_match,
+            'industry_mismatch': industry_mismatch,
+            'certification_gap': certification_gap,
+            'capacity_mismatch': capacity_mismatch,
+            'overall_rating': _value_or_zero(manufacturer.overall_rating),
+            'on_time_delivery_rate': _value_or_zero(manufacturer.on_time_delivery_rate),
+            'orders_completed': _value_or_zero(manufacturer.total_orders_completed),
+            'quality_rating': _value_or_zero(manufacturer.quality_rating),
+            'certification_relevance': certification_relevance,
+            'has_latitude': bool(getattr(manufacturer, 'latitude', None)),
+            'same_country': same_country,
+            'distance_penalty': distance_penalty,
+            'logistics': engine._calculate_logistics_complexity(manufacturer, order),
+            'has_utilization': manufacturer.capacity_utilization_pct is not None,
+            'utilization': float(manufacturer.capacity_utilization_pct or 0.0),
+            'lead_time_days': _value_or_zero(manufacturer.standard_lead_time_days),
+            'rush_available': bool(manufacturer.rush_order_available),
+            # A missing rush lead time can never meet the deadline
+            'rush_lead_time_days': (
+                float(manufacturer.rush_order_lead_time_days)
+                if manufacturer.rush_order_lead_time_days is not None else math.inf
+            ),
+            'days_since_activity': days_since_activity,
+            'quote_count': getattr(stats, 'quote_count', 0),
+            'priced_quote_count': getattr(stats, 'priced_quote_count', 0),
+            'unit_price_sum': getattr(stats, 'unit_price_sum', 0.0),
+            'recent_quote_count': getattr(stats, 'recent_quote_count', 0),
+            'recent_accepted_count': getattr(stats, 'recent_accepted_count', 0),
+            'recent_accepted_orders': getattr(stats, 'recent_accepted_orders', 0),
+            'industry_orders': getattr(stats, 'industry_orders', 0),
+            'industry_successful_orders': getattr(stats, 'industry_successful_orders', 0),
+        }
+
+    def score(self, features: CandidateFeatures, order: Any) -> KernelScores:
+        """Apply weights, penalties and confidence to the whole candidate set"""
+
+        engine = self.engine
+        f = features.columns
+        n = len(features)
+        zeros = np.zeros(n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capability = self._capability(f, zeros)
+            penalties = self._penalties(f, zeros, engine.penalty_weights)
+
+            # Historical statistics
+            recent_performance = np.where(
+                f['recent_quote_count'] == 0,
+                0.5,
+                np.minimum((f['recent_accepted_count'] / f['recent_quote_count']) * 1.2, 1.0)
+            )
+            consistency = np.where(f['recent_accepted_orders'] < 3, 0.5, 0.7)
+            average_unit_price = f['unit_price_sum'] / f['priced_quote_count']
+            market_avg = 1000.0
+            cost_efficiency = np.where(
+                (f['quote_count'] == 0) | (f['priced_quote_count'] == 0),
+                0.5,
+                np.select(
+                    [
+                        average_unit_price <= market_avg * 0.8,
+                        average_unit_price <= market_avg,
+                        average_unit_price <= market_avg * 1.2
+                    ],
+                    [0.9, 0.7, 0.5],
+                    default=0.3
+                )
+            )
+            historical_success = np.where(
+                f['industry_orders'] == 0,
+                0.5,
+                f['industry_successful_orders'] / f['industry_orders']
+            )
+
+        # Performance
+        performance = zeros
+        performance = _accumulate(
+            performance, f['overall_rating'] != 0,
+            np.minimum(f['overall_rating'] / 5.0, 1.0) * 0.3
+        )
+        performance = _accumulate(
+            performance, f['on_time_delivery_rate'] != 0,
+            (f['on_time_delivery_rate'] / 100.0) * 0.2
+        )
+        performance = _accumulate(
+            performance, f['orders_completed'] != 0,
+            np.minimum(f['orders_completed'] / 100.0, 1.0) * 0.1
+        )
+        performance = np.minimum(performance + recent_performance * 0.4, 1.0)
+
+        # Geography
+        base_score = 0.3
+        if order.preferred_country:
+            geographic = np.where(
+                f['same_country'] != 0,
+                base_score + 0.5,
+                base_score + 0.2 - f['distance_penalty']
+            )
+        else:
+            geographic = np.full(n, base_score + 0.3)
+        distance_km = f['distance_km']
+        geographic = np.where(
+            np.isnan(distance_km), geographic, base_score + 0.5 * proximity_score(distance_km)
+        )
+        geographic = np.clip(geographic + f['logistics'], 0.0, 1.0)
+
+        # Quality
+        quality = zeros
+        quality = _accumulate(quality, f['quality_rating'] != 0, (f['quality_rating'] / 5.0) * 0.5)
+        certification_relevance = f['certification_relevance']
+        quality = _accumulate(
+            quality, ~np.isnan(certification_relevance), certification_relevance * 0.3
+        )
+        quality = np.minimum(quality + consistency * 0.2, 1.0)
+
+        # Availability
+        utilization = f['utilization'] / 100.0
+        availability = np.where(
+            f['has_utilization'] != 0,
+            np.select([(utilization >= 0.7) & (utilization <= 0.8), utilization < 0.7], [0.4, 0.35], default=0.2),
+            0.3
+        )
+        days_until_deadline = f['days_until_deadline']
+        lead_time_score = np.where(
+            (f['lead_time_days'] != 0) & ~np.isnan(days_until_deadline),
+            np.select(
+                [
+                    f['lead_time_days'] <= days_until_deadline,
+                    (f['rush_available'] != 0) & (f['rush_lead_time_days'] <= days_until_deadline),
+                    f['rush_available'] != 0
+                ],
+                [0.35, 0.25, 0.1],
+                default=0.05
+            ),
+            0.25
+        )
+        days_since_activity = f['days_since_activity']
+        activity_score = np.where(
+            np.isnan(days_since_activity),
+            0.15,
+            np.select([days_since_activity <= 7, days_since_activity <= 30], [0.25, 0.2], default=0.1)
+        )
+        availability = np.minimum(availability + lead_time_score + activity_score, 1.0)
+
+        components = {
+            'capability': capability,
+            'performance': performance,
+            'geographic': geographic,
+            'quality': quality,
+            'cost_efficiency': cost_efficiency,
+            'availability': availability,
+        }
+
+        # Weighted total in the engine's weight order
+        total_score = zeros
+        for key, weight in engine.weights.items():
+            total_score = total_score + components[engine.score_weight_keys[key]] * weight
+        final_score = np.maximum(0.0, total_score - penalties)
+
+        confidence = self._confidence(f, components, penalties, order, zeros)
+
+        strength = np.select(
+            [
+                (final_score >= 0.8) & (confidence >= 0.8) & (penalties < 0.1),
+                (final_score >= 0.6) & (confidence >= 0.65) & (penalties < 0.2)
+            ],
+            ['STRONG', 'MODERATE'],
+            default='WEAK'
+        )
+
+        return KernelScores(
+            manufacturers=features.manufacturers,
+            columns={
+                'total_score': final_score,
+                'capability': capability,
+                'performance': performance,
+                'geographic': geographic,
+                'quality': quality,
+                'cost_efficiency': cost_efficiency,
+                'availability': availability,
+                'historical_success': historical_success,
+                'penalties': penalties,
+                'confidence': confidence,
+                'strength': strength,
+            }
+        )
+
+    def _capability(self, f: Dict[str, np.ndarray], zeros: np.ndarray) -> np.ndarray:
+        """Weighted average of the matched capability terms"""
+
+        total = zeros
+        weight_sum = zeros
+        for column, weight in (
+            ('process_match', 0.45),
+            ('material_match', 0.35),
+            ('industry_match', 0.15),
+            ('certification_match', 0.05)
+        ):
+            applies = ~np.isnan(f[column])
+            total = _accumulate(total, applies, f[column] * weight)
+            weight_sum = _accumulate(weight_sum, applies, weight)
+
+        score = np.where(weight_sum > 0, total / weight_sum, 0.1)
+        score = np.where(score < 0.3, score * 0.5, score)
+        return np.where(f['has_capability_data'] != 0, np.minimum(score, 1.0), 0.1)
+
+    def _penalties(
+        self,
+        f: Dict[str, np.ndarray],
+        zeros: np.ndarray,
+        penalty_weights: Dict[str, float]
+    ) -> np.ndarray:
+        """Mismatch penalties, capped at 0.6"""
+
+        penalties = zeros
+        penalties = _accumulate(penalties, f['industry_mismatch'] != 0, penalty_weights['industry_mismatch'])
+        penalties = penalties + f['certification_gap'] * penalty_weights['certification_gap']
+        penalties = _accumulate(penalties, f['capacity_mismatch'] != 0, penalty_weights['capacity_mismatch'])
+        for column, key in (('material_match', 'material_incompatibility'), ('process_match', 'process_mismatch')):
+            poor_match = ~np.isnan(f[column]) & (f[column] < 0.3)
+            penalties = _accumulate(penalties, poor_match, (0.3 - f[column]) * penalty_weights[key])
+        return np.where(f['has_capability_data'] != 0, np.minimum(penalties, 0.6), 0.3)
+
+    def _confidence(
+        self,
+        f: Dict[str, np.ndarray],
+        components: Dict[str, np.ndarray],
+        penalties: np.ndarray,
+        order: Any,
+        zeros: np.ndarray
+    ) -> np.ndarray:
+        """Data completeness, score consistency and penalty impact"""
+
+        data_completeness = zeros
+        data_completeness = _accumulate(data_completeness, f['has_capabilities'] != 0, 0.25)
+        data_completeness = _accumulate(data_completeness, f['overall_rating'] != 0, 0.15)
+        data_completeness = _accumulate(data_completeness, f['orders_completed'] > 5, 0.15)
+        data_completeness = _accumulate(data_completeness, f['has_latitude'] != 0, 0.1)
+        if order.technical_requirements:
+            data_completeness = data_completeness + 0.25
+        if getattr(order, 'industry_category', None):
+            data_completeness = data_completeness + 0.1
+
+        values = [components[name] for name in SMART_SCORE_COMPONENTS]
+        average = zeros
+        for value in values:
+            average = average + value
+        average = average / len(values)
+        variance = zeros
+        for value in values:
+            variance = variance + (value - average) ** 2
+        variance = variance / len(values)
+        consistency = np.maximum(0, 1 - variance * 2)
+
+        penalty_impact = np.maximum(0, 1 - penalties * 2)
+        confidence = data_completeness * 0.4 + consistency * 0.4 + penalty_impact * 0.2
+        return np.clip(confidence, 0.0, 1.0)
+
+
+class IntelligentScoringKernel:
+    """Vectorized equivalent of IntelligentMatchingService._calculate_comprehensive_score"""
+
+    # (requirement key, capability key, weight) in the order the per-row scorer adds them
+    CAPABILITY_TERMS = (
+        ('manufacturing_process', 'manufacturing_processes', 0.30),
+        ('material', 'materials', 0.25),
+        ('industry_category', 'industries_served', 0.20),
+        ('industry_standards', 'certifications', 0.15),
+        ('special_requirements', 'special_capabilities', 0.10),
+    )
+
+    def __init__(self, service):
+        self.service = service
+
+    def build_features(self, manufacturers: List[Any], order: Any) -> CandidateFeatures:
+        """Extract every input the scorers need into one column per feature"""
+
+        rows = {name: [] for name in (
+            'has_capability_data', 'manufacturing_process', 'material', 'industry_category',
+            'industry_standards', 'special_requirements', 'same_country',
+            'orders_completed', 'overall_rating', 'on_time_delivery_rate', 'communication_rating'
+        )}
+        kept = []
+
+        for manufacturer in manufacturers:
+            try:
+                row = self._extract_row(manufacturer, order)
+            except Exception as e:
+                logger.error(f"Error extracting features for manufacturer {manufacturer.id}: {str(e)}")
+                continue
+            kept.append(manufacturer)
+            for name, value in row.items():
+                rows[name].append(value)
+
+        features = CandidateFeatures(manufacturers=kept)
+        for name, values in rows.items():
+            features.columns[name] = np.array(values, dtype=float)
+        features.columns['distance_km'] = self.service._calculate_distances(kept, order)
+        return features
+
+    def _extract_row(self, manufacturer: Any, order: Any) -> Dict[str, float]:
+        """Feature values for a single manufacturer"""
+
+        service = self.service
+        tech_reqs = order.technical_requirements
+        manufacturer_caps = manufacturer.capabilities
+        has_capability_data = bool(manufacturer_caps) and bool(tech_reqs)
+        row = {'has_capability_data': has_capability_data}
+
+        for requirement_key, capability_key, _ in self.CAPABILITY_TERMS:
+            row[requirement_key] = math.nan
+            if not has_capability_data:
+                continue
+            if requirement_key not in tech_reqs or capability_key not in manufacturer_caps:
+                continue
+
+            available = manufacturer_caps[capability_key]
+            if requirement_key == 'industry_category':
+                required_industry = order.industry_category or tech_reqs.get('industry_category')
+                if required_industry:
+                    row[requirement_key] = service._fuzzy_match_list(required_industry, available)
+            elif requirement_key in ('industry_standards', 'special_requirements'):
+                required_terms = tech_reqs[requirement_key]
+                if isinstance(required_terms, list):
+                    term_scores = [service._fuzzy_match_list(term, available) for term in required_terms]
+                    row[requirement_key] = sum(term_scores) / len(term_scores) if term_scores else 0
+            else:
+                row[requirement_key] = service._fuzzy_match_list(tech_reqs[requirement_key], available)
+
+        row.update({
+            'same_country': bool(order.preferred_country) and manufacturer.country == order.preferred_country,
+            'orders_completed': float(manufacturer.total_orders_completed),
+            'overall_rating': _value_or_zero(manufacturer.overall_rating),
+            'on_time_delivery_rate': _value_or_zero(manufacturer.on_time_delivery_rate),
+            'communication_rating': _value_or_zero(manufacturer.communication_rating),
+        })
+        return row
+
+    def score(self, features: CandidateFeatures, order: Any) -> KernelScores:
+        """Apply the configured weights to the whole candidate set"""
+
+        service = self.service
+        f = features.columns
+        n = len(features)
+        zeros = np.zeros(n)
+
+        # Capability
+        total = zeros
+        weight_sum = zeros
+        for requirement_key, _, weight in self.CAPABILITY_TERMS:
+            applies = ~np.isnan(f[requirement_key])
+            total = _accumulate(total, applies, f[requirement_key] * weight)
+            weight_sum = _accumulate(weight_sum, applies, weight)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capability = np.where(weight_sum > 0, total / weight_sum, 0.1)
+        capability = np.where(f['has_capability_data'] != 0, capability, 0.1)
+
+        # Geography
+        if not order.preferred_country and not order.max_distance_km:
+            geographic = np.full(n, 0.5)
+        else:
+            if order.preferred_country:
+                geographic = np.where(f['same_country'] != 0, 0.4, 0.1)
+            else:
+                geographic = np.full(n, 0.4)
+            distance_km = f['distance_km']
+            distance_score = np.where(
+                np.isnan(distance_km),
+                0.3,
+                0.6 * proximity_score(distance_km, service.local_radius_km)
+            )
+            geographic = np.minimum(geographic + distance_score, 1.0)
+
+        # Performance
+        performance = zeros
+        performance = _accumulate(
+            performance, f['overall_rating'] != 0,
+            np.minimum(f['overall_rating'] / 5.0, 1.0) * 0.4
+        )
+        performance = _accumulate(
+            performance, f['on_time_delivery_rate'] != 0,
+            (f['on_time_delivery_rate'] / 100.0) * 0.3
+        )
+        performance = performance + np.minimum(f['orders_completed'] / 50.0, 1.0) * 0.2
+        performance = _accumulate(
+            performance, f['communication_rating'] != 0,
+            np.minimum(f['communication_rating'] / 5.0, 1.0) * 0.1
+        )
+        performance = np.where(f['orders_completed'] == 0, 0.3, np.minimum(performance, 1.0))
+
+        weights = service.weights
+        total_score = (
+            capability * weights.capability_weight +
+            geographic * weights.geographic_weight +
+            performance * weights.performance_weight
+        )
+
+        return KernelScores(
+            manufacturers=features.manufacturers,
+            columns={
+                'total_score': total_score,
+                'capability': capability,
+                'geographic': geographic,
+                'performance': performance,
+            }
+        )
@@ -0,0 +1,551 @@
+"""
+Two-tier matching result cache shared by the matching engines.
+
+Results are keyed by engine, a hash of the order fields that influence
+matching, and a manufacturer catalog version:
+
+    matching:{engine}:v{catalog_version}:{fingerprint}
+
+Lookups go to a bounded in-process LRU first and fall through to Redis, so
+every API worker and Celery worker shares results computed by any of them.
+When a manufacturer profile, rating or capability changes, the catalog
+version is bumped with INCR and announced on a pub/sub channel.
+Subscribers drop their local LRU; entries stored in Redis under the old
+version are never read again and expire with their TTL, so invalidation
+needs neither KEYS nor SCAN.
+
+Engines that score from quote history (the smart engine's prefetched
+price, acceptance and industry statistics) are keyed by a second version,
+v{catalog_version}.h{quote_history_version}. Quote changes bump only that
+one, on its own key and channel, so a new quote neither flushes the other
+engines' results nor the manufacturer catalog. Bulk UPDATE and DELETE
+statements bump versions too, not just flushed ORM changes.
+
+Values are stored in Redis as JSON. Dataclasses, enums, datetimes and
+decimals are tagged on write and rebuilt on read, but only for types an
+engine registered with register_result_types(), so a payload planted in
+Redis can never construct anything else.
+
+Without Redis the cache degrades to a process-local LRU with a local
+catalog version.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from itertools import chain
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.producer import Manufacturer
+from app.models.quote import ProductionQuote, Quote
+
+logger = logging.getLogger(__name__)
+
+# Order attributes that can change the result of any matching engine
+MATCHING_ORDER_FIELDS = (
+    'id',
+    'technical_requirements',
+    'quantity',
+    'quantity_unit',
+    'prototype_required',
+    'budget_type',
+    'budget_min_pln',
+    'budget_max_pln',
+    'budget_fixed_pln',
+    'budget_per_unit',
+    'delivery_deadline',
+    'delivery_flexibility_days',
+    'preferred_delivery_date',
+    'rush_order',
+    'preferred_country',
+    'preferred_state_province',
+    'preferred_city',
+    'max_distance_km',
+    'international_shipping_ok',
+    'priority',
+    'industry_category',
+    'project_category',
+    'status',
+)
+
+# Manufacturer attributes whose changes do not affect matching
+IGNORED_CATALOG_FIELDS = frozenset({
+    'updated_at',
+    'last_activity_date',
+    'stripe_account_id',
+    'stripe_onboarding_completed',
+})
+
+# Quote attributes read by the smart engine's prefetched manufacturer
+# statistics (price history, acceptance and industry track record)
+QUOTE_HISTORY_FIELDS = frozenset({
+    'manufacturer_id',
+    'order_id',
+    'total_price_pln',
+    'status',
+    'created_at',
+})
+
+# Engines whose results depend on QUOTE_HISTORY_FIELDS
+QUOTE_HISTORY_ENGINES = frozenset({'smart'})
+
+# Result types that may be rebuilt from Redis payloads, by qualified name
+_RESULT_TYPES: Dict[str, type] = {}
+
+
+def register_result_types(*types: type) -> None:
+    """Allow dataclasses and enums of an engine's cached results to be rebuilt on read"""
+    for result_type in types:
+        _RESULT_TYPES[_type_name(result_type)] = result_type
+
+
+def _type_name(result_type: type) -> str:
+    return f"{result_type.__module__}.{result_type.__qualname__}"
+
+
+def _encode_value(value: Any) -> Any:
+    """json.dumps() default: tag values JSON has no type for"""
+    if is_dataclass(value) and not isinstance(value, type):
+        return {
+            '__type__': _type_name(type(value)),
+            'fields': {field.name: getattr(value, field.name) for field in fields(value)}
+        }
+    if isinstance(value, Enum):
+        return {'__type__': _type_name(type(value)), 'value': value.value}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not a cacheable result type")
+
+
+def _decode_object(payload: Dict[str, Any]) -> Any:
+    """json.loads() object hook: rebuild tagged values of registered types"""
+    if '__type__' in payload:
+        result_type = _RESULT_TYPES.get(payload['__type__'])
+        if result_type is None:
+            raise ValueError(f"Unregistered result type {payload['__type__']}")
+        if 'fields' in payload:
+            return result_type(**payload['fields'])
+        return result_type(payload['value'])
+    if '__datetime__' in payload:
+        return datetime.fromisoformat(payload['__datetime__'])
+    if '__date__' in payload:
+        return date.fromisoformat(payload['__date__'])
+    if '__decimal__' in payload:
+        return Decimal(payload['__decimal__'])
+    return payload
+
+
+def encode_result(value: Any) -> bytes:
+    """JSON payload of a cached result"""
+    return json.dumps(value, default=_encode_value, separators=(',', ':')).encode('utf-8')
+
+
+def decode_result(payload: bytes) -> Any:
+    """Result rebuilt from encode_result(); tuples come back as lists"""
+    return json.loads(payload, object_hook=_decode_object)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+
+def order_fingerprint(order: Any, **params: Any) -> str:
+    """Stable hash of the matching-relevant fields of an order plus call parameters"""
+    payload = {field: getattr(order, field, None) for field in MATCHING_ORDER_FIELDS}
+    payload['params'] = params
+    blob = json.dumps(payload, sort_keys=True, default=_json_default)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def params_fingerprint(**params: Any) -> str:
+    """Stable hash of call parameters for engines that are not given an Order"""
+    blob = json.dumps(params, sort_keys=True, default=_json_default)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class EngineCacheStats:
+    """Counters for one matching engine"""
+    hits: int = 0           # Served from either tier
+    local_hits: int = 0     # Served from the in-process LRU
+    redis_hits: int = 0     # Served from Redis and promoted to the LRU
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0      # Dropped from the LRU to stay within capacity
+    errors: int = 0         # Redis failures, treated as misses
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {**asdict(self), 'hit_ratio': self.hits / total if total else 0.0}
+
+
+class MatchingResultCache:
+    """Bounded local LRU in front of Redis, invalidated by catalog version"""
+
+    VERSION_KEY = 'matching:catalog_version'
+    CHANNEL = 'matching:catalog_invalidations'
+    HISTORY_VERSION_KEY = 'matching:quote_history_version'
+    HISTORY_CHANNEL = 'matching:quote_history_invalidations'
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        use_redis: bool = True,
+        max_local_entries: int = 1000,
+        default_ttl_seconds: int = 900,
+        redis_retry_seconds: int = 30,
+        history_engines: FrozenSet[str] = QUOTE_HISTORY_ENGINES
+    ):
+        """
+        Args:
+            redis_client: Client to use; by default one is created lazily
+                from settings.REDIS_URL
+            use_redis: Set to False for a process-local cache only
+            max_local_entries: Entries kept in the in-process LRU
+            default_ttl_seconds: TTL when set() is not given one
+            redis_retry_seconds: Delay before reconnecting after Redis
+                turned out to be unavailable
+            history_engines: Engines whose results are also keyed by the
+                quote history version
+        """
+        self.use_redis = use_redis
+        self.max_local_entries = max_local_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        self.redis_retry_seconds = redis_retry_seconds
+        self.history_engines = frozenset(history_engines)
+
+        self._redis = redis_client
+        self._redis_retry_at = 0.0
+        # key -> (monotonic expiry, engine, value)
+        self._local: 'OrderedDict[str, Tuple[float, str, Any]]' = OrderedDict()
+        self._stats: Dict[str, EngineCacheStats] = {}
+        # version key -> version
+        self._versions: Dict[str, int] = {}
+        self._channel_keys = {self.CHANNEL: self.VERSION_KEY, self.HISTORY_CHANNEL: self.HISTORY_VERSION_KEY}
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.RLock()
+
+    # Public API
+
+    def get(self, engine: str, fingerprint: str) -> Optional[Any]:
+        """Cached result for an engine and fingerprint, or None"""
+        stats = self._engine_stats(engine)
+        key = self._key(engine, fingerprint)
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._local.move_to_end(key)
+                    stats.hits += 1
+                    stats.local_hits += 1
+                    return entry[2]
+                del self._local[key]
+
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.get(key)
+                pipe.ttl(key)
+                payload, ttl = pipe.execute()
+                if payload is not None:
+                    value = decode_result(payload)
+                    self._store_local(key, engine, value, ttl if ttl and ttl > 0 else self.default_ttl_seconds)
+                    stats.hits += 1
+                    stats.redis_hits += 1
+                    return value
+            except Exception as e:
+                logger.error(f"Matching cache get error for {engine}: {e}")
+                stats.errors += 1
+
+        stats.misses += 1
+        return None
+
+    def set(self, engine: str, fingerprint: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        """Store a result in both tiers"""
+        stats = self._engine_stats(engine)
+        ttl_seconds = ttl_seconds or self.default_ttl_seconds
+        key = self._key(engine, fingerprint)
+
+        self._store_local(key, engine, value, ttl_seconds)
+        stats.sets += 1
+
+        client = self._client()
+        if client is not None:
+            try:
+                client.setex(key, ttl_seconds, encode_result(value))
+            except Exception as e:
+                logger.error(f"Matching cache set error for {engine}: {e}")
+                stats.errors += 1
+
+    def catalog_version(self) -> int:
+        """Current manufacturer catalog version"""
+        return self._current_version(self.VERSION_KEY)
+
+    def quote_history_version(self) -> int:
+        """Current version of the quote history behind history_engines"""
+        return self._current_version(self.HISTORY_VERSION_KEY)
+
+    def bump_catalog_version(self, reason: str = '') -> int:
+        """Invalidate every cached result in all processes"""
+        version = self._bump_version(self.VERSION_KEY, self.CHANNEL)
+        logger.info(f"Manufacturer catalog version bumped to {version}" + (f" ({reason})" if reason else ""))
+        return version
+
+    def bump_quote_history_version(self, reason: str = '') -> int:
+        """Invalidate the cached results of history_engines in all processes"""
+        version = self._bump_version(self.HISTORY_VERSION_KEY, self.HISTORY_CHANNEL)
+        logger.info(f"Quote history version bumped to {version}" + (f" ({reason})" if reason else ""))
+        return version
+
+    def local_size(self) -> int:
+        return len(self._local)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss/eviction counters per engine"""
+        with self._lock:
+            return {engine: stats.to_dict() for engine, stats in self._stats.items()}
+
+    # Internals
+
+    def _key(self, engine: str, fingerprint: str) -> str:
+        version = f"v{self.catalog_version()}"
+        if engine in self.history_engines:
+            version += f".h{self.quote_history_version()}"
+        return f"matching:{engine}:{version}:{fingerprint}"
+
+    def _engine_stats(self, engine: str) -> EngineCacheStats:
+        stats = self._stats.get(engine)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(engine, EngineCacheStats())
+        return stats
+
+    def _store_local(self, key: str, engine: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl_seconds, engine, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                _, (_, evicted_engine, _) = self._local.popitem(last=False)
+                self._engine_stats(evicted_engine).evictions += 1
+
+    def _current_version(self, version_key: str) -> int:
+        version = self._versions.get(version_key)
+        if version is not None and self._listening():
+            return version
+
+        client = self._client()
+        if client is not None:
+            try:
+                self._apply_version(version_key, int(client.get(version_key) or 0))
+                self._ensure_listener(client)
+            except Exception as e:
+                logger.error(f"Matching cache version read error: {e}")
+        with self._lock:
+            return self._versions.setdefault(version_key, 0)
+
+    def _bump_version(self, version_key: str, channel: str) -> int:
+        client = self._client()
+        version = None
+        if client is not None:
+            try:
+                version = int(client.incr(version_key))
+                client.publish(channel, version)
+            except Exception as e:
+                logger.error(f"Matching cache version bump error: {e}")
+        if version is None:
+            version = self._versions.get(version_key, 0) + 1
+
+        self._apply_version(version_key, version)
+        return version
+
+    def _apply_version(self, version_key: str, version: int) -> None:
+        """Adopt a newer version and drop the local entries keyed by older ones"""
+        with self._lock:
+            current = self._versions.get(version_key)
+            if current is not None and version <= current:
+                return
+            if current is not None:
+                if version_key == self.VERSION_KEY:
+                    self._local.clear()
+                else:
+                    stale = [key for key, (_, engine, _) in self._local.items() if engine in self.history_engines]
+                    for key in stale:
+                        del self._local[key]
+            self._versions[version_key] = version
+
+    def _client(self) -> Any:
+        """Redis client, or None while Redis is disabled or unavailable"""
+        if not self.use_redis:
+            return None
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._redis_retry_at:
+            return None
+
+        try:
+            import redis
+            from app.core.config import settings
+
+            client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+            client.ping()
+            self._redis = client
+        except Exception as e:
+            logger.warning(f"Matching cache running without Redis: {e}")
+            self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+        return self._redis
+
+    def _listening(self) -> bool:
+        if self._redis is None:
+            # Local-only: the in-process version is authoritative
+            return True
+        return self._listener is not None and self._listener.is_alive()
+
+    def _ensure_listener(self, client: Any) -> None:
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(
+                target=self._listen, args=(client,), name='matching-cache-invalidations', daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, client: Any) -> None:
+        """Apply versions published by other processes"""
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*self._channel_keys)
+            for message in pubsub.listen():
+                try:
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self._apply_version(self._channel_keys[channel], int(message['data']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        except Exception as e:
+            # The next catalog_version() call re-reads the version and resubscribes
+            logger.error(f"Matching cache invalidation listener stopped: {e}")
+
+
+def install_catalog_invalidation(
+    cache: MatchingResultCache,
+    catalog_models: Tuple[type, ...],
+    history_models: Optional[Dict[type, FrozenSet[str]]] = None
+) -> None:
+    """
+    Bump the catalog or quote history version after a commit that changed
+    one of the given models.
+
+    Changes are collected on flush, and from bulk UPDATE and DELETE
+    statements, and only announced once the transaction commits, so a
+    rolled back update never invalidates anything.
+
+    Args:
+        catalog_models: Models whose changes all matter, apart from
+            IGNORED_CATALOG_FIELDS; they bump the catalog version
+        history_models: Models that only matter through the given
+            attributes, besides inserts and deletes; they bump the quote
+            history version
+    """
+    history_models = history_models or {}
+    history_types = tuple(history_models)
+
+    # Session.info keys private to this installation
+    catalog_flag = ('matching_catalog_changed', id(cache))
+    history_flag = ('matching_quote_history_changed', id(cache))
+
+    def _flag_for(model: type) -> Optional[Tuple[str, int]]:
+        if issubclass(model, catalog_models):
+            return catalog_flag
+        if issubclass(model, history_types):
+            return history_flag
+        return None
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_catalog_changes(session, flush_context):
+        for instance in chain(session.new, session.deleted):
+            flag = _flag_for(type(instance))
+            if flag is not None:
+                session.info[flag] = True
+        for instance in session.dirty:
+            if isinstance(instance, catalog_models):
+                if _has_relevant_changes(instance):
+                    session.info[catalog_flag] = True
+            elif type(instance) in history_models:
+                if _has_relevant_changes(instance, history_models[type(instance)]):
+                    session.info[history_flag] = True
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def _collect_bulk_changes(orm_execute_state):
+        # query.update() / query.delete() and update() / delete() statements
+        # bypass the flush, so any of them on a watched model counts
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        flag = _flag_for(mapper.class_) if mapper is not None else None
+        if flag is not None:
+            orm_execute_state.session.info[flag] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _announce_catalog_changes(session):
+        history_changed = session.info.pop(history_flag, False)
+        if session.info.pop(catalog_flag, False):
+            # Also invalidates every result keyed by the quote history version
+            cache.bump_catalog_version('catalog change committed')
+        elif history_changed:
+            cache.bump_quote_history_version('quote history change committed')
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_catalog_changes(session):
+        session.info.pop(catalog_flag, None)
+        session.info.pop(history_flag, None)
+
+
+def _has_relevant_changes(instance: Any, watched_fields: Optional[FrozenSet[str]] = None) -> bool:
+    state = inspect(instance)
+    for attr in state.attrs:
+        if watched_fields is not None:
+            if attr.key not in watched_fields:
+                continue
+        elif attr.key in IGNORED_CATALOG_FIELDS:
+            continue
+        if attr.history.has_changes():
+            return True
+    return False
+
+
+# Global matching result cache instance
+matching_result_cache = MatchingResultCache()
+
+install_catalog_invalidation(
+    matching_result_cache,
+    (Manufacturer, ProductionQuote),
+    {Quote: QUOTE_HISTORY_FIELDS}
+)
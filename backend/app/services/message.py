@@ -8,9 +8,10 @@ from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_, or_, desc, func
 from loguru import logger
 
-from app.core.database import get_db
+from app.core.database import get_db, get_db_context
 from app.models.message import Message, MessageRead, Room, RoomParticipant, OnlineStatus, TypingIndicator
 from app.models.user import User
+from app.services.full_text_search import MESSAGE_SEARCH, highlight
 
 
 class MessageService:
@@ -521,18 +522,19 @@ class MessageService:
     
     async def search_messages(self, query: str, user_id: int, room_name: str = None,
                              limit: int = 50) -> List[Dict[str, Any]]:
-        """Search messages by content"""
+        """Search messages by content, best matches first, with highlighted excerpts"""
         try:
-            async with get_db() as db:
+            with get_db_context() as db:
+                matches = MESSAGE_SEARCH.matches(db, query)
+                if matches is None:
+                    return []
+                
                 # Build search query
                 search_query = db.query(Message).options(
                     selectinload(Message.user)
-                ).filter(
-                    and_(
-                        Message.content.ilike(f"%{query}%"),
-                        Message.is_deleted == False
-                    )
-                )
+                ).join(
+                    matches, matches.c.id == Message.id
+                ).filter(Message.is_deleted == False)
                 
                 if room_name:
                     search_query = search_query.filter(Message.room_name == room_name)
@@ -551,8 +553,9 @@ class MessageService:
                         Room, Message.room_name == Room.name
                     ).filter(Room.id.in_(accessible_rooms))
                 
-                messages = await search_query.order_by(
-                    desc(Message.created_at)
+                # Best matches first, newest first among equals
+                messages = search_query.order_by(
+                    desc(matches.c.score), desc(Message.created_at)
                 ).limit(limit).all()
                 
                 # Format results
@@ -563,9 +566,10 @@ class MessageService:
                         'room_name': message.room_name,
                         'user': {
                             'id': message.user_id,
-                            'name': message.user.name if message.user else 'Unknown'
+                            'name': message.user.full_name if message.user else 'Unknown'
                         },
                         'content': message.content,
+                        'highlight': None if message.is_encrypted else highlight(message.content, query),
                         'message_type': message.message_type,
                         'timestamp': message.created_at.isoformat(),
                         'is_encrypted': message.is_encrypted
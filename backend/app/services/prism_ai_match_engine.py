@@ -34,6 +34,11 @@ from app.models.producer import Manufacturer
 from app.models.order import Order
 from app.models.quote import Quote
 from app.models.user import User
+from app.services.geo_index import (
+    country_code, country_location, haversine_km, manufacturer_location, proximity_score, within_radius
+)
+from app.services.manufacturer_catalog import manufacturer_catalog
+from app.services.matching_result_cache import matching_result_cache, params_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -112,6 +117,14 @@ class PrismAIMatchEngine:
             'high_value': 100000     # Orders above 100k PLN
         }
         
+        # Shared result cache, invalidated when the manufacturer catalog changes
+        self.result_cache = matching_result_cache
+        self.use_result_cache = True
+        self.result_cache_ttl_seconds = 900
+        
+        # Shared in-memory manufacturer catalog candidates are taken from
+        self.catalog = manufacturer_catalog
+        
         logger.info("PRISM AI Match Engine initialized")
     
     def analyze_and_rank(
@@ -131,12 +144,28 @@ class PrismAIMatchEngine:
         ranked manufacturers in the specified JSON format.
         """
         try:
+            # Results for an explicit manufacturer list are never shared
+            fingerprint = None
+            if self.use_result_cache and manufacturer_database is None:
+                fingerprint = params_fingerprint(
+                    order_specifications=order_specifications,
+                    technical_specs=technical_specs,
+                    quality_requirements=quality_requirements,
+                    budget_min=budget_min,
+                    budget_max=budget_max,
+                    delivery_deadline=delivery_deadline,
+                    location_preferences=location_preferences
+                )
+                cached = self.result_cache.get('prism', fingerprint)
+                if cached is not None:
+                    return cached
+            
             logger.info(f"Starting PRISM AI analysis for order: {order_specifications.get('title', 'Unknown')}")
             start_time = datetime.now()
             
             # Get or filter manufacturers
             candidates = self._get_candidate_manufacturers(
-                db, order_specifications, technical_specs, manufacturer_database
+                db, order_specifications, technical_specs, manufacturer_database, location_preferences
             )
             
             if not candidates:
@@ -195,7 +224,11 @@ class PrismAIMatchEngine:
             processing_time = (datetime.now() - start_time).total_seconds()
             logger.info(f"PRISM analysis completed in {processing_time:.2f}s: {len(top_matches)} matches")
             
-            return self._format_json_response(result)
+            response = self._format_json_response(result)
+            if fingerprint is not None:
+                self.result_cache.set('prism', fingerprint, response, self.result_cache_ttl_seconds)
+            
+            return response
             
         except Exception as e:
             logger.error(f"PRISM AI Match Engine error: {str(e)}")
@@ -206,22 +239,25 @@ class PrismAIMatchEngine:
         db: Session,
         order_specs: Dict[str, Any],
         technical_specs: Dict[str, Any],
-        manufacturer_database: Optional[List[Manufacturer]] = None
+        manufacturer_database: Optional[List[Manufacturer]] = None,
+        location_preferences: Optional[Dict[str, Any]] = None
     ) -> List[Manufacturer]:
         """Get candidate manufacturers based on basic filtering"""
         
         if manufacturer_database:
             candidates = manufacturer_database
         else:
-            # Query from database with basic filters
-            query = db.query(Manufacturer).filter(
-                and_(
-                    Manufacturer.is_active == True,
-                    Manufacturer.is_verified == True,
-                    Manufacturer.stripe_onboarding_completed == True
-                )
-            )
-            candidates = query.limit(100).all()
+            # Active, verified and onboarded manufacturers from the shared catalog
+            snapshot = self.catalog.snapshot(db)
+            candidates = snapshot.matchable()
+            
+            # Only those within the preferred radius, when one is given
+            max_distance_km = (location_preferences or {}).get('max_distance_km')
+            if max_distance_km:
+                location = self._preferred_location(location_preferences)
+                if location is not None:
+                    candidates = within_radius(candidates, snapshot.geo, location, float(max_distance_km))
+            candidates = candidates[:100]
         
         # Apply basic capability filtering
         filtered_candidates = []
@@ -602,9 +638,9 @@ class PrismAIMatchEngine:
         
         Scoring:
         - Same city/region: 12 points
+        - Known locations: 2 + 10 x proximity (12 locally, 3 intercontinental)
         - Same country: 8 points
-        - Same continent: 5 points
-        - Different continent: 2 points
+        - Otherwise: 5 points
         """
         
         if not location_preferences:
@@ -626,36 +662,33 @@ class PrismAIMatchEngine:
             if fuzz.partial_ratio(preferred_region, manufacturer_city) >= 80:
                 return 12
         
+        # Distance between the preferred location and the manufacturer, or
+        # the manufacturer's country when it has no coordinates
+        location = self._preferred_location(location_preferences)
+        manufacturer_point = manufacturer_location(manufacturer) or country_location(manufacturer.country)
+        if location is not None and manufacturer_point is not None:
+            distance_km = haversine_km(location[0], location[1], manufacturer_point[0], manufacturer_point[1])
+            return 2 + 10 * float(proximity_score(distance_km))
+        
         # Same country check
         if preferred_country and manufacturer_country:
             if fuzz.ratio(preferred_country, manufacturer_country) >= 80:
                 return 8
         
-        # Continental proximity (simplified)
-        european_countries = ['poland', 'germany', 'france', 'italy', 'spain', 'uk', 'netherlands']
-        north_american_countries = ['usa', 'canada', 'mexico']
-        asian_countries = ['china', 'japan', 'india', 'south korea', 'thailand']
-        
-        def get_continent(country):
-            country = country.lower()
-            if any(fuzz.partial_ratio(country, eu_country) >= 70 for eu_country in european_countries):
-                return 'europe'
-            elif any(fuzz.partial_ratio(country, na_country) >= 70 for na_country in north_american_countries):
-                return 'north_america'
-            elif any(fuzz.partial_ratio(country, asian_country) >= 70 for asian_country in asian_countries):
-                return 'asia'
-            return 'other'
-        
-        if preferred_country and manufacturer_country:
-            pref_continent = get_continent(preferred_country)
-            mfg_continent = get_continent(manufacturer_country)
-            
-            if pref_continent == mfg_continent:
-                return 5  # Same continent
-            else:
-                return 2  # Different continent
-        
-        return 5  # Default same continent assumption
+        return 5  # Locations unknown
+    
+    def _preferred_location(self, location_preferences: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        """Explicit coordinates, else the preferred city among the catalog's manufacturers, else the country"""
+        
+        if location_preferences.get('latitude') is not None and location_preferences.get('longitude') is not None:
+            return float(location_preferences['latitude']), float(location_preferences['longitude'])
+        snapshot = self.catalog.current
+        city = location_preferences.get('city')
+        if snapshot is not None and city:
+            location = snapshot.geo.city_location(city, country_code(location_preferences.get('country')))
+            if location is not None:
+                return location
+        return country_location(location_preferences.get('country'))
     
     def _calculate_cost_efficiency(
         self,
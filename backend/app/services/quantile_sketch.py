@@ -0,0 +1,171 @@
+"""
+Mergeable quantile sketch.
+
+A merging t-digest (Dunning & Ertl): the distribution is summarized by a
+sorted list of centroids (mean, weight) whose sizes are bounded by the k1
+scale function, so that centroids near the tails stay small and the
+extreme quantiles stay accurate. Values are buffered and merged into the
+centroids in one sorted pass; two digests merge the same way, which is
+what lets per-group sketches be maintained incrementally and combined.
+
+With the default compression of 100 a digest keeps at most about 100
+centroids however many values it has seen, and serializes to 16 bytes per
+centroid.
+"""
+
+import math
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Optional
+
+DEFAULT_COMPRESSION = 100
+
+
+def _k(q: float, compression: float) -> float:
+    """k1 scale function"""
+    return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+def _k_inverse(k: float, compression: float) -> float:
+    return (math.sin(k * 2 * math.pi / compression) + 1) / 2
+
+
+class TDigest:
+    """Approximate quantiles and ranks of a stream of values"""
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[float] = []
+        self._buffer_limit = int(compression * 5)
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self.means)
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        if math.isnan(value):
+            return
+        self._buffer.append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self._buffer_limit:
+            self._flush()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'TDigest') -> None:
+        """Fold another digest into this one"""
+        other._flush()
+        if not other.count:
+            return
+        self._flush()
+        self._compress(list(zip(self.means + other.means, self.weights + other.weights)))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _flush(self) -> None:
+        if self._buffer:
+            centroids = list(zip(self.means, self.weights))
+            centroids.extend((value, 1.0) for value in self._buffer)
+            self._buffer = []
+            self._compress(centroids)
+
+    def _compress(self, centroids: List) -> None:
+        """Merge sorted neighbours while the result stays within one unit of k"""
+        centroids.sort(key=lambda centroid: centroid[0])
+        total = sum(weight for _, weight in centroids)
+        means, weights = [], []
+        merged_weight = 0.0
+        mean, weight = centroids[0]
+        limit = total * _k_inverse(_k(0.0, self.compression) + 1, self.compression)
+        for next_mean, next_weight in centroids[1:]:
+            if merged_weight + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                merged_weight += weight
+                q = merged_weight / total
+                limit = total * _k_inverse(_k(q, self.compression) + 1, self.compression)
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def _points(self):
+        """(value, cumulative weight) knots: min, each centroid at its weight's midpoint, max"""
+        values, ranks = [self.min], [0.0]
+        cumulative = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            values.append(mean)
+            ranks.append(cumulative + weight / 2)
+            cumulative += weight
+        values.append(self.max)
+        ranks.append(cumulative)
+        return values, ranks
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value below which a fraction q of the values lie, None when empty"""
+        self._flush()
+        if not self.count:
+            return None
+        q = min(max(q, 0.0), 1.0)
+        values, ranks = self._points()
+        target = q * self.count
+        index = min(bisect_right(ranks, target), len(ranks) - 1)
+        low, high = ranks[index - 1], ranks[index]
+        if high <= low:
+            return values[index]
+        return values[index - 1] + (values[index] - values[index - 1]) * (target - low) / (high - low)
+
+    def cdf(self, value: float) -> Optional[float]:
+        """Fraction of the values at or below value, None when empty"""
+        self._flush()
+        if not self.count:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        values, ranks = self._points()
+        index = bisect_right(values, value)
+        low, high = values[index - 1], values[index]
+        if high <= low:
+            return ranks[index] / self.count
+        rank = ranks[index - 1] + (ranks[index] - ranks[index - 1]) * (value - low) / (high - low)
+        return rank / self.count
+
+    def to_bytes(self) -> bytes:
+        """Compression, count, min, max and the centroids as little-endian doubles"""
+        self._flush()
+        values = array('d', [self.compression, self.count, self.min, self.max])
+        for mean, weight in zip(self.means, self.weights):
+            values.append(mean)
+            values.append(weight)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TDigest':
+        values = array('d')
+        values.frombytes(data)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        digest = cls(compression=values[0])
+        digest.count, digest.min, digest.max = values[1], values[2], values[3]
+        digest.means = list(values[4::2])
+        digest.weights = list(values[5::2])
+        return digest
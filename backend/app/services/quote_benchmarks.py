@@ -0,0 +1,351 @@
+"""
+Quote benchmarks: price and delivery distributions of past quotes.
+
+Every order-response quote sent to a client is counted in the benchmark
+groups it belongs to, from its exact industry category, process, material
+and quantity bucket up to the whole market, and again in the 'accepted'
+groups when the client accepts it. Each group keeps its quote count,
+price and delivery sums and a t-digest of prices in one row of
+quote_benchmark_sketches, so benchmarking a quote reads at most ten rows
+by primary key however many quotes there are.
+
+Sketches are updated in the transaction of the flush that sends or
+accepts a quote. A t-digest cannot forget a value: quotes that are
+deleted or repriced after sending, and changes that bypass the ORM (bulk
+updates, raw SQL), stay as first counted until rebuild_quote_benchmarks()
+recomputes every group from the quotes table.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, event, func, inspect, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.order import Order
+from app.models.quote import Quote, QuoteStatus, QuoteType
+from app.models.quote_benchmark import QuoteBenchmarkSketch
+from app.services.capability_tags import normalize_tag
+from app.services.quantile_sketch import TDigest
+
+logger = logging.getLogger(__name__)
+
+QUOTED = 'quoted'
+ACCEPTED = 'accepted'
+SCOPES = (QUOTED, ACCEPTED)
+
+# Dimension value of the groups that cover all values
+ANY = '*'
+
+# Fewest quotes a group needs before it is preferred over broader ones
+MIN_SAMPLES = 10
+
+# (largest quantity, bucket label)
+QUANTITY_BUCKETS = ((1, '1'), (10, '2-10'), (100, '11-100'), (1000, '101-1000'), (10000, '1001-10000'))
+LARGEST_QUANTITY_BUCKET = '10001+'
+
+Dimensions = Tuple[str, str, str, str]  # industry category, process, material, quantity bucket
+SketchKey = Tuple[str, str, str, str, str]  # scope, *Dimensions
+Sample = Tuple[str, Dimensions, float, float]  # scope, dimensions, price, delivery days
+
+
+# Grouping
+
+def quantity_bucket(quantity: Optional[int]) -> str:
+    if not quantity or quantity < 1:
+        return ''
+    for largest, label in QUANTITY_BUCKETS:
+        if quantity <= largest:
+            return label
+    return LARGEST_QUANTITY_BUCKET
+
+
+def benchmark_dimensions(industry_category: Any, process: Any, material: Any, quantity: Optional[int]) -> Dimensions:
+    """Normalized dimensions of a quote, '' for unknown values"""
+    return (
+        normalize_tag(industry_category) if industry_category else '',
+        normalize_tag(process) if process else '',
+        normalize_tag(material) if material else '',
+        quantity_bucket(quantity),
+    )
+
+
+def quote_dimensions(quote: Quote, order: Optional[Order], industry_category: Optional[str] = None) -> Dimensions:
+    """Dimensions of a quote, filling what it does not state from its order"""
+    requirements = {}
+    if order is not None and isinstance(order.technical_requirements, dict):
+        requirements = order.technical_requirements
+    return benchmark_dimensions(
+        industry_category or (order.industry_category if order is not None else None),
+        quote.manufacturing_process or quote.process or requirements.get('manufacturing_process'),
+        quote.material or requirements.get('material'),
+        quote.quantity or (order.quantity if order is not None else None),
+    )
+
+
+def benchmark_groups(dimensions: Dimensions) -> List[Dimensions]:
+    """Groups a quote is counted in, most specific first"""
+    category, process, material, bucket = dimensions
+    return list(dict.fromkeys([
+        (category, process, material, bucket),
+        (category, process, ANY, bucket),
+        (category, process, ANY, ANY),
+        (category, ANY, ANY, ANY),
+        (ANY, ANY, ANY, ANY),
+    ]))
+
+
+def _key_columns():
+    columns = QuoteBenchmarkSketch.__table__.c
+    return columns.scope, columns.industry_category, columns.process, columns.material, columns.quantity_bucket
+
+
+# Maintenance on flush
+
+def _statuses(quote: Quote, is_new: bool) -> Tuple[Any, Any]:
+    """Status before and after the flush; the same when it did not change"""
+    history = inspect(quote).attrs.status.history
+    new = quote.__dict__.get('status') or QuoteStatus.DRAFT
+    if is_new:
+        return None, new
+    return (history.deleted[0] if history.deleted else new), new
+
+
+def _quote_samples(session: Session, quote: Quote, is_new: bool) -> List[Sample]:
+    if (quote.quote_type or QuoteType.ORDER_RESPONSE) != QuoteType.ORDER_RESPONSE:
+        return []
+    if quote.order_id is None or quote.total_price_pln is None:
+        return []
+
+    old, new = _statuses(quote, is_new)
+    scopes = []
+    if old in (None, QuoteStatus.DRAFT) and new != QuoteStatus.DRAFT:
+        scopes.append(QUOTED)
+    if old != QuoteStatus.ACCEPTED and new == QuoteStatus.ACCEPTED:
+        scopes.append(ACCEPTED)
+    if not scopes:
+        return []
+
+    order = quote.__dict__.get('order')
+    if order is None or order.id != quote.order_id:
+        order = session.get(Order, quote.order_id)
+    dimensions = quote_dimensions(quote, order)
+    price, delivery = float(quote.total_price_pln), float(quote.lead_time_days or 0)
+    return [(scope, dimensions, price, delivery) for scope in scopes]
+
+
+def collect_benchmark_samples(session: Session) -> List[Sample]:
+    """Quotes sent or accepted by the pending changes of a session"""
+    samples = []
+    for instance in session.new:
+        if isinstance(instance, Quote):
+            samples.extend(_quote_samples(session, instance, is_new=True))
+    for instance in session.dirty:
+        if isinstance(instance, Quote) and session.is_modified(instance):
+            samples.extend(_quote_samples(session, instance, is_new=False))
+    return samples
+
+
+def apply_benchmark_samples(connection: Any, samples: Iterable[Sample]) -> None:
+    """Add samples to the sketches of every group they belong to"""
+    grouped: Dict[SketchKey, List[Tuple[float, float]]] = defaultdict(list)
+    for scope, dimensions, price, delivery in samples:
+        for group in benchmark_groups(dimensions):
+            grouped[(scope, *group)].append((price, delivery))
+    if not grouped:
+        return
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    # Sorted so concurrent transactions lock sketch rows in the same order
+    keys = sorted(grouped)
+    key_columns = _key_columns()
+    table = QuoteBenchmarkSketch.__table__
+    connection.execute(insert(table).on_conflict_do_nothing(), [
+        {**dict(zip((column.name for column in key_columns), key)),
+         'quote_count': 0, 'price_sum': 0, 'delivery_sum': 0}
+        for key in keys
+    ])
+    rows = connection.execute(
+        select(*key_columns, table.c.quote_count, table.c.price_sum, table.c.delivery_sum, table.c.price_digest)
+        .where(tuple_(*key_columns).in_(keys))
+        .order_by(*key_columns)
+        .with_for_update()
+    ).all()
+
+    updates = []
+    for row in rows:
+        key = tuple(row[:5])
+        values = grouped[key]
+        digest = TDigest.from_bytes(row.price_digest) if row.price_digest else TDigest()
+        digest.update(price for price, _ in values)
+        updates.append({
+            **{f'key_{column.name}': value for column, value in zip(key_columns, key)},
+            'quote_count': row.quote_count + len(values),
+            'price_sum': row.price_sum + sum(price for price, _ in values),
+            'delivery_sum': row.delivery_sum + sum(delivery for _, delivery in values),
+            'price_digest': digest.to_bytes(),
+        })
+    connection.execute(
+        table.update()
+        .where(and_(*(column == bindparam(f'key_{column.name}') for column in key_columns)))
+        .values(updated_at=func.now()),
+        updates
+    )
+
+
+def install_benchmark_maintenance() -> None:
+    """Add quotes to their benchmark sketches in the transaction of the flush that sends or accepts them"""
+
+    @event.listens_for(Session, 'after_flush')
+    def _maintain_quote_benchmarks(session, flush_context):
+        if session.info.get('read_only'):
+            return
+        try:
+            samples = collect_benchmark_samples(session)
+        except Exception as e:
+            # rebuild_quote_benchmarks() counts the quotes we could not read here
+            logger.error(f"Quote benchmark sample collection failed: {e}")
+            return
+        apply_benchmark_samples(session.connection(), samples)
+
+
+# Reading
+
+@dataclass
+class Benchmark:
+    """Statistics of the benchmark group chosen for a quote"""
+    scope: str
+    dimensions: Dimensions
+    quote_count: int
+    average_price: float
+    average_delivery_days: float
+    digest: TDigest
+
+    def price_percentile(self, price: float) -> int:
+        """Share of the group's quotes priced at or below price, 0-100"""
+        return round(self.digest.cdf(price) * 100)
+
+
+def lookup_benchmarks(db: Session, dimensions: Dimensions, min_samples: int = MIN_SAMPLES) -> Dict[str, Benchmark]:
+    """
+    Benchmark of each scope: the most specific group with at least
+    min_samples quotes, or the whole market when none has that many.
+    Scopes without any quotes are left out.
+    """
+    groups = benchmark_groups(dimensions)
+    key_columns = _key_columns()
+    table = QuoteBenchmarkSketch.__table__
+    rows = db.execute(
+        select(*key_columns, table.c.quote_count, table.c.price_sum, table.c.delivery_sum, table.c.price_digest)
+        .where(tuple_(*key_columns).in_([(scope, *group) for scope in SCOPES for group in groups]))
+    ).all()
+    by_key = {tuple(row[:5]): row for row in rows}
+
+    benchmarks = {}
+    for scope in SCOPES:
+        for group in groups:
+            row = by_key.get((scope, *group))
+            if not row or not row.quote_count or not row.price_digest:
+                continue
+            if row.quote_count >= min_samples or group == (ANY, ANY, ANY, ANY):
+                benchmarks[scope] = Benchmark(
+                    scope=scope,
+                    dimensions=group,
+                    quote_count=row.quote_count,
+                    average_price=row.price_sum / row.quote_count,
+                    average_delivery_days=row.delivery_sum / row.quote_count,
+                    digest=TDigest.from_bytes(row.price_digest),
+                )
+                break
+    return benchmarks
+
+
+# Rebuild
+
+def compute_benchmark_sketches(db: Session, batch_size: int = 1000) -> Dict[SketchKey, Dict[str, Any]]:
+    """Every sketch recomputed from the quotes table, streamed in batches"""
+    sketches: Dict[SketchKey, Dict[str, Any]] = {}
+    query = (
+        select(
+            Quote.status, Quote.total_price_pln, Quote.lead_time_days, Quote.manufacturing_process,
+            Quote.process, Quote.material, Quote.quantity, Order.industry_category,
+            Order.technical_requirements, Order.quantity.label('order_quantity'),
+        )
+        .join(Order, Quote.order_id == Order.id)
+        .where(
+            Quote.quote_type == QuoteType.ORDER_RESPONSE,
+            Quote.status != QuoteStatus.DRAFT,
+            Quote.total_price_pln.isnot(None),
+        )
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.execute(query):
+        requirements = row.technical_requirements if isinstance(row.technical_requirements, dict) else {}
+        dimensions = benchmark_dimensions(
+            row.industry_category,
+            row.manufacturing_process or row.process or requirements.get('manufacturing_process'),
+            row.material or requirements.get('material'),
+            row.quantity or row.order_quantity,
+        )
+        price, delivery = float(row.total_price_pln), float(row.lead_time_days or 0)
+        scopes = (QUOTED, ACCEPTED) if row.status == QuoteStatus.ACCEPTED else (QUOTED,)
+        for scope in scopes:
+            for group in benchmark_groups(dimensions):
+                sketch = sketches.get((scope, *group))
+                if sketch is None:
+                    sketch = sketches[(scope, *group)] = {
+                        'quote_count': 0, 'price_sum': 0.0, 'delivery_sum': 0.0, 'digest': TDigest()
+                    }
+                sketch['quote_count'] += 1
+                sketch['price_sum'] += price
+                sketch['delivery_sum'] += delivery
+                sketch['digest'].add(price)
+    return sketches
+
+
+def rebuild_quote_benchmarks(db: Session, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Replace every sketch with one recomputed from the quotes table and
+    report how many groups had drifted. A quote sent while the rebuild runs
+    may be left out until the next one.
+    """
+    sketches = compute_benchmark_sketches(db, batch_size)
+    key_columns = _key_columns()
+    table = QuoteBenchmarkSketch.__table__
+    previous = {
+        tuple(row[:5]): row.quote_count
+        for row in db.execute(select(*key_columns, table.c.quote_count))
+    }
+
+    db.execute(delete(table))
+    if sketches:
+        db.execute(table.insert(), [
+            {**dict(zip((column.name for column in key_columns), key)),
+             'quote_count': sketch['quote_count'],
+             'price_sum': sketch['price_sum'],
+             'delivery_sum': sketch['delivery_sum'],
+             'price_digest': sketch['digest'].to_bytes()}
+            for key, sketch in sorted(sketches.items())
+        ])
+    db.commit()
+
+    drifted = sum(
+        1 for key in set(previous) | set(sketches)
+        if previous.get(key, 0) != (sketches[key]['quote_count'] if key in sketches else 0)
+    )
+    report = {
+        'sketches': len(sketches),
+        'quotes': sketches.get((QUOTED, ANY, ANY, ANY, ANY), {}).get('quote_count', 0),
+        'drifted': drifted,
+    }
+    if drifted:
+        logger.warning(f"Quote benchmarks drifted: {drifted} of {len(sketches)} groups")
+    return report
+
+
+install_benchmark_maintenance()
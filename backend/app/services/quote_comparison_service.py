@@ -1,7 +1,13 @@
 from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, joinedload
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from itertools import chain
 import statistics
+import threading
+import time
 import numpy as np
 from loguru import logger
 
@@ -12,12 +18,129 @@ from app.schemas.quote import (
     QuoteAnalytics, QuoteComparison, DecisionMatrix, QuoteComparisonReport,
     QuoteFilterCriteria, QuoteBenchmark
 )
+from app.services.quote_benchmarks import ACCEPTED, QUOTED, Benchmark, lookup_benchmarks, quote_dimensions
+
+SUSTAINABILITY_CERTIFICATIONS = ('ISO 14001', 'LEED', 'Carbon Neutral')
+
+# Order id -> quote changes committed by this process, counted by
+# install_quote_change_tracking() since updated_at may not tell apart two
+# updates within the same second
+_committed_quote_changes: Dict[int, int] = defaultdict(int)
+
+
+def _price(quote: Quote) -> float:
+    return float(quote.total_price_pln or 0)
+
+
+def _delivery_days(quote: Quote) -> int:
+    return quote.lead_time_days or 0
+
+
+def _rating(quote: Quote) -> float:
+    """Manufacturer's overall rating, 0 when unknown or unrated"""
+    if not quote.manufacturer or not quote.manufacturer.overall_rating:
+        return 0.0
+    return float(quote.manufacturer.overall_rating)
+
+
+def _certification_names(manufacturer: Manufacturer) -> List[str]:
+    certifications = manufacturer.quality_certifications or []
+    return [cert.get('name', '') if isinstance(cert, dict) else str(cert) for cert in certifications]
+
+
+@dataclass
+class QuoteSetStatistics:
+    """Price and delivery statistics of the quotes being compared, computed once per order"""
+    min_price: float
+    max_price: float
+    avg_price: float
+    min_delivery: float
+    max_delivery: float
+    avg_delivery: float
+
+    @classmethod
+    def from_arrays(cls, prices: np.ndarray, deliveries: np.ndarray) -> 'QuoteSetStatistics':
+        return cls(
+            min_price=float(prices.min()), max_price=float(prices.max()), avg_price=float(prices.mean()),
+            min_delivery=float(deliveries.min()), max_delivery=float(deliveries.max()),
+            avg_delivery=float(deliveries.mean())
+        )
+
+
+class QuoteFeatures:
+    """Column arrays of the quote and manufacturer attributes that analytics score, read in one pass"""
+
+    def __init__(self, quotes: List[Quote]):
+        count = len(quotes)
+        self.prices = np.empty(count)
+        self.deliveries = np.empty(count)
+        self.ratings = np.zeros(count)
+        self.has_manufacturer = np.zeros(count, dtype=bool)
+        self.on_time_rates = np.zeros(count)
+        self.certification_counts = np.zeros(count)
+        self.sustainability_counts = np.zeros(count)
+
+        for index, quote in enumerate(quotes):
+            self.prices[index] = _price(quote)
+            self.deliveries[index] = _delivery_days(quote)
+            self.ratings[index] = _rating(quote)
+            manufacturer = quote.manufacturer
+            if manufacturer is None:
+                continue
+            self.has_manufacturer[index] = True
+            on_time_rate = manufacturer.on_time_delivery_rate
+            self.on_time_rates[index] = 0.80 if on_time_rate is None else on_time_rate
+            names = _certification_names(manufacturer)
+            self.certification_counts[index] = len(names)
+            self.sustainability_counts[index] = sum(
+                1 for name in names if any(cert in name for cert in SUSTAINABILITY_CERTIFICATIONS)
+            )
+
+    def statistics(self) -> QuoteSetStatistics:
+        return QuoteSetStatistics.from_arrays(self.prices, self.deliveries)
+
+
+class _ReportCache:
+    """Bounded LRU of comparison reports with a TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Tuple, Tuple[float, QuoteComparisonReport]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[QuoteComparisonReport]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Tuple, report: QuoteComparisonReport) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), report)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
 
 
 class QuoteComparisonService:
     """Enhanced quote comparison service with advanced analytics"""
     
-    def __init__(self):
+    def __init__(self, report_cache_size: int = 256, report_cache_ttl_seconds: float = 300):
+        """
+        Reports are cached per order, quote-set version, weights and filters.
+        A new, changed or deleted quote changes the version; the TTL bounds
+        how long manufacturer rating or certification changes go unseen.
+        """
         self.default_criteria_weights = {
             "price": 0.30,
             "delivery": 0.20,
@@ -25,23 +148,27 @@ class QuoteComparisonService:
             "reliability": 0.15,
             "compliance": 0.10
         }
+        self.report_cache = _ReportCache(report_cache_size, report_cache_ttl_seconds)
     
-    def calculate_quote_analytics(
+    def analyze_quotes(
         self,
-        quote: Quote,
-        all_quotes: List[Quote],
+        quotes: List[Quote],
         criteria_weights: Optional[Dict[str, float]] = None
-    ) -> QuoteAnalytics:
-        """Calculate comprehensive analytics for a quote"""
+    ) -> List[QuoteAnalytics]:
+        """Analytics of every quote against the others, in the order given, in linear time"""
+        if not quotes:
+            return []
         
         weights = criteria_weights or self.default_criteria_weights
+        features = QuoteFeatures(quotes)
+        stats = features.statistics()
         
         # Calculate individual scores
-        price_score = self._calculate_price_score(quote, all_quotes)
-        delivery_score = self._calculate_delivery_score(quote, all_quotes)
-        quality_score = self._calculate_quality_score(quote)
-        reliability_score = self._calculate_reliability_score(quote)
-        compliance_score = self._calculate_compliance_score(quote)
+        price_score = self._calculate_price_scores(features, stats)
+        delivery_score = self._calculate_delivery_scores(features, stats)
+        quality_score = self._calculate_quality_scores(features)
+        reliability_score = self._calculate_reliability_scores(features)
+        compliance_score = self._calculate_compliance_scores(features)
         
         # Calculate weighted total score
         total_score = (
@@ -52,40 +179,49 @@ class QuoteComparisonService:
             compliance_score * weights.get("compliance", 0.1)
         )
         
-        # Calculate TCO
-        tco = self._calculate_total_cost_of_ownership(quote)
-        
-        # Risk assessment
-        risk_assessment = self._assess_quote_risk(quote)
-        
-        # Market position
-        market_position = self._determine_market_position(quote, all_quotes)
-        
-        # Savings vs average
-        avg_price = statistics.mean([q.price_total for q in all_quotes])
-        savings_vs_average = avg_price - quote.price_total
-        
-        # Delivery competitiveness
-        avg_delivery = statistics.mean([q.delivery_time for q in all_quotes])
-        delivery_competitiveness = (avg_delivery - quote.delivery_time) / avg_delivery * 100
-        
-        # Rank among all quotes
-        sorted_quotes = sorted(all_quotes, key=lambda q: self._calculate_simple_score(q), reverse=True)
-        rank = next(i for i, q in enumerate(sorted_quotes, 1) if q.id == quote.id)
-        
-        return QuoteAnalytics(
-            quote_id=str(quote.id),
-            score=round(total_score, 2),
-            rank=rank,
-            total_cost_of_ownership=tco,
-            risk_assessment=risk_assessment,
-            market_position=market_position,
-            savings_vs_average=savings_vs_average,
-            delivery_competitiveness=round(delivery_competitiveness, 2),
-            quality_score=round(quality_score, 2),
-            compliance_score=round(compliance_score, 2),
-            sustainability_score=self._calculate_sustainability_score(quote)
-        )
+        tco = self._calculate_total_cost_of_ownership(features)
+        market_position = self._determine_market_position(features, stats)
+        sustainability_score = self._calculate_sustainability_scores(features)
+        
+        # Savings and delivery competitiveness vs average
+        savings_vs_average = stats.avg_price - features.prices
+        if stats.avg_delivery:
+            delivery_competitiveness = (stats.avg_delivery - features.deliveries) / stats.avg_delivery * 100
+        else:
+            delivery_competitiveness = np.zeros(len(quotes))
+        
+        # Rank among all quotes; the stable sort ranks ties in the order given
+        ranks = np.empty(len(quotes), dtype=int)
+        ranks[np.argsort(-self._calculate_simple_scores(features), kind="stable")] = np.arange(1, len(quotes) + 1)
+        
+        return [
+            QuoteAnalytics(
+                quote_id=str(quote.id),
+                score=round(float(total_score[index]), 2),
+                rank=int(ranks[index]),
+                total_cost_of_ownership=float(tco[index]),
+                risk_assessment=self._assess_quote_risk(quote),
+                market_position=market_position[index],
+                savings_vs_average=float(savings_vs_average[index]),
+                delivery_competitiveness=round(float(delivery_competitiveness[index]), 2),
+                quality_score=round(float(quality_score[index]), 2),
+                compliance_score=round(float(compliance_score[index]), 2),
+                sustainability_score=sustainability_score[index]
+            )
+            for index, quote in enumerate(quotes)
+        ]
+    
+    def calculate_quote_analytics(
+        self,
+        quote: Quote,
+        all_quotes: List[Quote],
+        criteria_weights: Optional[Dict[str, float]] = None
+    ) -> QuoteAnalytics:
+        """Calculate comprehensive analytics for a quote"""
+        if all(q.id != quote.id for q in all_quotes):
+            all_quotes = [*all_quotes, quote]
+        analytics = self.analyze_quotes(all_quotes, criteria_weights)
+        return next(a for a in analytics if a.quote_id == str(quote.id))
     
     def generate_comparison_report(
         self,
@@ -96,33 +232,50 @@ class QuoteComparisonService:
     ) -> QuoteComparisonReport:
         """Generate comprehensive quote comparison report"""
         
-        # Fetch quotes
-        quotes = db.query(Quote).filter(Quote.order_id == order_id).all()
-        
-        if not quotes:
+        version = self._quote_set_version(db, order_id)
+        if not version[0]:
             raise ValueError("No quotes found for this order")
         
+        cache_key = (
+            order_id,
+            version,
+            tuple(sorted((criteria_weights or self.default_criteria_weights).items())),
+            filters.model_dump_json() if filters else None
+        )
+        report = self.report_cache.get(cache_key)
+        if report is not None:
+            return report
+        
+        # Fetch quotes
+        quotes = (
+            db.query(Quote)
+            .options(joinedload(Quote.manufacturer))
+            .filter(Quote.order_id == order_id)
+            .all()
+        )
+        
         # Apply filters if provided
         if filters:
             quotes = self._apply_filters(quotes, filters)
+            if not quotes:
+                raise ValueError("No quotes match the filters")
         
-        # Generate analytics for each quote
-        quote_comparisons = []
-        for quote in quotes:
-            analytics = self.calculate_quote_analytics(quote, quotes, criteria_weights)
-            
-            comparison = QuoteComparison(
+        # Generate analytics for all quotes at once
+        stats = QuoteFeatures(quotes).statistics()
+        quote_comparisons = [
+            QuoteComparison(
                 quote_id=str(quote.id),
                 manufacturer_name=quote.manufacturer.business_name if quote.manufacturer else "Unknown",
-                price=float(quote.price_total),
-                delivery_days=quote.delivery_time,
+                price=_price(quote),
+                delivery_days=_delivery_days(quote),
                 score=analytics.score,
                 analytics=analytics,
-                strengths=self._identify_strengths(quote, quotes),
-                weaknesses=self._identify_weaknesses(quote, quotes),
+                strengths=self._identify_strengths(quote, stats),
+                weaknesses=self._identify_weaknesses(quote, stats),
                 risk_factors=self._identify_risk_factors(quote)
             )
-            quote_comparisons.append(comparison)
+            for quote, analytics in zip(quotes, self.analyze_quotes(quotes, criteria_weights))
+        ]
         
         # Sort by score
         quote_comparisons.sort(key=lambda x: x.score, reverse=True)
@@ -131,7 +284,7 @@ class QuoteComparisonService:
         decision_matrix = DecisionMatrix(
             criteria=criteria_weights or self.default_criteria_weights,
             quotes=quote_comparisons,
-            recommendation=quote_comparisons[0] if quote_comparisons else None,
+            recommendation=quote_comparisons[0],
             alternatives=quote_comparisons[1:3] if len(quote_comparisons) > 1 else [],
             decision_rationale=self._generate_decision_rationale(quote_comparisons)
         )
@@ -140,10 +293,10 @@ class QuoteComparisonService:
         market_analysis = self._generate_market_analysis(quotes)
         cost_breakdown = self._generate_cost_breakdown(quotes)
         timeline_analysis = self._generate_timeline_analysis(quotes)
-        risk_analysis = self._generate_risk_analysis(quotes)
+        risk_analysis = self._generate_risk_analysis(quote_comparisons)
         recommendations = self._generate_recommendations(quote_comparisons)
         
-        return QuoteComparisonReport(
+        report = QuoteComparisonReport(
             order_id=order_id,
             generated_at=datetime.now(),
             total_quotes=len(quotes),
@@ -154,6 +307,8 @@ class QuoteComparisonService:
             risk_analysis=risk_analysis,
             recommendations=recommendations
         )
+        self.report_cache.set(cache_key, report)
+        return report
     
     def get_quote_benchmark(
         self,
@@ -161,110 +316,85 @@ class QuoteComparisonService:
         quote: Quote,
         industry_category: Optional[str] = None
     ) -> QuoteBenchmark:
-        """Get benchmarking data for a quote"""
-        
-        # Get industry averages (simplified - in production, use historical data)
-        industry_avg_price = self._get_industry_average_price(db, industry_category)
-        industry_avg_delivery = self._get_industry_average_delivery(db, industry_category)
-        
-        # Calculate percentile
-        similar_quotes = self._get_similar_quotes(db, quote, industry_category)
-        percentile = self._calculate_percentile(quote, similar_quotes)
+        """Benchmark a quote against the quotes sent for similar orders"""
+        benchmarks = lookup_benchmarks(db, quote_dimensions(quote, quote.order, industry_category))
+        quoted = benchmarks.get(QUOTED)
+        accepted = benchmarks.get(ACCEPTED)
+        if quoted is None:
+            return QuoteBenchmark(
+                competitive_advantage=self._identify_competitive_advantages(quote),
+                improvement_suggestions=self._suggest_improvements(quote)
+            )
         
+        percentile = quoted.price_percentile(_price(quote))
         return QuoteBenchmark(
-            industry_average_price=industry_avg_price,
-            industry_average_delivery=industry_avg_delivery,
+            industry_average_price=round(quoted.average_price, 2),
+            industry_average_delivery=round(quoted.average_delivery_days),
             market_percentile=percentile,
-            competitive_advantage=self._identify_competitive_advantages(quote),
-            improvement_suggestions=self._suggest_improvements(quote)
+            accepted_average_price=round(accepted.average_price, 2) if accepted else None,
+            sample_size=quoted.quote_count,
+            benchmark_group=dict(zip(('industry_category', 'process', 'material', 'quantity_bucket'), quoted.dimensions)),
+            competitive_advantage=self._identify_competitive_advantages(quote, quoted, percentile),
+            improvement_suggestions=self._suggest_improvements(quote, quoted, percentile)
         )
     
     # Private helper methods
     
-    def _calculate_price_score(self, quote: Quote, all_quotes: List[Quote]) -> float:
-        """Calculate price competitiveness score (0-100)"""
-        prices = [q.price_total for q in all_quotes]
-        min_price = min(prices)
-        max_price = max(prices)
-        
-        if max_price == min_price:
-            return 100.0
+    def _quote_set_version(self, db: Session, order_id: int) -> Tuple:
+        """Quote count, id sum and latest update of an order's quotes; changes whenever a quote does"""
+        count, id_sum, last_updated = db.query(
+            func.count(Quote.id), func.sum(Quote.id), func.max(Quote.updated_at)  # pylint: disable=not-callable
+        ).filter(Quote.order_id == order_id).one()
+        return count, id_sum, last_updated, _committed_quote_changes[order_id]
+    
+    def _calculate_price_scores(self, features: QuoteFeatures, stats: QuoteSetStatistics) -> np.ndarray:
+        """Price competitiveness scores (0-100)"""
+        if stats.max_price == stats.min_price:
+            return np.full(len(features.prices), 100.0)
         
         # Invert score so lower price = higher score
-        normalized = (max_price - quote.price_total) / (max_price - min_price)
-        return normalized * 100
+        return (stats.max_price - features.prices) / (stats.max_price - stats.min_price) * 100
     
-    def _calculate_delivery_score(self, quote: Quote, all_quotes: List[Quote]) -> float:
-        """Calculate delivery time competitiveness score (0-100)"""
-        delivery_times = [q.delivery_time for q in all_quotes]
-        min_delivery = min(delivery_times)
-        max_delivery = max(delivery_times)
-        
-        if max_delivery == min_delivery:
-            return 100.0
+    def _calculate_delivery_scores(self, features: QuoteFeatures, stats: QuoteSetStatistics) -> np.ndarray:
+        """Delivery time competitiveness scores (0-100)"""
+        if stats.max_delivery == stats.min_delivery:
+            return np.full(len(features.deliveries), 100.0)
         
         # Invert score so shorter delivery = higher score
-        normalized = (max_delivery - quote.delivery_time) / (max_delivery - min_delivery)
-        return normalized * 100
-    
-    def _calculate_quality_score(self, quote: Quote) -> float:
-        """Calculate quality score based on manufacturer rating"""
-        if not quote.manufacturer or not quote.manufacturer.overall_rating:
-            return 60.0  # Default score
-        
-        # Convert 5-star rating to 100-point scale
-        return (quote.manufacturer.overall_rating / 5.0) * 100
-    
-    def _calculate_reliability_score(self, quote: Quote) -> float:
-        """Calculate reliability score based on manufacturer history"""
-        if not quote.manufacturer:
-            return 60.0
-        
-        # Factors: completion rate, on-time delivery, review count
-        completion_rate = getattr(quote.manufacturer, 'completion_rate', 0.85) * 100
-        on_time_rate = getattr(quote.manufacturer, 'on_time_delivery_rate', 0.80) * 100
-        review_count = getattr(quote.manufacturer, 'total_reviews', 0)
-        
-        # Review count factor (more reviews = more reliable)
-        review_factor = min(review_count / 50, 1.0) * 20  # Max 20 points
-        
-        return (completion_rate * 0.4 + on_time_rate * 0.4 + review_factor * 0.2)
-    
-    def _calculate_compliance_score(self, quote: Quote) -> float:
-        """Calculate compliance score based on certifications"""
-        if not quote.manufacturer:
-            return 50.0
-        
-        # Count relevant certifications
-        certifications = getattr(quote.manufacturer, 'certifications', [])
-        cert_count = len(certifications) if certifications else 0
-        
-        # Base score + certification bonus
-        base_score = 60.0
-        cert_bonus = min(cert_count * 10, 40)  # Max 40 points for certifications
-        
-        return base_score + cert_bonus
-    
-    def _calculate_sustainability_score(self, quote: Quote) -> Optional[float]:
-        """Calculate sustainability score"""
-        if not quote.manufacturer:
-            return None
-        
-        # Check for sustainability certifications
-        sustainability_certs = ['ISO 14001', 'LEED', 'Carbon Neutral']
-        manufacturer_certs = getattr(quote.manufacturer, 'certifications', [])
-        
-        if not manufacturer_certs:
-            return 50.0
-        
-        cert_names = [cert.get('name', '') if isinstance(cert, dict) else str(cert) for cert in manufacturer_certs]
-        sustainability_count = sum(1 for cert in cert_names if any(s_cert in cert for s_cert in sustainability_certs))
-        
-        return min(50 + sustainability_count * 25, 100)
+        return (stats.max_delivery - features.deliveries) / (stats.max_delivery - stats.min_delivery) * 100
+    
+    def _calculate_quality_scores(self, features: QuoteFeatures) -> np.ndarray:
+        """Quality scores based on manufacturer rating"""
+        # Convert 5-star rating to 100-point scale; 60 for unrated manufacturers
+        return np.where(features.ratings > 0, features.ratings / 5.0 * 100, 60.0)
+    
+    def _calculate_reliability_scores(self, features: QuoteFeatures) -> np.ndarray:
+        """Reliability scores based on manufacturer history"""
+        # Factors: completion rate, on-time delivery, review count.
+        # Manufacturers track neither completion rate nor review count yet.
+        completion_rate = 0.85 * 100
+        on_time_rate = features.on_time_rates * 100
+        review_factor = 0.0
+        
+        scores = completion_rate * 0.4 + on_time_rate * 0.4 + review_factor * 0.2
+        return np.where(features.has_manufacturer, scores, 60.0)
+    
+    def _calculate_compliance_scores(self, features: QuoteFeatures) -> np.ndarray:
+        """Compliance scores based on certifications"""
+        # Base score + certification bonus, max 40 points for certifications
+        scores = 60.0 + np.minimum(features.certification_counts * 10, 40)
+        return np.where(features.has_manufacturer, scores, 50.0)
+    
+    def _calculate_sustainability_scores(self, features: QuoteFeatures) -> List[Optional[float]]:
+        """Sustainability scores based on sustainability certifications"""
+        scores = np.where(
+            features.certification_counts > 0, np.minimum(50 + features.sustainability_counts * 25, 100), 50.0
+        )
+        return [float(score) if known else None for score, known in zip(scores, features.has_manufacturer)]
     
-    def _calculate_total_cost_of_ownership(self, quote: Quote) -> float:
+    def _calculate_total_cost_of_ownership(self, features: QuoteFeatures) -> np.ndarray:
         """Calculate TCO including hidden costs"""
-        base_cost = float(quote.price_total)
+        base_cost = features.prices
         
         # Add estimated additional costs
         shipping_cost = base_cost * 0.05  # 5% shipping estimate
@@ -272,11 +402,9 @@ class QuoteComparisonService:
         risk_premium = base_cost * 0.01   # 1% risk premium
         
         # Quality-based adjustments
-        if quote.manufacturer and quote.manufacturer.overall_rating:
-            quality_factor = quote.manufacturer.overall_rating / 5.0
-            quality_adjustment = base_cost * (1 - quality_factor) * 0.1
-        else:
-            quality_adjustment = base_cost * 0.05
+        quality_adjustment = np.where(
+            features.ratings > 0, base_cost * (1 - features.ratings / 5.0) * 0.1, base_cost * 0.05
+        )
         
         return base_cost + shipping_cost + handling_cost + risk_premium + quality_adjustment
     
@@ -294,12 +422,12 @@ class QuoteComparisonService:
         if not quote.manufacturer:
             risks["factors"].append("Unknown manufacturer")
             risk_score += 20
-        elif quote.manufacturer.overall_rating and quote.manufacturer.overall_rating < 3.0:
+        elif 0 < _rating(quote) < 3.0:
             risks["factors"].append("Low manufacturer rating")
             risk_score += 15
         
         # Delivery risk
-        if quote.delivery_time > 30:
+        if _delivery_days(quote) > 30:
             risks["factors"].append("Long delivery time")
             risk_score += 10
         
@@ -317,29 +445,21 @@ class QuoteComparisonService:
         risks["score"] = min(risk_score, 100)
         return risks
     
-    def _determine_market_position(self, quote: Quote, all_quotes: List[Quote]) -> str:
-        """Determine quote's market position"""
-        prices = [q.price_total for q in all_quotes]
-        quote_price = quote.price_total
-        
-        min_price = min(prices)
-        max_price = max(prices)
-        avg_price = statistics.mean(prices)
-        
-        if quote_price == min_price:
-            return "lowest"
-        elif quote_price <= avg_price * 0.9:
-            return "competitive"
-        elif quote_price <= avg_price * 1.1:
-            return "market_rate"
-        else:
-            return "premium"
+    def _determine_market_position(self, features: QuoteFeatures, stats: QuoteSetStatistics) -> List[str]:
+        """Determine each quote's market position"""
+        prices = features.prices
+        positions = np.select(
+            [prices == stats.min_price, prices <= stats.avg_price * 0.9, prices <= stats.avg_price * 1.1],
+            ["lowest", "competitive", "market_rate"],
+            default="premium"
+        )
+        return positions.tolist()
     
-    def _calculate_simple_score(self, quote: Quote) -> float:
+    def _calculate_simple_scores(self, features: QuoteFeatures) -> np.ndarray:
         """Simple scoring for ranking"""
-        price_factor = 1000 / max(float(quote.price_total), 1)
-        delivery_factor = 30 / max(quote.delivery_time, 1)
-        quality_factor = quote.manufacturer.overall_rating if quote.manufacturer and quote.manufacturer.overall_rating else 3.0
+        price_factor = 1000 / np.maximum(features.prices, 1)
+        delivery_factor = 30 / np.maximum(features.deliveries, 1)
+        quality_factor = np.where(features.ratings > 0, features.ratings, 3.0)
         
         return price_factor + delivery_factor + quality_factor
     
@@ -348,58 +468,58 @@ class QuoteComparisonService:
         filtered = quotes
         
         if filters.max_price:
-            filtered = [q for q in filtered if q.price_total <= filters.max_price]
+            filtered = [q for q in filtered if _price(q) <= filters.max_price]
         
         if filters.max_delivery_days:
-            filtered = [q for q in filtered if q.delivery_time <= filters.max_delivery_days]
+            filtered = [q for q in filtered if _delivery_days(q) <= filters.max_delivery_days]
         
         if filters.min_rating and filtered:
-            filtered = [q for q in filtered if q.manufacturer and q.manufacturer.overall_rating and q.manufacturer.overall_rating >= filters.min_rating]
+            filtered = [q for q in filtered if _rating(q) and _rating(q) >= filters.min_rating]
         
         return filtered
     
-    def _identify_strengths(self, quote: Quote, all_quotes: List[Quote]) -> List[str]:
+    def _identify_strengths(self, quote: Quote, stats: QuoteSetStatistics) -> List[str]:
         """Identify quote strengths"""
         strengths = []
         
-        prices = [q.price_total for q in all_quotes]
-        deliveries = [q.delivery_time for q in all_quotes]
+        price = _price(quote)
+        delivery_days = _delivery_days(quote)
         
-        if quote.price_total == min(prices):
+        if price == stats.min_price:
             strengths.append("Lowest price")
-        elif quote.price_total <= statistics.mean(prices) * 0.9:
+        elif price <= stats.avg_price * 0.9:
             strengths.append("Competitive pricing")
         
-        if quote.delivery_time == min(deliveries):
+        if delivery_days == stats.min_delivery:
             strengths.append("Fastest delivery")
-        elif quote.delivery_time <= statistics.mean(deliveries) * 0.9:
+        elif delivery_days <= stats.avg_delivery * 0.9:
             strengths.append("Quick delivery")
         
-        if quote.manufacturer and quote.manufacturer.overall_rating and quote.manufacturer.overall_rating >= 4.5:
+        if _rating(quote) >= 4.5:
             strengths.append("Highly rated manufacturer")
         
         return strengths
     
-    def _identify_weaknesses(self, quote: Quote, all_quotes: List[Quote]) -> List[str]:
+    def _identify_weaknesses(self, quote: Quote, stats: QuoteSetStatistics) -> List[str]:
         """Identify quote weaknesses"""
         weaknesses = []
         
-        prices = [q.price_total for q in all_quotes]
-        deliveries = [q.delivery_time for q in all_quotes]
+        price = _price(quote)
+        delivery_days = _delivery_days(quote)
         
-        if quote.price_total == max(prices):
+        if price == stats.max_price:
             weaknesses.append("Highest price")
-        elif quote.price_total >= statistics.mean(prices) * 1.2:
+        elif price >= stats.avg_price * 1.2:
             weaknesses.append("Above market price")
         
-        if quote.delivery_time == max(deliveries):
+        if delivery_days == stats.max_delivery:
             weaknesses.append("Longest delivery time")
-        elif quote.delivery_time >= statistics.mean(deliveries) * 1.2:
+        elif delivery_days >= stats.avg_delivery * 1.2:
             weaknesses.append("Slow delivery")
         
         if not quote.manufacturer:
             weaknesses.append("Unknown manufacturer")
-        elif quote.manufacturer.overall_rating and quote.manufacturer.overall_rating < 3.0:
+        elif 0 < _rating(quote) < 3.0:
             weaknesses.append("Low manufacturer rating")
         
         return weaknesses
@@ -411,10 +531,10 @@ class QuoteComparisonService:
         if not quote.manufacturer:
             risks.append("Unverified manufacturer")
         
-        if quote.delivery_time > 45:
+        if _delivery_days(quote) > 45:
             risks.append("Extended delivery timeline")
         
-        if quote.manufacturer and quote.manufacturer.overall_rating and quote.manufacturer.overall_rating < 3.5:
+        if 0 < _rating(quote) < 3.5:
             risks.append("Below average manufacturer rating")
         
         return risks
@@ -444,8 +564,8 @@ class QuoteComparisonService:
     
     def _generate_market_analysis(self, quotes: List[Quote]) -> Dict[str, Any]:
         """Generate market analysis"""
-        prices = [float(q.price_total) for q in quotes]
-        deliveries = [q.delivery_time for q in quotes]
+        prices = [_price(q) for q in quotes]
+        deliveries = [_delivery_days(q) for q in quotes]
         
         return {
             "total_quotes": len(quotes),
@@ -457,24 +577,25 @@ class QuoteComparisonService:
     
     def _generate_cost_breakdown(self, quotes: List[Quote]) -> Dict[str, Any]:
         """Generate cost breakdown analysis"""
-        prices = [float(q.price_total) for q in quotes]
+        prices = [_price(q) for q in quotes]
+        average = statistics.mean(prices)
         
         return {
             "lowest_quote": min(prices),
             "highest_quote": max(prices),
-            "average_quote": statistics.mean(prices),
+            "average_quote": average,
             "median_quote": statistics.median(prices),
             "potential_savings": max(prices) - min(prices),
             "cost_distribution": {
-                "budget_friendly": len([p for p in prices if p <= statistics.mean(prices) * 0.8]),
-                "market_rate": len([p for p in prices if statistics.mean(prices) * 0.8 < p <= statistics.mean(prices) * 1.2]),
-                "premium": len([p for p in prices if p > statistics.mean(prices) * 1.2])
+                "budget_friendly": len([p for p in prices if p <= average * 0.8]),
+                "market_rate": len([p for p in prices if average * 0.8 < p <= average * 1.2]),
+                "premium": len([p for p in prices if p > average * 1.2])
             }
         }
     
     def _generate_timeline_analysis(self, quotes: List[Quote]) -> Dict[str, Any]:
         """Generate timeline analysis"""
-        deliveries = [q.delivery_time for q in quotes]
+        deliveries = [_delivery_days(q) for q in quotes]
         
         return {
             "fastest_delivery": min(deliveries),
@@ -486,12 +607,9 @@ class QuoteComparisonService:
             "extended_options": len([d for d in deliveries if d > 30])
         }
     
-    def _generate_risk_analysis(self, quotes: List[Quote]) -> Dict[str, Any]:
+    def _generate_risk_analysis(self, quote_comparisons: List[QuoteComparison]) -> Dict[str, Any]:
         """Generate risk analysis"""
-        risk_levels = []
-        for quote in quotes:
-            risk_assessment = self._assess_quote_risk(quote)
-            risk_levels.append(risk_assessment["overall_level"])
+        risk_levels = [qc.analytics.risk_assessment["overall_level"] for qc in quote_comparisons]
         
         return {
             "low_risk_quotes": risk_levels.count("low"),
@@ -529,44 +647,71 @@ class QuoteComparisonService:
         
         return recommendations
     
-    # Simplified implementations for benchmarking (would use real data in production)
-    
-    def _get_industry_average_price(self, db: Session, category: Optional[str]) -> float:
-        """Get industry average price (simplified)"""
-        return 1000.0  # Placeholder
-    
-    def _get_industry_average_delivery(self, db: Session, category: Optional[str]) -> int:
-        """Get industry average delivery time (simplified)"""
-        return 21  # Placeholder
-    
-    def _get_similar_quotes(self, db: Session, quote: Quote, category: Optional[str]) -> List[Quote]:
-        """Get similar quotes for benchmarking (simplified)"""
-        return []  # Placeholder
-    
-    def _calculate_percentile(self, quote: Quote, similar_quotes: List[Quote]) -> int:
-        """Calculate market percentile (simplified)"""
-        return 50  # Placeholder
-    
-    def _identify_competitive_advantages(self, quote: Quote) -> List[str]:
-        """Identify competitive advantages (simplified)"""
+    def _identify_competitive_advantages(
+        self,
+        quote: Quote,
+        benchmark: Optional[Benchmark] = None,
+        percentile: Optional[int] = None
+    ) -> List[str]:
+        """Identify competitive advantages against the quote's benchmark group"""
         advantages = []
         
-        if quote.manufacturer and quote.manufacturer.overall_rating and quote.manufacturer.overall_rating >= 4.0:
+        if _rating(quote) >= 4.0:
             advantages.append("High manufacturer rating")
         
-        if quote.delivery_time <= 14:
-            advantages.append("Fast delivery capability")
+        if benchmark is None:
+            if _delivery_days(quote) <= 14:
+                advantages.append("Fast delivery capability")
+            return advantages
+        
+        if percentile <= 25:
+            advantages.append(f"Priced below {100 - percentile}% of similar quotes")
+        if _delivery_days(quote) <= benchmark.average_delivery_days * 0.8:
+            advantages.append("Faster delivery than similar quotes")
         
         return advantages
     
-    def _suggest_improvements(self, quote: Quote) -> List[str]:
-        """Suggest improvements (simplified)"""
+    def _suggest_improvements(
+        self,
+        quote: Quote,
+        benchmark: Optional[Benchmark] = None,
+        percentile: Optional[int] = None
+    ) -> List[str]:
+        """Suggest improvements against the quote's benchmark group"""
         suggestions = []
         
-        if quote.delivery_time > 30:
-            suggestions.append("Negotiate shorter delivery timeline")
+        if benchmark is None:
+            if _delivery_days(quote) > 30:
+                suggestions.append("Negotiate shorter delivery timeline")
+        else:
+            if percentile >= 75:
+                suggestions.append(f"Priced above {percentile}% of similar quotes; review the cost breakdown")
+            if _delivery_days(quote) >= benchmark.average_delivery_days * 1.2:
+                suggestions.append("Negotiate shorter delivery timeline")
         
-        if not quote.manufacturer or not quote.manufacturer.overall_rating or quote.manufacturer.overall_rating < 4.0:
+        if _rating(quote) < 4.0:
             suggestions.append("Request additional quality assurance measures")
         
-        return suggestions 
\ No newline at end of file
+        return suggestions
+
+
+def install_quote_change_tracking() -> None:
+    """Count committed quote changes per order, for the report cache's quote-set versions"""
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_quote_changes(session, flush_context):
+        for instance in chain(session.new, session.dirty, session.deleted):
+            if isinstance(instance, Quote) and instance.order_id is not None:
+                session.info.setdefault('changed_quote_orders', set()).add(instance.order_id)
+
+    @event.listens_for(Session, 'after_commit')
+    def _count_quote_changes(session):
+        for order_id in session.info.pop('changed_quote_orders', ()):
+            _committed_quote_changes[order_id] += 1
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_quote_changes(session):
+        session.info.pop('changed_quote_orders', None)
+
+
+install_quote_change_tracking()
@@ -2,16 +2,27 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 import logging
 
+from app.core.pagination import InvalidCursor, KeysetPage, keyset_order
 from app.models.quote import Quote, QuoteStatus
 from app.models.producer import Manufacturer
 from app.models.user import User
 from app.models.order import Order, OrderStatus
 from app.schemas.quote import QuoteCreate
+from app.services.full_text_search import QUOTE_SEARCH
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import case, func
 
 logger = logging.getLogger(__name__)
 
+# Columns search_quotes() can sort by
+QUOTE_SORT_COLUMNS = {
+    'created_at': Quote.created_at,
+    'updated_at': Quote.updated_at,
+    'valid_until': Quote.valid_until,
+    'total_price_pln': Quote.total_price_pln,
+    'lead_time_days': Quote.lead_time_days,
+}
+
 class QuoteService:
     def __init__(self, db: Session):
         self.db = db
@@ -80,6 +91,10 @@ class QuoteService:
 
     def search_quotes(self, filters: dict, current_user: User) -> list[Quote]:
         """Advanced search with multiple filter criteria"""
+        return self.search_quotes_page(filters, current_user).items
+
+    def search_quotes_page(self, filters: dict, current_user: User) -> KeysetPage[Quote]:
+        """search_quotes(), with the cursor of the next page; pass it back as filters['cursor']"""
         query = self.db.query(Quote)
 
         # Apply role-based visibility
@@ -92,11 +107,11 @@ class QuoteService:
                 query = query.filter(Quote.manufacturer_id == manufacturer.id)
 
         # Dynamic filters
-        if (status := filters.get('status')):
-            if isinstance(status, list):
-                query = query.filter(Quote.status.in_(status))
+        if (status_filter := filters.get('status')):
+            if isinstance(status_filter, list):
+                query = query.filter(Quote.status.in_(status_filter))
             else:
-                query = query.filter(Quote.status == status)
+                query = query.filter(Quote.status == status_filter)
         if (order_id := filters.get('order_id')):
             query = query.filter(Quote.order_id == order_id)
         if (manufacturer_id := filters.get('manufacturer_id')):
@@ -109,22 +124,22 @@ class QuoteService:
             query = query.filter(Quote.created_at >= created_from)
         if (created_to := filters.get('created_to')):
             query = query.filter(Quote.created_at <= created_to)
-        if (search := filters.get('search')):
-            like_pattern = f"%{search}%"
-            query = query.filter(Quote.client_message.ilike(like_pattern))
-
-        # Sorting
-        sort_by = filters.get('sort_by', 'created_at')
-        sort_order = filters.get('sort_order', 'desc')
-        sort_column = getattr(Quote, sort_by, Quote.created_at)
-        if sort_order == 'desc':
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+        if (matches := QUOTE_SEARCH.matches(self.db, filters.get('search'))) is not None:
+            query = query.join(matches, matches.c.id == Quote.id)
+
+        # Sorting, on the id too so that pages never overlap
+        sort_by = filters.get('sort_by') or 'created_at'
+        if sort_by not in QUOTE_SORT_COLUMNS:
+            sort_by = 'created_at'
+        keyset = keyset_order(QUOTE_SORT_COLUMNS, sort_by, filters.get('sort_order') or 'desc', Quote.id)
 
         limit = filters.get('limit', 100)
         offset = filters.get('skip', 0)
-        return query.offset(offset).limit(limit).all()
+        try:
+            rows = keyset.apply(query, filters.get('cursor'), limit, offset).all()
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return keyset.page(rows, limit)
 
     def bulk_update_status(self, action: str, quote_ids: list[int], current_user: User) -> int:
         """Perform bulk operations on quotes (accept, reject, withdraw, delete)"""
@@ -167,12 +182,19 @@ class QuoteService:
             if manufacturer:
                 query = query.filter(Quote.manufacturer_id == manufacturer.id)
 
-        total_quotes = query.count()
-        accepted = query.filter(Quote.status == QuoteStatus.ACCEPTED).count()
-        rejected = query.filter(Quote.status == QuoteStatus.REJECTED).count()
-        withdrawn = query.filter(Quote.status == QuoteStatus.WITHDRAWN).count()
-        sent = query.filter(Quote.status == QuoteStatus.SENT).count()
-        avg_value = (query.with_entities(func.avg(Quote.total_price_pln)).scalar() or 0)
+        # One pass over the filtered quotes for every count and the average
+        def count_status(quote_status):
+            return func.count(case((Quote.status == quote_status, 1)))
+
+        total_quotes, accepted, rejected, withdrawn, sent, avg_value = query.with_entities(
+            func.count(Quote.id),
+            count_status(QuoteStatus.ACCEPTED),
+            count_status(QuoteStatus.REJECTED),
+            count_status(QuoteStatus.WITHDRAWN),
+            count_status(QuoteStatus.SENT),
+            func.avg(Quote.total_price_pln),
+        ).one()
+        avg_value = avg_value or 0
 
         win_rate = round((accepted / total_quotes) * 100, 2) if total_quotes else 0
 
@@ -9,6 +9,8 @@ from enum import Enum
 from ..models import Order, ProductionQuote, Manufacturer, Quote
 from ..models.production_quote import ProductionQuoteType, PricingModel
 from ..types import CapabilityCategory, UrgencyLevel
+from .manufacturer_catalog import manufacturer_catalog
+from .matching_result_cache import MatchingResultCache, matching_result_cache, register_result_types
 
 
 class MatchType(Enum):
@@ -46,6 +48,9 @@ class SmartMatch:
     expires_at: Optional[datetime]
 
 
+register_result_types(MatchType, MatchScore, SmartMatch)
+
+
 class SmartMatchingService:
     """
     Advanced smart matching service for connecting orders with production quotes
@@ -54,6 +59,7 @@ class SmartMatchingService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.catalog = manufacturer_catalog
         
     # Core Matching Methods
     
@@ -83,7 +89,7 @@ class SmartMatchingService:
                     score=score,
                     estimated_price=self._estimate_price(order, pq),
                     estimated_delivery_days=self._estimate_delivery_time(order, pq),
-                    manufacturer_info=self._get_manufacturer_info(pq.manufacturer),
+                    manufacturer_info=self._get_manufacturer_info(self._manufacturer(pq)),
                     created_at=datetime.now(),
                     expires_at=datetime.now() + timedelta(days=7)
                 )
@@ -119,7 +125,7 @@ class SmartMatchingService:
                     score=score,
                     estimated_price=self._estimate_price(order, pq),
                     estimated_delivery_days=self._estimate_delivery_time(order, pq),
-                    manufacturer_info=self._get_manufacturer_info(pq.manufacturer),
+                    manufacturer_info=self._get_manufacturer_info(self._manufacturer(pq)),
                     created_at=datetime.now(),
                     expires_at=datetime.now() + timedelta(days=7)
                 )
@@ -131,6 +137,11 @@ class SmartMatchingService:
     
     # Candidate Selection Methods
     
+    def _manufacturer(self, production_quote: ProductionQuote) -> Optional[Manufacturer]:
+        """Manufacturer of a production quote from the shared catalog, loaded only when not in it"""
+        manufacturer = self.catalog.get(self.db, production_quote.manufacturer_id)
+        return manufacturer if manufacturer is not None else production_quote.manufacturer
+    
     def _get_candidate_production_quotes(self, order: Order) -> List[ProductionQuote]:
         """Get production quotes that could potentially match the order."""
         query = self.db.query(ProductionQuote).filter(
@@ -216,7 +227,7 @@ class SmartMatchingService:
         timeline_score = self._score_timeline_compatibility(order, production_quote)
         geographic_score = self._score_geographic_proximity(order, production_quote)
         capacity_score = self._score_capacity_availability(order, production_quote)
-        manufacturer_score = self._score_manufacturer_rating(production_quote.manufacturer)
+        manufacturer_score = self._score_manufacturer_rating(self._manufacturer(production_quote))
         urgency_score = self._score_urgency_alignment(order, production_quote)
         specification_score = self._score_specification_match(order, production_quote)
         
@@ -629,33 +640,34 @@ class SmartMatchingService:
 
 # Batch Processing and Caching
 class MatchingCache:
-    """Cache for storing and retrieving match results."""
-    
-    def __init__(self):
-        self._cache = {}
-        self._cache_expiry = {}
-    
+    """
+    Cache for storing and retrieving match results.
+
+    Backed by the shared two-tier matching result cache, so entries are
+    bounded, shared between workers and invalidated whenever the
+    manufacturer catalog (including production quotes) changes.
+    """
+
+    ENGINE = "smart_quotes"
+
+    def __init__(self, result_cache: Optional[MatchingResultCache] = None):
+        self.result_cache = result_cache or matching_result_cache
+
     def get_matches(self, key: str) -> Optional[List[SmartMatch]]:
         """Get cached matches if still valid."""
-        if key in self._cache and key in self._cache_expiry:
-            if datetime.now() < self._cache_expiry[key]:
-                return self._cache[key]
-            else:
-                # Clean up expired cache
-                del self._cache[key]
-                del self._cache_expiry[key]
-        return None
-    
+        return self.result_cache.get(self.ENGINE, key)
+
     def set_matches(self, key: str, matches: List[SmartMatch], ttl_minutes: int = 30):
         """Cache matches with TTL."""
-        self._cache[key] = matches
-        self._cache_expiry[key] = datetime.now() + timedelta(minutes=ttl_minutes)
-    
+        self.result_cache.set(self.ENGINE, key, matches, ttl_seconds=ttl_minutes * 60)
+
     def clear_cache(self):
-        """Clear all cached matches."""
-        self._cache.clear()
-        self._cache_expiry.clear()
+        """Invalidate all cached matches."""
+        self.result_cache.bump_catalog_version("matching cache refresh requested")
+
+    def size(self) -> int:
+        return self.result_cache.local_size()
 
 
 # Global cache instance
-matching_cache = MatchingCache() 
\ No newline at end of file
+matching_cache = MatchingCache()
@@ -13,13 +13,14 @@ FIXED VERSION - Addresses issues found in testing:
 - Improved fuzzy matching accuracy
 """
 
+import heapq
 import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, text
+from sqlalchemy import and_, or_, func, text, case, cast, distinct, Float
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
@@ -31,13 +32,31 @@ from dataclasses import dataclass, asdict
 from fuzzywuzzy import fuzz, process
 
 from app.models.producer import Manufacturer
-from app.models.order import Order
-from app.models.quote import Quote
+from app.models.order import Order, OrderStatus
+from app.models.quote import Quote, QuoteStatus
 from app.models.user import User
 from app.core.config import settings
+from app.services.matching_kernel import SmartScoringKernel, KernelScores
+from app.services.capability_index import CapabilityIndex, normalize_term
+from app.services.capability_tags import required_tags
+from app.services.geo_index import coordinates, haversine_km, order_location, proximity_score, within_radius
+from app.services.manufacturer_catalog import active_since, manufacturer_catalog
+from app.services.matching_result_cache import matching_result_cache, order_fingerprint, register_result_types
 
 logger = logging.getLogger(__name__)
 
+# SmartRecommendation fields computed only for the recommendations returned,
+# and only when asked for; see SmartMatchingEngine.expand_recommendation()
+RECOMMENDATION_DETAILS = (
+    'estimated_delivery_time',
+    'estimated_cost_range',
+    'risk_assessment',
+    'competitive_advantages',
+    'potential_concerns',
+    'similar_past_projects',
+    'ai_insights',
+)
+
 
 @dataclass
 class MatchScore:
@@ -61,18 +80,34 @@ class MatchScore:
 
 @dataclass
 class SmartRecommendation:
-    """Enhanced recommendation with AI insights"""
+    """Enhanced recommendation with AI insights; details not asked for are None"""
     manufacturer_id: int
     manufacturer_name: str
     match_score: MatchScore
     predicted_success_rate: float
-    estimated_delivery_time: int
-    estimated_cost_range: Dict[str, float]
-    risk_assessment: Dict[str, Any]
-    competitive_advantages: List[str]
-    potential_concerns: List[str]
-    similar_past_projects: List[Dict[str, Any]]
-    ai_insights: Dict[str, Any]
+    estimated_delivery_time: Optional[int] = None
+    estimated_cost_range: Optional[Dict[str, float]] = None
+    risk_assessment: Optional[Dict[str, Any]] = None
+    competitive_advantages: Optional[List[str]] = None
+    potential_concerns: Optional[List[str]] = None
+    similar_past_projects: Optional[List[Dict[str, Any]]] = None
+    ai_insights: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class ManufacturerStats:
+    """Historical statistics for one manufacturer, prefetched for batch scoring"""
+    quote_count: int = 0                 # Quotes in the price-history window (max 50)
+    priced_quote_count: int = 0          # Of those, quotes with a price and an order
+    unit_price_sum: float = 0.0          # Sum of total price / order quantity
+    recent_quote_count: int = 0          # Quotes in the last 90 days
+    recent_accepted_count: int = 0       # Accepted quotes in the last 90 days
+    recent_accepted_orders: int = 0      # Orders won in the last 180 days
+    industry_orders: int = 0             # Orders won in the order's industry
+    industry_successful_orders: int = 0  # Of those, completed or delivered
+
+
+register_result_types(MatchScore, SmartRecommendation)
 
 
 class SmartMatchingEngine:
@@ -103,8 +138,37 @@ class SmartMatchingEngine:
             'availability': 0.05           # Reduced
         }
         
+        # Component score each weight applies to
+        self.score_weight_keys = {
+            'capability_match': 'capability',
+            'performance_history': 'performance',
+            'geographic_proximity': 'geographic',
+            'quality_metrics': 'quality',
+            'cost_efficiency': 'cost_efficiency',
+            'availability': 'availability'
+        }
+        
+        # NEW: Capability vocabulary index replacing per-pair fuzzy matching
+        self.capability_index = CapabilityIndex(
+            self._capability_pair_similarity, self._finalize_capability_match
+        )
+        self.use_capability_index = True
+        
+        # NEW: Shared result cache, invalidated when the manufacturer catalog changes
+        self.result_cache = matching_result_cache
+        self.use_result_cache = True
+        self.result_cache_ttl_seconds = 900
+        
+        # NEW: Shared in-memory manufacturer catalog candidates are taken from
+        self.catalog = manufacturer_catalog
+        
+        # Candidate pool size for the per-row and vectorized scoring paths
+        self.max_candidates = 100
+        self.max_vectorized_candidates = 5000
+        
         # FIXED: Stricter AI model parameters
         self.min_confidence_threshold = 0.7    # Increased from 0.6
+        self.min_score_threshold = 0.4         # Filters poor matches
         self.similarity_threshold = 0.4        # Increased from 0.3
         self.clustering_enabled = True
         
@@ -123,17 +187,56 @@ class SmartMatchingEngine:
         order: Order,
         max_recommendations: int = 15,
         include_ai_insights: bool = True,
-        enable_ml_predictions: bool = True
+        enable_ml_predictions: bool = True,
+        batch_scoring: bool = True,
+        vectorized: bool = True,
+        details: Optional[Iterable[str]] = None
     ) -> List[SmartRecommendation]:
         """
         FIXED: Generate AI-powered manufacturer recommendations with improved accuracy
+
+        With batch_scoring enabled the historical statistics for every
+        candidate are prefetched in a few grouped queries instead of being
+        queried per manufacturer. With vectorized enabled the candidates are
+        scored as columns by SmartScoringKernel, which allows a much larger
+        candidate pool. All modes produce identical rankings.
+
+        Candidates are taken best first and only the ones returned are
+        enriched: the success prediction and business filters are applied
+        one candidate at a time until max_recommendations have passed, and
+        only those get the fields of RECOMMENDATION_DETAILS named in details
+        (all by default). The others stay None until expand_recommendation().
+
+        Results are served from the shared matching result cache while
+        neither the order nor the manufacturer catalog has changed.
         """
+        details = RECOMMENDATION_DETAILS if details is None else tuple(details)
+        unknown = set(details) - set(RECOMMENDATION_DETAILS)
+        if unknown:
+            raise ValueError(f"Unknown recommendation details: {', '.join(sorted(unknown))}")
+        
         try:
+            fingerprint = None
+            if self.use_result_cache:
+                fingerprint = order_fingerprint(
+                    order,
+                    max_recommendations=max_recommendations,
+                    include_ai_insights=include_ai_insights,
+                    enable_ml_predictions=enable_ml_predictions,
+                    details=sorted(details)
+                )
+                cached = self.result_cache.get('smart', fingerprint)
+                if cached is not None:
+                    return list(cached)
+            
             logger.info(f"Generating smart recommendations for order {order.id}")
             start_time = datetime.now()
             
             # Get candidate manufacturers
-            candidates = self._get_candidate_manufacturers(db, order)
+            candidates = self._get_candidate_manufacturers(
+                db, order,
+                limit=self.max_vectorized_candidates if vectorized else self.max_candidates
+            )
             
             if not candidates:
                 logger.warning(f"No candidate manufacturers found for order {order.id}")
@@ -143,30 +246,30 @@ class SmartMatchingEngine:
             if enable_ml_predictions and not self.success_predictor:
                 self._initialize_ml_models(db)
             
-            # Generate recommendations with improved scoring
+            # Take candidates best first until enough pass the business filters
             recommendations = []
+            ranked = self._ranked_candidates(
+                db, order, candidates,
+                batch_scoring=batch_scoring, vectorized=vectorized
+            )
             
-            for manufacturer in candidates:
+            for manufacturer, match_score in ranked:
+                if len(recommendations) >= max_recommendations:
+                    break
                 try:
-                    # FIXED: Calculate comprehensive match score with penalties
-                    match_score = self._calculate_enhanced_match_score(
-                        db, manufacturer, order
+                    recommendation = self._create_smart_recommendation(
+                        db, manufacturer, order, match_score,
+                        include_ai_insights, enable_ml_predictions, details=()
                     )
                     
-                    # FIXED: Apply stricter confidence threshold
-                    if match_score.confidence_level < self.min_confidence_threshold:
-                        logger.debug(f"Manufacturer {manufacturer.id} filtered out due to low confidence: {match_score.confidence_level}")
-                        continue
-                    
-                    # FIXED: Apply minimum score threshold to filter poor matches
-                    if match_score.total_score < 0.4:
-                        logger.debug(f"Manufacturer {manufacturer.id} filtered out due to low score: {match_score.total_score}")
+                    # Apply business logic filters before the expensive details
+                    if not self._passes_smart_filters(recommendation):
                         continue
                     
-                    # Generate AI-powered insights
-                    recommendation = self._create_smart_recommendation(
-                        db, manufacturer, order, match_score,
-                        include_ai_insights, enable_ml_predictions
+                    # Generate AI-powered insights for the survivors only
+                    self.expand_recommendation(
+                        db, recommendation, order, details,
+                        include_ai_insights=include_ai_insights, manufacturer=manufacturer
                     )
                     
                     recommendations.append(recommendation)
@@ -175,102 +278,409 @@ class SmartMatchingEngine:
                     logger.error(f"Error processing manufacturer {manufacturer.id}: {str(e)}")
                     continue
             
-            # Sort by total score and confidence
-            recommendations.sort(
-                key=lambda x: (x.match_score.total_score, x.match_score.confidence_level),
-                reverse=True
-            )
-            
-            # Apply business logic filters
-            recommendations = self._apply_smart_filters(recommendations, order)
-            
-            # Limit results
-            recommendations = recommendations[:max_recommendations]
-            
             processing_time = (datetime.now() - start_time).total_seconds()
             logger.info(
                 f"Smart matching completed for order {order.id}: "
                 f"{len(recommendations)} recommendations in {processing_time:.2f}s"
             )
             
+            if fingerprint is not None:
+                self.result_cache.set('smart', fingerprint, recommendations, self.result_cache_ttl_seconds)
+            
             return recommendations
             
         except Exception as e:
             logger.error(f"Error in smart matching for order {order.id}: {str(e)}")
             return []
     
-    def _get_candidate_manufacturers(
+    def expand_recommendation(
+        self,
+        db: Session,
+        recommendation: SmartRecommendation,
+        order: Order,
+        fields: Optional[Iterable[str]] = None,
+        include_ai_insights: bool = True,
+        manufacturer: Optional[Manufacturer] = None
+    ) -> SmartRecommendation:
+        """
+        Compute the detail fields of a recommendation that are still None,
+        all of RECOMMENDATION_DETAILS by default, e.g. when the client opens
+        a recommendation returned without them
+        """
+        fields = RECOMMENDATION_DETAILS if fields is None else tuple(fields)
+        unknown = set(fields) - set(RECOMMENDATION_DETAILS)
+        if unknown:
+            raise ValueError(f"Unknown recommendation details: {', '.join(sorted(unknown))}")
+        
+        # In RECOMMENDATION_DETAILS order, which is the order they were always computed in
+        missing = [field for field in RECOMMENDATION_DETAILS if field in fields and getattr(recommendation, field) is None]
+        if not missing:
+            return recommendation
+        
+        if manufacturer is None:
+            manufacturer = self.catalog.get(db, recommendation.manufacturer_id)
+            if manufacturer is None:
+                raise ValueError(f"Manufacturer {recommendation.manufacturer_id} not found")
+        
+        for field in missing:
+            setattr(recommendation, field, self._recommendation_detail(
+                db, field, manufacturer, order, recommendation.match_score, include_ai_insights
+            ))
+        return recommendation
+    
+    def _recommendation_detail(
+        self,
+        db: Session,
+        field: str,
+        manufacturer: Manufacturer,
+        order: Order,
+        match_score: MatchScore,
+        include_ai_insights: bool
+    ) -> Any:
+        """Value of one of RECOMMENDATION_DETAILS"""
+        
+        if field == 'estimated_delivery_time':
+            return self._estimate_delivery_time(manufacturer, order)
+        if field == 'estimated_cost_range':
+            return self._estimate_cost_range(db, manufacturer, order)
+        if field == 'risk_assessment':
+            return self._assess_risks(db, manufacturer, order, match_score)
+        if field == 'competitive_advantages':
+            return self._identify_competitive_advantages(manufacturer, order)
+        if field == 'potential_concerns':
+            return self._identify_potential_concerns(manufacturer, order, match_score)
+        if field == 'similar_past_projects':
+            return self._find_similar_projects(db, manufacturer, order)
+        if include_ai_insights:
+            return self._generate_ai_insights(db, manufacturer, order, match_score)
+        return {}
+    
+    def _ranked_candidates(
+        self,
+        db: Session,
+        order: Order,
+        candidates: List[Manufacturer],
+        batch_scoring: bool = True,
+        vectorized: bool = False
+    ) -> Iterator[Tuple[Manufacturer, MatchScore]]:
+        """
+        Candidates above the confidence and score thresholds, best first by
+        total score and then confidence, ties in candidate order. Ranked with
+        a heap (or one argsort of the kernel columns), so taking the first k
+        costs O(n + k log n) and only those k get a MatchScore built.
+        """
+        
+        if vectorized:
+            survivors = self._vectorized_survivors(db, order, candidates)
+            order_by = np.lexsort((
+                np.arange(len(survivors)), -survivors['confidence'], -survivors['total_score']
+            ))
+            for index in order_by:
+                yield survivors.manufacturers[index], self._match_score_from_columns(survivors, index)
+            return
+        
+        scored = self._score_candidates(db, order, candidates, batch_scoring=batch_scoring)
+        heap = [
+            (-match_score.total_score, -match_score.confidence_level, position)
+            for position, (_, match_score) in enumerate(scored)
+        ]
+        heapq.heapify(heap)
+        while heap:
+            position = heapq.heappop(heap)[2]
+            yield scored[position]
+    
+    def _score_candidates(
+        self,
+        db: Session,
+        order: Order,
+        candidates: List[Manufacturer],
+        batch_scoring: bool = True,
+        vectorized: bool = False
+    ) -> List[Tuple[Manufacturer, MatchScore]]:
+        """
+        Score candidates and keep those above the confidence and score thresholds
+        """
+        
+        if vectorized:
+            return self._score_candidates_vectorized(db, order, candidates)
+        
+        stats_by_manufacturer = {}
+        if batch_scoring:
+            stats_by_manufacturer = self._prefetch_manufacturer_stats(
+                db, [manufacturer.id for manufacturer in candidates], order
+            )
+        
+        scored = []
+        
+        for manufacturer in candidates:
+            try:
+                # FIXED: Calculate comprehensive match score with penalties
+                match_score = self._calculate_enhanced_match_score(
+                    db, manufacturer, order,
+                    stats=stats_by_manufacturer.get(manufacturer.id)
+                )
+                
+                # FIXED: Apply stricter confidence threshold
+                if match_score.confidence_level < self.min_confidence_threshold:
+                    logger.debug(f"Manufacturer {manufacturer.id} filtered out due to low confidence: {match_score.confidence_level}")
+                    continue
+                
+                # FIXED: Apply minimum score threshold to filter poor matches
+                if match_score.total_score < self.min_score_threshold:
+                    logger.debug(f"Manufacturer {manufacturer.id} filtered out due to low score: {match_score.total_score}")
+                    continue
+                
+                scored.append((manufacturer, match_score))
+                
+            except Exception as e:
+                logger.error(f"Error scoring manufacturer {manufacturer.id}: {str(e)}")
+                continue
+        
+        return scored
+    
+    def _score_candidates_vectorized(
+        self,
+        db: Session,
+        order: Order,
+        candidates: List[Manufacturer]
+    ) -> List[Tuple[Manufacturer, MatchScore]]:
+        """
+        Score all candidates as columns and materialize only those above
+        the confidence and score thresholds
+        """
+        
+        survivors = self._vectorized_survivors(db, order, candidates)
+        
+        return [
+            (manufacturer, self._match_score_from_columns(survivors, index))
+            for index, manufacturer in enumerate(survivors.manufacturers)
+        ]
+    
+    def _vectorized_survivors(
+        self,
+        db: Session,
+        order: Order,
+        candidates: List[Manufacturer]
+    ) -> KernelScores:
+        """Kernel score columns of the candidates above the confidence and score thresholds"""
+        
+        stats_by_manufacturer = self._prefetch_manufacturer_stats(
+            db, [manufacturer.id for manufacturer in candidates], order
+        )
+        
+        kernel = SmartScoringKernel(self)
+        features = kernel.build_features(candidates, order, stats_by_manufacturer)
+        scores = kernel.score(features, order)
+        
+        keep = (
+            (scores['confidence'] >= self.min_confidence_threshold) &
+            (scores['total_score'] >= self.min_score_threshold)
+        )
+        return scores.select(keep)
+    
+    def _match_score_from_columns(self, scores: KernelScores, index: int) -> MatchScore:
+        """Build the MatchScore for one row of the kernel output"""
+        
+        capability_score = float(scores['capability'][index])
+        performance_score = float(scores['performance'][index])
+        match_reasons, risk_factors = self._describe_match(capability_score, performance_score)
+        
+        return MatchScore(
+            total_score=float(scores['total_score'][index]),
+            capability_score=capability_score,
+            performance_score=performance_score,
+            geographic_score=float(scores['geographic'][index]),
+            quality_score=float(scores['quality'][index]),
+            reliability_score=performance_score,  # Using performance as reliability proxy
+            cost_efficiency_score=float(scores['cost_efficiency'][index]),
+            availability_score=float(scores['availability'][index]),
+            specialization_score=0.0,  # Placeholder
+            historical_success_score=float(scores['historical_success'][index]),
+            confidence_level=float(scores['confidence'][index]),
+            match_reasons=match_reasons,
+            risk_factors=risk_factors,
+            recommendation_strength=str(scores['strength'][index]),
+            mismatch_penalties=float(scores['penalties'][index])
+        )
+    
+    def _prefetch_manufacturer_stats(
         self,
         db: Session,
+        manufacturer_ids: List[int],
         order: Order
-    ) -> List[Manufacturer]:
-        """Get candidate manufacturers with pre-filtering"""
+    ) -> Dict[int, ManufacturerStats]:
+        """
+        Load the historical statistics used by the scorers for all candidates
+        with one grouped query per statistic, keyed by manufacturer_id
+        """
+        
+        stats = {manufacturer_id: ManufacturerStats() for manufacturer_id in manufacturer_ids}
+        if not manufacturer_ids:
+            return stats
+        
+        now = datetime.now()
+        
+        # 1. Price history: the first 50 quotes per manufacturer, as in
+        #    _calculate_cost_intelligence
+        price_window = db.query(
+            Quote.manufacturer_id.label('manufacturer_id'),
+            Quote.order_id.label('order_id'),
+            Quote.total_price_pln.label('total_price_pln'),
+            func.row_number().over(
+                partition_by=Quote.manufacturer_id,
+                order_by=Quote.id
+            ).label('position')
+        ).filter(
+            Quote.manufacturer_id.in_(manufacturer_ids)
+        ).subquery()
+        
+        is_priced = and_(
+            price_window.c.total_price_pln.isnot(None),
+            price_window.c.total_price_pln != 0,
+            Order.id.isnot(None)
+        )
+        unit_price = cast(price_window.c.total_price_pln, Float) / case(
+            (Order.quantity > 1, Order.quantity), else_=1
+        )
         
-        query = db.query(Manufacturer).filter(
+        price_rows = db.query(
+            price_window.c.manufacturer_id,
+            func.count(),
+            func.count(case((is_priced, 1))),
+            func.sum(case((is_priced, unit_price)))
+        ).outerjoin(
+            Order, Order.id == price_window.c.order_id
+        ).filter(
+            price_window.c.position <= 50
+        ).group_by(price_window.c.manufacturer_id).all()
+        
+        for manufacturer_id, quote_count, priced_count, unit_price_sum in price_rows:
+            stats[manufacturer_id].quote_count = quote_count
+            stats[manufacturer_id].priced_quote_count = priced_count
+            stats[manufacturer_id].unit_price_sum = float(unit_price_sum or 0.0)
+        
+        # 2. Recent performance: quote acceptance over the last 90 days
+        recent_rows = db.query(
+            Quote.manufacturer_id,
+            func.count(Quote.id),
+            func.count(case((Quote.status == QuoteStatus.ACCEPTED, 1)))
+        ).filter(
             and_(
-                Manufacturer.is_active == True,
-                Manufacturer.is_verified == True,
-                Manufacturer.stripe_onboarding_completed == True
+                Quote.manufacturer_id.in_(manufacturer_ids),
+                Quote.created_at >= now - timedelta(days=90)
             )
-        )
+        ).group_by(Quote.manufacturer_id).all()
+        
+        for manufacturer_id, quote_count, accepted_count in recent_rows:
+            stats[manufacturer_id].recent_quote_count = quote_count
+            stats[manufacturer_id].recent_accepted_count = accepted_count
+        
+        # 3. Quality consistency: orders won over the last 180 days
+        consistency_rows = db.query(
+            Quote.manufacturer_id,
+            func.count(distinct(Order.id))
+        ).join(
+            Order, Quote.order_id == Order.id
+        ).filter(
+            and_(
+                Quote.manufacturer_id.in_(manufacturer_ids),
+                Quote.status == QuoteStatus.ACCEPTED,
+                Order.created_at >= now - timedelta(days=180)
+            )
+        ).group_by(Quote.manufacturer_id).all()
+        
+        for manufacturer_id, order_count in consistency_rows:
+            stats[manufacturer_id].recent_accepted_orders = order_count
+        
+        # 4. Historical success with orders from the same industry
+        success_rows = db.query(
+            Quote.manufacturer_id,
+            func.count(distinct(Order.id)),
+            func.count(distinct(case((
+                Order.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]),
+                Order.id
+            ))))
+        ).join(
+            Order, Quote.order_id == Order.id
+        ).filter(
+            and_(
+                Quote.manufacturer_id.in_(manufacturer_ids),
+                Quote.status == QuoteStatus.ACCEPTED,
+                Order.industry_category == order.industry_category
+            )
+        ).group_by(Quote.manufacturer_id).all()
+        
+        for manufacturer_id, order_count, successful_count in success_rows:
+            stats[manufacturer_id].industry_orders = order_count
+            stats[manufacturer_id].industry_successful_orders = successful_count
+        
+        return stats
+    
+    def _get_candidate_manufacturers(
+        self,
+        db: Session,
+        order: Order,
+        limit: Optional[int] = None
+    ) -> List[Manufacturer]:
+        """Get candidate manufacturers with pre-filtering, from the shared catalog"""
+        
+        snapshot = self.catalog.snapshot(db)
+        candidates = snapshot.matchable()
         
         # Apply basic filters based on order requirements
         if order.technical_requirements:
-            tech_reqs = order.technical_requirements
-            
             # Filter by minimum order quantity
             if order.quantity and order.quantity > 0:
-                query = query.filter(
-                    or_(
-                        Manufacturer.min_order_quantity.is_(None),
-                        Manufacturer.min_order_quantity <= order.quantity
-                    )
-                )
-                
-                query = query.filter(
-                    or_(
-                        Manufacturer.max_order_quantity.is_(None),
-                        Manufacturer.max_order_quantity >= order.quantity
-                    )
-                )
+                candidates = [
+                    m for m in candidates
+                    if (m.min_order_quantity is None or m.min_order_quantity <= order.quantity)
+                    and (m.max_order_quantity is None or m.max_order_quantity >= order.quantity)
+                ]
             
             # Filter by budget range
             if order.budget_max_pln:
-                query = query.filter(
-                    or_(
-                        Manufacturer.min_order_value_pln.is_(None),
-                        Manufacturer.min_order_value_pln <= order.budget_max_pln
-                    )
-                )
+                candidates = [
+                    m for m in candidates
+                    if m.min_order_value_pln is None or m.min_order_value_pln <= order.budget_max_pln
+                ]
         
-        # Geographic filtering
-        if order.preferred_country:
-            # Prioritize same country, but don't exclude others
-            pass
+        # Geographic filtering: other countries are not excluded, only
+        # manufacturers known to be beyond the order's maximum distance
+        location = self._order_location(order)
+        if order.max_distance_km and location is not None:
+            candidates = within_radius(candidates, snapshot.geo, location, order.max_distance_km)
         
         # Get active manufacturers with recent activity
-        query = query.filter(
-            or_(
-                Manufacturer.last_activity_date.is_(None),
-                Manufacturer.last_activity_date >= datetime.now() - timedelta(days=90)
-            )
-        )
+        candidates = [
+            m for m in candidates
+            if m.last_activity_date is None or active_since(m.last_activity_date, 90)
+        ]
+        
+        # Manufacturers tagged with the required process, material or
+        # certifications first, so the limit keeps them rather than an
+        # arbitrary slice; fuzzy capability scoring still sees everyone else
+        tags = required_tags(order.technical_requirements)
+        if tags:
+            # Stable sort: by id among equal hits
+            candidates.sort(key=lambda m: len(tags & m.tags), reverse=True)
         
-        return query.limit(100).all()  # Limit for performance
+        return candidates[:limit or self.max_candidates]  # Limit for performance
     
     def _calculate_enhanced_match_score(
         self,
         db: Session,
         manufacturer: Manufacturer,
-        order: Order
+        order: Order,
+        stats: Optional[ManufacturerStats] = None
     ) -> MatchScore:
         """
         FIXED: Enhanced match score calculation with penalty system
+
+        When prefetched stats are given, the historical scorers read them
+        instead of querying the database.
         """
         
         scores = {}
-        match_reasons = []
-        risk_factors = []
         
         # 1. FIXED: Enhanced Capability Matching (35%)
         capability_score = self._calculate_enhanced_capability_intelligence(
@@ -278,21 +688,13 @@ class SmartMatchingEngine:
         )
         scores['capability'] = capability_score
         
-        if capability_score > 0.85:
-            match_reasons.append("Excellent capability match")
-        elif capability_score < 0.3:  # FIXED: Stricter threshold
-            risk_factors.append("Poor capability alignment")
-        
         # 2. Performance History (25%)
         performance_score = self._calculate_performance_intelligence(
-            db, manufacturer, order
+            db, manufacturer, order, stats
         )
         scores['performance'] = performance_score
         
-        if performance_score > 0.85:
-            match_reasons.append("Outstanding performance history")
-        elif performance_score < 0.4:  # FIXED: Stricter threshold
-            risk_factors.append("Below-average performance metrics")
+        match_reasons, risk_factors = self._describe_match(capability_score, performance_score)
         
         # 3. FIXED: Enhanced Geographic Intelligence (12%)
         geographic_score = self._calculate_enhanced_geographic_intelligence(
@@ -302,13 +704,13 @@ class SmartMatchingEngine:
         
         # 4. Quality Assessment (15%)
         quality_score = self._calculate_quality_intelligence(
-            db, manufacturer, order
+            db, manufacturer, order, stats
         )
         scores['quality'] = quality_score
         
         # 5. Cost Efficiency (8%)
         cost_score = self._calculate_cost_intelligence(
-            db, manufacturer, order
+            db, manufacturer, order, stats
         )
         scores['cost_efficiency'] = cost_score
         
@@ -318,15 +720,18 @@ class SmartMatchingEngine:
         )
         scores['availability'] = availability_score
         
+        # Historical success with similar orders (reported, not weighted)
+        historical_success_score = self._calculate_historical_success_intelligence(
+            db, manufacturer, order, stats
+        )
+        
         # NEW: Calculate mismatch penalties
         penalties = self._calculate_mismatch_penalties(manufacturer, order)
         
         # Calculate weighted total score with penalties
         total_score = sum(
-            scores[key.replace('_intelligence', '').replace('_assessment', '')] * 
-            self.weights.get(key, 0) 
-            for key in self.weights.keys()
-            if key.replace('_', '') in scores or key in scores
+            scores[self.score_weight_keys[key]] * weight
+            for key, weight in self.weights.items()
         )
         
         # FIXED: Apply penalties to reduce score for poor matches
@@ -353,7 +758,7 @@ class SmartMatchingEngine:
             cost_efficiency_score=cost_score,
             availability_score=availability_score,
             specialization_score=0.0,  # Placeholder
-            historical_success_score=0.0,  # Placeholder
+            historical_success_score=historical_success_score,
             confidence_level=confidence,
             match_reasons=match_reasons,
             risk_factors=risk_factors,
@@ -361,6 +766,28 @@ class SmartMatchingEngine:
             mismatch_penalties=penalties
         )
     
+    def _describe_match(
+        self,
+        capability_score: float,
+        performance_score: float
+    ) -> Tuple[List[str], List[str]]:
+        """Match reasons and risk factors derived from the component scores"""
+        
+        match_reasons = []
+        risk_factors = []
+        
+        if capability_score > 0.85:
+            match_reasons.append("Excellent capability match")
+        elif capability_score < 0.3:  # FIXED: Stricter threshold
+            risk_factors.append("Poor capability alignment")
+        
+        if performance_score > 0.85:
+            match_reasons.append("Outstanding performance history")
+        elif performance_score < 0.4:  # FIXED: Stricter threshold
+            risk_factors.append("Below-average performance metrics")
+        
+        return match_reasons, risk_factors
+    
     def _calculate_enhanced_capability_intelligence(
         self,
         manufacturer: Manufacturer,
@@ -386,8 +813,8 @@ class SmartMatchingEngine:
             
             if available_processes:
                 # FIXED: Use enhanced fuzzy matching
-                process_match = self._enhanced_fuzzy_match_capability(
-                    required_process, available_processes
+                process_match = self._match_capability(
+                    required_process, manufacturer, 'manufacturing_processes'
                 )
                 total_score += process_match * 0.45
                 weight_sum += 0.45
@@ -398,8 +825,8 @@ class SmartMatchingEngine:
             available_materials = capabilities.get('materials', [])
             
             if available_materials:
-                material_match = self._enhanced_fuzzy_match_capability(
-                    required_material, available_materials
+                material_match = self._match_capability(
+                    required_material, manufacturer, 'materials'
                 )
                 total_score += material_match * 0.35
                 weight_sum += 0.35
@@ -408,8 +835,8 @@ class SmartMatchingEngine:
         if order.industry_category:
             served_industries = capabilities.get('industries_served', [])
             if served_industries:
-                industry_match = self._enhanced_fuzzy_match_capability(
-                    order.industry_category, served_industries
+                industry_match = self._match_capability(
+                    order.industry_category, manufacturer, 'industries_served'
                 )
                 total_score += industry_match * 0.15
                 weight_sum += 0.15
@@ -422,8 +849,8 @@ class SmartMatchingEngine:
             if required_certs and available_certs:
                 cert_matches = []
                 for req_cert in required_certs:
-                    cert_match = self._enhanced_fuzzy_match_capability(
-                        req_cert, available_certs
+                    cert_match = self._match_capability(
+                        req_cert, manufacturer, 'certifications'
                     )
                     cert_matches.append(cert_match)
                 
@@ -451,58 +878,82 @@ class SmartMatchingEngine:
         if not available or not required:
             return 0.0
         
-        required_lower = required.lower().strip()
+        required_lower = normalize_term(required)
         best_match = 0.0
         
         for capability in available:
-            capability_lower = capability.lower().strip()
-            
-            # Exact match gets perfect score
-            if required_lower == capability_lower:
-                return 1.0
-            
-            # EDGE CASE FIX: Handle close technical terms specifically
-            close_tech_score = self._calculate_close_technical_match(required_lower, capability_lower)
-            if close_tech_score > 0:
-                best_match = max(best_match, close_tech_score)
-                continue
-            
-            # Calculate multiple similarity metrics
-            similarity_scores = []
-            
-            # 1. Exact substring match with technical boost
-            if required_lower in capability_lower or capability_lower in required_lower:
-                substring_ratio = min(len(required_lower), len(capability_lower)) / max(len(required_lower), len(capability_lower))
-                # EDGE CASE FIX: Apply technical boost
+            best_match = max(
+                best_match, self._capability_pair_similarity(required_lower, normalize_term(capability))
+            )
+        
+        return self._finalize_capability_match(best_match)
+    
+    def _match_capability(self, required: str, manufacturer: Manufacturer, category: str) -> float:
+        """
+        NEW: Fuzzy match a required term against one capability category,
+        answered from the capability index when enabled
+        """
+        
+        if self.use_capability_index:
+            return self.capability_index.match(required, manufacturer, category)
+        
+        return self._enhanced_fuzzy_match_capability(
+            required, (manufacturer.capabilities or {}).get(category, [])
+        )
+    
+    def _capability_pair_similarity(self, required_lower: str, capability_lower: str) -> float:
+        """
+        Similarity of one normalized required term to one normalized capability
+        """
+        
+        # Exact match gets perfect score
+        if required_lower == capability_lower:
+            return 1.0
+        
+        # EDGE CASE FIX: Handle close technical terms specifically
+        close_tech_score = self._calculate_close_technical_match(required_lower, capability_lower)
+        if close_tech_score > 0:
+            return close_tech_score
+        
+        # Calculate multiple similarity metrics
+        similarity_scores = []
+        
+        # 1. Exact substring match with technical boost
+        if required_lower in capability_lower or capability_lower in required_lower:
+            substring_ratio = min(len(required_lower), len(capability_lower)) / max(len(required_lower), len(capability_lower))
+            # EDGE CASE FIX: Apply technical boost
+            boost_factor = self._get_technical_boost_factor(required_lower, capability_lower)
+            similarity_scores.append(substring_ratio * 0.9 * boost_factor)
+        
+        # 2. Word overlap similarity with boost
+        req_words = set(required_lower.split())
+        cap_words = set(capability_lower.split())
+        
+        if req_words and cap_words:
+            overlap = len(req_words.intersection(cap_words))
+            union = len(req_words.union(cap_words))
+            if union > 0:
+                word_similarity = overlap / union
                 boost_factor = self._get_technical_boost_factor(required_lower, capability_lower)
-                similarity_scores.append(substring_ratio * 0.9 * boost_factor)
-            
-            # 2. Word overlap similarity with boost
-            req_words = set(required_lower.split())
-            cap_words = set(capability_lower.split())
-            
-            if req_words and cap_words:
-                overlap = len(req_words.intersection(cap_words))
-                union = len(req_words.union(cap_words))
-                if union > 0:
-                    word_similarity = overlap / union
-                    boost_factor = self._get_technical_boost_factor(required_lower, capability_lower)
-                    similarity_scores.append(word_similarity * 0.8 * boost_factor)
-            
-            # 3. FIXED: Technical term matching (for manufacturing processes)
-            technical_similarity = self._calculate_technical_similarity(required_lower, capability_lower)
-            if technical_similarity > 0:
-                similarity_scores.append(technical_similarity)
-            
-            # 4. Fuzzy string matching using fuzzywuzzy
-            fuzzy_ratio = fuzz.token_sort_ratio(required_lower, capability_lower) / 100.0
-            if fuzzy_ratio >= 0.7:  # Only consider high fuzzy matches
-                similarity_scores.append(fuzzy_ratio * 0.7)
-            
-            # Take the best similarity score
-            if similarity_scores:
-                capability_similarity = max(similarity_scores)
-                best_match = max(best_match, capability_similarity)
+                similarity_scores.append(word_similarity * 0.8 * boost_factor)
+        
+        # 3. FIXED: Technical term matching (for manufacturing processes)
+        technical_similarity = self._calculate_technical_similarity(required_lower, capability_lower)
+        if technical_similarity > 0:
+            similarity_scores.append(technical_similarity)
+        
+        # 4. Fuzzy string matching using fuzzywuzzy
+        fuzzy_ratio = fuzz.token_sort_ratio(required_lower, capability_lower) / 100.0
+        if fuzzy_ratio >= 0.7:  # Only consider high fuzzy matches
+            similarity_scores.append(fuzzy_ratio * 0.7)
+        
+        # Take the best similarity score
+        return max(similarity_scores) if similarity_scores else 0.0
+    
+    def _finalize_capability_match(self, best_match: float) -> float:
+        """
+        Map the best pair similarity onto the final capability match score
+        """
         
         # EDGE CASE FIX: Boost scores that are just below thresholds
         if 0.32 <= best_match <= 0.38:  # Close to moderate range
@@ -621,8 +1072,12 @@ class SmartMatchingEngine:
         
         base_score = 0.3  # FIXED: Lower base score
         
-        # Country matching
-        if order.preferred_country:
+        distance_km = self._distance_km(manufacturer, order)
+        if distance_km is not None:
+            # Both locations known: proximity replaces the country heuristics
+            score = base_score + 0.5 * float(proximity_score(distance_km))  # (total: 0.35-0.8)
+        elif order.preferred_country:
+            # Country matching
             if manufacturer.country == order.preferred_country:
                 score = base_score + 0.5  # Same country bonus (total: 0.8)
             else:
@@ -641,6 +1096,27 @@ class SmartMatchingEngine:
         
         return min(max(score, 0.0), 1.0)
     
+    def _distance_km(self, manufacturer: Manufacturer, order: Order) -> Optional[float]:
+        """Distance in km between a manufacturer and the order's location, when both are known"""
+        
+        distance_km = self._distances_km([manufacturer], order)[0]
+        return None if np.isnan(distance_km) else float(distance_km)
+    
+    def _distances_km(self, manufacturers: List[Manufacturer], order: Order) -> np.ndarray:
+        """Haversine distances in km for a whole candidate set; NaN where unknown"""
+        
+        location = self._order_location(order)
+        if location is None:
+            return np.full(len(manufacturers), np.nan)
+        latitudes, longitudes = coordinates(manufacturers)
+        return haversine_km(location[0], location[1], latitudes, longitudes)
+    
+    def _order_location(self, order: Order) -> Optional[Tuple[float, float]]:
+        """Where the order is delivered: its preferred city, else its preferred country"""
+        
+        snapshot = self.catalog.current
+        return order_location(order, snapshot.geo if snapshot is not None else None)
+    
     def _calculate_distance_penalty(self, manufacturer_country: str, preferred_country: str) -> float:
         """
         NEW: Calculate distance penalty for different countries
@@ -755,8 +1231,8 @@ class SmartMatchingEngine:
             available_materials = capabilities.get('materials', [])
             
             if available_materials:
-                material_match = self._enhanced_fuzzy_match_capability(
-                    required_material, available_materials
+                material_match = self._match_capability(
+                    required_material, manufacturer, 'materials'
                 )
                 if material_match < 0.3:  # Poor material match
                     penalty = (0.3 - material_match) * self.penalty_weights['material_incompatibility']
@@ -768,8 +1244,8 @@ class SmartMatchingEngine:
             available_processes = capabilities.get('manufacturing_processes', [])
             
             if available_processes:
-                process_match = self._enhanced_fuzzy_match_capability(
-                    required_process, available_processes
+                process_match = self._match_capability(
+                    required_process, manufacturer, 'manufacturing_processes'
                 )
                 if process_match < 0.3:  # Poor process match
                     penalty = (0.3 - process_match) * self.penalty_weights['process_mismatch']
@@ -832,7 +1308,8 @@ class SmartMatchingEngine:
         self,
         db: Session,
         manufacturer: Manufacturer,
-        order: Order
+        order: Order,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """AI-enhanced performance assessment"""
         
@@ -840,7 +1317,7 @@ class SmartMatchingEngine:
         
         # Base performance metrics (60%)
         if manufacturer.overall_rating:
-            rating_score = min(manufacturer.overall_rating / 5.0, 1.0)
+            rating_score = min(float(manufacturer.overall_rating) / 5.0, 1.0)
             score += rating_score * 0.3
         
         if manufacturer.on_time_delivery_rate:
@@ -852,7 +1329,7 @@ class SmartMatchingEngine:
             score += experience_score * 0.1
         
         # Recent performance trend (40%)
-        recent_performance = self._analyze_recent_performance(db, manufacturer)
+        recent_performance = self._analyze_recent_performance(db, manufacturer, stats)
         score += recent_performance * 0.4
         
         return min(score, 1.0)
@@ -877,12 +1354,9 @@ class SmartMatchingEngine:
             score += 0.3  # No preference
         
         # Calculate distance if coordinates available
-        if (manufacturer.latitude and manufacturer.longitude and 
-            hasattr(order, 'delivery_location')):
-            # Placeholder for distance calculation
-            # In production, implement haversine formula
-            distance_score = 0.2  # Placeholder
-            score += distance_score
+        distance_km = self._distance_km(manufacturer, order)
+        if distance_km is not None:
+            score += 0.2 * float(proximity_score(distance_km))
         else:
             score += 0.2  # Neutral if no coordinates
         
@@ -892,7 +1366,8 @@ class SmartMatchingEngine:
         self,
         db: Session,
         manufacturer: Manufacturer,
-        order: Order
+        order: Order,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """Advanced quality assessment"""
         
@@ -900,7 +1375,7 @@ class SmartMatchingEngine:
         
         # Quality ratings (50%)
         if manufacturer.quality_rating:
-            quality_score = manufacturer.quality_rating / 5.0
+            quality_score = float(manufacturer.quality_rating) / 5.0
             score += quality_score * 0.5
         
         # Certifications relevance (30%)
@@ -911,7 +1386,7 @@ class SmartMatchingEngine:
             score += cert_score * 0.3
         
         # Quality consistency (20%)
-        consistency_score = self._analyze_quality_consistency(db, manufacturer)
+        consistency_score = self._analyze_quality_consistency(db, manufacturer, stats)
         score += consistency_score * 0.2
         
         return min(score, 1.0)
@@ -920,14 +1395,22 @@ class SmartMatchingEngine:
         self,
         db: Session,
         manufacturer: Manufacturer,
-        order: Order
+        order: Order,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """AI-powered cost efficiency analysis"""
         
+        if stats is not None:
+            if not stats.quote_count:
+                return 0.5  # Neutral score for new manufacturers
+            if not stats.priced_quote_count:
+                return 0.5
+            return self._score_unit_price(stats.unit_price_sum / stats.priced_quote_count)
+        
         # Analyze historical pricing patterns
         historical_quotes = db.query(Quote).filter(
             Quote.manufacturer_id == manufacturer.id
-        ).limit(50).all()
+        ).order_by(Quote.id).limit(50).all()
         
         if not historical_quotes:
             return 0.5  # Neutral score for new manufacturers
@@ -943,20 +1426,25 @@ class SmartMatchingEngine:
         if cost_scores:
             # Compare with market average (simplified)
             avg_cost = sum(cost_scores) / len(cost_scores)
-            # Placeholder: assume market average is 1000 PLN per unit
-            market_avg = 1000.0
-            
-            if avg_cost <= market_avg * 0.8:
-                return 0.9  # Very competitive
-            elif avg_cost <= market_avg:
-                return 0.7  # Competitive
-            elif avg_cost <= market_avg * 1.2:
-                return 0.5  # Average
-            else:
-                return 0.3  # Expensive
+            return self._score_unit_price(avg_cost)
         
         return 0.5
     
+    def _score_unit_price(self, avg_cost: float) -> float:
+        """Map an average historical unit price to a cost efficiency score"""
+        
+        # Placeholder: assume market average is 1000 PLN per unit
+        market_avg = 1000.0
+        
+        if avg_cost <= market_avg * 0.8:
+            return 0.9  # Very competitive
+        elif avg_cost <= market_avg:
+            return 0.7  # Competitive
+        elif avg_cost <= market_avg * 1.2:
+            return 0.5  # Average
+        else:
+            return 0.3  # Expensive
+    
     def _calculate_availability_intelligence(
         self,
         db: Session,
@@ -1039,30 +1527,37 @@ class SmartMatchingEngine:
         self,
         db: Session,
         manufacturer: Manufacturer,
-        order: Order
+        order: Order,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """Analyze historical success with similar orders"""
         
-        # Find similar past orders
-        similar_orders = db.query(Order).join(Quote).filter(
-            and_(
-                Quote.manufacturer_id == manufacturer.id,
-                Quote.status == 'ACCEPTED',
-                Order.industry_category == order.industry_category
-            )
-        ).limit(20).all()
+        if stats is not None:
+            similar_orders = stats.industry_orders
+            successful_orders = stats.industry_successful_orders
+        else:
+            # Find similar past orders
+            similar_orders, successful_orders = db.query(
+                func.count(distinct(Order.id)),
+                func.count(distinct(case((
+                    Order.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]),
+                    Order.id
+                ))))
+            ).join(
+                Quote, Quote.order_id == Order.id
+            ).filter(
+                and_(
+                    Quote.manufacturer_id == manufacturer.id,
+                    Quote.status == QuoteStatus.ACCEPTED,
+                    Order.industry_category == order.industry_category
+                )
+            ).one()
         
         if not similar_orders:
             return 0.5  # Neutral for no history
         
         # Analyze success rate
-        successful_orders = [
-            o for o in similar_orders 
-            if o.status in ['COMPLETED', 'DELIVERED']
-        ]
-        
-        success_rate = len(successful_orders) / len(similar_orders)
-        return success_rate
+        return successful_orders / similar_orders
     
     def _create_smart_recommendation(
         self,
@@ -1071,52 +1566,25 @@ class SmartMatchingEngine:
         order: Order,
         match_score: MatchScore,
         include_ai_insights: bool,
-        enable_ml_predictions: bool
+        enable_ml_predictions: bool,
+        details: Iterable[str] = RECOMMENDATION_DETAILS
     ) -> SmartRecommendation:
-        """Create comprehensive smart recommendation"""
+        """Create a smart recommendation with the given details"""
         
         # Predict success rate
         predicted_success = 0.75  # Placeholder
         if enable_ml_predictions and self.success_predictor:
             predicted_success = self._predict_success_rate(manufacturer, order)
         
-        # Estimate delivery time
-        estimated_delivery = self._estimate_delivery_time(manufacturer, order)
-        
-        # Estimate cost range
-        cost_range = self._estimate_cost_range(db, manufacturer, order)
-        
-        # Risk assessment
-        risk_assessment = self._assess_risks(db, manufacturer, order, match_score)
-        
-        # Competitive advantages
-        advantages = self._identify_competitive_advantages(manufacturer, order)
-        
-        # Potential concerns
-        concerns = self._identify_potential_concerns(manufacturer, order, match_score)
-        
-        # Similar past projects
-        similar_projects = self._find_similar_projects(db, manufacturer, order)
-        
-        # AI insights
-        ai_insights = {}
-        if include_ai_insights:
-            ai_insights = self._generate_ai_insights(
-                db, manufacturer, order, match_score
-            )
-        
-        return SmartRecommendation(
+        recommendation = SmartRecommendation(
             manufacturer_id=manufacturer.id,
             manufacturer_name=manufacturer.business_name or "Unknown",
             match_score=match_score,
-            predicted_success_rate=predicted_success,
-            estimated_delivery_time=estimated_delivery,
-            estimated_cost_range=cost_range,
-            risk_assessment=risk_assessment,
-            competitive_advantages=advantages,
-            potential_concerns=concerns,
-            similar_past_projects=similar_projects,
-            ai_insights=ai_insights
+            predicted_success_rate=predicted_success
+        )
+        return self.expand_recommendation(
+            db, recommendation, order, details,
+            include_ai_insights=include_ai_insights, manufacturer=manufacturer
         )
     
     def _fuzzy_match_capability(
@@ -1142,24 +1610,30 @@ class SmartMatchingEngine:
     def _analyze_recent_performance(
         self,
         db: Session,
-        manufacturer: Manufacturer
+        manufacturer: Manufacturer,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """Analyze recent performance trends"""
         
-        # Get recent quotes and orders
-        recent_quotes = db.query(Quote).filter(
-            and_(
-                Quote.manufacturer_id == manufacturer.id,
-                Quote.created_at >= datetime.now() - timedelta(days=90)
-            )
-        ).all()
+        if stats is not None:
+            quote_count = stats.recent_quote_count
+            accepted_count = stats.recent_accepted_count
+        else:
+            # Get recent quotes and orders
+            recent_quotes = db.query(Quote).filter(
+                and_(
+                    Quote.manufacturer_id == manufacturer.id,
+                    Quote.created_at >= datetime.now() - timedelta(days=90)
+                )
+            ).all()
+            quote_count = len(recent_quotes)
+            accepted_count = len([q for q in recent_quotes if q.status == QuoteStatus.ACCEPTED])
         
-        if not recent_quotes:
+        if not quote_count:
             return 0.5  # Neutral for no recent activity
         
         # Analyze acceptance rate, response time, etc.
-        accepted_quotes = [q for q in recent_quotes if q.status == 'ACCEPTED']
-        acceptance_rate = len(accepted_quotes) / len(recent_quotes)
+        acceptance_rate = accepted_count / quote_count
         
         # Simple performance score based on acceptance rate
         return min(acceptance_rate * 1.2, 1.0)
@@ -1206,20 +1680,26 @@ class SmartMatchingEngine:
     def _analyze_quality_consistency(
         self,
         db: Session,
-        manufacturer: Manufacturer
+        manufacturer: Manufacturer,
+        stats: Optional[ManufacturerStats] = None
     ) -> float:
         """Analyze quality consistency over time"""
         
-        # Get recent orders with ratings
-        recent_orders = db.query(Order).join(Quote).filter(
-            and_(
-                Quote.manufacturer_id == manufacturer.id,
-                Quote.status == 'ACCEPTED',
-                Order.created_at >= datetime.now() - timedelta(days=180)
-            )
-        ).all()
+        if stats is not None:
+            recent_order_count = stats.recent_accepted_orders
+        else:
+            # Get recent orders with ratings
+            recent_order_count = len(db.query(Order).join(
+                Quote, Quote.order_id == Order.id
+            ).filter(
+                and_(
+                    Quote.manufacturer_id == manufacturer.id,
+                    Quote.status == QuoteStatus.ACCEPTED,
+                    Order.created_at >= datetime.now() - timedelta(days=180)
+                )
+            ).all())
         
-        if len(recent_orders) < 3:
+        if recent_order_count < 3:
             return 0.5  # Not enough data
         
         # Placeholder: analyze rating consistency
@@ -1269,24 +1749,24 @@ class SmartMatchingEngine:
     ) -> List[SmartRecommendation]:
         """Apply intelligent business logic filters"""
         
-        filtered = []
+        return [rec for rec in recommendations if self._passes_smart_filters(rec)]
+    
+    def _passes_smart_filters(self, rec: SmartRecommendation) -> bool:
+        """Business logic filters; they need only the match score and success prediction"""
         
-        for rec in recommendations:
-            # Skip very low confidence recommendations
-            if rec.match_score.confidence_level < 0.4:
-                continue
-            
-            # Skip if too many risk factors
-            if len(rec.match_score.risk_factors) > 3:
-                continue
-            
-            # Skip if predicted success rate is too low
-            if rec.predicted_success_rate < 0.3:
-                continue
-            
-            filtered.append(rec)
+        # Skip very low confidence recommendations
+        if rec.match_score.confidence_level < 0.4:
+            return False
         
-        return filtered
+        # Skip if too many risk factors
+        if len(rec.match_score.risk_factors) > 3:
+            return False
+        
+        # Skip if predicted success rate is too low
+        if rec.predicted_success_rate < 0.3:
+            return False
+        
+        return True
     
     def _estimate_delivery_time(
         self,
@@ -1375,7 +1855,7 @@ class SmartMatchingEngine:
         
         # Material-based delays
         material_days = 0
-        if order.materials_required:
+        if getattr(order, 'materials_required', None):
             specialty_materials = [
                 'titanium', 'inconel', 'carbon fiber', 'peek', 'ultem',
                 'magnesium', 'beryllium', 'tungsten'
@@ -1396,7 +1876,7 @@ class SmartMatchingEngine:
         
         # Geographic/shipping considerations
         shipping_days = 0
-        if manufacturer.country != order.preferred_location:
+        if manufacturer.country != order.preferred_country:
             # International shipping adds time
             shipping_days = 5
             
@@ -1425,7 +1905,7 @@ class SmartMatchingEngine:
         
         # Quality requirements impact
         quality_factor = 1.0
-        if order.quality_standards:
+        if getattr(order, 'quality_standards', None):
             quality_standards = [std.lower() for std in order.quality_standards]
             if any(std in ['iso 9001', 'as9100', 'iso 13485'] for std in quality_standards):
                 quality_factor = 1.15  # Quality certifications add time
@@ -1553,7 +2033,7 @@ class SmartMatchingEngine:
         
         # Material cost factor
         material_factor = 1.0
-        if order.materials_required:
+        if getattr(order, 'materials_required', None):
             premium_materials = ['titanium', 'carbon fiber', 'stainless steel', 'aluminum']
             has_premium = any(
                 any(material.lower() in mat.lower() for material in premium_materials)
@@ -1574,7 +2054,7 @@ class SmartMatchingEngine:
         
         # Geographic factor
         geographic_factor = 1.0
-        if manufacturer.country != order.preferred_location:
+        if manufacturer.country != order.preferred_country:
             geographic_factor = 1.1  # International premium
         
         # Rush order factor
@@ -1600,7 +2080,7 @@ class SmartMatchingEngine:
         
         # Add variability based on historical data if available
         if similar_quotes:
-            avg_historical_cost = sum(q.total_amount for q in similar_quotes) / len(similar_quotes)
+            avg_historical_cost = sum(float(q.total_price_pln) for q in similar_quotes) / len(similar_quotes)
             # Blend with historical average (70% calculated, 30% historical)
             estimated_cost = estimated_cost * 0.7 + avg_historical_cost * 0.3
             confidence = 0.8
@@ -1719,10 +2199,12 @@ class SmartMatchingEngine:
     ) -> List[Dict[str, Any]]:
         """Find similar past projects"""
         
-        similar_orders = db.query(Order).join(Quote).filter(
+        similar_orders = db.query(Order).join(
+            Quote, Quote.order_id == Order.id
+        ).filter(
             and_(
                 Quote.manufacturer_id == manufacturer.id,
-                Quote.status == 'ACCEPTED',
+                Quote.status == QuoteStatus.ACCEPTED,
                 Order.industry_category == order.industry_category
             )
         ).limit(3).all()
@@ -1980,7 +2462,7 @@ class SmartMatchingEngine:
         features.append(float(order.budget_min or 1000))
         features.append(float(order.quantity or 1))
         features.append(len(order.technical_requirements or []))
-        features.append(len(order.materials_required or []))
+        features.append(len(getattr(order, 'materials_required', None) or []))
         
         # Quote features
         features.append(quote.total_amount)
@@ -1988,7 +2470,7 @@ class SmartMatchingEngine:
         features.append(quote.confidence_score or 0.5)
         
         # Geographic proximity (simplified)
-        geo_score = 1.0 if (manufacturer.country == order.preferred_location) else 0.5
+        geo_score = 1.0 if (manufacturer.country == order.preferred_country) else 0.5
         features.append(geo_score)
         
         # Time features
@@ -2065,7 +2547,7 @@ class SmartMatchingEngine:
         features.append(float(order.budget_min or 1000))
         features.append(float(order.quantity or 1))
         features.append(len(order.technical_requirements or []))
-        features.append(len(order.materials_required or []))
+        features.append(len(getattr(order, 'materials_required', None) or []))
         
         # Estimated quote features (using averages for prediction)
         estimated_cost = (order.budget_min or 1000) * 1.2  # Rough estimate
@@ -2074,7 +2556,7 @@ class SmartMatchingEngine:
         features.append(0.7)   # Default confidence
         
         # Geographic and urgency features
-        geo_score = 1.0 if (manufacturer.country == order.preferred_location) else 0.5
+        geo_score = 1.0 if (manufacturer.country == order.preferred_country) else 0.5
         features.append(geo_score)
         
         order_urgency = 1.0 if order.delivery_deadline and (order.delivery_deadline - order.created_at).days < 30 else 0.0
@@ -0,0 +1,313 @@
+"""
+Streaming tabular exports.
+
+An export is a list of ExportColumns over a SELECT statement. Rows are
+fetched in batches of `batch_size` with yield_per, which makes SQLAlchemy
+use a server-side cursor where the driver supports one (psycopg2 named
+cursors), and each batch is encoded to CSV, NDJSON or Parquet as soon as it
+arrives, optionally through a streaming gzip compressor. Memory stays
+bounded by one batch, whatever the size of the export:
+
+    columns = ORDER_EXPORT_COLUMNS
+    statement = export_statement(columns).where(Order.client_id == user_id)
+    return export_response(db, statement, columns, "orders_export", "csv")
+
+Exports too large for a request are written to disk by the
+export_dataset Celery task with write_export(), which returns a handle the
+client downloads later.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """One exported column and the SQL expression selected for it"""
+    header: str                                     # CSV header
+    key: str                                        # NDJSON / Parquet field name
+    expression: Any
+    transform: Optional[Callable[[Any], Any]] = None
+    kind: str = "string"                            # Parquet type: string, int, float or timestamp
+
+    def value(self, raw: Any) -> Any:
+        value = self.transform(raw) if self.transform is not None else raw
+        if isinstance(value, Enum):
+            return value.value
+        return value
+
+
+def export_statement(columns: Sequence[ExportColumn]) -> Select:
+    """SELECT of the column expressions, to be filtered by the caller"""
+    return select(*(column.expression for column in columns))
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+
+class CsvEncoder:
+    def __init__(self, columns: Sequence[ExportColumn]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def begin(self) -> bytes:
+        self._writer.writerow([column.header for column in self.columns])
+        return self._drain()
+
+    def encode(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        columns = self.columns
+        self._writer.writerows(
+            [_text(column.value(raw)) for column, raw in zip(columns, row)] for row in rows
+        )
+        return self._drain()
+
+    def end(self) -> bytes:
+        return b''
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode('utf-8')
+
+
+class NdjsonEncoder:
+    def __init__(self, columns: Sequence[ExportColumn]):
+        self.columns = columns
+
+    def begin(self) -> bytes:
+        return b''
+
+    def encode(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        columns = self.columns
+        lines = [
+            json.dumps({column.key: column.value(raw) for column, raw in zip(columns, row)}, default=_json_default)
+            for row in rows
+        ]
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+    def end(self) -> bytes:
+        return b''
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet records file offsets in its footer, so this keeps counting across drains
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """One Parquet row group per batch; needs pyarrow"""
+
+    def __init__(self, columns: Sequence[ExportColumn]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet exports require pyarrow")
+
+        self.pa = pyarrow
+        self.columns = columns
+        types = {
+            'string': pyarrow.string(),
+            'int': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'timestamp': pyarrow.timestamp('us', tz='UTC'),
+        }
+        self.schema = pyarrow.schema([(column.key, types[column.kind]) for column in columns])
+        self._sink = _DrainSink()
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self.schema)
+
+    def begin(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        if not rows:
+            return b''
+        arrays = []
+        for index, column in enumerate(self.columns):
+            values = [column.value(row[index]) for row in rows]
+            if column.kind == 'string':
+                values = [None if value is None else _text(value) for value in values]
+            elif column.kind == 'float':
+                values = [None if value is None else float(value) for value in values]
+            arrays.append(self.pa.array(values, type=self.schema.field(index).type))
+        self._writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {
+    ExportFormat.CSV: CsvEncoder,
+    ExportFormat.NDJSON: NdjsonEncoder,
+    ExportFormat.PARQUET: ParquetEncoder,
+}
+
+
+def iter_export(
+    db: Session,
+    statement: Select,
+    columns: Sequence[ExportColumn],
+    export_format: ExportFormat = ExportFormat.CSV,
+    compress: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Encoded export, one chunk per fetched batch of rows"""
+    encoder = ENCODERS[ExportFormat(export_format)](columns)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None and data else data
+
+    chunk = emit(encoder.begin())
+    if chunk:
+        yield chunk
+
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        for rows in result.partitions():
+            chunk = emit(encoder.encode(rows))
+            if chunk:
+                yield chunk
+    finally:
+        result.close()
+
+    chunk = emit(encoder.end())
+    if compressor is not None:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def stream_export(
+    db: Session,
+    statement: Select,
+    columns: Sequence[ExportColumn],
+    export_format: ExportFormat = ExportFormat.CSV,
+    compress: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """iter_export() as an async generator; fetching and encoding run in the threadpool"""
+    chunks = iter_export(db, statement, columns, export_format, compress, batch_size)
+    async for chunk in iterate_in_threadpool(chunks):
+        yield chunk
+
+
+def export_filename(basename: str, export_format: ExportFormat, compress: bool = False) -> str:
+    return f"{basename}.{ExportFormat(export_format).value}" + (".gz" if compress else "")
+
+
+def export_response(
+    db: Session,
+    statement: Select,
+    columns: Sequence[ExportColumn],
+    basename: str,
+    export_format: ExportFormat = ExportFormat.CSV,
+    compress: bool = False
+) -> StreamingResponse:
+    """StreamingResponse of an export, sent as an attachment"""
+    export_format = ExportFormat(export_format)
+    if export_format == ExportFormat.PARQUET:
+        # Fail before the response starts rather than halfway through it
+        ParquetEncoder(columns)
+    return StreamingResponse(
+        stream_export(db, statement, columns, export_format, compress),
+        media_type="application/gzip" if compress else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={export_filename(basename, export_format, compress)}"}
+    )
+
+
+def write_export(
+    db: Session,
+    statement: Select,
+    columns: Sequence[ExportColumn],
+    path: str,
+    export_format: ExportFormat = ExportFormat.CSV,
+    compress: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Write an export to path, via a temporary file so readers never see a partial one"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = f"{path}.part"
+    size = 0
+    try:
+        with open(partial, 'wb') as output:
+            for chunk in iter_export(db, statement, columns, export_format, compress, batch_size):
+                output.write(chunk)
+                size += len(chunk)
+        os.replace(partial, path)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    logger.info(f"Export written to {path} ({size} bytes)")
+    return {"path": path, "bytes": size}
@@ -16,6 +16,8 @@ from app.services.analytics import AnalyticsService
 from app.services.reporting import ReportingService
 from app.services.metrics import MetricsService
 from app.models.analytics import AnalyticsEvent
+from app.services.manufacturer_similarity_index import ManufacturerSimilarityIndex
+from app.services.dashboard_counters import rebuild_counters
 
 
 @celery_app.task(bind=True, max_retries=2)
@@ -556,4 +558,57 @@ def generate_predictive_analytics() -> Dict[str, Any]:
         
     except Exception as exc:
         logger.error(f"Predictive analytics generation failed: {str(exc)}")
-        raise 
\ No newline at end of file
+        raise
+
+
+@celery_app.task
+def materialize_similar_manufacturers() -> Dict[str, Any]:
+    """
+    Materialize nearest-neighbour lists for every manufacturer
+    Scheduled task - runs nightly
+    """
+    db = next(get_db())
+    try:
+        similarity_index = ManufacturerSimilarityIndex()
+        similarity_index.rebuild(db)
+        manufacturer_count = similarity_index.materialize()
+        
+        logger.info(f"Similar manufacturer lists materialized for {manufacturer_count} manufacturers")
+        
+        return {
+            'status': 'success',
+            'manufacturers': manufacturer_count,
+            'neighbours': similarity_index.neighbours
+        }
+        
+    except Exception as exc:
+        logger.error(f"Similar manufacturer materialization failed: {str(exc)}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task
+def rebuild_dashboard_counters() -> Dict[str, Any]:
+    """
+    Rebuild materialized dashboard counters from orders and quotes and report drift
+    Scheduled task - runs nightly
+    """
+    db = next(get_db())
+    try:
+        report = rebuild_counters(db)
+        
+        logger.info(
+            f"Dashboard counters rebuilt: {report['counters']} counters, {report['drifted']} drifted"
+        )
+        
+        return {
+            'status': 'success',
+            **report
+        }
+        
+    except Exception as exc:
+        logger.error(f"Dashboard counter rebuild failed: {str(exc)}")
+        raise
+    finally:
+        db.close()
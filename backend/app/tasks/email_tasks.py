@@ -222,59 +222,33 @@ def process_bounced_emails() -> Dict[str, Any]:
 def send_bulk_email_task(self, email_list: List[Dict[str, Any]], template_name: str, common_context: Dict[str, Any]):
     """
     Celery task for sending bulk emails (newsletters, campaigns)
+    Unsubscribes are checked in batches and emails go out through SendGrid's
+    batch API on the worker's shared event loop (see app.services.bulk_email)
     """
-    from app.services.email import email_service
-    
-    results = []
-    successful = 0
-    failed = 0
+    from app.services.bulk_email import bulk_email_sender, run_in_worker_loop
     
-    for email_data in email_list:
-        try:
-            # Check if user is unsubscribed
-            if email_service.unsubscribe_manager and email_service.unsubscribe_manager.is_unsubscribed(
-                email_data['email'], template_name
-            ):
-                logger.info(f"Skipping bulk email to {email_data['email']} - unsubscribed")
-                continue
-            
-            # Merge common context with user-specific context
-            context = {**common_context, **email_data.get('context', {})}
-            
-            # Render template
-            rendered = template_manager.render_template(
-                template_name, 
-                context, 
-                email_data.get('language', 'en')
-            )
-            
-            # Send email immediately (since we're already in a task)
-            success = asyncio.run(email_service.send_immediate_email(
-                to_email=email_data['email'],
-                subject=rendered['subject'],
-                html_content=rendered['html_content'],
-                text_content=rendered.get('text_content')
-            ))
-            
-            if success:
-                successful += 1
-                results.append({"email": email_data['email'], "status": "sent"})
-            else:
-                failed += 1
-                results.append({"email": email_data['email'], "status": "failed", "error": "SendGrid error"})
-                
-        except Exception as e:
-            failed += 1
-            results.append({"email": email_data['email'], "status": "failed", "error": str(e)})
-            logger.error(f"Bulk email failed for {email_data['email']}: {str(e)}")
+    recipients = [
+        {
+            'email': email_data['email'],
+            'name': email_data.get('name'),
+            'context': email_data.get('context', {}),
+            'language': email_data.get('language', 'en')
+        }
+        for email_data in email_list
+    ]
+    results = run_in_worker_loop(bulk_email_sender().send(template_name, recipients, common_context))
     
-    logger.info(f"Bulk email campaign completed: {successful} sent, {failed} failed")
+    successful = sum(1 for result in results if result['status'] == 'sent')
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    skipped = len(results) - successful - failed
+    logger.info(f"Bulk email campaign completed: {successful} sent, {failed} failed, {skipped} unsubscribed")
     
     return {
         "template": template_name,
         "total": len(email_list),
         "successful": successful,
         "failed": failed,
+        "unsubscribed": skipped,
         "results": results
     }
 
@@ -455,8 +429,8 @@ def send_email_campaign(template_name: str, recipient_list: List[Dict], common_c
     """
     Send bulk email campaign
     """
-    # Split into chunks to avoid overwhelming the system
-    chunk_size = 100
+    # One chunk per task; a task sends up to 1000 recipients per SendGrid request
+    chunk_size = 1000
     chunks = [recipient_list[i:i + chunk_size] for i in range(0, len(recipient_list), chunk_size)]
     
     task_ids = []
@@ -0,0 +1,71 @@
+"""
+Background exports written to disk and downloaded later
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.celery_config import celery_app
+from app.core.config import settings
+from app.core.principal_cache import Principal
+from app.core.read_replicas import get_read_db
+from app.services.data_exports import EXPORT_DATASETS
+from app.services.streaming_export import MEDIA_TYPES, ExportFormat, export_filename, write_export
+
+read_session = contextmanager(get_read_db)
+
+
+def remove_expired_exports(directory: str, retention_hours: int) -> int:
+    """Delete export files older than the retention period"""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - retention_hours * 3600
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove expired export {entry.path}: {e}")
+    return removed
+
+
+@celery_app.task(bind=True, max_retries=1)
+def export_dataset(
+    self,
+    dataset: str,
+    principal: str,
+    export_format: str = ExportFormat.CSV.value,
+    compress: bool = False,
+    filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Export a dataset visible to a principal (Principal.to_json()) to a file
+    Priority: LOW
+    """
+    export_format = ExportFormat(export_format)
+    owner = Principal.from_json(principal)
+    definition = EXPORT_DATASETS[dataset]
+    directory = settings.EXPORT_DIRECTORY
+
+    remove_expired_exports(directory, settings.EXPORT_RETENTION_HOURS)
+
+    filename = export_filename(f"{dataset}_export", export_format, compress)
+    path = os.path.join(directory, f"{self.request.id}_{filename}")
+    logger.info(f"Exporting {dataset} as {filename} for user {owner.id}")
+
+    with read_session() as db:
+        result = write_export(
+            db, definition.build(owner, **(filters or {})), definition.columns, path, export_format, compress
+        )
+
+    return {
+        **result,
+        "filename": filename,
+        "media_type": "application/gzip" if compress else MEDIA_TYPES[export_format],
+        "user_id": owner.id,
+    }
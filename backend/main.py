@@ -7,7 +7,8 @@ import uvicorn
 
 from app.core.config import get_settings
 from app.core.database import create_tables, get_db
-from app.core.middleware import setup_middleware, cleanup_rate_limits
+from app.core.middleware import setup_middleware
+from app.core.read_replicas import ReadRoutingMiddleware
 from app.core.exceptions import setup_exception_handlers
 from app.core.logging import setup_logging
 from app.core.sentry import configure_sentry
@@ -54,19 +55,10 @@ async def lifespan(app: FastAPI):
         logger.error(f"Health monitoring initialization failed: {e}")
         # Continue without health monitoring to avoid startup failure
     
-    # Start background tasks
-    cleanup_task = asyncio.create_task(cleanup_rate_limits())
-    logger.info("Background tasks started")
-    
     yield
     
     # Shutdown
     logger.info("Shutting down Manufacturing Platform API...")
-    cleanup_task.cancel()
-    try:
-        await cleanup_task
-    except asyncio.CancelledError:
-        pass
     logger.info("Shutdown complete")
 
 
@@ -111,6 +103,9 @@ app = FastAPI(
 # Setup middleware (order matters!)
 setup_middleware(app, settings)
 
+# Per-request read replica routing state
+app.add_middleware(ReadRoutingMiddleware)
+
 # Setup exception handlers
 setup_exception_handlers(app)
 
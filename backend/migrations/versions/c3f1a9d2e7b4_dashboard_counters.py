@@ -0,0 +1,33 @@
+"""dashboard counters
+
+Revision ID: c3f1a9d2e7b4
+Revises: 9bb45b133c13
+Create Date: 2026-10-16 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1a9d2e7b4'
+down_revision = '9bb45b133c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Populated by app.tasks.analytics_tasks.rebuild_dashboard_counters;
+    # dashboards use aggregate queries until its first run
+    op.create_table(
+        'dashboard_counters',
+        sa.Column('owner_type', sa.String(length=20), primary_key=True),
+        sa.Column('owner_id', sa.Integer(), primary_key=True),
+        sa.Column('metric', sa.String(length=50), primary_key=True),
+        sa.Column('value', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('dashboard_counters')
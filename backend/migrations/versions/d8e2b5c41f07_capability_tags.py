@@ -0,0 +1,123 @@
+"""capability tags
+
+Revision ID: d8e2b5c41f07
+Revises: c3f1a9d2e7b4
+Create Date: 2026-10-16 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2b5c41f07'
+down_revision = 'c3f1a9d2e7b4'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# As in app.services.capability_tags
+PRODUCTION_QUOTE_TAG_FIELDS = {
+    'process': 'manufacturing_processes',
+    'material': 'materials',
+    'certification': 'certifications',
+    'country': 'preferred_countries',
+}
+MANUFACTURER_TAG_FIELDS = {
+    'process': 'manufacturing_processes',
+    'material': 'materials',
+    'certification': 'certifications',
+}
+
+
+def _normalize(value):
+    return ' '.join(str(value).split()).casefold()[:200]
+
+
+def _tags(lists):
+    tags = set()
+    for kind, values in lists.items():
+        if isinstance(values, str):
+            values = [values]
+        elif not isinstance(values, (list, tuple)):
+            continue
+        for value in values:
+            tag = _normalize(value) if value is not None else ''
+            if tag:
+                tags.add((kind, tag))
+    return tags
+
+
+def _backfill(source, columns, tag_table, owner_key, tags_of):
+    """Tag rows for every row of source, read in primary key order in batches"""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(source.c.id, *columns).where(source.c.id > last_id).order_by(source.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        tag_rows = [
+            {'kind': kind, 'value': value, owner_key: row[0]}
+            for row in rows
+            for kind, value in sorted(tags_of(row))
+        ]
+        if tag_rows:
+            bind.execute(tag_table.insert(), tag_rows)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    production_quote_tags = op.create_table(
+        'production_quote_tags',
+        sa.Column('kind', sa.String(length=20), primary_key=True),
+        sa.Column('value', sa.String(length=200), primary_key=True),
+        sa.Column(
+            'production_quote_id', sa.Integer(),
+            sa.ForeignKey('production_quotes.id', ondelete='CASCADE'), primary_key=True
+        ),
+    )
+    op.create_index('idx_production_quote_tags_quote', 'production_quote_tags', ['production_quote_id'])
+
+    manufacturer_capability_tags = op.create_table(
+        'manufacturer_capability_tags',
+        sa.Column('kind', sa.String(length=20), primary_key=True),
+        sa.Column('value', sa.String(length=200), primary_key=True),
+        sa.Column(
+            'manufacturer_id', sa.Integer(),
+            sa.ForeignKey('manufacturers.id', ondelete='CASCADE'), primary_key=True
+        ),
+    )
+    op.create_index(
+        'idx_manufacturer_capability_tags_manufacturer', 'manufacturer_capability_tags', ['manufacturer_id']
+    )
+
+    production_quotes = sa.table(
+        'production_quotes', sa.column('id', sa.Integer),
+        *(sa.column(field, sa.JSON) for field in PRODUCTION_QUOTE_TAG_FIELDS.values())
+    )
+    _backfill(
+        production_quotes,
+        [production_quotes.c[field] for field in PRODUCTION_QUOTE_TAG_FIELDS.values()],
+        production_quote_tags, 'production_quote_id',
+        lambda row: _tags(dict(zip(PRODUCTION_QUOTE_TAG_FIELDS, row[1:])))
+    )
+
+    manufacturers = sa.table('manufacturers', sa.column('id', sa.Integer), sa.column('capabilities', sa.JSON))
+    _backfill(
+        manufacturers, [manufacturers.c.capabilities],
+        manufacturer_capability_tags, 'manufacturer_id',
+        lambda row: _tags({
+            kind: (row[1] if isinstance(row[1], dict) else {}).get(key)
+            for kind, key in MANUFACTURER_TAG_FIELDS.items()
+        })
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_manufacturer_capability_tags_manufacturer', table_name='manufacturer_capability_tags')
+    op.drop_table('manufacturer_capability_tags')
+    op.drop_index('idx_production_quote_tags_quote', table_name='production_quote_tags')
+    op.drop_table('production_quote_tags')
@@ -0,0 +1,77 @@
+"""full text search
+
+Revision ID: e5b9d3a7c218
+Revises: d8e2b5c41f07
+Create Date: 2026-10-17 01:20:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9d3a7c218'
+down_revision = 'd8e2b5c41f07'
+branch_labels = None
+depends_on = None
+
+# As in app.services.full_text_search: table -> (column, weight label)
+SEARCH_INDEXES = {
+    'messages': [('content', 'A')],
+    'quotes': [('client_message', 'A')],
+    'production_quotes': [('title', 'A'), ('description', 'B')],
+}
+
+
+def _sqlite_statements(name, columns):
+    fts = f'{name}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, content='{name}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 0')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {name} BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {name} BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {name} '
+        f'BEGIN {delete_old} {insert_new} END',
+        # Index the rows that predate the triggers
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _postgresql_statements(name, columns):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight in columns
+    )
+    return [
+        f'ALTER TABLE {name} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS idx_{name}_search_vector ON {name} USING gin (search_vector)',
+    ]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for name, columns in SEARCH_INDEXES.items():
+        if dialect == 'sqlite':
+            statements = _sqlite_statements(name, [column for column, _ in columns])
+        elif dialect == 'postgresql':
+            statements = _postgresql_statements(name, columns)
+        else:
+            # Searched with ILIKE
+            statements = []
+        for statement in statements:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for name in SEARCH_INDEXES:
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {name}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {name}_fts')
+        elif dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS idx_{name}_search_vector')
+            op.execute(f'ALTER TABLE {name} DROP COLUMN IF EXISTS search_vector')
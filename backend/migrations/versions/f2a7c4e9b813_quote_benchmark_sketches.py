@@ -0,0 +1,38 @@
+"""quote benchmark sketches
+
+Revision ID: f2a7c4e9b813
+Revises: e5b9d3a7c218
+Create Date: 2026-10-17 02:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c4e9b813'
+down_revision = 'e5b9d3a7c218'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Populated by scripts/rebuild_quote_benchmarks.py; quotes sent before
+    # its first run are not benchmarked until then
+    op.create_table(
+        'quote_benchmark_sketches',
+        sa.Column('scope', sa.String(length=20), primary_key=True),
+        sa.Column('industry_category', sa.String(length=100), primary_key=True),
+        sa.Column('process', sa.String(length=200), primary_key=True),
+        sa.Column('material', sa.String(length=200), primary_key=True),
+        sa.Column('quantity_bucket', sa.String(length=20), primary_key=True),
+        sa.Column('quote_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('price_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('delivery_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('price_digest', sa.LargeBinary(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('quote_benchmark_sketches')
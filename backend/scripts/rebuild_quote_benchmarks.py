@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Rebuild the quote benchmark sketches from the quotes table
+
+Recomputes the price distribution and averages of every benchmark group
+and replaces the stored sketches. Run it once after creating the table,
+and again after bulk changes to quotes, which the incremental maintenance
+does not see.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.services.quote_benchmarks import rebuild_quote_benchmarks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild quote benchmark sketches')
+    parser.add_argument('--database-url', help='Database to rebuild (default: DATABASE_URL)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Quotes read per batch')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or get_settings().DATABASE_URL)
+    with Session(engine) as db:
+        report = rebuild_quote_benchmarks(db, batch_size=args.batch_size)
+    logger.info(
+        f"Rebuilt {report['sketches']} benchmark sketches from {report['quotes']} quotes "
+        f"({report['drifted']} drifted) on {engine.url.render_as_string(hide_password=True)}"
+    )
+
+
+if __name__ == '__main__':
+    main()
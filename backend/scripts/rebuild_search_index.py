@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search indexes of messages, quotes and production quotes
+
+Creates any index that is missing (e.g. on a database set up before they
+existed) and rebuilds it from its table. Safe to run at any time; on
+SQLite the rebuild holds a write lock for its duration.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine
+
+from app.core.config import get_settings
+from app.services.full_text_search import SEARCH_INDEXES, rebuild_search_indexes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild full-text search indexes')
+    parser.add_argument(
+        'indexes', nargs='*', metavar='index',
+        help=f"Tables to reindex: {', '.join(sorted(SEARCH_INDEXES))} (default: all)"
+    )
+    parser.add_argument('--database-url', help='Database to reindex (default: DATABASE_URL)')
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.indexes) - set(SEARCH_INDEXES))
+    if unknown:
+        parser.error(f"unknown index: {', '.join(unknown)}")
+
+    engine = create_engine(args.database_url or get_settings().DATABASE_URL)
+    with engine.begin() as connection:
+        rebuilt = rebuild_search_indexes(connection, args.indexes)
+    logger.info(f"Rebuilt {len(rebuilt)} search indexes on {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == '__main__':
+    main()
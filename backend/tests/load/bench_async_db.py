@@ -0,0 +1,194 @@
+"""
+Load test for the async database layer.
+
+Serves the order listing query two ways from the same `async def` handler
+shape the endpoints use:
+
+- before: the sync Session from get_db, which blocks the event loop for
+  the duration of every query
+- after:  the AsyncSession from get_async_db (aiosqlite locally, asyncpg
+  on PostgreSQL), which leaves the loop free while the query runs
+
+Requests are fired concurrently through the ASGI app and per-request
+latency percentiles are reported for each concurrency level, together with
+the latency of a DB-free /ping endpoint probed while the listing traffic
+runs. With in-process SQLite the listing query itself is CPU-bound and the
+aiosqlite thread hop costs about what it saves; the probe shows the
+event-loop stall every other request on the worker suffers from the sync
+path. Against PostgreSQL the sync path additionally holds the loop for
+every network round trip.
+
+Usage:
+    python tests/load/bench_async_db.py [--orders 50000] [--requests 400] [--concurrency 1 10 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import async_database_url
+from app.models.order import Order, OrderStatus
+
+STATUSES = [OrderStatus.ACTIVE, OrderStatus.QUOTED, OrderStatus.IN_PRODUCTION, OrderStatus.COMPLETED]
+
+
+def seed(engine, count: int) -> None:
+    Order.__table__.create(engine)
+    rng = random.Random(7)
+    now = datetime(2024, 5, 1)
+    rows = [
+        {
+            "client_id": rng.randint(1, 200),
+            "title": f"Order {index}",
+            "description": "Machined aluminium housing",
+            "technical_requirements": {"technology": "CNC", "material": "Aluminum"},
+            "quantity": rng.randint(1, 5000),
+            "delivery_deadline": now + timedelta(days=rng.randint(5, 120)),
+            "status": rng.choice(STATUSES),
+        }
+        for index in range(count)
+    ]
+    with engine.begin() as connection:
+        connection.execute(Order.__table__.insert(), rows)
+
+
+def listing_query(client_id: int):
+    return select(Order).where(Order.client_id == client_id, Order.status == OrderStatus.ACTIVE)
+
+
+def build_app(database_url: str, pool_size: int) -> FastAPI:
+    # Pools are sized for the highest concurrency: with a smaller sync pool
+    # the "before" handler blocks the loop on checkout while the sessions
+    # that would be returned are waiting for that same loop
+    sync_engine = create_engine(
+        database_url, connect_args={"check_same_thread": False}, pool_size=pool_size, max_overflow=0
+    )
+    SessionLocal = sessionmaker(bind=sync_engine, expire_on_commit=False)
+    async_engine = create_async_engine(async_database_url(database_url), pool_size=pool_size, max_overflow=0)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/before/orders")
+    async def orders_before(client_id: int, db: Session = Depends(get_db)):
+        query = db.query(Order).filter(Order.client_id == client_id, Order.status == OrderStatus.ACTIVE)
+        total = query.count()
+        orders = query.offset(0).limit(20).all()
+        return {"total": total, "ids": [order.id for order in orders]}
+
+    @app.get("/after/orders")
+    async def orders_after(client_id: int, db: AsyncSession = Depends(get_async_db)):
+        query = listing_query(client_id)
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))  # pylint: disable=not-callable
+        orders = (await db.scalars(query.offset(0).limit(20))).all()
+        return {"total": total, "ids": [order.id for order in orders]}
+
+    return app
+
+
+def percentile(latencies, fraction):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    ping_latencies = []
+    done = asyncio.Event()
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(11)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(client_id: int):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, params={"client_id": client_id})
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+                return response.json()
+
+        async def probe():
+            # Latency is measured from the intended send time, so time the
+            # probe spends waiting for a blocked loop is counted too
+            interval = 0.002
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await client.get("/ping")
+                ping_latencies.append(time.perf_counter() - scheduled)
+                scheduled = max(scheduled + interval, time.perf_counter())
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(rng.randint(1, 200)) for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": percentile(latencies, 0.99),
+        "ping_p99": percentile(ping_latencies, 0.99),
+        "rps": requests / elapsed,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(create_engine(database_url), args.orders)
+        app = build_app(database_url, max(args.concurrency))
+
+        print(
+            f"{'concurrency':>11} | {'path':>6} | {'p50 ms':>8} | {'p99 ms':>8} | "
+            f"{'ping p99':>8} | {'req/s':>7} | identical"
+        )
+        for concurrency in args.concurrency:
+            before = asyncio.run(run(app, "/before/orders", args.requests, concurrency))
+            after = asyncio.run(run(app, "/after/orders", args.requests, concurrency))
+            identical = before["results"] == after["results"]
+            for name, result in (("before", before), ("after", after)):
+                print(
+                    f"{concurrency:>11} | {name:>6} | {result['p50']:>8.2f} | {result['p99']:>8.2f} | "
+                    f"{result['ping_p99']:>8.2f} | {result['rps']:>7.0f} | {identical}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark of bulk email sending.
+
+Sends one newsletter to 10k recipients, 2% of them unsubscribed, two ways:
+the previous send_bulk_email_task loop (an unsubscribe GET, a full
+render_template() call, three tracking round trips and an asyncio.run()
+of one single-recipient SendGrid request per recipient), and
+BulkEmailSender. Redis is fakeredis behind a fixed round-trip time and
+SendGrid is an httpx mock transport with a fixed latency per request.
+
+Two campaigns are timed: one whose content is the same for everybody, and
+one personalized per recipient, which BulkEmailSender cannot batch. The
+previous loop is strictly sequential, so it is timed on --baseline-sample
+recipients and scaled up.
+
+Usage:
+    python tests/load/bench_bulk_email.py [--recipients 10000] [--redis-ms 0.2] [--sendgrid-ms 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import fakeredis
+import httpx
+
+from app.services.bulk_email import BulkEmailSender
+from app.services.email import EmailStatus, EmailTracker, UnsubscribeManager
+from app.services.email_templates import EmailTemplateManager
+
+NEWSLETTER_HTML = """<html><body>
+<h1>{{ campaign_name }}</h1>
+<p>Hello {{ first_name }},</p>
+{% for item in items %}<div class="item"><h2>{{ item.title }}</h2><p>{{ item.body }}</p></div>
+{% endfor %}
+<p><a href="{{ unsubscribe_url }}">Unsubscribe</a> · {{ company_address }} · {{ current_year }}</p>
+</body></html>"""
+
+
+class SlowRedis:
+    """fakeredis paying a network round trip per command or pipeline"""
+
+    def __init__(self, redis_client, round_trip: float):
+        self.redis = redis_client
+        self.round_trip = round_trip
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self.round_trip)
+            return command(*args, **kwargs)
+        return call
+
+    def pipeline(self, *args, **kwargs):
+        pipeline = self.redis.pipeline(*args, **kwargs)
+        execute = pipeline.execute
+
+        def slow_execute():
+            time.sleep(self.round_trip)
+            return execute()
+        pipeline.execute = slow_execute
+        return pipeline
+
+
+def sendgrid_transport(latency: float) -> httpx.MockTransport:
+    async def mail_send(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(202)
+    return httpx.MockTransport(mail_send)
+
+
+def setup(directory, recipients: int, round_trip: float):
+    os.makedirs(os.path.join(directory, 'en'))
+    with open(os.path.join(directory, 'en', 'newsletter.html'), 'w') as f:
+        f.write(NEWSLETTER_HTML)
+    with open(os.path.join(directory, 'en', 'newsletter_subject.txt'), 'w') as f:
+        f.write("{{ campaign_name }}")
+    templates = EmailTemplateManager(template_dir=directory)
+
+    fake_redis = fakeredis.FakeRedis()
+    for index in range(0, recipients, 50):
+        UnsubscribeManager(fake_redis).add_unsubscribe(f"user{index}@example.com")
+    redis_client = SlowRedis(fake_redis, round_trip)
+    return templates, EmailTracker(redis_client), UnsubscribeManager(redis_client)
+
+
+def previous_loop(email_list, common_context, templates, tracker, unsubscribes, transport):
+    """send_bulk_email_task before BulkEmailSender, with EmailService.send_email's tracking"""
+
+    async def send_immediate_email(to_email, subject, html_content):
+        async with httpx.AsyncClient(base_url="https://api.sendgrid.com", transport=transport) as client:
+            response = await client.post('/v3/mail/send', json={
+                'personalizations': [{'to': [{'email': to_email}]}],
+                'from': {'email': "noreply@example.com"},
+                'subject': subject,
+                'content': [{'type': 'text/html', 'value': html_content}]
+            })
+        return response.status_code == 202
+
+    results = []
+    for email_data in email_list:
+        if unsubscribes.is_unsubscribed(email_data['email'], 'newsletter'):
+            continue
+        rendered = templates.render_template(
+            'newsletter', {**common_context, **email_data.get('context', {})}, 'en'
+        )
+        email_id = str(uuid.uuid4())
+        tracker.track_email(email_id, 'newsletter', email_data['email'], rendered['subject'])
+        success = asyncio.run(send_immediate_email(email_data['email'], rendered['subject'], rendered['html_content']))
+        tracker.update_status(email_id, EmailStatus.SENT if success else EmailStatus.FAILED)
+        results.append({"email": email_data['email'], "status": "sent" if success else "failed"})
+    return results
+
+
+def run(recipients: int, round_trip: float, latency: float, baseline_sample: int):
+    common_context = {
+        'campaign_name': "Capacity news",
+        'items': [{'title': f"Item {index}", 'body': "Five-axis milling capacity " * 10} for index in range(10)],
+    }
+    campaigns = [
+        ("same content", [{'email': f"user{index}@example.com"} for index in range(recipients)]),
+        ("personalized", [
+            {'email': f"user{index}@example.com", 'context': {'first_name': f"User {index}"}}
+            for index in range(recipients)
+        ]),
+    ]
+
+    print(f"{recipients} recipients, Redis {round_trip * 1e3:.1f} ms, SendGrid {latency * 1e3:.0f} ms per request")
+    print(f"{'campaign':<14} | {'previous s':>10} | {'bulk s':>7} | {'requests':>8} | {'speedup':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        templates, tracker, unsubscribes = setup(directory, recipients, round_trip)
+        for label, email_list in campaigns:
+            transport = sendgrid_transport(latency)
+            sample = email_list[:baseline_sample]
+            started = time.perf_counter()
+            previous_loop(sample, common_context, templates, tracker, unsubscribes, transport)
+            previous_seconds = (time.perf_counter() - started) * len(email_list) / len(sample)
+
+            requests = []
+
+            async def counting(request):
+                requests.append(request)
+                return await transport.handle_async_request(request)
+
+            sender = BulkEmailSender(
+                "SG.bench", "noreply@example.com", "Manufacturing Platform",
+                tracker=tracker, unsubscribe_manager=unsubscribes, templates=templates,
+                transport=httpx.MockTransport(counting)
+            )
+
+            async def campaign():
+                try:
+                    return await sender.send('newsletter', email_list, common_context)
+                finally:
+                    await sender.aclose()
+
+            started = time.perf_counter()
+            results = asyncio.run(campaign())
+            bulk_seconds = time.perf_counter() - started
+            assert sum(result['status'] == 'sent' for result in results) == recipients - len(range(0, recipients, 50))
+
+            print(
+                f"{label:<14} | {previous_seconds:>10.1f} | {bulk_seconds:>7.2f} | {len(requests):>8} | "
+                f"{previous_seconds / bulk_seconds:>6.0f}x"
+            )
+    print(f"(previous loop timed on {min(baseline_sample, recipients)} recipients and scaled)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipients", type=int, default=10_000)
+    parser.add_argument("--redis-ms", type=float, default=0.2)
+    parser.add_argument("--sendgrid-ms", type=float, default=20)
+    parser.add_argument("--baseline-sample", type=int, default=500)
+    args = parser.parse_args()
+    run(args.recipients, args.redis_ms / 1e3, args.sendgrid_ms / 1e3, args.baseline_sample)
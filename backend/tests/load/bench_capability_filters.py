@@ -0,0 +1,141 @@
+"""
+Benchmark of production quote capability filters.
+
+Fills a temporary SQLite database with production quotes and their tags,
+then times the capability filters of list_production_quotes two ways: the
+old one LIKE '%"value"%' clause per value on the JSON columns, and
+tagged_with() on the production_quote_tags primary key. Both must select
+the same rows here, since the generated values contain no LIKE wildcards,
+quotes or non-ASCII characters.
+
+Usage:
+    python tests/load/bench_capability_filters.py [--quotes 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import and_, create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.capability_tag import ProductionQuoteTag
+from app.models.quote import ProductionQuote
+from app.services.capability_tags import MATERIAL, PROCESS, COUNTRY, production_quote_tags, tagged_with
+
+BASE_PROCESSES = [
+    "CNC Machining", "3D Printing", "Injection Molding", "Sheet Metal", "Welding",
+    "Die Casting", "Laser Cutting", "Anodizing", "Powder Coating", "Grinding",
+]
+PROCESSES = BASE_PROCESSES + [
+    f"{qualifier} {process}" for process in BASE_PROCESSES
+    for qualifier in ("Precision", "Prototype", "High-volume", "Micro", "Large-format")
+]
+MATERIALS = [
+    f"{material} {grade}".strip() for material in ("Aluminum", "Steel", "Stainless Steel", "Titanium", "Brass", "Copper")
+    for grade in ("", "Grade A", "Grade B", "Cast", "Forged")
+] + ["ABS", "PEEK", "Nylon", "Polycarbonate"]
+COUNTRIES = [
+    "AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "ES", "FI", "FR", "GR", "HR", "HU",
+    "IE", "IT", "LT", "LU", "LV", "MT", "NL", "PL", "PT", "RO", "SE", "SI", "SK",
+]
+
+FILTERS = [
+    {PROCESS: ["CNC Machining"]},
+    {PROCESS: ["Welding", "Laser Cutting"], MATERIAL: ["Steel"]},
+    {MATERIAL: ["Titanium"], COUNTRY: ["DE"]},
+    {PROCESS: ["Die Casting"], MATERIAL: ["Aluminum"], COUNTRY: ["PL", "CZ"]},
+]
+
+LIKE_COLUMNS = {
+    PROCESS: ProductionQuote.manufacturing_processes,
+    MATERIAL: ProductionQuote.materials,
+    COUNTRY: ProductionQuote.preferred_countries,
+}
+
+
+class _Quote:
+    def __init__(self, row):
+        self.__dict__.update(row)
+
+
+def populate(engine, quotes: int):
+    for model in (ProductionQuote, ProductionQuoteTag):
+        model.__table__.create(engine)
+    rng = random.Random(7)
+    with engine.begin() as connection:
+        for offset in range(0, quotes, 10000):
+            rows = [
+                {
+                    "id": index + 1,
+                    "manufacturer_id": index % 500 + 1,
+                    "production_quote_type": "CAPACITY_AVAILABILITY",
+                    "title": f"Capacity #{index}",
+                    "pricing_model": "fixed",
+                    "pricing_details": {},
+                    "manufacturing_processes": rng.sample(PROCESSES, rng.randint(1, 3)),
+                    "materials": rng.sample(MATERIALS, rng.randint(1, 3)),
+                    "certifications": [],
+                    "preferred_countries": rng.sample(COUNTRIES, rng.randint(1, 2)),
+                    "is_active": True,
+                    "is_public": True,
+                }
+                for index in range(offset, min(offset + 10000, quotes))
+            ]
+            connection.execute(insert(ProductionQuote.__table__), rows)
+            connection.execute(insert(ProductionQuoteTag.__table__), [
+                {"kind": kind, "value": value, "production_quote_id": row["id"]}
+                for row in rows
+                for kind, value in production_quote_tags(_Quote(row))
+            ])
+
+
+def like_ids(db, filters):
+    conditions = [
+        LIKE_COLUMNS[kind].like(f'%"{value}"%')
+        for kind, values in filters.items()
+        for value in values
+    ]
+    return set(db.scalars(select(ProductionQuote.id).where(and_(*conditions))))
+
+
+def tag_ids(db, filters):
+    return set(db.scalars(select(ProductionQuote.id).where(tagged_with(ProductionQuote, filters))))
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def run(quotes: int, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        print(f"Populating {quotes} production quotes...")
+        populate(engine, quotes)
+
+        print(f"{'filter':<70} | {'rows':>6} | {'LIKE ms':>8} | {'tags ms':>8} | {'speedup':>7}")
+        with Session(engine) as db:
+            for filters in FILTERS:
+                like_rows, like_seconds = timed(lambda: like_ids(db, filters), repeat)
+                tag_rows, tag_seconds = timed(lambda: tag_ids(db, filters), repeat)
+                label = "; ".join(f"{kind}={','.join(values)}" for kind, values in filters.items())
+                print(
+                    f"{label:<70} | {len(tag_rows):>6} | {like_seconds * 1e3:>8.1f} | {tag_seconds * 1e3:>8.1f} | "
+                    f"{like_seconds / tag_seconds:>6.1f}x"
+                )
+                assert like_rows == tag_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.quotes, args.repeat)
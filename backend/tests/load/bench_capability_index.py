@@ -0,0 +1,104 @@
+"""
+Benchmark for capability fuzzy matching.
+
+Compares the per-pair path (_enhanced_fuzzy_match_capability over every
+capability string) with CapabilityIndex lookups for a stream of orders
+against a synthetic manufacturer catalog. The index is measured cold (first
+order, vocabulary and similarity rows built on the fly) and warm. Scores
+from both paths must be identical.
+
+Usage:
+    python tests/load/bench_capability_index.py [--manufacturers 100 1000 5000] [--orders 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.smart_matching_engine import SmartMatchingEngine
+
+PROCESSES = [
+    "CNC Machining", "Precision Machining", "CNC Milling", "CNC Turning", "3D Printing",
+    "Additive Manufacturing", "Injection Molding", "Sheet Metal Stamping", "Metal Stamping",
+    "Welding", "Die Casting", "Laser Cutting", "Anodizing", "Powder Coating"
+]
+MATERIALS = [
+    "Aluminum", "Aluminum Alloy", "Aluminum 7075", "Steel", "Mild Steel", "Stainless Steel 316",
+    "Stainless Steel 304", "Titanium Grade 5", "ABS Plastic", "PEEK", "Nylon", "Brass", "Copper"
+]
+INDUSTRIES = ["Automotive", "Aerospace", "Medical Devices", "Electronics", "Energy", "Defense"]
+CERTIFICATIONS = ["ISO 9001", "AS9100", "ISO 13485", "IATF 16949", "ISO 14001"]
+CATEGORIES = {
+    "manufacturing_processes": PROCESSES,
+    "materials": MATERIALS,
+    "industries_served": INDUSTRIES,
+    "certifications": CERTIFICATIONS,
+}
+
+
+def make_catalog(count: int, rng: random.Random):
+    return [
+        SimpleNamespace(id=index, capabilities={
+            category: rng.sample(terms, rng.randint(1, 4)) for category, terms in CATEGORIES.items()
+        })
+        for index in range(count)
+    ]
+
+
+def make_orders(count: int, rng: random.Random):
+    return [
+        [
+            ("manufacturing_processes", rng.choice(PROCESSES + ["cnc milling aluminium", "sls printing"])),
+            ("materials", rng.choice(MATERIALS + ["Aluminum 6061", "stainless"])),
+            ("industries_served", rng.choice(INDUSTRIES)),
+            ("certifications", rng.choice(CERTIFICATIONS)),
+        ]
+        for _ in range(count)
+    ]
+
+
+def score_orders(engine: SmartMatchingEngine, catalog, orders, indexed: bool):
+    engine.use_capability_index = indexed
+    scores = []
+    for requirements in orders:
+        for manufacturer in catalog:
+            for category, required in requirements:
+                scores.append(engine._match_capability(required, manufacturer, category))
+    return scores
+
+
+def run(manufacturer_counts, order_count: int):
+    rng = random.Random(42)
+    orders = make_orders(order_count, rng)
+
+    print(f"{'manufacturers':>13} | {'mode':>11} | {'ms/order':>9} | identical")
+    for count in manufacturer_counts:
+        catalog = make_catalog(count, rng)
+        engine = SmartMatchingEngine()
+
+        started = time.perf_counter()
+        reference = score_orders(engine, catalog, orders, indexed=False)
+        per_pair_ms = (time.perf_counter() - started) * 1000 / len(orders)
+        print(f"{count:>13} | {'per-pair':>11} | {per_pair_ms:>9.1f} |")
+
+        started = time.perf_counter()
+        cold = score_orders(engine, catalog, orders[:1], indexed=True)
+        cold_ms = (time.perf_counter() - started) * 1000
+        print(f"{count:>13} | {'index cold':>11} | {cold_ms:>9.1f} | {cold == reference[:len(cold)]}")
+
+        started = time.perf_counter()
+        warm = score_orders(engine, catalog, orders, indexed=True)
+        warm_ms = (time.perf_counter() - started) * 1000 / len(orders)
+        print(f"{count:>13} | {'index warm':>11} | {warm_ms:>9.1f} | {warm == reference}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manufacturers", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--orders", type=int, default=20)
+    args = parser.parse_args()
+    run(args.manufacturers, args.orders)
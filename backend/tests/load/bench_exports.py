@@ -0,0 +1,146 @@
+"""
+Memory benchmark for order exports.
+
+Fills a temporary SQLite database with orders-like rows, then exports them
+as CSV two ways and reports the peak Python heap (tracemalloc) and time of
+each: the old export_orders_csv approach (query.all(), a csv.writer into an
+in-memory buffer, getvalue() copied into the response) and iter_export,
+which reads batches with yield_per and encodes them as they arrive. The
+streamed bytes are counted and dropped, as a StreamingResponse would send
+them.
+
+Usage:
+    python tests/load/bench_exports.py [--rows 1000000] [--batch-size 1000] [--format csv] [--gzip]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import JSON, Column, DateTime, Integer, Numeric, String, Text, create_engine, insert
+from sqlalchemy.orm import Session, declarative_base
+
+from app.services.streaming_export import ExportColumn, ExportFormat, export_statement, iter_export
+
+Base = declarative_base()
+
+
+class BenchOrder(Base):
+    __tablename__ = "bench_orders"
+    id = Column(Integer, primary_key=True)
+    title = Column(String(255))
+    description = Column(Text)
+    technical_requirements = Column(JSON)
+    quantity = Column(Integer)
+    budget_fixed_pln = Column(Numeric(12, 2))
+    status = Column(String(20))
+    priority = Column(String(20))
+    delivery_deadline = Column(DateTime)
+    created_at = Column(DateTime)
+
+
+COLUMNS = [
+    ExportColumn('ID', 'id', BenchOrder.id, kind='int'),
+    ExportColumn('Title', 'title', BenchOrder.title),
+    ExportColumn('Description', 'description', BenchOrder.description),
+    ExportColumn('Technology', 'technology', BenchOrder.technical_requirements,
+                 lambda requirements: (requirements or {}).get('technology', '')),
+    ExportColumn('Material', 'material', BenchOrder.technical_requirements,
+                 lambda requirements: (requirements or {}).get('material', '')),
+    ExportColumn('Quantity', 'quantity', BenchOrder.quantity, kind='int'),
+    ExportColumn('Budget (PLN)', 'budget_pln', BenchOrder.budget_fixed_pln, lambda budget: str(budget or 0)),
+    ExportColumn('Status', 'status', BenchOrder.status),
+    ExportColumn('Priority', 'priority', BenchOrder.priority),
+    ExportColumn('Delivery Deadline', 'delivery_deadline', BenchOrder.delivery_deadline, kind='timestamp'),
+    ExportColumn('Created At', 'created_at', BenchOrder.created_at, kind='timestamp'),
+]
+
+
+def populate(engine, rows: int):
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, 10000):
+            connection.execute(insert(BenchOrder), [
+                {
+                    "id": index + 1,
+                    "title": f"CNC machined bracket #{index}",
+                    "description": "Anodised aluminium bracket, tolerance +/- 0.05 mm, batch of parts",
+                    "technical_requirements": {"technology": "cnc_machining", "material": "aluminium_6061"},
+                    "quantity": 100 + index % 900,
+                    "budget_fixed_pln": index % 5000 + 0.5,
+                    "status": "active",
+                    "priority": "normal",
+                    "delivery_deadline": start + timedelta(days=30 + index % 60),
+                    "created_at": start + timedelta(minutes=index),
+                }
+                for index in range(offset, min(offset + 10000, rows))
+            ])
+
+
+def buffered_export(db) -> int:
+    """What export_orders_csv used to do"""
+    orders = db.query(BenchOrder).all()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([column.header for column in COLUMNS])
+    for order in orders:
+        requirements = order.technical_requirements or {}
+        writer.writerow([
+            order.id, order.title, order.description,
+            requirements.get('technology', ''), requirements.get('material', ''),
+            order.quantity, str(order.budget_fixed_pln or 0), order.status, order.priority,
+            order.delivery_deadline.isoformat(), order.created_at.isoformat(),
+        ])
+    body = io.BytesIO(output.getvalue().encode())
+    return len(body.getvalue())
+
+
+def streamed_export(db, batch_size: int, export_format: ExportFormat, compress: bool) -> int:
+    statement = export_statement(COLUMNS).order_by(BenchOrder.id)
+    return sum(len(chunk) for chunk in iter_export(db, statement, COLUMNS, export_format, compress, batch_size))
+
+
+def measure(engine, function):
+    with Session(engine) as db:
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = function(db)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def run(rows: int, batch_size: int, export_format: ExportFormat, compress: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        print(f"Populating {rows} rows...")
+        populate(engine, rows)
+
+        print(f"{'method':>10} | {'output MB':>9} | {'peak heap MB':>12} | {'seconds':>7}")
+        results = []
+        if export_format == ExportFormat.CSV and not compress:
+            results.append(("buffered", measure(engine, buffered_export)))
+        results.append(("streamed", measure(
+            engine, lambda db: streamed_export(db, batch_size, export_format, compress)
+        )))
+        for name, (size, peak, elapsed) in results:
+            print(f"{name:>10} | {size / 1e6:>9.1f} | {peak / 1e6:>12.1f} | {elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--format", choices=[value.value for value in ExportFormat], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    run(args.rows, args.batch_size, ExportFormat(args.format), args.gzip)
@@ -0,0 +1,125 @@
+"""
+Benchmark of message search.
+
+Fills a temporary SQLite database with chat messages, indexed by the FTS5
+triggers as they are inserted, and times MessageService.search_messages'
+query two ways: the previous ILIKE '%text%' filter, newest first, and
+MESSAGE_SEARCH.matches(), best match first. Word frequencies follow a Zipf
+distribution, so the queries range from a word in most messages to words
+in a handful.
+
+Usage:
+    python tests/load/bench_full_text_search.py [--messages 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import and_, create_engine, desc, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.message import Message
+from app.services.full_text_search import MESSAGE_SEARCH
+
+VOCABULARY_SIZE = 20_000
+LIMIT = 50
+
+# (label, search text); w00042 is the 42nd most frequent word
+QUERIES = [
+    ("very common word", "w00001"),
+    ("common word", "w00020"),
+    ("uncommon word", "w02000"),
+    ("rare word", "w19000"),
+    ("two common words", "w00001 w00020"),
+    ("common + uncommon word", "w00001 w02000"),
+    ("prefix of 10 words", "w0199"),
+]
+
+
+def populate(engine, messages: int):
+    Message.__table__.create(engine)
+    rng = random.Random(11)
+    words = [f"w{rank:05d}" for rank in range(1, VOCABULARY_SIZE + 1)]
+    weights = [1 / rank for rank in range(1, VOCABULARY_SIZE + 1)]
+    started = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, messages, 50_000):
+            count = min(50_000, messages - offset)
+            content = rng.choices(words, weights, k=count * 12)
+            connection.execute(insert(Message.__table__), [
+                {
+                    "id": offset + index + 1,
+                    "user_id": index % 1000 + 1,
+                    "room_name": f"order-{(offset + index) % 5000}",
+                    "content": " ".join(content[index * 12:(index + 1) * 12]),
+                    "message_type": "text",
+                    "is_encrypted": False,
+                    "is_edited": False,
+                    "is_deleted": False,
+                    "created_at": started + timedelta(seconds=offset + index),
+                }
+                for index in range(count)
+            ])
+
+
+def ilike_search(db, search_text):
+    # Several words are one phrase here, unlike for the FTS query
+    return db.scalars(
+        select(Message.id)
+        .where(and_(Message.content.ilike(f"%{search_text}%"), Message.is_deleted == False))
+        .order_by(desc(Message.created_at)).limit(LIMIT)
+    ).all()
+
+
+def fts_search(db, search_text):
+    matches = MESSAGE_SEARCH.matches(db, search_text)
+    return db.scalars(
+        select(Message.id).join(matches, matches.c.id == Message.id)
+        .where(Message.is_deleted == False)
+        .order_by(desc(matches.c.score), desc(Message.created_at)).limit(LIMIT)
+    ).all()
+
+
+def fts_count(db, search_text):
+    matches = MESSAGE_SEARCH.matches(db, search_text)
+    return len(db.scalars(select(matches.c.id)).all())
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(messages: int, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        print(f"Populating {messages} messages...")
+        started = time.perf_counter()
+        populate(engine, messages)
+        print(f"  {time.perf_counter() - started:.1f} s including FTS5 triggers")
+
+        print(f"{'query':<22} | {'matches':>8} | {'ILIKE ms':>9} | {'FTS ms':>8} | {'speedup':>7}")
+        with Session(engine) as db:
+            for label, search_text in QUERIES:
+                ilike_seconds = timed(lambda: ilike_search(db, search_text), repeat)
+                fts_seconds = timed(lambda: fts_search(db, search_text), repeat)
+                print(
+                    f"{label:<22} | {fts_count(db, search_text):>8} | {ilike_seconds * 1e3:>9.1f} | "
+                    f"{fts_seconds * 1e3:>8.1f} | {ilike_seconds / fts_seconds:>6.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.messages, args.repeat)
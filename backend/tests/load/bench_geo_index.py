@@ -0,0 +1,96 @@
+"""
+Benchmark of the geospatial index.
+
+Places manufacturers across Europe and compares, for a batch of order
+locations, a per-row haversine scan in Python (as the engines computed
+distances) with the vectorized haversine over the whole candidate set and
+with GeoIndex radius and k-nearest queries. Reports the index build time;
+radius and nearest results must equal the full scan.
+
+Usage:
+    python tests/load/bench_geo_index.py [--manufacturers 10000 100000] [--queries 200] [--radius 100] [--k 50]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.geo_index import GeoIndex, coordinates, haversine_km
+
+
+def scalar_km(latitude1, longitude1, latitude2, longitude2):
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (
+        math.sin((latitude2 - latitude1) / 2) ** 2 +
+        math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def run(manufacturer_counts, query_count: int, radius_km: float, k: int):
+    rng = random.Random(11)
+    queries = [(rng.uniform(40, 60), rng.uniform(-5, 30)) for _ in range(query_count)]
+    print(f"{'manufacturers':>13} | {'step':<22} | {'ms/query':>9}")
+    for count in manufacturer_counts:
+        manufacturers = [
+            SimpleNamespace(
+                id=index, latitude=rng.uniform(36, 62), longitude=rng.uniform(-10, 32),
+                city=f"City {index % 500}", country="PL"
+            )
+            for index in range(1, count + 1)
+        ]
+
+        def report(step, seconds, per=query_count):
+            print(f"{count:>13} | {step:<22} | {seconds * 1e3 / per:>9.3f}")
+
+        geo, seconds = timed(lambda: GeoIndex(manufacturers))
+        report("index build (total)", seconds, per=1)
+
+        def scan():
+            return [
+                {m.id: scalar_km(latitude, longitude, m.latitude, m.longitude) for m in manufacturers}
+                for latitude, longitude in queries
+            ]
+
+        scanned, seconds = timed(scan)
+        report("per-row scan", seconds)
+
+        latitudes, longitudes = coordinates(manufacturers)
+        vectorized, seconds = timed(lambda: [haversine_km(lat, lon, latitudes, longitudes) for lat, lon in queries])
+        report("vectorized haversine", seconds)
+
+        within, seconds = timed(lambda: [geo.within(lat, lon, radius_km) for lat, lon in queries])
+        report(f"index radius {radius_km:g} km", seconds)
+
+        nearest, seconds = timed(lambda: [geo.nearest(lat, lon, k) for lat, lon in queries])
+        report(f"index {k} nearest", seconds)
+
+        identical = all(
+            max(abs(vector[index] - distances[m.id]) for index, m in enumerate(manufacturers)) < 1e-6
+            and set(found) == {m_id for m_id, distance in distances.items() if distance <= radius_km}
+            and [m.id for m, _ in closest] == sorted(distances, key=distances.get)[:k]
+            for distances, vector, found, closest in zip(scanned, vectorized, within, nearest)
+        )
+        print(f"{count:>13} | identical: {identical}")
+        assert identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manufacturers", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=100)
+    parser.add_argument("--k", type=int, default=50)
+    args = parser.parse_args()
+    run(args.manufacturers, args.queries, args.radius, args.k)
@@ -0,0 +1,147 @@
+"""
+Benchmark of the shared manufacturer catalog.
+
+Seeds active manufacturers with capability profiles and compares loading
+the matchable ones as the engines used to, by hydrating Manufacturer rows,
+with the ManufacturerCatalog: time, peak memory and memory kept (both
+traced with tracemalloc) of a full build, the latency of a refresh with
+nothing to apply, after profiles were updated and after a change
+notification, and the time to take matchable manufacturers from the
+current snapshot. The manufacturers must be identical.
+
+Usage:
+    python tests/load/bench_manufacturer_catalog.py [--manufacturers 10000 100000] [--changes 100]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.producer import Manufacturer
+from app.services.manufacturer_catalog import ManufacturerCatalog
+
+PROCESSES = ["CNC Machining", "3D Printing", "Injection Molding", "Sheet Metal", "Welding", "Die Casting"]
+MATERIALS = ["Aluminum", "Steel", "Stainless Steel", "Titanium", "ABS", "Brass", "Nylon"]
+CERTIFICATIONS = ["ISO 9001", "ISO 14001", "AS9100", "IATF 16949", "ISO 13485"]
+CITIES = ["Warsaw", "Krakow", "Gdansk", "Wroclaw", "Poznan", "Lodz", "Katowice"]
+STARTED = datetime(2026, 1, 1)
+
+
+def seed(db, count: int, rng: random.Random):
+    rows = [
+        {
+            'id': index, 'user_id': index, 'business_name': f"Manufacturer {index}",
+            'business_description': "Contract manufacturing " * 20, 'country': "PL", 'city': rng.choice(CITIES),
+            'latitude': rng.uniform(49, 55), 'longitude': rng.uniform(14, 24),
+            'capabilities': {
+                "manufacturing_processes": rng.sample(PROCESSES, rng.randint(1, 3)),
+                "materials": rng.sample(MATERIALS, rng.randint(1, 4)),
+                "certifications": rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+            },
+            'quality_certifications': rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+            'min_order_quantity': rng.choice([1, 10, 100]), 'standard_lead_time_days': rng.randint(5, 40),
+            'overall_rating': round(rng.uniform(2, 5), 2), 'total_orders_completed': rng.randint(0, 300),
+            'is_active': rng.random() < 0.95, 'is_verified': rng.random() < 0.8,
+            'stripe_onboarding_completed': rng.random() < 0.9,
+            'updated_at': STARTED - timedelta(minutes=rng.randint(0, 100_000)),
+        }
+        for index in range(1, count + 1)
+    ]
+    for start in range(0, count, 10_000):
+        db.execute(insert(Manufacturer), rows[start:start + 10_000])
+    db.commit()
+
+
+def traced(function):
+    """Peak traced bytes during a call and traced bytes its result keeps"""
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, kept
+
+
+def timed(function, repeat: int = 1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def orm_manufacturers(engine):
+    with Session(engine) as db:
+        manufacturers = db.query(Manufacturer).filter(
+            Manufacturer.is_active == True,
+            Manufacturer.is_verified == True,
+            Manufacturer.stripe_onboarding_completed == True
+        ).all()
+        db.expunge_all()
+    return manufacturers
+
+
+def run(manufacturer_counts, changes: int):
+    rng = random.Random(5)
+    print(f"{'manufacturers':>13} | {'step':<23} | {'ms':>9} | {'peak MB':>8} | {'kept MB':>8}")
+    for count in manufacturer_counts:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db, count, rng)
+
+        def report(step, seconds, peak=None, kept=None):
+            peak = f"{peak / 2 ** 20:>8.1f}" if peak is not None else f"{'':>8}"
+            kept = f"{kept / 2 ** 20:>8.1f}" if kept is not None else f"{'':>8}"
+            print(f"{count:>13} | {step:<23} | {seconds * 1e3:>9.1f} | {peak} | {kept}")
+
+        reference, seconds = timed(lambda: orm_manufacturers(engine))
+        report("ORM hydration", seconds, *traced(lambda: orm_manufacturers(engine)))
+
+        version = [0]
+        catalog = ManufacturerCatalog(sync_interval_seconds=0, version_source=lambda: version[0])
+        with Session(engine) as db:
+            snapshot, seconds = timed(lambda: catalog.rebuild(db))
+            report("catalog build", seconds, *traced(lambda: ManufacturerCatalog(version_source=lambda: 0).rebuild(db)))
+
+            matchable, seconds = timed(snapshot.matchable, repeat=5)
+            report("matchable from snapshot", seconds)
+            identical = [m.id for m in matchable] == [m.id for m in reference]
+
+            _, seconds = timed(lambda: catalog.refresh(db), repeat=5)
+            report("refresh, no changes", seconds)
+
+            changed_ids = rng.sample(range(1, count + 1), changes)
+            db.execute(
+                update(Manufacturer).where(Manufacturer.id.in_(changed_ids))
+                .values(city="Szczecin", updated_at=STARTED + timedelta(minutes=1))
+            )
+            db.commit()
+            applied, seconds = timed(lambda: catalog.refresh(db))
+            report(f"refresh, {changes} updated", seconds)
+
+            version[0] += 1
+            _, seconds = timed(lambda: catalog.refresh(db))
+            report("refresh, notification", seconds)
+
+        print(f"{count:>13} | identical: {identical}; {applied} records replaced")
+        assert identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manufacturers", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--changes", type=int, default=100)
+    args = parser.parse_args()
+    run(args.manufacturers, args.changes)
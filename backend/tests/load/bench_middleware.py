@@ -0,0 +1,121 @@
+"""
+Benchmark for the middleware stack.
+
+Serves /health and /api/v1/orders/ from an app wrapped in the logging,
+rate limiting and security header middlewares, once as three
+BaseHTTPMiddleware layers (the old stack; the same stages run through
+dispatch()) and once as one MiddlewarePipeline. Requests are sent in
+process through httpx's ASGI transport with a fixed concurrency, so the
+numbers are middleware and framework overhead only. Rate limiting uses
+per-process buckets with limits high enough that nothing is rejected.
+
+Usage:
+    python tests/load/bench_middleware.py [--requests 5000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.asgi_pipeline import MiddlewarePipeline, RequestContext
+from app.core.middleware import RateLimitMiddleware, RequestLoggingMiddleware, SecurityHeadersMiddleware
+from app.core.rate_limit import RateLimitEngine, RateLimitPolicy
+
+ORDERS = [
+    {"id": index, "title": f"Bracket batch {index}", "status": "published", "quantity": 100 + index}
+    for index in range(50)
+]
+
+
+class LegacyLayer(BaseHTTPMiddleware):
+    """A pipeline stage run the old way, as its own BaseHTTPMiddleware"""
+
+    def __init__(self, app, stage):
+        super().__init__(app)
+        self.stage = stage
+
+    async def dispatch(self, request, call_next):
+        ctx = RequestContext(request.scope)
+        response = await self.stage.on_request(ctx)
+        if response is None:
+            response = await call_next(request)
+            ctx.status_code = response.status_code
+            self.stage.on_response_start(ctx, response.headers)
+        await self.stage.on_complete(ctx)
+        return response
+
+
+def make_stages():
+    engine = RateLimitEngine(
+        policies={name: RateLimitPolicy(name, 10_000_000, 60) for name in ("auth", "api", "public")},
+        use_redis=False,
+    )
+    return [RequestLoggingMiddleware(), RateLimitMiddleware(engine=engine), SecurityHeadersMiddleware()]
+
+
+def make_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/v1/orders/")
+    async def orders():
+        return ORDERS
+
+    stages = make_stages()
+    if stack == "legacy":
+        # add_middleware wraps, so the last one added is outermost
+        for stage in reversed(stages):
+            app.add_middleware(LegacyLayer, stage=stage)
+    else:
+        app.add_middleware(MiddlewarePipeline, stages=stages)
+    return app
+
+
+async def measure(app: FastAPI, path: str, request_count: int, concurrency: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        async def worker(count: int):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.status_code
+
+        await worker(50)  # warm up
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(request_count // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def run(request_count: int, concurrency: int):
+    logging.disable(logging.INFO)  # Request logging would dominate the timings
+    print(f"{'path':>16} | {'stack':>8} | {'req/s':>8} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for path in ("/health", "/api/v1/orders/"):
+        for stack in ("legacy", "pipeline"):
+            rps, p50, p99 = asyncio.run(measure(make_app(stack), path, request_count, concurrency))
+            print(f"{path:>16} | {stack:>8} | {rps:>8.0f} | {p50 * 1000:>7.2f} | {p99 * 1000:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency)
@@ -0,0 +1,144 @@
+"""
+Benchmark of quote benchmarking.
+
+Seeds orders and sent quotes across industry categories, processes,
+materials and quantities, builds the sketches with
+rebuild_quote_benchmarks(), then benchmarks random quotes two ways: an
+exact aggregate over the quotes of the quote's group (count, average
+price and delivery and the share priced at or below it), and
+lookup_benchmarks(), which reads the group's sketch row. Reports the
+latency of both, the percentile error of the sketches and the cost of
+adding one quote to its sketches on flush.
+
+Usage:
+    python tests/load/bench_quote_benchmarks.py [--quotes 100000] [--lookups 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import case, create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.order import Order
+from app.models.quote import Quote, QuoteStatus, QuoteType
+from app.services.quote_benchmarks import (
+    QUANTITY_BUCKETS,
+    QUOTED,
+    apply_benchmark_samples,
+    benchmark_dimensions,
+    lookup_benchmarks,
+    rebuild_quote_benchmarks,
+)
+
+CATEGORIES = ["automotive", "aerospace", "medical", "electronics", "energy", "consumer goods"]
+PROCESSES = ["cnc machining", "injection molding", "sheet metal", "casting", "3d printing", "welding"]
+MATERIALS = ["steel", "aluminum 6061", "titanium", "abs", "brass", "stainless steel", "nylon", "copper"]
+QUANTITIES = [1, 5, 50, 500, 5000, 50000]
+
+
+def seed(db, quote_count: int, rng: random.Random):
+    orders, quotes = [], []
+    deadline = datetime.now() + timedelta(days=60)
+    for order_id in range(1, quote_count // 5 + 1):
+        orders.append({
+            'id': order_id, 'client_id': 1, 'title': "Part", 'description': "Part", 'technical_requirements': {},
+            'quantity': rng.choice(QUANTITIES), 'industry_category': rng.choice(CATEGORIES),
+            'delivery_deadline': deadline,
+        })
+    for quote_id in range(1, quote_count + 1):
+        order = rng.choice(orders)
+        process = PROCESSES[min(int(rng.expovariate(0.6)), len(PROCESSES) - 1)]
+        price = round(rng.lognormvariate(8, 0.8) * (1 + QUANTITIES.index(order['quantity'])), 2)
+        quotes.append({
+            'id': quote_id, 'order_id': order['id'], 'manufacturer_id': 1, 'quote_type': QuoteType.ORDER_RESPONSE,
+            'status': QuoteStatus.ACCEPTED if rng.random() < 0.2 else QuoteStatus.SENT,
+            'manufacturing_process': process, 'material': rng.choice(MATERIALS), 'quantity': order['quantity'],
+            'subtotal_pln': price, 'total_price_pln': price, 'lead_time_days': rng.randint(5, 60),
+        })
+    db.execute(insert(Order), orders)
+    db.execute(insert(Quote), quotes)
+    db.commit()
+    return quotes, {order['id']: order for order in orders}
+
+
+def exact_benchmark(db, category, process, material, quantity, price):
+    """Count, averages and percentile from the quotes of the quote's most specific group"""
+    bounds = [0] + [largest for largest, _ in QUANTITY_BUCKETS] + [float('inf')]
+    upper = next(index for index, bound in enumerate(bounds) if quantity <= bound)
+    count, average_price, average_delivery, at_or_below = db.execute(
+        select(
+            func.count(Quote.id),  # pylint: disable=not-callable
+            func.avg(Quote.total_price_pln),
+            func.avg(Quote.lead_time_days),
+            func.sum(case((Quote.total_price_pln <= price, 1), else_=0)),
+        )
+        .join(Order, Quote.order_id == Order.id)
+        .where(
+            Order.industry_category == category,
+            Quote.manufacturing_process == process,
+            Quote.material == material,
+            Quote.quantity > bounds[upper - 1],
+            Quote.quantity <= bounds[upper],
+            Quote.status != QuoteStatus.DRAFT,
+        )
+    ).one()
+    return count, average_price, average_delivery, round(at_or_below / count * 100)
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+def run(quote_count: int, lookups: int):
+    rng = random.Random(11)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed_seconds, (quotes, orders) = timed(lambda: seed(db, quote_count, rng))
+        rebuild_seconds, report = timed(lambda: rebuild_quote_benchmarks(db))
+        print(f"{quote_count} quotes seeded in {seed_seconds:.1f} s; "
+              f"{report['sketches']} sketches rebuilt in {rebuild_seconds:.1f} s")
+
+        exact_times, sketch_times, errors = [], [], []
+        for quote in rng.sample(quotes, lookups):
+            order = orders[quote['order_id']]
+            values = (order['industry_category'], quote['manufacturing_process'], quote['material'], quote['quantity'])
+            exact_seconds, (count, _, _, percentile) = timed(lambda: exact_benchmark(db, *values, quote['total_price_pln']))
+            sketch_seconds, benchmarks = timed(lambda: lookup_benchmarks(db, benchmark_dimensions(*values), min_samples=1))
+            exact_times.append(exact_seconds)
+            sketch_times.append(sketch_seconds)
+            errors.append(abs(benchmarks[QUOTED].price_percentile(quote['total_price_pln']) - percentile))
+            assert benchmarks[QUOTED].quote_count == count
+
+        samples = [
+            (QUOTED, benchmark_dimensions(rng.choice(CATEGORIES), rng.choice(PROCESSES), rng.choice(MATERIALS),
+                                          rng.choice(QUANTITIES)), 1000.0, 14.0)
+            for _ in range(lookups)
+        ]
+        apply_seconds, _ = timed(lambda: [apply_benchmark_samples(db.connection(), [sample]) for sample in samples])
+        db.rollback()
+
+    print(f"{'lookup':<8} | {'median ms':>9} | {'p95 ms':>7}")
+    for label, times in (("exact", exact_times), ("sketch", sketch_times)):
+        times = sorted(times)
+        print(f"{label:<8} | {statistics.median(times) * 1e3:>9.2f} | {times[int(len(times) * 0.95)] * 1e3:>7.2f}")
+    print(f"percentile error: mean {statistics.mean(errors):.2f}, max {max(errors)} points")
+    print(f"sketch update on flush: {apply_seconds / lookups * 1e3:.2f} ms per quote")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    run(args.quotes, args.lookups)
@@ -0,0 +1,117 @@
+"""
+Benchmark of quote comparison analytics.
+
+Scores every quote of an RFQ two ways: the previous per-quote loop, where
+each quote's analytics recomputed the min/max/mean prices and deliveries
+of all quotes and re-sorted them to find its rank, and
+QuoteComparisonService.analyze_quotes(), which computes the statistics and
+ranks once and scores all quotes in one vectorized pass. Strengths and
+weaknesses are included, as generate_comparison_report() builds them too.
+
+Usage:
+    python tests/load/bench_quote_comparison.py [--sizes 10 100 500 2000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.quote_comparison_service import QuoteComparisonService, QuoteFeatures
+
+
+def make_quotes(count: int):
+    rng = random.Random(5)
+    quotes = []
+    for quote_id in range(1, count + 1):
+        manufacturer = None
+        if rng.random() < 0.9:
+            manufacturer = SimpleNamespace(
+                business_name=f"Manufacturer {quote_id}",
+                overall_rating=round(rng.uniform(2.0, 5.0), 2),
+                quality_certifications=rng.sample(["ISO 9001", "ISO 14001", "AS9100", "IATF 16949"], rng.randint(0, 3)),
+                on_time_delivery_rate=rng.uniform(0.6, 1.0),
+            )
+        quotes.append(SimpleNamespace(
+            id=quote_id, total_price_pln=round(rng.uniform(500, 50_000), 2),
+            lead_time_days=rng.randint(3, 60), manufacturer=manufacturer,
+        ))
+    return quotes
+
+
+def previous_analytics(quote, all_quotes, weights):
+    """The former calculate_quote_analytics() plus strengths and weaknesses, per quote"""
+    prices = [float(q.total_price_pln) for q in all_quotes]
+    deliveries = [q.lead_time_days for q in all_quotes]
+    price = float(quote.total_price_pln)
+    rating = float(quote.manufacturer.overall_rating) if quote.manufacturer else 0.0
+
+    # Each helper took all_quotes and recomputed its own statistics
+    price_score = 100.0 if max(prices) == min(prices) else (max(prices) - price) / (max(prices) - min(prices)) * 100
+    delivery_score = 100.0 if max(deliveries) == min(deliveries) else (
+        (max(deliveries) - quote.lead_time_days) / (max(deliveries) - min(deliveries)) * 100
+    )
+    quality_score = rating / 5.0 * 100 if rating else 60.0
+    score = price_score * weights["price"] + delivery_score * weights["delivery"] + quality_score * weights["quality"]
+    market_position = "lowest" if price == min(prices) else "competitive" if price <= statistics.mean(prices) * 0.9 else "premium"
+    savings_vs_average = statistics.mean(prices) - price
+    delivery_competitiveness = (statistics.mean(deliveries) - quote.lead_time_days) / statistics.mean(deliveries) * 100
+
+    def simple_score(q):
+        q_rating = float(q.manufacturer.overall_rating) if q.manufacturer else 3.0
+        return 1000 / max(float(q.total_price_pln), 1) + 30 / max(q.lead_time_days, 1) + q_rating
+
+    ranked = sorted(all_quotes, key=simple_score, reverse=True)
+    rank = next(i for i, q in enumerate(ranked, 1) if q.id == quote.id)
+
+    strengths = [price == min(prices), price <= statistics.mean(prices) * 0.9,
+                 quote.lead_time_days == min(deliveries), quote.lead_time_days <= statistics.mean(deliveries) * 0.9]
+    weaknesses = [price == max(prices), price >= statistics.mean(prices) * 1.2,
+                  quote.lead_time_days == max(deliveries), quote.lead_time_days >= statistics.mean(deliveries) * 1.2]
+    return score, rank, market_position, savings_vs_average, delivery_competitiveness, strengths, weaknesses
+
+
+def previous(service, quotes):
+    return [previous_analytics(quote, quotes, service.default_criteria_weights) for quote in quotes]
+
+
+def batch(service, quotes):
+    stats = QuoteFeatures(quotes).statistics()
+    analytics = service.analyze_quotes(quotes)
+    return [
+        (a, service._identify_strengths(quote, stats), service._identify_weaknesses(quote, stats))
+        for quote, a in zip(quotes, analytics)
+    ]
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(sizes, repeat: int):
+    service = QuoteComparisonService()
+    print(f"{'quotes':>7} | {'previous ms':>11} | {'batch ms':>9} | {'speedup':>7}")
+    for size in sizes:
+        quotes = make_quotes(size)
+        # The previous loop is quadratic; time large sets once
+        previous_seconds = timed(lambda: previous(service, quotes), repeat if size <= 500 else 1)
+        batch_seconds = timed(lambda: batch(service, quotes), repeat)
+        print(
+            f"{size:>7} | {previous_seconds * 1e3:>11.1f} | {batch_seconds * 1e3:>9.1f} | "
+            f"{previous_seconds / batch_seconds:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,70 @@
+"""
+Benchmark for rate limit overhead per request.
+
+Times RateLimitEngine.hit() for a stream of requests spread over a pool of
+client IPs, with one policy per request (the route policy) and with two
+(route policy plus a per-user policy, checked in one pipelined round trip).
+Backends measured: the in-process fallback, fakeredis (script execution
+without network) and, with --redis-url, a real Redis server.
+
+Usage:
+    python tests/load/bench_rate_limit.py [--requests 20000] [--clients 5000] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.rate_limit import RateLimitEngine, RateLimitPolicy
+
+POLICIES = {
+    "api": RateLimitPolicy("api", 100, 60),
+    "matching": RateLimitPolicy("matching", 30, 60),
+}
+
+
+def make_engines(redis_url):
+    engines = {"local": RateLimitEngine(policies=POLICIES, use_redis=False)}
+    try:
+        import fakeredis
+        engines["fakeredis"] = RateLimitEngine(policies=POLICIES, redis_client=fakeredis.FakeRedis())
+    except ImportError:
+        print("fakeredis not installed, skipping")
+    if redis_url:
+        import redis
+        client = redis.from_url(redis_url)
+        client.flushdb()
+        engines["redis"] = RateLimitEngine(policies=POLICIES, redis_client=client)
+    return engines
+
+
+def run(request_count: int, client_count: int, redis_url):
+    rng = random.Random(42)
+    clients = [f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}" for i in range(client_count)]
+    stream = [(rng.choice(clients), rng.randrange(client_count)) for _ in range(request_count)]
+
+    print(f"{'backend':>10} | {'policies':>8} | {'us/request':>10} | {'denied':>6}")
+    for name, engine in make_engines(redis_url).items():
+        for with_user in (False, True):
+            denied = 0
+            started = time.perf_counter()
+            for ip, user_id in stream:
+                identities = [("api", ip)]
+                if with_user:
+                    identities.append(("matching", f"user:{user_id}"))
+                results = engine.hit(identities)
+                denied += not RateLimitEngine.most_restrictive(results).allowed
+            per_request_us = (time.perf_counter() - started) * 1_000_000 / len(stream)
+            print(f"{name:>10} | {len(identities):>8} | {per_request_us:>10.1f} | {denied:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+    run(args.requests, args.clients, args.redis_url)
@@ -0,0 +1,104 @@
+"""
+Benchmark for similar-manufacturer lookups.
+
+Compares the pairwise _calculate_similarity_score loop with the
+ManufacturerSimilarityIndex exact top-k search and reports per-lookup
+latency as the catalog grows, plus the time to materialize neighbour lists
+for every manufacturer (the nightly job).
+
+Usage:
+    python tests/load/bench_similar_manufacturers.py [--manufacturers 1000 10000 50000] [--lookups 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.manufacturer_discovery_service import ManufacturerDiscoveryService
+from app.services.manufacturer_similarity_index import ManufacturerSimilarityIndex, ManufacturerFeatures
+
+PROCESSES = ["CNC Machining", "3D Printing", "Injection Molding", "Welding", "Die Casting", "Laser Cutting"]
+MATERIALS = ["Aluminum", "Steel", "Titanium", "ABS Plastic", "Nylon", "Brass", "Copper"]
+CERTIFICATIONS = ["ISO 9001", "AS9100", "ISO 13485", "IATF 16949", "ISO 14001"]
+
+
+def make_catalog(count: int, rng: random.Random):
+    return [
+        SimpleNamespace(
+            id=index,
+            country=rng.choice(["PL", "DE", "CZ", "SK"]),
+            state_province=rng.choice([None, "A", "B", "C"]),
+            capabilities={
+                "manufacturing_processes": rng.sample(PROCESSES, rng.randint(1, 3)),
+                "materials": rng.sample(MATERIALS, rng.randint(1, 3)),
+                "certifications": rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+            },
+            overall_rating=round(rng.uniform(2, 5), 2),
+            total_orders_completed=rng.randint(0, 300),
+            is_active=True,
+            is_verified=True,
+            updated_at=datetime(2024, 1, 1),
+        )
+        for index in range(count)
+    ]
+
+
+def run(manufacturer_counts, lookups: int, limit: int = 10):
+    rng = random.Random(42)
+    service = ManufacturerDiscoveryService()
+
+    print(f"{'manufacturers':>13} | {'mode':>11} | {'ms/lookup':>9} | identical")
+    for count in manufacturer_counts:
+        catalog = make_catalog(count, rng)
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = catalog
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = ManufacturerSimilarityIndex(index_path=os.path.join(index_dir, "neighbours"))
+            index.rebuild(db)
+            targets = rng.sample(catalog, min(lookups, count))
+
+            pairwise_targets = targets[:max(1, len(targets) // 20)]
+            started = time.perf_counter()
+            reference = []
+            for target in pairwise_targets:
+                scored = sorted(
+                    (
+                        (other.id, service._calculate_similarity_score(target, other))
+                        for other in catalog if other.id != target.id
+                    ),
+                    key=lambda item: (-item[1], item[0])
+                )
+                reference.append([item[0] for item in scored if item[1] > 0.3][:limit])
+            pairwise_ms = (time.perf_counter() - started) * 1000 / len(pairwise_targets)
+
+            started = time.perf_counter()
+            indexed = [
+                [hit[0] for hit in index.nearest(ManufacturerFeatures.from_manufacturer(target), limit)]
+                for target in targets
+            ]
+            index_ms = (time.perf_counter() - started) * 1000 / len(targets)
+
+            started = time.perf_counter()
+            index.materialize()
+            materialize_s = time.perf_counter() - started
+
+        identical = indexed[:len(reference)] == reference
+        print(f"{count:>13} | {'pairwise':>11} | {pairwise_ms:>9.2f} |")
+        print(f"{count:>13} | {'index':>11} | {index_ms:>9.3f} | {identical}")
+        print(f"{count:>13} | {'materialize':>11} | {materialize_s:>8.1f}s |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manufacturers", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    run(args.manufacturers, args.lookups)
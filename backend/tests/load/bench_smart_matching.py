@@ -0,0 +1,170 @@
+"""
+Benchmark for SmartMatchingEngine candidate scoring.
+
+Compares the per-manufacturer query path, the batch prefetch path and the
+vectorized NumPy kernel on a seeded in-memory SQLite database and reports
+query count and latency as the candidate count grows. Rankings from all
+paths must be identical.
+
+Usage:
+    python tests/load/bench_smart_matching.py [--candidates 10 25 50 100 1000] [--quotes 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.order import Order, OrderStatus
+from app.models.producer import Manufacturer
+from app.models.quote import Quote, QuoteStatus
+from app.services.smart_matching_engine import SmartMatchingEngine
+
+PROCESSES = ["CNC Machining", "3D Printing", "Injection Molding", "Sheet Metal Stamping", "Welding"]
+MATERIALS = ["Aluminum", "Steel", "Stainless Steel", "Titanium", "ABS Plastic"]
+INDUSTRIES = ["Automotive", "Aerospace", "Medical", "Electronics"]
+CERTIFICATIONS = ["ISO 9001", "AS9100", "ISO 13485", "IATF 16949"]
+
+
+class QueryCounter:
+    """Counts statements executed on an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def seed(session, manufacturers: int, quotes_per_manufacturer: int) -> Order:
+    """Seed manufacturers with quote and order history and return a target order"""
+    rng = random.Random(42)
+    now = datetime.now()
+
+    for index in range(manufacturers):
+        session.add(Manufacturer(
+            user_id=index + 1,
+            business_name=f"Manufacturer {index}",
+            city="Warsaw",
+            country=rng.choice(["PL", "DE", "CZ", "US"]),
+            capabilities={
+                "manufacturing_processes": rng.sample(PROCESSES, 2),
+                "materials": rng.sample(MATERIALS, 3),
+                "industries_served": rng.sample(INDUSTRIES, 2),
+                "certifications": rng.sample(CERTIFICATIONS, 2),
+            },
+            overall_rating=Decimal(str(round(rng.uniform(3.0, 5.0), 2))),
+            quality_rating=Decimal(str(round(rng.uniform(3.0, 5.0), 2))),
+            on_time_delivery_rate=rng.uniform(70, 100),
+            total_orders_completed=rng.randint(0, 150),
+            capacity_utilization_pct=rng.uniform(30, 95),
+            standard_lead_time_days=rng.randint(7, 45),
+            is_active=True,
+            is_verified=True,
+            stripe_onboarding_completed=True,
+            last_activity_date=now - timedelta(days=rng.randint(0, 60)),
+        ))
+    session.flush()
+
+    for manufacturer_id in range(1, manufacturers + 1):
+        for _ in range(quotes_per_manufacturer):
+            history_order = Order(
+                client_id=1,
+                title="Historical order",
+                description="Historical order",
+                technical_requirements={},
+                quantity=rng.randint(1, 500),
+                delivery_deadline=now + timedelta(days=30),
+                industry_category=rng.choice(INDUSTRIES),
+                status=rng.choice([OrderStatus.COMPLETED, OrderStatus.DELIVERED, OrderStatus.IN_PRODUCTION]),
+                created_at=now - timedelta(days=rng.randint(0, 365)),
+            )
+            session.add(history_order)
+            session.flush()
+            price = Decimal(rng.randint(500, 200000))
+            session.add(Quote(
+                order_id=history_order.id,
+                manufacturer_id=manufacturer_id,
+                subtotal_pln=price,
+                total_price_pln=price,
+                lead_time_days=rng.randint(5, 60),
+                status=rng.choice([QuoteStatus.ACCEPTED, QuoteStatus.SENT, QuoteStatus.REJECTED]),
+                created_at=now - timedelta(days=rng.randint(0, 180)),
+            ))
+
+    target = Order(
+        client_id=1,
+        title="Aluminium housings",
+        description="CNC machined aluminium housings",
+        technical_requirements={
+            "manufacturing_process": "CNC Machining",
+            "material": "Aluminum 6061",
+            "certifications": ["ISO 9001"],
+        },
+        quantity=250,
+        delivery_deadline=now + timedelta(days=40),
+        industry_category="Automotive",
+        preferred_country="PL",
+    )
+    session.add(target)
+    session.commit()
+    return target
+
+
+def run(candidate_counts, quotes_per_manufacturer: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    order = seed(session, max(candidate_counts), quotes_per_manufacturer)
+    counter = QueryCounter(engine)
+    matcher = SmartMatchingEngine()
+    # Rank every candidate so the parity check covers the full candidate set
+    matcher.min_confidence_threshold = 0.0
+    matcher.min_score_threshold = 0.0
+    # Measure scoring, not the result cache
+    matcher.use_result_cache = False
+
+    print(f"{'candidates':>10} | {'mode':>8} | {'queries':>7} | {'ms':>9} | identical")
+    for candidate_count in candidate_counts:
+        rankings = {}
+        for mode, batch, vectorized in (
+            ("per-row", False, False), ("batch", True, False), ("vector", True, True)
+        ):
+            # Start each run from a cold identity map, as a fresh request would
+            session.expire_all()
+            candidates = session.query(Manufacturer).order_by(Manufacturer.id).limit(candidate_count).all()
+            counter.count = 0
+            started = time.perf_counter()
+            scored = matcher._score_candidates(
+                session, order, candidates, batch_scoring=batch, vectorized=vectorized
+            )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            rankings[mode] = [
+                (manufacturer.id, round(score.total_score, 12), round(score.confidence_level, 12),
+                 round(score.quality_score, 12), round(score.performance_score, 12),
+                 round(score.cost_efficiency_score, 12), round(score.historical_success_score, 12))
+                for manufacturer, score in sorted(
+                    scored,
+                    key=lambda item: (item[1].total_score, item[1].confidence_level),
+                    reverse=True
+                )
+            ]
+            identical = "" if mode == "per-row" else str(rankings["per-row"] == rankings[mode])
+            print(f"{candidate_count:>10} | {mode:>8} | {counter.count:>7} | {elapsed_ms:>9.1f} | {identical}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 25, 50, 100, 1000])
+    parser.add_argument("--quotes", type=int, default=20, help="Historical quotes per manufacturer")
+    args = parser.parse_args()
+    run(args.candidates, args.quotes)
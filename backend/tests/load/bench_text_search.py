@@ -0,0 +1,117 @@
+"""
+Benchmark for manufacturer text search.
+
+Compares refitting TF-IDF on the whole corpus per query (the previous
+search_manufacturers_by_text path) with ManufacturerTextIndex, which fits
+once and answers queries with transform + sparse dot product + top-k.
+Reports per-query latency as the corpus grows and the overlap of the top
+results (IDF differs slightly because the old path fitted the query too).
+
+Usage:
+    python tests/load/bench_text_search.py [--manufacturers 1000 5000 20000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.services.manufacturer_text_index import ManufacturerTextIndex
+
+WORDS = (
+    "cnc machining milling turning aluminum steel stainless titanium welding stamping casting "
+    "injection molding plastic 3d printing additive prototyping assembly coating anodizing "
+    "automotive aerospace medical electronics precision tooling laser cutting bending fabrication"
+).split()
+CITIES = ["Warsaw", "Krakow", "Berlin", "Munich", "Brno", "Prague"]
+
+
+def make_catalog(count: int, rng: random.Random):
+    return [
+        SimpleNamespace(
+            id=index,
+            business_name=f"{rng.choice(WORDS).title()} Works {index}",
+            business_description=" ".join(rng.choices(WORDS, k=25)),
+            capabilities={
+                "manufacturing_processes": rng.sample(WORDS[:12], 3),
+                "materials": rng.sample(WORDS[4:8], 2),
+            },
+            country=rng.choice(["PL", "DE", "CZ"]),
+            state_province=None,
+            city=rng.choice(CITIES),
+            overall_rating=round(rng.uniform(2, 5), 2),
+            is_active=True,
+            is_verified=True,
+            updated_at=datetime(2024, 1, 1),
+        )
+        for index in range(count)
+    ]
+
+
+def text_of(manufacturer) -> str:
+    parts = [manufacturer.business_name, manufacturer.business_description]
+    for value in manufacturer.capabilities.values():
+        parts.extend(value)
+    return " ".join(parts)
+
+
+def refit_search(vectorizer, catalog, search_text: str, limit: int):
+    """Previous path: refit the vectorizer on corpus + query for every search"""
+    vectorizer = clone(vectorizer)
+    matrix = vectorizer.fit_transform([text_of(m) for m in catalog] + [search_text])
+    similarities = cosine_similarity(matrix[-1], matrix[:-1]).flatten()
+    hits = [(catalog[i].id, similarities[i]) for i in range(len(catalog)) if similarities[i] > 0.1]
+    hits.sort(key=lambda hit: hit[1], reverse=True)
+    return hits[:limit]
+
+
+def run(manufacturer_counts, query_count: int, limit: int = 20):
+    rng = random.Random(42)
+    queries = [" ".join(rng.sample(WORDS, 3)) for _ in range(query_count)]
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english', ngram_range=(1, 2))
+
+    print(f"{'manufacturers':>13} | {'mode':>8} | {'ms/query':>9} | top-{limit} overlap")
+    for count in manufacturer_counts:
+        catalog = make_catalog(count, rng)
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = catalog
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = ManufacturerTextIndex(text_of, vectorizer, os.path.join(index_dir, "index"))
+            started = time.perf_counter()
+            index.rebuild(db)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            refit_queries = queries[:max(1, query_count // 10)]
+            started = time.perf_counter()
+            reference = [refit_search(vectorizer, catalog, query, limit) for query in refit_queries]
+            refit_ms = (time.perf_counter() - started) * 1000 / len(refit_queries)
+
+            started = time.perf_counter()
+            indexed = [index.search(query, limit=limit) for query in queries]
+            index_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        overlap = sum(
+            len({hit[0] for hit in expected} & {hit[0] for hit in actual}) / max(len(expected), 1)
+            for expected, actual in zip(reference, indexed)
+        ) / len(reference)
+        print(f"{count:>13} | {'refit':>8} | {refit_ms:>9.1f} |")
+        print(f"{count:>13} | {'index':>8} | {index_ms:>9.2f} | {overlap:.0%} (build {build_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manufacturers", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    run(args.manufacturers, args.queries)
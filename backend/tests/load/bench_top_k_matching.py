@@ -0,0 +1,91 @@
+"""
+Benchmark of top-k smart recommendations.
+
+Seeds manufacturers with quote history (as bench_smart_matching.py does)
+and builds recommendations for one order two ways: the previous pipeline,
+which enriched every scored candidate with all details before sorting,
+filtering and cutting to max_recommendations, and
+get_smart_recommendations(), which takes candidates best first and
+enriches only the ones returned, with all details or only the ones the
+curated matching engine presents. Reports query count and latency; the
+returned manufacturers must be identical.
+
+Usage:
+    python tests/load/bench_top_k_matching.py [--candidates 50 200 1000] [--top 3 10] [--quotes 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.services.manufacturer_catalog import ManufacturerCatalog
+from app.services.smart_matching_engine import SmartMatchingEngine
+from bench_smart_matching import QueryCounter, seed
+
+CURATED_DETAILS = ['estimated_delivery_time', 'estimated_cost_range', 'risk_assessment']
+
+
+def enrich_all(matcher, session, order, max_recommendations):
+    """The previous get_smart_recommendations() pipeline"""
+    candidates = matcher._get_candidate_manufacturers(session, order, limit=matcher.max_vectorized_candidates)
+    scored = matcher._score_candidates(session, order, candidates, vectorized=True)
+    recommendations = [
+        matcher._create_smart_recommendation(session, manufacturer, order, match_score, True, False)
+        for manufacturer, match_score in scored
+    ]
+    recommendations.sort(
+        key=lambda rec: (rec.match_score.total_score, rec.match_score.confidence_level), reverse=True
+    )
+    return matcher._apply_smart_filters(recommendations, order)[:max_recommendations]
+
+
+def run(candidate_counts, top_counts, quotes_per_manufacturer: int):
+    for candidate_count in candidate_counts:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        order = seed(session, candidate_count, quotes_per_manufacturer)
+        counter = QueryCounter(engine)
+        matcher = SmartMatchingEngine()
+        # A catalog of this run's database
+        matcher.catalog = ManufacturerCatalog()
+        # Measure the pipeline, not the result cache
+        matcher.use_result_cache = False
+
+        print(f"{candidate_count} candidates")
+        print(f"{'top':>5} | {'mode':>10} | {'queries':>7} | {'ms':>9} | identical")
+        for top in top_counts:
+            results = {}
+            for mode, build in (
+                ("enrich-all", lambda: enrich_all(matcher, session, order, top)),
+                ("top-k", lambda: matcher.get_smart_recommendations(
+                    session, order, max_recommendations=top, enable_ml_predictions=False)),
+                ("curated", lambda: matcher.get_smart_recommendations(
+                    session, order, max_recommendations=top, enable_ml_predictions=False,
+                    details=CURATED_DETAILS)),
+            ):
+                # Start each run from a cold identity map, as a fresh request would
+                session.expire_all()
+                counter.count = 0
+                started = time.perf_counter()
+                recommendations = build()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                results[mode] = [rec.manufacturer_id for rec in recommendations]
+                identical = "" if mode == "enrich-all" else str(results["enrich-all"] == results[mode])
+                print(f"{top:>5} | {mode:>10} | {counter.count:>7} | {elapsed_ms:>9.1f} | {identical}")
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--top", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--quotes", type=int, default=5, help="Historical quotes per manufacturer")
+    args = parser.parse_args()
+    run(args.candidates, args.top, args.quotes)
@@ -0,0 +1,200 @@
+import asyncio
+
+import pytest
+from starlette.responses import JSONResponse
+
+from app.core.asgi_pipeline import MiddlewarePipeline, PipelineStage
+from app.core.middleware import RateLimitMiddleware, SecurityHeadersMiddleware
+from app.core.rate_limit import RateLimitEngine, RateLimitPolicy
+
+
+def call(app, method="GET", path="/", body=b"", headers=None):
+    """Run one HTTP request through an ASGI app; returns the sent messages"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("203.0.113.9", 5000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    chunks = [body[:3], body[3:]] if body else [b""]
+    incoming = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+def response_headers(messages):
+    return {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+
+
+class Endpoint:
+    """Streams three chunks; records what it received"""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.body = None
+        self.fail = fail
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("boom")
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        self.body = b"".join(chunks)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/csv")]})
+        for chunk in (b"a,b\n", b"1,2\n", b"3,4\n"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class Recorder(PipelineStage):
+
+    def __init__(self, name, log, answer=None, body=False, handle_errors=False):
+        super().__init__()
+        self.name = name
+        self.log = log
+        self.answer = answer
+        self.body = body
+        self.handle_errors = handle_errors
+
+    def wants_body(self, ctx):
+        return self.body
+
+    async def on_request(self, ctx):
+        self.log.append(("request", self.name, ctx.body))
+        return self.answer
+
+    def on_response_start(self, ctx, headers):
+        self.log.append(("headers", self.name))
+        headers[f"x-{self.name}"] = "1"
+
+    async def on_error(self, ctx, exc):
+        if self.handle_errors:
+            return JSONResponse({"error": str(exc)}, status_code=500)
+        return None
+
+    async def on_complete(self, ctx):
+        self.log.append(("complete", self.name, ctx.status_code))
+
+
+class TestMiddlewarePipeline:
+
+    def test_stages_run_like_nested_middleware(self):
+        log = []
+        endpoint = Endpoint()
+        app = MiddlewarePipeline(endpoint, [Recorder("outer", log), Recorder("inner", log)])
+
+        messages = call(app)
+
+        assert [entry[:2] for entry in log] == [
+            ("request", "outer"), ("request", "inner"),
+            ("headers", "inner"), ("headers", "outer"),
+            ("complete", "inner"), ("complete", "outer"),
+        ]
+        assert {"x-outer", "x-inner"} <= set(response_headers(messages))
+
+    def test_streamed_bodies_pass_through_unbuffered(self):
+        app = MiddlewarePipeline(Endpoint(), [Recorder("stage", [])])
+        messages = call(app)
+        assert [message.get("body") for message in messages[1:]] == [b"a,b\n", b"1,2\n", b"3,4\n", b""]
+
+    def test_answering_stage_skips_app_and_inner_stages(self):
+        log = []
+        endpoint = Endpoint()
+        app = MiddlewarePipeline(endpoint, [
+            Recorder("outer", log),
+            Recorder("gate", log, answer=JSONResponse({"blocked": True}, status_code=403)),
+            Recorder("inner", log),
+        ])
+
+        messages = call(app)
+
+        assert endpoint.calls == 0
+        assert messages[0]["status"] == 403
+        headers = response_headers(messages)
+        assert "x-outer" in headers and "x-gate" not in headers and "x-inner" not in headers
+        assert ("request", "inner", None) not in log
+
+    def test_body_is_read_only_on_request_and_replayed(self):
+        log = []
+        endpoint = Endpoint()
+        app = MiddlewarePipeline(endpoint, [Recorder("plain", log), Recorder("scanner", log, body=True)])
+
+        call(app, method="POST", body=b'{"name": "bracket"}')
+
+        assert log[0] == ("request", "plain", None)
+        assert log[1] == ("request", "scanner", b'{"name": "bracket"}')
+        assert endpoint.body == b'{"name": "bracket"}'
+
+    def test_body_prefix_read_by_a_stage_is_replayed_before_the_rest(self):
+        class Prefix(PipelineStage):
+            async def on_request(self, ctx):
+                self.seen = [chunk async for chunk in ctx.iter_body(limit=2)]
+
+        stage = Prefix()
+        endpoint = Endpoint()
+
+        call(MiddlewarePipeline(endpoint, [stage]), method="POST", body=b"abcdef")
+
+        assert stage.seen == [b"abc"]
+        assert endpoint.body == b"abcdef"
+
+    def test_errors_become_responses_when_a_stage_handles_them(self):
+        log = []
+        app = MiddlewarePipeline(Endpoint(fail=True), [
+            Recorder("outer", log),
+            Recorder("guard", log, handle_errors=True),
+        ])
+
+        messages = call(app)
+
+        assert messages[0]["status"] == 500
+        assert "x-outer" in response_headers(messages)
+        assert ("complete", "guard", 500) in log
+
+    def test_unhandled_errors_propagate(self):
+        app = MiddlewarePipeline(Endpoint(fail=True), [Recorder("stage", [])])
+        with pytest.raises(RuntimeError):
+            call(app)
+
+
+class TestStandaloneStages:
+
+    def test_rate_limit_answers_before_the_app(self):
+        engine = RateLimitEngine(policies={"public": RateLimitPolicy("public", 2, 60)}, use_redis=False)
+        endpoint = Endpoint()
+        app = RateLimitMiddleware(endpoint, engine=engine)
+
+        statuses = [call(app, path="/health")[0]["status"] for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert endpoint.calls == 2
+
+    def test_security_headers_are_added_at_response_start(self):
+        messages = call(SecurityHeadersMiddleware(Endpoint()))
+        headers = response_headers(messages)
+        assert headers["x-frame-options"] == "DENY"
+        assert headers["content-type"] == "text/csv"
+        assert "strict-transport-security" not in headers
@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.bulk_email import BulkEmailSender, run_in_worker_loop
+from app.services.email import EmailStatus, EmailTracker, UnsubscribeManager
+from app.services.email_templates import EmailTemplateManager
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def templates(tmp_path):
+    for language, greeting in (('en', 'Hello'), ('pl', 'Dzień dobry')):
+        directory = tmp_path / language
+        directory.mkdir()
+        (directory / 'newsletter_subject.txt').write_text("{{ campaign_name }} news\n")
+        (directory / 'newsletter.html').write_text(f"<p>{greeting} {{{{ first_name }}}}</p>")
+        (directory / 'newsletter.txt').write_text(f"{greeting} {{{{ first_name }}}}")
+    return EmailTemplateManager(template_dir=str(tmp_path))
+
+
+class SendGrid:
+    """Records mail/send requests and answers them with status"""
+
+    def __init__(self, status=202):
+        self.status = status
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(json.loads(request.content))
+        return httpx.Response(self.status)
+
+
+def make_sender(redis_client, templates, sendgrid):
+    return BulkEmailSender(
+        api_key="SG.test",
+        from_email="noreply@example.com",
+        from_name="Manufacturing Platform",
+        tracker=EmailTracker(redis_client),
+        unsubscribe_manager=UnsubscribeManager(redis_client),
+        templates=templates,
+        transport=httpx.MockTransport(sendgrid)
+    )
+
+
+def recipients(count, **fields):
+    return [{'email': f"user{index}@example.com", **fields} for index in range(count)]
+
+
+class TestRedisBatching:
+
+    def test_unsubscribes_are_checked_in_batches(self, redis_client):
+        manager = UnsubscribeManager(redis_client)
+        manager.add_unsubscribe("All@Example.com")
+        manager.add_unsubscribe("news@example.com", "newsletter")
+        manager.add_unsubscribe("other@example.com", "welcome")
+        emails = ["All@Example.com", "news@example.com", "other@example.com", "kept@example.com"]
+
+        assert manager.unsubscribed_among(emails, "newsletter", batch_size=2) == {
+            "All@Example.com", "news@example.com"
+        }
+        assert manager.unsubscribed_among(emails) == {"All@Example.com"}
+        assert all(manager.is_unsubscribed(email, "newsletter") for email in emails[:2])
+
+    def test_tracking_many_emails(self, redis_client):
+        tracker = EmailTracker(redis_client)
+        tracker.track_many([
+            {'email_id': email_id, 'email_type': 'newsletter', 'to_email': 'a@example.com', 'subject': 'News'}
+            for email_id in ("1", "2")
+        ])
+        tracker.update_many(["1", "missing"], EmailStatus.SENT, {'sent_at': 'now'})
+
+        assert tracker.get_email_status("1")['status'] == "sent"
+        assert tracker.get_email_status("1")['sent_at'] == "now"
+        assert tracker.get_email_status("2")['status'] == "pending"
+        assert tracker.get_email_status("missing") is None
+
+
+class TestCompiledTemplates:
+
+    def test_compiled_template_renders_like_render_template(self, templates):
+        context = {'campaign_name': 'May', 'first_name': 'Ada'}
+        compiled = templates.compile_template('newsletter', 'pl')
+        assert compiled.render(context) == templates.render_template('newsletter', context, 'pl')
+        assert compiled.render(context)['subject'] == "May news"
+        assert compiled.render({'first_name': 'Jan'})['html_content'] == "<p>Dzień dobry Jan</p>"
+
+    def test_missing_subject_and_text_templates(self, templates, tmp_path):
+        (tmp_path / 'en' / 'notice.html').write_text("<p>{{ platform_name }}</p>")
+        rendered = templates.compile_template('notice').render({})
+        assert rendered == {
+            'subject': "Manufacturing Platform - Notice",
+            'html_content': "<p>Manufacturing Platform</p>",
+            'text_content': None
+        }
+
+
+class TestBulkSend:
+
+    def send(self, sender, recipient_list, common_context=None):
+        return asyncio.run(sender.send('newsletter', recipient_list, common_context or {'campaign_name': 'May'}))
+
+    def test_identical_emails_share_requests_of_up_to_1000_recipients(self, redis_client, templates):
+        sendgrid = SendGrid()
+        sender = make_sender(redis_client, templates, sendgrid)
+        results = self.send(sender, recipients(2500, context={'first_name': 'there'}))
+
+        assert [len(request['personalizations']) for request in sendgrid.requests] == [1000, 1000, 500]
+        assert all(result['status'] == 'sent' for result in results)
+        request = sendgrid.requests[0]
+        assert request['subject'] == "May news"
+        assert [content['type'] for content in request['content']] == ['text/plain', 'text/html']
+        assert request['personalizations'][0] == {
+            'to': [{'email': 'user0@example.com'}],
+            'custom_args': {'email_id': results[0]['email_id']}
+        }
+
+    def test_personalized_emails_are_sent_separately(self, redis_client, templates):
+        sendgrid = SendGrid()
+        sender = make_sender(redis_client, templates, sendgrid)
+        results = self.send(sender, [
+            {'email': 'ada@example.com', 'name': 'Ada', 'context': {'first_name': 'Ada'}},
+            {'email': 'jan@example.com', 'context': {'first_name': 'Jan'}, 'language': 'pl'},
+            {'email': 'eve@example.com', 'context': {'first_name': 'Ada'}},
+        ])
+
+        html = sorted(request['content'][1]['value'] for request in sendgrid.requests)
+        assert html == ["<p>Dzień dobry Jan</p>", "<p>Hello Ada</p>"]
+        ada = next(request for request in sendgrid.requests if "Ada" in request['content'][1]['value'])
+        assert [p['to'] for p in ada['personalizations']] == [
+            [{'email': 'ada@example.com', 'name': 'Ada'}], [{'email': 'eve@example.com'}]
+        ]
+        assert [result['status'] for result in results] == ['sent'] * 3
+
+    def test_statuses_are_tracked_and_unsubscribes_skipped(self, redis_client, templates):
+        UnsubscribeManager(redis_client).add_unsubscribe("user1@example.com", "newsletter")
+        sender = make_sender(redis_client, templates, SendGrid())
+        results = self.send(sender, recipients(3))
+
+        assert [result['status'] for result in results] == ['sent', 'unsubscribed', 'sent']
+        assert 'email_id' not in results[1]
+        status = sender.tracker.get_email_status(results[0]['email_id'])
+        assert status['status'] == 'sent'
+        assert status['to_email'] == 'user0@example.com' and status['subject'] == "May news"
+
+    def test_rejected_requests_fail_their_recipients(self, redis_client, templates):
+        sender = make_sender(redis_client, templates, SendGrid(status=400))
+        results = self.send(sender, recipients(2))
+
+        assert [result['status'] for result in results] == ['failed', 'failed']
+        assert results[0]['error'].startswith("SendGrid error 400")
+        assert sender.tracker.get_email_status(results[0]['email_id'])['status'] == 'failed'
+
+    def test_render_errors_fail_only_their_recipients(self, redis_client, templates, tmp_path):
+        (tmp_path / 'pl' / 'newsletter.html').unlink()
+        sender = make_sender(redis_client, templates, SendGrid())
+        results = self.send(sender, recipients(1) + recipients(1, language='pl'))
+
+        assert [result['status'] for result in results] == ['sent', 'failed']
+        assert "newsletter.html" in results[1]['error']
+
+    def test_without_an_api_key_sendgrid_is_mocked(self, templates):
+        sender = BulkEmailSender("", "noreply@example.com", "Manufacturing Platform", templates=templates)
+        results = self.send(sender, recipients(2))
+        assert [result['status'] for result in results] == ['sent', 'sent']
+
+
+def test_worker_loop_is_reused_between_tasks():
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run_in_worker_loop(current_loop()) is run_in_worker_loop(current_loop())
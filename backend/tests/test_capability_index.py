@@ -0,0 +1,97 @@
+import random
+import pytest
+from unittest.mock import Mock
+
+from app.services.smart_matching_engine import SmartMatchingEngine
+from app.models.producer import Manufacturer
+
+PROCESSES = [
+    "CNC Machining", "Precision Machining", "3D Printing", "Additive Manufacturing",
+    "Injection Molding", "Sheet Metal Stamping", "Metal Stamping", "Welding", "Die Casting"
+]
+MATERIALS = ["Aluminum", "Aluminum Alloy", "Steel", "Stainless Steel 316", "Titanium Grade 5", "ABS Plastic", "PEEK"]
+REQUIRED_TERMS = [
+    "CNC Machining", "cnc milling", "3D printing", "Aluminum 6061", "stainless steel",
+    "Metal Stamping", "Plastic injection", "welding", "Anodizing", "  STEEL "
+]
+
+
+def make_manufacturer(manufacturer_id, capabilities):
+    manufacturer = Mock(spec=Manufacturer)
+    manufacturer.id = manufacturer_id
+    manufacturer.capabilities = capabilities
+    return manufacturer
+
+
+class TestCapabilityIndex:
+    """Test suite for the capability vocabulary index"""
+
+    @pytest.fixture
+    def engine(self):
+        return SmartMatchingEngine()
+
+    def test_matches_per_pair_scores(self, engine):
+        """Index lookups return exactly the per-pair fuzzy match scores"""
+        rng = random.Random(3)
+        manufacturers = [
+            make_manufacturer(index, {
+                "manufacturing_processes": rng.sample(PROCESSES, rng.randint(0, 4)),
+                "materials": rng.sample(MATERIALS, rng.randint(0, 3)),
+            })
+            for index in range(50)
+        ]
+        engine.capability_index.rebuild(manufacturers)
+
+        for manufacturer in manufacturers:
+            for category in ("manufacturing_processes", "materials", "certifications"):
+                for required in REQUIRED_TERMS:
+                    expected = engine._enhanced_fuzzy_match_capability(
+                        required, manufacturer.capabilities.get(category, [])
+                    )
+                    assert engine.capability_index.match(required, manufacturer, category) == expected
+
+    def test_vocabulary_is_shared(self, engine):
+        """Each distinct normalized term is indexed once"""
+        engine.capability_index.rebuild([
+            make_manufacturer(1, {"materials": ["Steel", "Aluminum"]}),
+            make_manufacturer(2, {"materials": [" steel", "ALUMINUM", "Titanium"]}),
+        ])
+
+        assert engine.capability_index.vocabulary_size == 3
+        assert len(engine.capability_index) == 2
+
+    def test_changed_profile_is_reindexed(self, engine):
+        """Updating a manufacturer's capabilities is picked up on the next lookup"""
+        manufacturer = make_manufacturer(1, {"manufacturing_processes": ["Welding"]})
+        assert engine._match_capability("CNC Machining", manufacturer, "manufacturing_processes") < 0.3
+
+        manufacturer.capabilities = {"manufacturing_processes": ["Welding", "CNC Machining"]}
+
+        assert engine._match_capability("CNC Machining", manufacturer, "manufacturing_processes") == 1.0
+
+    def test_similarity_rows_extend_for_new_terms(self, engine):
+        """Rows computed before a vocabulary change are extended, not recomputed"""
+        engine.capability_index.pair_similarity = Mock(wraps=engine._capability_pair_similarity)
+        first = make_manufacturer(1, {"materials": ["Steel"]})
+        second = make_manufacturer(2, {"materials": ["Steel", "Titanium"]})
+
+        engine.capability_index.match("Stainless Steel", first, "materials")
+        engine.capability_index.match("Stainless Steel", second, "materials")
+        engine.capability_index.match("Stainless Steel", first, "materials")
+
+        assert engine.capability_index.pair_similarity.call_count == 2
+
+    def test_lru_eviction(self, engine):
+        engine.capability_index.max_required_terms = 2
+        manufacturer = make_manufacturer(1, {"materials": ["Steel"]})
+
+        for required in ("steel", "aluminum", "titanium"):
+            engine.capability_index.match(required, manufacturer, "materials")
+
+        assert list(engine.capability_index._similarity_rows) == ["aluminum", "titanium"]
+
+    def test_missing_inputs_score_zero(self, engine):
+        manufacturer = make_manufacturer(1, None)
+
+        assert engine.capability_index.match("Steel", manufacturer, "materials") == 0.0
+        assert engine.capability_index.match("", make_manufacturer(2, {"materials": ["Steel"]}), "materials") == 0.0
@@ -0,0 +1,153 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models.capability_tag import ManufacturerCapabilityTag, ProductionQuoteTag
+from app.models.producer import Manufacturer
+from app.models.quote import ProductionQuote, ProductionQuoteInquiry, ProductionQuoteType
+from app.services.capability_tags import (
+    CERTIFICATION,
+    COUNTRY,
+    MATERIAL,
+    PROCESS,
+    normalize_tag,
+    production_quote_tags,
+    rebuild_capability_tags,
+    required_tags,
+    tag_hits,
+    tagged_with,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for model in (Manufacturer, ProductionQuote, ProductionQuoteInquiry, ProductionQuoteTag, ManufacturerCapabilityTag):
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def make_quote(quote_id, processes=(), materials=(), certifications=(), countries=()):
+    return ProductionQuote(
+        id=quote_id,
+        manufacturer_id=1,
+        production_quote_type=ProductionQuoteType.CAPACITY_AVAILABILITY,
+        title=f"Quote {quote_id}",
+        pricing_model="fixed",
+        pricing_details={},
+        manufacturing_processes=list(processes),
+        materials=list(materials),
+        certifications=list(certifications),
+        preferred_countries=list(countries),
+    )
+
+
+def make_manufacturer(manufacturer_id, capabilities):
+    return Manufacturer(id=manufacturer_id, user_id=manufacturer_id, city="Warsaw", capabilities=capabilities)
+
+
+def quote_ids(db, filters):
+    return db.scalars(
+        select(ProductionQuote.id).where(tagged_with(ProductionQuote, filters)).order_by(ProductionQuote.id)
+    ).all()
+
+
+def stored_tags(db, quote_id):
+    return set(db.execute(
+        select(ProductionQuoteTag.kind, ProductionQuoteTag.value)
+        .where(ProductionQuoteTag.production_quote_id == quote_id)
+    ).all())
+
+
+class TestNormalization:
+
+    def test_values_are_case_and_whitespace_insensitive(self):
+        assert normalize_tag("  CNC   Machining ") == "cnc machining"
+        assert normalize_tag("ISO 9001") == normalize_tag("iso 9001")
+
+    def test_quote_tags_skip_blank_and_missing_values(self):
+        quote = make_quote(1, processes=["Welding", "", None], countries=["PL", "pl"])
+        quote.materials = None
+        assert production_quote_tags(quote) == {(PROCESS, "welding"), (COUNTRY, "pl")}
+
+    def test_order_requirements(self):
+        assert required_tags({"manufacturing_process": "CNC Machining", "certifications": ["ISO 9001"]}) == {
+            (PROCESS, "cnc machining"), (CERTIFICATION, "iso 9001")
+        }
+        assert required_tags(None) == set()
+
+
+class TestTagMaintenance:
+
+    def test_tags_follow_the_json_lists(self, db):
+        db.add(make_quote(1, processes=["CNC Machining"], materials=["Aluminum"]))
+        db.commit()
+        assert stored_tags(db, 1) == {(PROCESS, "cnc machining"), (MATERIAL, "aluminum")}
+
+        quote = db.get(ProductionQuote, 1)
+        quote.materials = ["Steel", "Titanium"]
+        db.commit()
+        assert stored_tags(db, 1) == {(PROCESS, "cnc machining"), (MATERIAL, "steel"), (MATERIAL, "titanium")}
+
+        db.delete(quote)
+        db.commit()
+        assert stored_tags(db, 1) == set()
+
+    def test_unrelated_changes_leave_tags_alone(self, db):
+        db.add(make_quote(1, processes=["Welding"]))
+        db.commit()
+        db.execute(ProductionQuoteTag.__table__.delete())
+
+        db.get(ProductionQuote, 1).title = "Renamed"
+        db.commit()
+        assert stored_tags(db, 1) == set()
+
+    def test_rebuild_repairs_drift(self, db):
+        db.add_all([make_quote(1, processes=["Welding"]), make_manufacturer(5, {"materials": ["PEEK"]})])
+        db.commit()
+        db.execute(ProductionQuoteTag.__table__.delete())
+        db.commit()
+
+        assert rebuild_capability_tags(db, batch_size=1) == {"production_quotes": 1, "manufacturers": 1}
+        assert stored_tags(db, 1) == {(PROCESS, "welding")}
+        assert db.execute(select(ManufacturerCapabilityTag.manufacturer_id, ManufacturerCapabilityTag.value)).all() == [
+            (5, "peek")
+        ]
+
+
+class TestTagQueries:
+
+    @pytest.fixture
+    def quotes(self, db):
+        db.add_all([
+            make_quote(1, processes=["CNC Machining", "Welding"], countries=["PL"]),
+            make_quote(2, processes=["CNC Machining"], countries=["DE"]),
+            make_quote(3, processes=["Precision CNC Machining"], countries=["PL", "DE"]),
+        ])
+        db.commit()
+
+    def test_every_value_is_required(self, db, quotes):
+        assert quote_ids(db, {PROCESS: ["cnc machining"]}) == [1, 2]
+        assert quote_ids(db, {PROCESS: ["CNC Machining", " welding"]}) == [1]
+        assert quote_ids(db, {COUNTRY: ["pl", "de"]}) == [3]
+        assert quote_ids(db, {PROCESS: ["CNC Machining"], COUNTRY: ["DE"]}) == [2]
+        assert quote_ids(db, {PROCESS: ["Welding"], COUNTRY: ["DE"]}) == []
+
+    def test_substrings_of_other_values_do_not_match(self, db, quotes):
+        assert quote_ids(db, {PROCESS: ["Machining"]}) == []
+
+    def test_blank_filters_are_ignored(self, db):
+        assert tagged_with(ProductionQuote, {PROCESS: ["", "  "], MATERIAL: []}) is None
+
+    def test_hits_count_matching_tags(self, db):
+        db.add_all([
+            make_manufacturer(1, {"manufacturing_processes": ["CNC Machining"], "materials": ["Steel"]}),
+            make_manufacturer(2, {"manufacturing_processes": ["Welding"], "materials": ["steel"]}),
+            make_manufacturer(3, {"materials": ["PEEK"]}),
+        ])
+        db.commit()
+
+        hits = tag_hits(Manufacturer, required_tags({"manufacturing_process": "CNC Machining", "material": "Steel"}))
+        rows = db.execute(select(hits.c.owner_id, hits.c.hits).order_by(hits.c.owner_id)).all()
+        assert rows == [(1, 2), (2, 1)]
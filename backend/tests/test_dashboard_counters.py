@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+from collections import Counter
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models.dashboard_counter import DashboardCounter
+from app.models.order import OrderStatus
+from app.models.quote import QuoteStatus
+from app.services import dashboard_counters
+from app.services.dashboard_counters import (
+    CLIENT,
+    GLOBAL,
+    MANUFACTURER,
+    REBUILT_AT,
+    apply_counter_deltas,
+    order_contributions,
+    quote_contributions,
+    read_counters,
+    rebuild_counters,
+)
+
+
+class TestContributions:
+
+    def test_order_counts_for_client_and_availability(self):
+        assert order_contributions(7, OrderStatus.ACTIVE) == Counter({
+            (CLIENT, 7, 'orders_total'): 1,
+            (CLIENT, 7, 'orders_active'): 1,
+            (GLOBAL, 0, 'orders_available'): 1,
+        })
+        assert order_contributions(7, OrderStatus.COMPLETED) == Counter({
+            (CLIENT, 7, 'orders_total'): 1,
+            (CLIENT, 7, 'orders_completed'): 1,
+        })
+
+    def test_accepted_quote_counts_in_production_only_with_its_order(self):
+        accepted = quote_contributions(3, QuoteStatus.ACCEPTED, 7, OrderStatus.IN_PRODUCTION)
+        assert accepted[(MANUFACTURER, 3, 'orders_in_production')] == 1
+        assert accepted[(MANUFACTURER, 3, 'quotes_accepted')] == 1
+        assert accepted[(CLIENT, 7, 'quotes_total')] == 1
+
+        waiting = quote_contributions(3, QuoteStatus.ACCEPTED, 7, OrderStatus.ACCEPTED)
+        assert (MANUFACTURER, 3, 'orders_in_production') not in waiting
+
+    def test_sent_viewed_and_negotiating_quotes_are_pending(self):
+        for status in (QuoteStatus.SENT, QuoteStatus.VIEWED, QuoteStatus.NEGOTIATING):
+            counts = quote_contributions(3, status, 7, OrderStatus.QUOTED)
+            assert counts[(CLIENT, 7, 'quotes_pending')] == 1
+            assert counts[(MANUFACTURER, 3, 'quotes_pending')] == 1
+        assert (CLIENT, 7, 'quotes_pending') not in quote_contributions(3, QuoteStatus.DRAFT, 7, None)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    DashboardCounter.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def counter_values(session):
+    counters = DashboardCounter.__table__.c
+    return {
+        (owner_type, owner_id, metric): value
+        for owner_type, owner_id, metric, value in session.execute(select(
+            counters.owner_type, counters.owner_id, counters.metric, counters.value
+        ))
+    }
+
+
+class TestCounterTable:
+
+    def test_deltas_are_upsert_increments(self, session):
+        apply_counter_deltas(session.connection(), {(CLIENT, 7, 'orders_total'): 2})
+        apply_counter_deltas(session.connection(), {(CLIENT, 7, 'orders_total'): -1, (CLIENT, 8, 'orders_total'): 1})
+
+        assert counter_values(session) == {(CLIENT, 7, 'orders_total'): 1, (CLIENT, 8, 'orders_total'): 1}
+
+    def test_rebuild_corrects_and_reports_drift(self, session):
+        apply_counter_deltas(session.connection(), {
+            (MANUFACTURER, 3, 'quotes_accepted'): 5,
+            (CLIENT, 7, 'orders_total'): 2,
+        })
+        expected = Counter({(MANUFACTURER, 3, 'quotes_accepted'): 4, (CLIENT, 7, 'orders_total'): 2})
+
+        with patch.object(dashboard_counters, 'compute_counters', return_value=expected):
+            report = rebuild_counters(session)
+
+        assert report['drifted'] == 1
+        assert report['samples'] == [{
+            'owner_type': MANUFACTURER, 'owner_id': 3, 'metric': 'quotes_accepted', 'expected': 4, 'actual': 5
+        }]
+        values = counter_values(session)
+        assert values[(MANUFACTURER, 3, 'quotes_accepted')] == 4
+        assert (GLOBAL, 0, REBUILT_AT) in values
+
+    def test_counters_are_read_once_built(self, session):
+        class AsyncSessionStub:
+            async def execute(self, statement):
+                return session.execute(statement)
+
+        apply_counter_deltas(session.connection(), {
+            (CLIENT, 7, 'orders_total'): 3,
+            (GLOBAL, 0, 'orders_available'): 9,
+        })
+        assert asyncio.run(read_counters(AsyncSessionStub(), CLIENT, 7)) is None
+
+        apply_counter_deltas(session.connection(), {(GLOBAL, 0, REBUILT_AT): 1}, increment=False)
+        counts = asyncio.run(read_counters(AsyncSessionStub(), CLIENT, 7))
+        assert counts['orders_total'] == 3
+        assert counts['quotes_pending'] == 0
+        assert counts['orders_available'] == 9
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.services import file_service
+from app.services.file_service import FileService, RangeFileResponse, detect_mime_type, parse_range
+
+PDF = b"%PDF-1.7\n" + b"0123456789" * 100
+
+
+def upload(content, filename="drawing.pdf"):
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = FileService()
+    service.upload_base_path = tmp_path
+    service.chunk_size = 64
+    return service
+
+
+def save(service, content, quote_id=1, filename="drawing.pdf"):
+    return asyncio.run(service.save_quote_attachment(upload(content, filename), quote_id, user_id=1))
+
+
+def serve(path, headers=(), extensions=None):
+    """Status, headers and body messages of a RangeFileResponse"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/download",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+        "extensions": extensions or {},
+    }
+    asyncio.run(RangeFileResponse(path, filename="drawing.pdf")(scope, receive, send))
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, messages[1:]
+
+
+class TestUploads:
+
+    def test_upload_is_streamed_hashed_and_sniffed(self, service, tmp_path):
+        info = save(service, PDF)
+        assert info["size"] == len(PDF)
+        assert info["sha256"] == hashlib.sha256(PDF).hexdigest()
+        assert info["mime_type"] == "application/pdf"
+        with open(info["path"], "rb") as f:
+            assert f.read() == PDF
+        assert info["path"].startswith(str(tmp_path / "quotes" / "1"))
+        assert list((tmp_path / "temp").iterdir()) == []
+
+    def test_oversized_upload_is_rejected_while_streaming(self, service, tmp_path):
+        service.max_file_size = 100
+        with pytest.raises(HTTPException) as error:
+            save(service, PDF)
+        assert error.value.status_code == 400
+        assert list((tmp_path / "temp").iterdir()) == []
+        assert not (tmp_path / "blobs").exists()
+        assert not (tmp_path / "quotes").exists()
+
+    def test_identical_files_are_stored_once(self, service, tmp_path):
+        first = save(service, PDF, quote_id=1)
+        second = save(service, PDF, quote_id=2, filename="copy.pdf")
+        assert first["path"] != second["path"]
+        assert os.path.samefile(first["path"], second["path"])
+        assert len(list((tmp_path / "blobs").glob("*/*"))) == 1
+        assert service.get_storage_stats()["total_size"] == len(PDF)
+
+    def test_blobs_are_pruned_once_unreferenced(self, service, tmp_path):
+        first = save(service, PDF, quote_id=1)
+        second = save(service, PDF, quote_id=2)
+        service.delete_file(first["path"])
+        assert service.prune_blobs() == 0
+        service.delete_file(second["path"])
+        assert service.prune_blobs() == 1
+        assert list((tmp_path / "blobs").glob("*/*")) == []
+
+    def test_new_blobs_are_published_already_linked(self, service, monkeypatch):
+        replace = os.replace
+        pruned = []
+
+        def replace_then_prune(source, target):
+            replace(source, target)
+            # A concurrent cleanup_temp_files() right after publishing
+            pruned.append(service.prune_blobs())
+
+        monkeypatch.setattr(file_service.os, "replace", replace_then_prune)
+        info = save(service, PDF)
+        assert pruned == [0]
+        with open(info["path"], "rb") as f:
+            assert f.read() == PDF
+
+    def test_blob_pruned_during_an_upload_is_stored_again(self, service, tmp_path, monkeypatch):
+        service.delete_file(save(service, PDF, quote_id=1)["path"])
+        link_blob = service._link_blob
+
+        def prune_then_link(source, file_path):
+            # The unreferenced blob goes away between hashing and linking
+            service.prune_blobs()
+            return link_blob(source, file_path)
+
+        monkeypatch.setattr(service, "_link_blob", prune_then_link)
+        info = save(service, PDF, quote_id=2)
+        with open(info["path"], "rb") as f:
+            assert f.read() == PDF
+        assert os.path.samefile(info["path"], service.blob_path(info["sha256"]))
+        assert list((tmp_path / "temp").iterdir()) == []
+
+    def test_disallowed_extensions_are_rejected_before_reading(self, service):
+        with pytest.raises(HTTPException):
+            save(service, b"MZ", filename="setup.exe")
+
+
+class TestMimeDetection:
+
+    def test_content_wins_over_the_extension(self):
+        assert detect_mime_type(b"\x89PNG\r\n\x1a\n....", "photo.jpg") == "image/png"
+
+    def test_containers_are_refined_by_the_extension(self):
+        assert detect_mime_type(b"PK\x03\x04....", "report.xlsx") == (
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+        assert detect_mime_type(b"PK\x03\x04....", None) == "application/zip"
+
+    def test_unknown_content(self):
+        assert detect_mime_type(b"G1 X10 Y20", "part.gcode") == "text/plain"
+        assert detect_mime_type(b"\x00\xff\xfe", "part.bin2") == "application/octet-stream"
+
+
+class TestRanges:
+
+    @pytest.mark.parametrize("header, expected", [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=0-1,5-6", None),
+        ("bytes=9-1", None),
+        ("items=0-1", None),
+        ("bytes=abc", None),
+    ])
+    def test_parse_range(self, header, expected):
+        assert parse_range(header, 1000) == expected
+
+    def test_unsatisfiable_ranges(self):
+        with pytest.raises(ValueError):
+            parse_range("bytes=1000-", 1000)
+        with pytest.raises(ValueError):
+            parse_range("bytes=-0", 1000)
+
+    def test_partial_content(self, tmp_path):
+        path = tmp_path / "drawing.pdf"
+        path.write_bytes(PDF)
+        status, headers, body = serve(path, [("range", "bytes=5-14")])
+        assert status == 206
+        assert headers["content-range"] == f"bytes 5-14/{len(PDF)}"
+        assert headers["content-length"] == "10"
+        assert b"".join(message["body"] for message in body) == PDF[5:15]
+
+    def test_whole_file_without_range(self, tmp_path):
+        path = tmp_path / "drawing.pdf"
+        path.write_bytes(PDF)
+        status, headers, body = serve(path)
+        assert status == 200 and headers["accept-ranges"] == "bytes"
+        assert b"".join(message["body"] for message in body) == PDF
+
+    def test_stale_if_range_gets_the_whole_file(self, tmp_path):
+        path = tmp_path / "drawing.pdf"
+        path.write_bytes(PDF)
+        status, _, _ = serve(path, [("range", "bytes=5-14"), ("if-range", '"old-etag"')])
+        assert status == 200
+
+    def test_unsatisfiable_range(self, tmp_path):
+        path = tmp_path / "drawing.pdf"
+        path.write_bytes(PDF)
+        status, headers, _ = serve(path, [("range", "bytes=5000-")])
+        assert status == 416
+        assert headers["content-range"] == f"bytes */{len(PDF)}"
+
+    def test_zero_copy_send_when_the_server_offers_it(self, tmp_path):
+        path = tmp_path / "drawing.pdf"
+        path.write_bytes(PDF)
+        status, _, body = serve(path, [("range", "bytes=10-")], {"http.response.zerocopysend": {}})
+        assert status == 206
+        assert body[0]["type"] == "http.response.zerocopysend"
+        assert (body[0]["offset"], body[0]["count"]) == (10, len(PDF) - 10)
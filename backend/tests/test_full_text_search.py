@@ -0,0 +1,181 @@
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.message import Message, Room, RoomParticipant
+from app.models.quote import ProductionQuote
+from app.models.user import User, UserRole
+from app.services import message as message_service
+from app.services.full_text_search import (
+    MESSAGE_SEARCH,
+    PRODUCTION_QUOTE_SEARCH,
+    highlight,
+    rebuild_search_indexes,
+    search_terms,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    for model in (Message, ProductionQuote):
+        model.__table__.create(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+def add_messages(db, *contents):
+    db.execute(insert(Message), [
+        {"id": index, "user_id": 1, "room_name": "order-1", "content": content}
+        for index, content in enumerate(contents, start=1)
+    ])
+
+
+def message_ids(db, search_text, prefix=True):
+    matches = MESSAGE_SEARCH.matches(db, search_text, prefix=prefix)
+    return db.scalars(select(matches.c.id).order_by(matches.c.id)).all()
+
+
+class TestSearchTerms:
+
+    def test_words_are_casefolded_and_deduplicated(self):
+        assert search_terms("CNC, cnc-machining  ŻÓŁW") == ["cnc", "machining", "żółw"]
+
+    def test_operators_and_punctuation_are_not_terms(self):
+        assert search_terms('"" * ( ) _ -') == []
+        assert search_terms(None) == []
+
+
+class TestIndexMaintenance:
+
+    def test_triggers_follow_inserts_updates_and_deletes(self, db):
+        add_messages(db, "Aluminum housing ready", "Steel brackets shipped")
+        assert message_ids(db, "aluminum") == [1]
+
+        db.execute(text("UPDATE messages SET content = 'Titanium housing ready' WHERE id = 1"))
+        assert message_ids(db, "aluminum") == []
+        assert message_ids(db, "titanium housing") == [1]
+
+        db.execute(text("DELETE FROM messages WHERE id = 1"))
+        assert message_ids(db, "housing") == []
+        assert message_ids(db, "brackets") == [2]
+
+    def test_rebuild_repairs_the_index(self, db):
+        add_messages(db, "Aluminum housing ready")
+        db.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('delete-all')"))
+        assert message_ids(db, "aluminum") == []
+
+        assert rebuild_search_indexes(db.connection(), ["messages"]) == ["messages"]
+        assert message_ids(db, "aluminum") == [1]
+
+        with pytest.raises(ValueError):
+            rebuild_search_indexes(db.connection(), ["orders"])
+
+    def test_dropping_the_table_drops_the_index(self, engine):
+        Message.__table__.drop(engine)
+        assert "messages_fts" not in inspect(engine).get_table_names()
+
+
+class TestQueries:
+
+    def test_every_term_must_match_as_word_prefix(self, db):
+        add_messages(db, "CNC machining of the housing", "Machining done", "Remachining needed")
+        assert message_ids(db, "mach") == [1, 2]
+        assert message_ids(db, "mach", prefix=False) == []
+        assert message_ids(db, "cnc MACHINING") == [1]
+
+    def test_fts_syntax_in_search_text_is_literal(self, db):
+        add_messages(db, "Delivery NEAR Warsaw or Krakow")
+        assert message_ids(db, 'near OR "warsaw" delivery:') == [1]
+
+    def test_text_without_terms_matches_nothing_to_filter(self, db):
+        assert MESSAGE_SEARCH.matches(db, " -- ") is None
+
+    def test_title_matches_rank_above_description_matches(self, db):
+        db.execute(insert(ProductionQuote), [
+            {
+                "id": quote_id, "manufacturer_id": 1, "production_quote_type": "CAPACITY_AVAILABILITY",
+                "pricing_model": "fixed", "pricing_details": {}, "title": title, "description": description,
+            }
+            for quote_id, title, description in (
+                (1, "Free capacity", "Five-axis milling of aluminum"),
+                (2, "Aluminum milling", "Free capacity next month"),
+                (3, "Welding", None),
+            )
+        ])
+        matches = PRODUCTION_QUOTE_SEARCH.matches(db, "aluminum")
+        ranked = db.scalars(select(matches.c.id).order_by(matches.c.score.desc())).all()
+        assert ranked == [2, 1]
+
+    def test_postgres_uses_the_generated_tsvector(self):
+        bind = SimpleNamespace(dialect=postgresql.dialect())
+        matches = MESSAGE_SEARCH.matches(bind, "cnc mach")
+        compiled = select(matches.c.id).compile(dialect=postgresql.dialect())
+        assert "messages.search_vector @@ to_tsquery(" in str(compiled)
+        assert "cnc:* & mach:*" in compiled.params.values()
+        assert "GENERATED ALWAYS AS" in MESSAGE_SEARCH.create_statements("postgresql")[0]
+
+
+class TestMessageSearch:
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add(User(id=1, email="anna@example.com", first_name="Anna", last_name="Nowak", role=UserRole.CLIENT))
+            db.add_all([Room(id=1, name="order-1"), Room(id=2, name="order-2")])
+            db.add(RoomParticipant(room_id=1, user_id=1))
+            db.add_all([
+                Message(id=1, user_id=1, room_name="order-1", content="Steel brackets shipped"),
+                Message(id=2, user_id=1, room_name="order-1", content="Aluminum housing ready for pickup"),
+                Message(id=3, user_id=1, room_name="order-2", content="Aluminum housing rejected"),
+                Message(id=4, user_id=1, room_name="order-1", content="Aluminum housing v1", is_deleted=True),
+            ])
+            db.commit()
+
+        @contextmanager
+        def get_db_context():
+            with Session(engine) as db:
+                yield db
+
+        monkeypatch.setattr(message_service, "get_db_context", get_db_context)
+        return message_service.MessageService()
+
+    def test_searches_accessible_rooms_through_the_index(self, service):
+        results = asyncio.run(service.search_messages("alumin hous", user_id=1))
+
+        assert [result["message_id"] for result in results] == [2]
+        assert results[0]["user"]["name"] == "Anna Nowak"
+        assert "<mark>" in results[0]["highlight"]
+
+    def test_room_filter_and_empty_search_text(self, service):
+        results = asyncio.run(service.search_messages("aluminum", user_id=1, room_name="order-2"))
+        assert [result["message_id"] for result in results] == [3]
+        assert asyncio.run(service.search_messages("***", user_id=1)) == []
+
+
+class TestHighlight:
+
+    def test_marks_matched_words_and_escapes_the_rest(self):
+        assert highlight("<b>CNC</b> machining & milling", "cnc mach") == (
+            "&lt;b&gt;<mark>CNC</mark>&lt;/b&gt; <mark>machining</mark> &amp; milling"
+        )
+        assert highlight("remachining", "mach") == "remachining"
+
+    def test_excerpt_starts_near_the_first_match(self):
+        content = "filler " * 100 + "the aluminum housing " + "filler " * 100
+        excerpt = highlight(content, "aluminum", max_length=80)
+        assert excerpt.startswith("…") and excerpt.endswith("…")
+        assert "<mark>aluminum</mark>" in excerpt
@@ -0,0 +1,198 @@
+import math
+import random
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.order import Order
+from app.models.producer import Manufacturer
+from app.services.geo_index import (
+    GeoIndex, haversine_km, order_location, proximity_score, within_radius
+)
+from app.services.intelligent_matching import IntelligentMatchingService
+from app.services.manufacturer_catalog import ManufacturerCatalog
+from app.services.prism_ai_match_engine import PrismAIMatchEngine
+from app.services.smart_matching_engine import SmartMatchingEngine
+
+WARSAW = (52.2297, 21.0122)
+KRAKOW = (50.0647, 19.9450)
+GDANSK = (54.3520, 18.6466)
+BERLIN = (52.5200, 13.4050)
+
+
+def place(manufacturer_id, location=None, city=None, country="PL"):
+    latitude, longitude = location if location else (None, None)
+    return SimpleNamespace(id=manufacturer_id, latitude=latitude, longitude=longitude, city=city, country=country)
+
+
+def reference_km(latitude1, longitude1, latitude2, longitude2):
+    """Scalar haversine the engines used before"""
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (
+        math.sin((latitude2 - latitude1) / 2) ** 2 +
+        math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+class TestDistance:
+
+    def test_haversine_between_cities(self):
+        assert float(haversine_km(*WARSAW, *KRAKOW)) == pytest.approx(252, abs=1)
+        assert float(haversine_km(*WARSAW, *WARSAW)) == 0
+
+    def test_haversine_over_arrays_keeps_missing_coordinates(self):
+        latitudes = np.array([KRAKOW[0], np.nan, GDANSK[0]])
+        longitudes = np.array([KRAKOW[1], np.nan, GDANSK[1]])
+
+        distances = haversine_km(WARSAW[0], WARSAW[1], latitudes, longitudes)
+
+        assert distances[0] == pytest.approx(reference_km(*WARSAW, *KRAKOW), abs=1e-9)
+        assert np.isnan(distances[1])
+        assert distances[2] == pytest.approx(reference_km(*WARSAW, *GDANSK), abs=1e-9)
+
+    def test_proximity_score_curve(self):
+        assert proximity_score(0) == 1.0
+        assert proximity_score(50) == 1.0
+        assert proximity_score(200) == pytest.approx(0.8)
+        assert proximity_score(350) == pytest.approx(0.7)
+        assert proximity_score(20_000) == pytest.approx(0.1)
+        # An engine's own local radius
+        assert proximity_score(100, local_radius_km=100) == 1.0
+        scores = proximity_score(np.array([10, 1000, np.nan]))
+        assert list(scores[:2]) == pytest.approx([1.0, 0.4])
+        assert np.isnan(scores[2])
+
+
+class TestGeoIndex:
+
+    @pytest.fixture
+    def manufacturers(self):
+        rng = random.Random(7)
+        located = [
+            place(index, (rng.uniform(49, 55), rng.uniform(14, 24)), city=rng.choice(["Warsaw", "Krakow"]))
+            for index in range(1, 301)
+        ]
+        return located + [place(301), place(302, city="Warsaw")]
+
+    def test_radius_and_nearest_match_a_full_scan(self, manufacturers):
+        geo = GeoIndex(manufacturers)
+        distances = {
+            m.id: reference_km(*WARSAW, m.latitude, m.longitude) for m in manufacturers if m.latitude is not None
+        }
+
+        nearby = geo.within(*WARSAW, 150)
+        assert set(nearby) == {m_id for m_id, distance in distances.items() if distance <= 150}
+        for m_id, distance in nearby.items():
+            assert distance == pytest.approx(distances[m_id], abs=1e-6)
+
+        nearest = geo.nearest(*WARSAW, 5)
+        assert [m.id for m, _ in nearest] == sorted(distances, key=distances.get)[:5]
+        assert len(geo) == 300 and 301 not in geo
+
+    def test_empty_index(self):
+        geo = GeoIndex([place(1)])
+        assert geo.within(*WARSAW, 100) == {}
+        assert geo.nearest(*WARSAW, 3) == []
+
+    def test_within_radius_keeps_manufacturers_without_coordinates(self):
+        manufacturers = [place(1, WARSAW), place(2, KRAKOW), place(3, BERLIN, country="DE"), place(4)]
+        geo = GeoIndex(manufacturers)
+
+        assert [m.id for m in within_radius(manufacturers, geo, WARSAW, 300)] == [1, 2, 4]
+        assert within_radius(manufacturers, geo, WARSAW, None) is manufacturers
+
+    def test_order_location_prefers_the_city_centre(self):
+        geo = GeoIndex([place(1, (50.0, 20.0), city="Krakow"), place(2, (50.2, 19.8), city="krakow")])
+        order = SimpleNamespace(preferred_country="PL", preferred_city=" KRAKOW")
+
+        assert order_location(order, geo) == pytest.approx((50.1, 19.9))
+        # Unknown city: the capital of the preferred country
+        assert order_location(SimpleNamespace(preferred_country="Poland", preferred_city="Opole"), geo) == WARSAW
+        assert order_location(SimpleNamespace(preferred_country=None, preferred_city=None)) is None
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def add_manufacturer(db, manufacturer_id, location=None, **fields):
+    latitude, longitude = location if location else (None, None)
+    values = dict(
+        id=manufacturer_id, user_id=manufacturer_id, business_name=f"Manufacturer {manufacturer_id}",
+        country="PL", city="Warsaw", latitude=latitude, longitude=longitude,
+        capabilities={"manufacturing_processes": ["CNC Machining"]},
+        is_active=True, is_verified=True, stripe_onboarding_completed=True,
+    )
+    values.update(fields)
+    db.add(Manufacturer(**values))
+    db.commit()
+
+
+def make_order(**fields):
+    values = dict(
+        quantity=100, budget_max_pln=None, preferred_country="PL", preferred_city=None, max_distance_km=None,
+        technical_requirements={"manufacturing_process": "CNC Machining"}, delivery_deadline=None,
+    )
+    values.update(fields)
+    return Mock(spec=Order, **values)
+
+
+class TestEngineGeography:
+
+    @pytest.fixture
+    def catalog(self, db):
+        add_manufacturer(db, 1, WARSAW)
+        add_manufacturer(db, 2, KRAKOW, city="Krakow")
+        add_manufacturer(db, 3, GDANSK, city="Gdansk")
+        add_manufacturer(db, 4, city="Lodz")
+        return ManufacturerCatalog(sync_interval_seconds=3600, version_source=lambda: 0)
+
+    def test_radius_prefilters_candidates(self, db, catalog):
+        order = make_order(preferred_city="Krakow", max_distance_km=100)
+        engine = SmartMatchingEngine()
+        engine.catalog = catalog
+        service = IntelligentMatchingService()
+        service.catalog = catalog
+
+        assert sorted(m.id for m in engine._get_candidate_manufacturers(db, order)) == [2, 4]
+        assert sorted(m.id for m in service._get_eligible_manufacturers(db, order)) == [2, 4]
+        assert len(engine._get_candidate_manufacturers(db, make_order(preferred_city="Krakow"))) == 4
+
+    def test_distances_score_nearer_manufacturers_higher(self, db, catalog):
+        order = make_order(preferred_city="Gdansk")
+        engine = SmartMatchingEngine()
+        engine.catalog = catalog
+        snapshot = catalog.snapshot(db)
+        gdansk, warsaw, krakow, lodz = (snapshot.get(m_id) for m_id in (3, 1, 2, 4))
+
+        distances = engine._distances_km([gdansk, warsaw, krakow, lodz], order)
+
+        assert distances[0] == 0
+        assert distances[1] < distances[2]
+        assert np.isnan(distances[3])
+        scores = [engine._calculate_geographic_intelligence(m, order) for m in (gdansk, warsaw, krakow)]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_prism_scores_by_distance(self, db, catalog):
+        engine = PrismAIMatchEngine()
+        engine.catalog = catalog
+        catalog.snapshot(db)
+        gdansk = catalog.get(db, 3)
+
+        near = engine._calculate_geographic_proximity(gdansk, {'country': "PL", 'city': "Gdynia", 'latitude': 54.52, 'longitude': 18.53})
+        far = engine._calculate_geographic_proximity(gdansk, {'country': "PL", 'city': "Krakow"})
+        abroad = engine._calculate_geographic_proximity(gdansk, {'country': "US"})
+
+        assert near == pytest.approx(12)
+        assert 8 < far < near
+        assert abroad == pytest.approx(2 + 10 * proximity_score(haversine_km(38.9072, -77.0369, *GDANSK)))
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.order import Order
+from app.models.producer import Manufacturer
+from app.services.intelligent_matching import IntelligentMatchingService
+from app.services.manufacturer_catalog import ManufacturerCatalog
+from app.services.smart_matching_engine import SmartMatchingEngine
+
+
+class Version:
+    """Stand-in for the matching result cache's catalog version"""
+
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self):
+        return self.value
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def version():
+    return Version()
+
+
+@pytest.fixture
+def catalog(version):
+    # Refresh only on demand or on a version change
+    return ManufacturerCatalog(sync_interval_seconds=3600, version_source=version)
+
+
+STARTED = datetime(2026, 1, 1)
+
+
+def add_manufacturer(db, manufacturer_id, **fields):
+    values = dict(
+        id=manufacturer_id, user_id=manufacturer_id, business_name=f"Manufacturer {manufacturer_id}",
+        country="PL", city="Warsaw", capabilities={"manufacturing_processes": ["CNC Machining"]},
+        is_active=True, is_verified=True, stripe_onboarding_completed=True, updated_at=STARTED,
+    )
+    values.update(fields)
+    manufacturer = Manufacturer(**values)
+    db.add(manufacturer)
+    db.commit()
+    return manufacturer
+
+
+class TestCatalogSnapshot:
+
+    def test_build_keeps_active_manufacturers_in_id_order(self, db, catalog):
+        add_manufacturer(db, 3)
+        add_manufacturer(db, 1, is_verified=False)
+        add_manufacturer(db, 2, is_active=False)
+
+        snapshot = catalog.snapshot(db)
+
+        assert list(snapshot.ids) == [1, 3]
+        assert [m.id for m in snapshot.matchable()] == [3]
+        assert snapshot.get(2) is None
+        assert snapshot.get(3).tags == frozenset({("process", "cnc machining")})
+        assert snapshot.watermark == STARTED
+
+    def test_records_are_read_only(self, db, catalog):
+        add_manufacturer(db, 1)
+        record = catalog.get(db, 1)
+        with pytest.raises(AttributeError):
+            record.city = "Krakow"
+        with pytest.raises(AttributeError):
+            record.business_description  # pylint: disable=pointless-statement
+
+    def test_refresh_applies_changes_after_the_watermark(self, db, catalog):
+        first = add_manufacturer(db, 1)
+        second = add_manufacturer(db, 2)
+        old = catalog.snapshot(db)
+
+        first.city = "Krakow"
+        first.updated_at = STARTED + timedelta(minutes=1)
+        second.is_active = False
+        second.updated_at = STARTED + timedelta(minutes=2)
+        add_manufacturer(db, 3, updated_at=STARTED + timedelta(minutes=3))
+
+        assert catalog.refresh(db) == 3
+        new = catalog.snapshot(db)
+        assert list(new.ids) == [1, 3]
+        assert new.get(1).city == "Krakow"
+        assert new.watermark == STARTED + timedelta(minutes=3)
+        # Copy on write: the previous snapshot is untouched
+        assert list(old.ids) == [1, 2]
+        assert old.get(1).city == "Warsaw"
+
+        # Rows at the watermark are re-read but unchanged ones are not replaced
+        assert catalog.refresh(db) == 0
+        assert catalog.snapshot(db).get(3) is new.get(3)
+
+    def test_change_notification_reconciles_deleted_and_unstamped_rows(self, db, catalog, version):
+        add_manufacturer(db, 1)
+        deleted = add_manufacturer(db, 2)
+        catalog.snapshot(db)
+
+        db.delete(deleted)
+        add_manufacturer(db, 3, updated_at=STARTED - timedelta(days=1))
+        assert list(catalog.snapshot(db).ids) == [1, 2]
+
+        version.value += 1
+        assert list(catalog.snapshot(db).ids) == [1, 3]
+        assert catalog.snapshot(db).version == 1
+
+
+def make_order(**fields):
+    values = dict(
+        quantity=100, budget_max_pln=None, preferred_country=None, preferred_city=None, max_distance_km=None,
+        technical_requirements={"manufacturing_process": "CNC Machining", "material": "Aluminum"},
+        delivery_deadline=datetime.now() + timedelta(days=30),
+    )
+    values.update(fields)
+    return Mock(spec=Order, **values)
+
+
+class TestCatalogCandidates:
+
+    def test_smart_engine_filters_and_ranks_by_tags(self, db, catalog):
+        add_manufacturer(db, 1)
+        add_manufacturer(db, 2, capabilities={"manufacturing_processes": ["CNC Machining"], "materials": ["Aluminum"]})
+        add_manufacturer(db, 3, min_order_quantity=500)
+        add_manufacturer(db, 4, last_activity_date=datetime.now() - timedelta(days=120))
+        add_manufacturer(db, 5, capabilities={"manufacturing_processes": ["Welding"]})
+        add_manufacturer(db, 6, stripe_onboarding_completed=False)
+        engine = SmartMatchingEngine()
+        engine.catalog = catalog
+
+        candidates = engine._get_candidate_manufacturers(db, make_order())
+
+        assert [m.id for m in candidates] == [2, 1, 5]
+        assert [m.id for m in engine._get_candidate_manufacturers(db, make_order(), limit=1)] == [2]
+
+    def test_intelligent_matching_filters_and_orders_by_activity(self, db, catalog):
+        now = datetime.now()
+        add_manufacturer(db, 1)
+        add_manufacturer(db, 2, last_activity_date=now - timedelta(days=5))
+        add_manufacturer(db, 3, last_activity_date=now - timedelta(days=1))
+        add_manufacturer(db, 4, standard_lead_time_days=60)
+        add_manufacturer(db, 5, country="DE")
+        add_manufacturer(db, 6, min_order_value_pln=50_000)
+        service = IntelligentMatchingService()
+        service.catalog = catalog
+
+        eligible = service._get_eligible_manufacturers(db, make_order(budget_max_pln=10_000, preferred_country="PL"))
+
+        assert [m.id for m in eligible] == [3, 2, 1]
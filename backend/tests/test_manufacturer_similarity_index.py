@@ -0,0 +1,118 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, Mock
+
+from app.services.manufacturer_discovery_service import ManufacturerDiscoveryService
+from app.services.manufacturer_similarity_index import ManufacturerSimilarityIndex, ManufacturerFeatures
+from app.models.producer import Manufacturer
+
+PROCESSES = ["CNC Machining", "3D Printing", "Injection Molding", "Welding", "Die Casting"]
+MATERIALS = ["Aluminum", "Steel", "Titanium", "ABS Plastic", "Nylon"]
+CERTIFICATIONS = ["ISO 9001", "AS9100", "ISO 13485", "IATF 16949"]
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def random_manufacturer(rng, manufacturer_id):
+    manufacturer = Mock(spec=Manufacturer)
+    manufacturer.id = manufacturer_id
+    manufacturer.country = rng.choice(["PL", "DE", "CZ"])
+    manufacturer.state_province = rng.choice([None, "Mazowieckie", "Bayern"])
+    manufacturer.capabilities = rng.choice([{}, {
+        "manufacturing_processes": rng.sample(PROCESSES, rng.randint(0, 3)),
+        "materials": rng.sample(MATERIALS, rng.randint(0, 3)),
+        "certifications": rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+    }])
+    manufacturer.overall_rating = rng.choice([None, Decimal("0.00"), Decimal(str(round(rng.uniform(2, 5), 2)))])
+    manufacturer.total_orders_completed = rng.choice([None, 0, rng.randint(1, 200)])
+    manufacturer.is_active = True
+    manufacturer.is_verified = True
+    manufacturer.updated_at = NOW - timedelta(hours=manufacturer_id)
+    return manufacturer
+
+
+def session_returning(rows, changed=()):
+    db = MagicMock()
+    rebuild_query = MagicMock()
+    rebuild_query.all.return_value = rows
+    refresh_query = MagicMock()
+    refresh_query.all.return_value = list(changed)
+    # rebuild filters on is_active/is_verified (two criteria), refresh on updated_at (one)
+    db.query.return_value.filter.side_effect = lambda *criteria: rebuild_query if len(criteria) == 2 else refresh_query
+    return db
+
+
+@pytest.fixture
+def catalog():
+    rng = random.Random(11)
+    return [random_manufacturer(rng, index) for index in range(1, 81)]
+
+
+@pytest.fixture
+def index(catalog, tmp_path):
+    index = ManufacturerSimilarityIndex(index_path=str(tmp_path / "neighbours"), sync_interval_seconds=0)
+    index.rebuild(session_returning(catalog))
+    return index
+
+
+class TestManufacturerSimilarityIndex:
+    """Test suite for the similar-manufacturer k-NN index"""
+
+    @pytest.fixture
+    def service(self):
+        return ManufacturerDiscoveryService()
+
+    def test_similarities_match_reference(self, service, index, catalog):
+        """Vectorized scores equal the pairwise _calculate_similarity_score"""
+        for target in catalog[:20]:
+            scores = dict(zip(index._columns['ids'], index.similarities(ManufacturerFeatures.from_manufacturer(target))))
+            for manufacturer in catalog:
+                expected = service._calculate_similarity_score(target, manufacturer)
+                assert scores[manufacturer.id] == pytest.approx(expected, abs=1e-12)
+
+    def test_reference_score_reaches_threshold(self, service, catalog):
+        """Identical profiles score 1.0, so the 0.3 threshold is reachable"""
+        twin = catalog[0]
+        twin.capabilities = {"manufacturing_processes": ["Welding"]}
+        twin.overall_rating = Decimal("4.50")
+        twin.total_orders_completed = 10
+
+        assert service._calculate_similarity_score(twin, twin) == pytest.approx(1.0)
+
+    def test_nearest_is_exact_top_k(self, service, index, catalog):
+        target = catalog[5]
+        expected = sorted(
+            (
+                (manufacturer.id, service._calculate_similarity_score(target, manufacturer))
+                for manufacturer in catalog if manufacturer.id != target.id
+            ),
+            key=lambda item: (-item[1], item[0])
+        )
+        expected = [item for item in expected if item[1] > 0.3][:10]
+
+        hits = index.nearest(ManufacturerFeatures.from_manufacturer(target), 10)
+
+        assert [manufacturer_id for manufacturer_id, _ in hits] == [manufacturer_id for manufacturer_id, _ in expected]
+
+    def test_refresh_drops_deactivated(self, index, catalog):
+        catalog[1].is_active = False
+        catalog[1].updated_at = NOW + timedelta(hours=1)
+
+        assert index.refresh(session_returning(catalog, changed=[catalog[1]])) == 1
+        assert catalog[1].id not in index._columns['ids']
+        assert len(index) == len(catalog) - 1
+
+    def test_materialized_neighbours_round_trip(self, index, catalog, tmp_path):
+        assert index.materialize() == len(catalog)
+
+        reader = ManufacturerSimilarityIndex(index_path=str(tmp_path / "neighbours"))
+        target = ManufacturerFeatures.from_manufacturer(catalog[3])
+
+        assert reader.materialized_neighbours(catalog[3].id, 5) == pytest.approx(index.nearest(target, 5))
+        assert reader.materialized_neighbours(999, 5) is None
+
+    def test_missing_materialization_returns_none(self, tmp_path):
+        reader = ManufacturerSimilarityIndex(index_path=str(tmp_path / "missing"))
+
+        assert reader.materialized_neighbours(1, 5) is None
@@ -0,0 +1,151 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, Mock
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.services.manufacturer_text_index import ManufacturerTextIndex, _filter_attributes, _matches_filters
+from app.models.producer import Manufacturer
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def make_manufacturer(manufacturer_id, name, description, capabilities, country="PL", city="Warsaw", rating=4.0):
+    manufacturer = Mock(spec=Manufacturer)
+    manufacturer.id = manufacturer_id
+    manufacturer.business_name = name
+    manufacturer.business_description = description
+    manufacturer.capabilities = capabilities
+    manufacturer.country = country
+    manufacturer.state_province = None
+    manufacturer.city = city
+    manufacturer.overall_rating = rating
+    manufacturer.is_active = True
+    manufacturer.is_verified = True
+    manufacturer.updated_at = NOW - timedelta(days=manufacturer_id)
+    return manufacturer
+
+
+def text_of(manufacturer):
+    parts = [manufacturer.business_name, manufacturer.business_description or ""]
+    for value in (manufacturer.capabilities or {}).values():
+        parts.extend(value)
+    return " ".join(parts)
+
+
+def session_returning(rows):
+    """Session whose manufacturer queries return rows for both build and refresh"""
+    db = MagicMock()
+    query = db.query.return_value
+    query.filter.return_value.order_by.return_value.all.return_value = rows
+    query.filter.return_value.all.return_value = []
+    query.all.return_value = []
+    return db
+
+
+@pytest.fixture
+def catalog():
+    return [
+        make_manufacturer(1, "Precision CNC Works", "CNC machining of aluminum housings",
+                          {"manufacturing_processes": ["CNC Machining"], "materials": ["Aluminum"],
+                           "certifications": ["ISO 9001"]}),
+        make_manufacturer(2, "PrintLab", "Industrial 3D printing and additive manufacturing",
+                          {"manufacturing_processes": ["3D Printing"], "materials": ["Nylon", "PEEK"]},
+                          country="DE", city="Berlin", rating=4.8),
+        make_manufacturer(3, "Steel Fab", "Welding and sheet metal fabrication of steel frames",
+                          {"manufacturing_processes": ["Welding"], "materials": ["Steel"],
+                           "certifications": ["ISO 3834"]}, rating=3.2),
+        make_manufacturer(4, "Euro Machining", "CNC milling and turning of steel and aluminum parts",
+                          {"manufacturing_processes": ["CNC Milling", "CNC Turning"],
+                           "materials": ["Steel", "Aluminum"], "certifications": ["ISO 9001", "AS9100"]},
+                          country="CZ", city="Brno", rating=None),
+    ]
+
+
+@pytest.fixture
+def index(catalog, tmp_path):
+    index = ManufacturerTextIndex(
+        text_fn=text_of,
+        vectorizer=TfidfVectorizer(stop_words='english', ngram_range=(1, 2)),
+        index_path=str(tmp_path / "text_index"),
+        sync_interval_seconds=0
+    )
+    index.rebuild(session_returning(catalog))
+    return index
+
+
+class TestManufacturerTextIndex:
+    """Test suite for the persistent manufacturer TF-IDF index"""
+
+    def test_search_ranks_by_similarity(self, index):
+        hits = index.search("cnc machining aluminum")
+
+        assert [manufacturer_id for manufacturer_id, _ in hits][:2] == [1, 4]
+        assert all(score > 0.1 for _, score in hits)
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+    def test_limit_keeps_best_hits(self, index):
+        assert index.search("cnc steel aluminum", limit=1) == index.search("cnc steel aluminum")[:1]
+
+    def test_filters_match_row_evaluation(self, index, catalog):
+        """Cached id masks select the same rows as evaluating the filters per row"""
+        for filters in (
+            {"country": "PL"},
+            {"city": "ber"},
+            {"min_rating": 4.0},
+            {"capabilities": ["cnc"]},
+            {"materials": ["aluminum"], "certifications": ["iso 9001"]},
+            {"country": "CZ", "materials": ["steel"]},
+        ):
+            expected = [m.id for m in catalog if _matches_filters(_filter_attributes(m), filters)]
+            assert list(index.ids[index._filter_mask(filters)]) == expected
+
+    def test_filters_restrict_results(self, index):
+        hits = index.search("cnc machining aluminum", filters={"country": "CZ"})
+
+        assert [manufacturer_id for manufacturer_id, _ in hits] == [4]
+
+    def test_saved_index_is_memory_mapped(self, index, tmp_path):
+        loaded = ManufacturerTextIndex(
+            text_fn=text_of,
+            vectorizer=TfidfVectorizer(),
+            index_path=str(tmp_path / "text_index")
+        )
+
+        assert loaded.load()
+        # Read-only views of the mmap'd .npy files, not copies
+        assert not loaded.matrix.data.flags.writeable
+        assert not loaded.matrix.indices.flags.writeable
+        assert loaded.search("3d printing nylon") == index.search("3d printing nylon")
+        assert loaded.watermark == index.watermark
+
+    def test_updated_profile_is_reindexed(self, index, catalog):
+        changed = catalog[2]
+        changed.business_description = "CNC machining of aluminum brackets"
+        changed.capabilities = {"manufacturing_processes": ["CNC Machining"], "materials": ["Aluminum"]}
+        changed.updated_at = NOW + timedelta(hours=1)
+        db = session_returning(catalog)
+        db.query.return_value.filter.return_value.all.return_value = [changed]
+
+        assert index.refresh(db) == 1
+        hits = dict(index.search("cnc machining aluminum", filters={"materials": ["aluminum"]}))
+
+        assert 3 in hits
+        assert index.watermark == changed.updated_at
+
+    def test_deactivated_manufacturer_is_removed(self, index, catalog):
+        catalog[0].is_active = False
+        index.update_manufacturer(catalog[0])
+
+        assert 1 not in dict(index.search("cnc machining aluminum"))
+        assert len(index) == 3
+
+    def test_overrides_trigger_compaction(self, index, catalog):
+        index.compact_min_rows = 1
+        index.compact_ratio = 0.0
+        db = session_returning(catalog)
+        db.query.return_value.filter.return_value.all.return_value = catalog[:2]
+
+        index.refresh(db)
+
+        assert index._overrides == {}
+        assert len(index) == 4
@@ -0,0 +1,187 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from sqlalchemy.orm import Session
+
+from app.services.smart_matching_engine import SmartMatchingEngine, ManufacturerStats
+from app.services.matching import IntelligentMatchingService
+from app.services.matching_kernel import SmartScoringKernel, IntelligentScoringKernel
+from app.models.producer import Manufacturer
+from app.models.order import Order
+
+PROCESSES = ["CNC Machining", "3D Printing", "Injection Molding", "Sheet Metal Stamping", "Welding"]
+MATERIALS = ["Aluminum", "Steel", "Stainless Steel", "Titanium", "ABS Plastic"]
+INDUSTRIES = ["Automotive", "Aerospace", "Medical", "Electronics"]
+CERTIFICATIONS = ["ISO 9001", "AS9100", "ISO 13485", "IATF 16949"]
+COUNTRIES = ["PL", "DE", "CZ", "US", "CN"]
+
+
+def random_manufacturer(rng, manufacturer_id):
+    """Manufacturer with randomized, sometimes missing, attributes"""
+    manufacturer = Mock(spec=Manufacturer)
+    manufacturer.id = manufacturer_id
+    manufacturer.business_name = f"Manufacturer {manufacturer_id}"
+    manufacturer.city = "Warsaw"
+    manufacturer.country = rng.choice(COUNTRIES)
+    manufacturer.quality_certifications = rng.sample(CERTIFICATIONS, rng.randint(0, 2))
+    manufacturer.latitude = rng.choice([None, 52.2297, 50.0647, 54.3520])
+    manufacturer.longitude = 21.0122
+    manufacturer.overall_rating = rng.choice([None, round(rng.uniform(2.0, 5.0), 2)])
+    manufacturer.quality_rating = rng.choice([None, round(rng.uniform(2.0, 5.0), 2)])
+    manufacturer.communication_rating = rng.choice([None, round(rng.uniform(2.0, 5.0), 2)])
+    manufacturer.total_orders_completed = rng.choice([0, rng.randint(1, 150)])
+    manufacturer.on_time_delivery_rate = rng.choice([None, rng.uniform(60, 100)])
+    manufacturer.capacity_utilization_pct = rng.choice([None, rng.uniform(20, 95)])
+    manufacturer.standard_lead_time_days = rng.choice([None, rng.randint(5, 60)])
+    manufacturer.rush_order_available = rng.random() < 0.5
+    manufacturer.rush_order_lead_time_days = (
+        rng.randint(3, 20) if manufacturer.rush_order_available else None
+    )
+    manufacturer.min_order_quantity = rng.choice([None, 10, 500])
+    manufacturer.max_order_quantity = rng.choice([None, 100, 5000])
+    # Half-day offsets keep activity ages away from day boundaries
+    manufacturer.last_activity_date = rng.choice([
+        None, datetime.now() - timedelta(days=rng.randint(0, 60), hours=12)
+    ])
+    manufacturer.capabilities = rng.choice([None, {
+        "manufacturing_processes": rng.sample(PROCESSES, rng.randint(0, 3)),
+        "materials": rng.sample(MATERIALS, rng.randint(0, 3)),
+        "industries_served": rng.sample(INDUSTRIES, rng.randint(0, 2)),
+        "certifications": rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+    }])
+    return manufacturer
+
+
+def random_stats(rng):
+    quote_count = rng.randint(0, 50)
+    priced_quote_count = rng.randint(0, quote_count)
+    recent_quote_count = rng.randint(0, 20)
+    industry_orders = rng.randint(0, 10)
+    return ManufacturerStats(
+        quote_count=quote_count,
+        priced_quote_count=priced_quote_count,
+        unit_price_sum=priced_quote_count * rng.uniform(200, 1500),
+        recent_quote_count=recent_quote_count,
+        recent_accepted_count=rng.randint(0, recent_quote_count),
+        recent_accepted_orders=rng.randint(0, 6),
+        industry_orders=industry_orders,
+        industry_successful_orders=rng.randint(0, industry_orders)
+    )
+
+
+@pytest.fixture
+def sample_order():
+    order = Mock(spec=Order)
+    order.id = 1
+    order.quantity = 250
+    order.delivery_deadline = datetime.now() + timedelta(days=30, hours=12)
+    order.preferred_country = "PL"
+    order.max_distance_km = None
+    order.industry_category = "Automotive"
+    order.technical_requirements = {
+        "manufacturing_process": "CNC Machining",
+        "material": "Aluminum 6061",
+        "certifications": ["ISO 9001", "IATF 16949"],
+        "industry_standards": ["ISO 9001"],
+        "quantity": 250
+    }
+    return order
+
+
+class TestSmartScoringKernel:
+    """Parity between SmartScoringKernel and the per-row smart matching scorer"""
+
+    @pytest.fixture
+    def engine(self):
+        return SmartMatchingEngine()
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_matches_per_row_scores(self, engine, sample_order, seed):
+        """Every score column equals the per-row result for randomized candidates"""
+        rng = random.Random(seed)
+        manufacturers = [random_manufacturer(rng, index) for index in range(1, 41)]
+        stats = {manufacturer.id: random_stats(rng) for manufacturer in manufacturers}
+
+        kernel = SmartScoringKernel(engine)
+        scores = kernel.score(kernel.build_features(manufacturers, sample_order, stats), sample_order)
+
+        assert scores.manufacturers == manufacturers
+        db = Mock(spec=Session)
+        for index, manufacturer in enumerate(manufacturers):
+            expected = engine._calculate_enhanced_match_score(
+                db, manufacturer, sample_order, stats=stats[manufacturer.id]
+            )
+            assert scores['total_score'][index] == pytest.approx(expected.total_score, abs=1e-12)
+            assert scores['capability'][index] == pytest.approx(expected.capability_score, abs=1e-12)
+            assert scores['performance'][index] == pytest.approx(expected.performance_score, abs=1e-12)
+            assert scores['geographic'][index] == pytest.approx(expected.geographic_score, abs=1e-12)
+            assert scores['quality'][index] == pytest.approx(expected.quality_score, abs=1e-12)
+            assert scores['cost_efficiency'][index] == pytest.approx(expected.cost_efficiency_score, abs=1e-12)
+            assert scores['availability'][index] == pytest.approx(expected.availability_score, abs=1e-12)
+            assert scores['historical_success'][index] == pytest.approx(expected.historical_success_score, abs=1e-12)
+            assert scores['penalties'][index] == pytest.approx(expected.mismatch_penalties, abs=1e-12)
+            assert scores['confidence'][index] == pytest.approx(expected.confidence_level, abs=1e-12)
+            assert scores['strength'][index] == expected.recommendation_strength
+        db.query.assert_not_called()
+
+    def test_vectorized_candidates_match_per_row(self, engine, sample_order):
+        """_score_candidates returns the same survivors and scores on both paths"""
+        rng = random.Random(7)
+        manufacturers = [random_manufacturer(rng, index) for index in range(1, 31)]
+        stats = {manufacturer.id: random_stats(rng) for manufacturer in manufacturers}
+        engine._prefetch_manufacturer_stats = Mock(return_value=stats)
+
+        per_row = engine._score_candidates(Mock(spec=Session), sample_order, manufacturers)
+        vectorized = engine._score_candidates(
+            Mock(spec=Session), sample_order, manufacturers, vectorized=True
+        )
+
+        assert [m.id for m, _ in vectorized] == [m.id for m, _ in per_row]
+        for (_, expected), (_, actual) in zip(per_row, vectorized):
+            assert actual.total_score == pytest.approx(expected.total_score, abs=1e-12)
+            assert actual.confidence_level == pytest.approx(expected.confidence_level, abs=1e-12)
+            assert actual.match_reasons == expected.match_reasons
+            assert actual.risk_factors == expected.risk_factors
+
+    def test_vectorized_ranking_matches_per_row(self, engine, sample_order):
+        """_ranked_candidates yields the same best-first order on both paths"""
+        rng = random.Random(8)
+        manufacturers = [random_manufacturer(rng, index) for index in range(1, 31)]
+        stats = {manufacturer.id: random_stats(rng) for manufacturer in manufacturers}
+        engine._prefetch_manufacturer_stats = Mock(return_value=stats)
+
+        per_row = engine._ranked_candidates(Mock(spec=Session), sample_order, manufacturers)
+        vectorized = engine._ranked_candidates(Mock(spec=Session), sample_order, manufacturers, vectorized=True)
+
+        assert [m.id for m, _ in vectorized] == [m.id for m, _ in per_row]
+
+    def test_empty_candidate_set(self, engine, sample_order):
+        kernel = SmartScoringKernel(engine)
+        scores = kernel.score(kernel.build_features([], sample_order, {}), sample_order)
+
+        assert len(scores) == 0
+        assert scores['total_score'].shape == (0,)
+
+
+class TestIntelligentScoringKernel:
+    """Parity between IntelligentScoringKernel and IntelligentMatchingService"""
+
+    @pytest.fixture
+    def service(self):
+        return IntelligentMatchingService()
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_matches_comprehensive_score(self, service, sample_order, seed):
+        rng = random.Random(seed)
+        manufacturers = [random_manufacturer(rng, index) for index in range(1, 41)]
+
+        kernel = IntelligentScoringKernel(service)
+        scores = kernel.score(kernel.build_features(manufacturers, sample_order), sample_order)
+
+        for index, manufacturer in enumerate(manufacturers):
+            expected = service._calculate_comprehensive_score(manufacturer, sample_order)
+            assert scores['total_score'][index] == pytest.approx(expected.total_score, abs=1e-12)
+            assert scores['capability'][index] == pytest.approx(expected.capability_score, abs=1e-12)
+            assert scores['geographic'][index] == pytest.approx(expected.geographic_score, abs=1e-12)
+            assert scores['performance'][index] == pytest.approx(expected.performance_score, abs=1e-12)
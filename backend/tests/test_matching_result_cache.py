@@ -0,0 +1,407 @@
+import json
+import queue
+import time
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from unittest.mock import Mock
+
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.services.matching_result_cache import (
+    MATCHING_ORDER_FIELDS,
+    MatchingResultCache,
+    install_catalog_invalidation,
+    order_fingerprint,
+    register_result_types,
+)
+from app.services.intelligent_matching import IntelligentMatchingService, MatchResult
+from app.services.smart_matching_engine import MatchScore, SmartRecommendation
+from app.services.manufacturer_catalog import CatalogSnapshot
+from app.models.producer import Manufacturer
+from app.models.order import Order
+
+
+class FakeRedis:
+    """Just enough of redis-py for the matching result cache"""
+
+    def __init__(self):
+        self.values = {}
+        self.subscribers = []
+
+    def get(self, key):
+        entry = self.values.get(key)
+        return entry[0] if entry else None
+
+    def ttl(self, key):
+        return self.values[key][1] if key in self.values else -2
+
+    def setex(self, key, ttl, value):
+        self.values[key] = (value, ttl)
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.values[key] = (str(value).encode(), -1)
+        return value
+
+    def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            subscriber.put({'type': 'message', 'channel': channel, 'data': str(message).encode()})
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(('get', key))
+
+    def ttl(self, key):
+        self.calls.append(('ttl', key))
+
+    def execute(self):
+        return [getattr(self.client, name)(key) for name, key in self.calls]
+
+
+class FakePubSub:
+    def __init__(self, client):
+        self.client = client
+        self.messages = queue.Queue()
+
+    def subscribe(self, *channels):
+        self.client.subscribers.append(self.messages)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class Grade(Enum):
+    PREFERRED = "preferred"
+
+
+register_result_types(Grade)
+
+
+def sample_recommendation():
+    score = MatchScore(
+        total_score=0.82, capability_score=0.9, performance_score=0.7, geographic_score=0.8,
+        quality_score=0.75, reliability_score=0.7, cost_efficiency_score=0.6, availability_score=0.9,
+        specialization_score=0.5, historical_success_score=0.6, confidence_level=0.8,
+        match_reasons=["CNC Machining"], risk_factors=[], recommendation_strength="STRONG",
+        mismatch_penalties=0.0
+    )
+    return SmartRecommendation(
+        manufacturer_id=7, manufacturer_name="Manufacturer 7", match_score=score,
+        predicted_success_rate=0.9, estimated_cost_range={"min": 1000.0, "max": 1500.0},
+        ai_insights={"grade": Grade.PREFERRED, "last_order": datetime(2024, 5, 1, 12, 30), "margin": Decimal("0.15")}
+    )
+
+
+def sample_order(**overrides):
+    order = Mock(spec=Order)
+    for field in MATCHING_ORDER_FIELDS:
+        setattr(order, field, None)
+    order.id = 1
+    order.title = "Aluminium brackets"
+    order.technical_requirements = {"manufacturing_process": "CNC Machining", "material": "Aluminum"}
+    order.quantity = 500
+    order.budget_max_pln = 12000
+    order.delivery_deadline = datetime(2024, 6, 1)
+    order.preferred_country = "PL"
+    order.industry_category = "Automotive"
+    for field, value in overrides.items():
+        setattr(order, field, value)
+    return order
+
+
+class TestOrderFingerprint:
+
+    def test_stable_for_same_inputs(self):
+        assert order_fingerprint(sample_order(), limit=10) == order_fingerprint(sample_order(), limit=10)
+
+    def test_changes_with_matching_fields_and_params(self):
+        base = order_fingerprint(sample_order(), limit=10)
+        assert order_fingerprint(sample_order(quantity=501), limit=10) != base
+        assert order_fingerprint(sample_order(preferred_country="DE"), limit=10) != base
+        assert order_fingerprint(sample_order(), limit=20) != base
+
+    def test_ignores_presentation_fields(self):
+        assert order_fingerprint(sample_order(title="Renamed")) == order_fingerprint(sample_order())
+
+
+class TestLocalTier:
+
+    @pytest.fixture
+    def cache(self):
+        return MatchingResultCache(use_redis=False, max_local_entries=2)
+
+    def test_hit_and_miss_counted_per_engine(self, cache):
+        assert cache.get('smart', 'a') is None
+        cache.set('smart', 'a', ['result'])
+        assert cache.get('smart', 'a') == ['result']
+        assert cache.get('prism', 'a') is None
+
+        stats = cache.stats()
+        assert stats['smart']['hits'] == 1
+        assert stats['smart']['local_hits'] == 1
+        assert stats['smart']['misses'] == 1
+        assert stats['prism']['misses'] == 1
+
+    def test_lru_is_bounded_and_counts_evictions(self, cache):
+        cache.set('smart', 'a', 1)
+        cache.set('intelligent', 'b', 2)
+        cache.get('smart', 'a')
+        cache.set('smart', 'c', 3)
+
+        assert cache.local_size() == 2
+        assert cache.get('intelligent', 'b') is None
+        assert cache.get('smart', 'a') == 1
+        assert cache.stats()['intelligent']['evictions'] == 1
+
+    def test_expired_entries_are_misses(self, cache):
+        cache.set('smart', 'a', 1, ttl_seconds=0.01)
+        time.sleep(0.02)
+        assert cache.get('smart', 'a') is None
+
+    def test_version_bump_invalidates(self, cache):
+        cache.set('enhanced', 'a', 1)
+        version = cache.catalog_version()
+
+        assert cache.bump_catalog_version() == version + 1
+        assert cache.get('enhanced', 'a') is None
+        assert cache.local_size() == 0
+
+    def test_history_bump_invalidates_only_history_engines(self, cache):
+        cache.set('smart', 'a', 1)
+        cache.set('prism', 'a', 2)
+        version = cache.catalog_version()
+
+        cache.bump_quote_history_version()
+
+        assert cache.get('smart', 'a') is None
+        assert cache.get('prism', 'a') == 2
+        assert cache.catalog_version() == version
+
+
+class TestSharedTier:
+
+    def test_results_are_shared_through_redis(self):
+        redis_client = FakeRedis()
+        worker_a = MatchingResultCache(redis_client=redis_client)
+        worker_b = MatchingResultCache(redis_client=redis_client)
+
+        worker_a.set('smart', 'a', {'manufacturer_id': 7}, ttl_seconds=60)
+
+        assert worker_b.get('smart', 'a') == {'manufacturer_id': 7}
+        assert worker_b.get('smart', 'a') == {'manufacturer_id': 7}
+        stats = worker_b.stats()['smart']
+        assert stats['redis_hits'] == 1
+        assert stats['local_hits'] == 1
+
+    def test_bump_is_broadcast_to_other_workers(self):
+        redis_client = FakeRedis()
+        worker_a = MatchingResultCache(redis_client=redis_client)
+        worker_b = MatchingResultCache(redis_client=redis_client)
+        worker_a.set('smart', 'a', 1)
+        assert worker_b.get('smart', 'a') == 1
+
+        version = worker_a.bump_catalog_version()
+
+        assert wait_for(lambda: worker_b.catalog_version() == version)
+        assert worker_b.local_size() == 0
+        assert worker_b.get('smart', 'a') is None
+
+    def test_history_bump_is_broadcast_to_other_workers(self):
+        redis_client = FakeRedis()
+        worker_a = MatchingResultCache(redis_client=redis_client)
+        worker_b = MatchingResultCache(redis_client=redis_client)
+        worker_a.set('smart', 'a', 1)
+        worker_a.set('prism', 'a', 2)
+        assert worker_b.get('smart', 'a') == 1 and worker_b.get('prism', 'a') == 2
+
+        version = worker_a.bump_quote_history_version()
+
+        assert wait_for(lambda: worker_b.quote_history_version() == version)
+        assert worker_b.get('smart', 'a') is None
+        assert worker_b.stats()['prism']['local_hits'] == 0
+        assert worker_b.get('prism', 'a') == 2
+        assert worker_b.stats()['prism']['local_hits'] == 1
+
+    def test_results_round_trip_through_json(self):
+        redis_client = FakeRedis()
+        worker_a = MatchingResultCache(redis_client=redis_client)
+        worker_b = MatchingResultCache(redis_client=redis_client)
+        recommendation = sample_recommendation()
+
+        worker_a.set('smart', 'a', [recommendation], ttl_seconds=60)
+
+        payload = json.loads(redis_client.get(next(iter(redis_client.values))))
+        assert payload[0]['__type__'].endswith('SmartRecommendation')
+        assert worker_b.get('smart', 'a') == [recommendation]
+
+    def test_unregistered_types_are_neither_stored_nor_rebuilt(self):
+        redis_client = FakeRedis()
+        cache = MatchingResultCache(redis_client=redis_client)
+
+        cache.set('smart', 'a', [object()], ttl_seconds=60)
+        assert cache.stats()['smart']['errors'] == 1
+        assert cache.get('smart', 'a') is not None  # Local tier only
+
+        key = cache._key('smart', 'b')
+        redis_client.setex(key, 60, json.dumps({'__type__': 'os.system', 'value': 'true'}).encode())
+        assert cache.get('smart', 'b') is None
+        assert cache.stats()['smart']['errors'] == 2
+
+    def test_redis_errors_degrade_to_misses(self):
+        redis_client = Mock()
+        redis_client.get.return_value = None
+        redis_client.pipeline.side_effect = ConnectionError("down")
+        cache = MatchingResultCache(redis_client=redis_client)
+
+        assert cache.get('prism', 'a') is None
+        assert cache.stats()['prism']['errors'] == 1
+
+
+Base = declarative_base()
+
+
+class Widget(Base):
+    __tablename__ = 'widgets'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    updated_at = Column(DateTime)
+
+
+class Offer(Base):
+    __tablename__ = 'offers'
+    id = Column(Integer, primary_key=True)
+    status = Column(String(20))
+    notes = Column(String(200))
+
+
+class TestCatalogInvalidation:
+
+    @pytest.fixture
+    def setup(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        cache = MatchingResultCache(use_redis=False)
+        install_catalog_invalidation(cache, (Widget,), {Offer: frozenset({'status'})})
+        return sessionmaker(bind=engine)(), cache
+
+    def test_committed_changes_bump_version(self, setup):
+        session, cache = setup
+        version = cache.catalog_version()
+
+        session.add(Widget(id=1, name="bracket"))
+        session.commit()
+        assert cache.catalog_version() == version + 1
+
+        session.get(Widget, 1).name = "flange"
+        session.commit()
+        assert cache.catalog_version() == version + 2
+
+    def test_ignored_fields_and_rollbacks_do_not_bump(self, setup):
+        session, cache = setup
+        session.add(Widget(id=1, name="bracket"))
+        session.commit()
+        version = cache.catalog_version()
+
+        session.get(Widget, 1).updated_at = datetime(2024, 1, 1)
+        session.commit()
+        session.get(Widget, 1).name = "flange"
+        session.flush()
+        session.rollback()
+
+        assert cache.catalog_version() == version
+
+
+    def test_history_models_bump_only_the_history_version_on_watched_fields(self, setup):
+        session, cache = setup
+        catalog_version = cache.catalog_version()
+        version = cache.quote_history_version()
+
+        session.add(Offer(id=1, status="pending"))
+        session.commit()
+        assert cache.quote_history_version() == version + 1
+
+        session.get(Offer, 1).notes = "Call back on Monday"
+        session.commit()
+        assert cache.quote_history_version() == version + 1
+
+        session.get(Offer, 1).status = "accepted"
+        session.commit()
+        assert cache.quote_history_version() == version + 2
+        assert cache.catalog_version() == catalog_version
+
+    def test_bulk_updates_and_deletes_bump(self, setup):
+        session, cache = setup
+        session.add_all([Widget(id=1, name="bracket"), Offer(id=1, status="pending")])
+        session.commit()
+        catalog_version = cache.catalog_version()
+        version = cache.quote_history_version()
+
+        session.query(Offer).filter(Offer.id == 1).update({Offer.status: "accepted"}, synchronize_session=False)
+        session.commit()
+        assert cache.quote_history_version() == version + 1
+        assert cache.catalog_version() == catalog_version
+
+        session.query(Offer).filter(Offer.id == 1).delete(synchronize_session=False)
+        session.rollback()
+        assert cache.quote_history_version() == version + 1
+
+        session.query(Widget).delete(synchronize_session=False)
+        session.commit()
+        assert cache.catalog_version() == catalog_version + 1
+
+
+class TestIntelligentMatchingCache:
+
+    @pytest.mark.parametrize("through_redis", [False, True])
+    def test_cached_matches_reattach_manufacturers(self, through_redis):
+        service = IntelligentMatchingService()
+        redis_client = FakeRedis() if through_redis else None
+        service.result_cache = MatchingResultCache(redis_client=redis_client, use_redis=through_redis)
+        manufacturer = Mock(spec=Manufacturer)
+        manufacturer.id = 42
+        match = MatchResult(
+            manufacturer=manufacturer, total_score=0.9, capability_score=0.9,
+            geographic_score=0.8, performance_score=0.7, distance_km=None,
+            match_reasons=[], capability_matches={}, availability_status="available",
+            estimated_lead_time=14, capacity_utilization=0.5, risk_factors=[]
+        )
+        service._cache_matches('fp', [match])
+        if through_redis:
+            # Read by another worker
+            service.result_cache = MatchingResultCache(redis_client=redis_client)
+
+        db = Mock()
+        service.catalog = Mock()
+        service.catalog.snapshot.return_value = CatalogSnapshot({42: manufacturer}, None, 0)
+        cached = service._get_cached_matches(db, 'fp')
+
+        assert [m.manufacturer for m in cached] == [manufacturer]
+        assert cached[0].total_score == 0.9
+        db.query.assert_not_called()
+
+        service.catalog.snapshot.return_value = CatalogSnapshot({}, None, 0)
+        assert service._get_cached_matches(db, 'fp') is None
@@ -0,0 +1,185 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, Numeric, String, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from app.core.pagination import CountEstimator, InvalidCursor, KeysetOrder, keyset_order
+
+Base = declarative_base()
+
+
+class Part(Base):
+    __tablename__ = "parts"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    price = Column(Numeric(10, 2), nullable=True)
+    created_at = Column(DateTime)
+
+
+SORT_COLUMNS = {"created_at": Part.created_at, "price": Part.price}
+
+START = datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            Part(
+                id=index,
+                name=f"part {index}",
+                # Repeated prices and timestamps, and some NULL prices
+                price=None if index % 7 == 0 else Decimal(index % 4) + Decimal("0.50"),
+                created_at=START + timedelta(hours=index // 3),
+            )
+            for index in range(1, 41)
+        ])
+        session.commit()
+        yield session
+
+
+def walk(db, keyset, statement, per_page):
+    """Ids of every page followed by cursor, and the number of pages"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = keyset.page(db.scalars(keyset.apply(statement, cursor, per_page)).all(), per_page)
+        ids += [part.id for part in page.items]
+        pages += 1
+        if page.next_cursor is None:
+            return ids, pages
+        cursor = page.next_cursor
+
+
+def expected_ids(db, sort_by, descending):
+    """Python ordering with NULLs larger than any value and the id as tie-breaker"""
+    parts = db.scalars(select(Part)).all()
+    key = lambda part: (getattr(part, sort_by) is None, getattr(part, sort_by), part.id)
+    return [part.id for part in sorted(parts, key=key, reverse=descending)]
+
+
+class TestKeysetOrder:
+
+    @pytest.mark.parametrize("sort_by", ["created_at", "price"])
+    @pytest.mark.parametrize("sort_order", ["asc", "desc"])
+    def test_cursor_walk_visits_every_row_once_in_order(self, db, sort_by, sort_order):
+        keyset = keyset_order(SORT_COLUMNS, sort_by, sort_order, Part.id)
+
+        ids, pages = walk(db, keyset, select(Part), per_page=6)
+
+        assert ids == expected_ids(db, sort_by, sort_order == "desc")
+        assert pages == 7
+
+    def test_cursor_pages_match_offset_pages(self, db):
+        keyset = keyset_order(SORT_COLUMNS, "price", "desc", Part.id)
+        statement = select(Part).where(Part.name != "part 3")
+
+        offset_ids = []
+        for page in range(4):
+            rows = db.scalars(keyset.apply(statement, None, 10, offset=page * 10)).all()
+            offset_ids += [part.id for part in keyset.page(rows, 10).items]
+
+        assert walk(db, keyset, statement, per_page=10)[0] == offset_ids
+
+    def test_works_on_legacy_queries(self, db):
+        keyset = keyset_order(SORT_COLUMNS, "created_at", "desc", Part.id)
+        first = keyset.page(keyset.apply(db.query(Part), None, 5).all(), 5)
+        second = keyset.page(keyset.apply(db.query(Part), first.next_cursor, 5).all(), 5)
+
+        assert [part.id for part in first.items + second.items] == expected_ids(db, "created_at", True)[:10]
+
+    def test_last_page_has_no_cursor(self, db):
+        keyset = keyset_order(SORT_COLUMNS, "created_at", "asc", Part.id)
+        assert keyset.page(db.scalars(keyset.apply(select(Part), None, 40)).all(), 40).next_cursor is None
+
+    def test_cursor_is_tied_to_its_ordering(self, db):
+        ascending = keyset_order(SORT_COLUMNS, "price", "asc", Part.id)
+        cursor = ascending.page(db.scalars(ascending.apply(select(Part), None, 5)).all(), 5).next_cursor
+
+        with pytest.raises(InvalidCursor):
+            keyset_order(SORT_COLUMNS, "price", "desc", Part.id).decode(cursor)
+        with pytest.raises(InvalidCursor):
+            keyset_order(SORT_COLUMNS, "created_at", "asc", Part.id).decode(cursor)
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", "e30", base64.urlsafe_b64encode(b"[1]").decode()])
+    def test_malformed_cursors_are_rejected(self, cursor):
+        with pytest.raises(InvalidCursor):
+            KeysetOrder("price", Part.price, Part.id).decode(cursor)
+
+    def test_cursor_round_trips_typed_values(self):
+        keyset = KeysetOrder("price", Part.price, Part.id)
+        for value in (Decimal("12.50"), START, None, 3):
+            assert keyset.decode(keyset.encode(value, 7)) == (value, 7)
+        assert json.loads(base64.urlsafe_b64decode(keyset.encode(1, 2) + "=="))["s"] == "price"
+
+    def test_unknown_sort_columns_are_refused(self):
+        with pytest.raises(ValueError):
+            keyset_order(SORT_COLUMNS, "name", "asc", Part.id)
+
+
+class TestInMemoryPagination:
+
+    def test_paginate_follows_the_same_order(self):
+        keyset = KeysetOrder("uploaded_at", None, None)
+        documents = [
+            {"id": f"doc-{index:02d}", "uploaded_at": START + timedelta(hours=index // 2)}
+            for index in range(11)
+        ]
+
+        ids, cursor = [], None
+        while True:
+            page = keyset.paginate(documents, cursor, 4, lambda doc: doc["uploaded_at"], lambda doc: doc["id"])
+            ids += [doc["id"] for doc in page.items]
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert ids == [f"doc-{index:02d}" for index in reversed(range(11))]
+
+
+class TestCountEstimator:
+
+    def test_counts_are_cached_per_statement_and_parameters(self, db):
+        estimator = CountEstimator(ttl_seconds=60)
+        cheap = select(Part).where(Part.price < 2)
+
+        assert estimator.count(db, cheap) == estimator.count(db, cheap.order_by(Part.id).limit(5))
+        db.add(Part(id=100, name="new", price=Decimal("1.00"), created_at=START))
+        db.flush()
+        assert estimator.count(db, cheap) == 18  # Still the cached count
+        assert estimator.count(db, select(Part).where(Part.price < 3)) == 28
+        assert estimator.stats() == {"estimates": 0, "hits": 2, "counts": 2, "entries": 2}
+
+    def test_expired_counts_are_recounted(self, db):
+        estimator = CountEstimator(ttl_seconds=0)
+        estimator.count(db, select(Part))
+        db.add(Part(id=100, name="new", created_at=START))
+        db.flush()
+        assert estimator.count(db, select(Part)) == 41
+
+    def test_entries_are_bounded(self, db):
+        estimator = CountEstimator(max_entries=2)
+        for limit in range(1, 5):
+            estimator.count(db, select(Part).where(Part.id < limit))
+        assert estimator.stats()["entries"] == 2
+
+    def test_async_sessions(self, tmp_path):
+        pytest.importorskip("aiosqlite")
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        async def count():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'parts.db'}")
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine) as session:
+                session.add_all([Part(id=index, name="part", created_at=START) for index in range(1, 4)])
+                await session.commit()
+                return await CountEstimator().count_async(session, select(Part))
+
+        assert asyncio.run(count()) == 3
@@ -0,0 +1,71 @@
+import pytest
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.core.database import PoolTelemetry, _instrumented_pool_class, pool_telemetry
+
+
+class TestPoolTelemetry:
+
+    def test_quantiles_come_from_bucket_bounds(self):
+        telemetry = PoolTelemetry(buckets=(0.001, 0.01, 0.1))
+        for _ in range(90):
+            telemetry.observe("primary", 0.0005)
+        for _ in range(10):
+            telemetry.observe("primary", 0.05)
+
+        assert telemetry.wait_quantile("primary", 0.5) == 0.001
+        assert telemetry.wait_quantile("primary", 0.95) == 0.1
+        assert telemetry.wait_quantile("replica", 0.95) is None
+
+    def test_observers_receive_checkouts_and_failures_are_isolated(self):
+        telemetry = PoolTelemetry()
+        seen = []
+
+        def broken(*args):
+            raise RuntimeError("exporter down")
+
+        telemetry.add_observer(broken)
+        telemetry.add_observer(lambda *args: seen.append(args))
+        telemetry.observe("primary", 0.2, timed_out=True)
+
+        assert seen == [("primary", 0.2, True)]
+        assert telemetry.snapshot("primary")["checkout_timeouts"] == 1
+
+
+class TestInstrumentedPool:
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=_instrumented_pool_class(QueuePool, "test_pool"),
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        pool_telemetry.register_engine("test_pool", engine)
+        yield engine
+        pool_telemetry.engines.pop("test_pool", None)
+        engine.dispose()
+
+    def test_checkouts_and_timeouts_are_recorded(self, engine):
+        before = pool_telemetry.snapshot("test_pool")
+
+        held = engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+        status = pool_telemetry.snapshot("test_pool")
+        assert status["checkouts"] == before["checkouts"] + 2
+        assert status["checkout_timeouts"] == before["checkout_timeouts"] + 1
+        assert status["checked_out"] == 1
+        assert status["capacity"] == 1
+        assert status["checkout_wait_p99_seconds"] >= 0.05
+        held.close()
+
+    def test_snapshot_follows_pool_replaced_by_dispose(self, engine):
+        engine.dispose()
+        with engine.connect():
+            assert pool_telemetry.snapshot("test_pool")["checked_out"] == 1
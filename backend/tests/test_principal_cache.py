@@ -0,0 +1,219 @@
+import time
+
+import pytest
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.core.principal_cache import Principal, PrincipalCache, install_principal_invalidation
+from app.models.user import RegistrationStatus, UserRole
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def user_fields(user_id=7, role=UserRole.MANUFACTURER, manufacturer_id=3):
+    return {
+        "id": user_id,
+        "email": f"user{user_id}@example.com",
+        "role": role,
+        "registration_status": RegistrationStatus.ACTIVE,
+        "email_verified": True,
+        "is_active": True,
+        "manufacturer_id": manufacturer_id,
+    }
+
+
+class Loader:
+    """Stands in for the database; counts queries"""
+
+    def __init__(self, **fields):
+        self.fields = user_fields(**fields)
+        self.calls = 0
+
+    def __call__(self, user_id):
+        self.calls += 1
+        return dict(self.fields, id=user_id) if user_id == self.fields["id"] else None
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestPrincipal:
+
+    def test_json_round_trip(self):
+        principal = Principal(version=4, **user_fields())
+        assert Principal.from_json(principal.to_json()) == principal
+
+    def test_is_immutable(self):
+        principal = Principal(**user_fields())
+        with pytest.raises(AttributeError):
+            principal.role = UserRole.ADMIN
+
+
+class TestPrincipalCache:
+
+    def test_loads_once_then_serves_from_the_local_tier(self):
+        cache = PrincipalCache(use_redis=False)
+        loader = Loader()
+
+        first = cache.get(7, loader)
+        second = cache.get(7, loader)
+
+        assert first is second
+        assert first.manufacturer_id == 3 and first.role == UserRole.MANUFACTURER
+        assert loader.calls == 1
+        assert cache.stats()["local_hits"] == 1
+
+    def test_unknown_users_are_not_cached(self):
+        cache = PrincipalCache(use_redis=False)
+        loader = Loader()
+        assert cache.get(8, loader) is None
+        assert cache.get(8, loader) is None
+        assert loader.calls == 2
+
+    def test_local_entries_expire(self):
+        cache = PrincipalCache(use_redis=False, local_ttl_seconds=0.01)
+        loader = Loader()
+        cache.get(7, loader)
+        time.sleep(0.02)
+        assert cache.get_local(7) is None
+        cache.get(7, loader)
+        assert loader.calls == 2
+
+    def test_local_tier_is_bounded(self):
+        cache = PrincipalCache(use_redis=False, max_local_entries=2)
+        for user_id in (1, 2, 3):
+            cache.get(user_id, Loader(user_id=user_id))
+        assert cache.local_size() == 2
+        assert cache.get_local(1) is None
+
+    def test_processes_share_snapshots_through_redis(self):
+        redis = fakeredis.FakeRedis()
+        loader = Loader()
+
+        PrincipalCache(redis_client=redis).get(7, loader)
+        principal = PrincipalCache(redis_client=redis).get(7, loader)
+
+        assert principal.email == "user7@example.com"
+        assert loader.calls == 1
+
+    def test_invalidation_reaches_other_processes(self):
+        redis = fakeredis.FakeRedis()
+        writer, reader = PrincipalCache(redis_client=redis), PrincipalCache(redis_client=redis)
+        loader = Loader()
+        reader.get(7, loader)
+        time.sleep(0.1)  # let the reader's listener subscribe
+
+        loader.fields["role"] = UserRole.CLIENT
+        writer.invalidate(7)
+
+        assert wait_for(lambda: reader.get_local(7) is None)
+        principal = reader.get(7, loader)
+        assert principal.role == UserRole.CLIENT and principal.version == 1
+        assert loader.calls == 2
+
+    def test_snapshots_of_older_versions_are_ignored(self):
+        redis = fakeredis.FakeRedis()
+        loader = Loader()
+        PrincipalCache(redis_client=redis).get(7, loader)
+        # A change committed without reaching this cache's snapshot
+        redis.incr(PrincipalCache.VERSION_KEY.format(7))
+
+        PrincipalCache(redis_client=redis).get(7, loader)
+
+        assert loader.calls == 2
+
+    def test_load_racing_an_invalidation_is_not_kept(self):
+        cache = PrincipalCache(use_redis=False)
+
+        def loader(user_id):
+            cache.invalidate(user_id)
+            return user_fields(user_id)
+
+        assert cache.get(7, loader) is not None
+        assert cache.get_local(7) is None
+
+
+Base = declarative_base()
+
+
+class Account(Base):
+    __tablename__ = "accounts"
+    id = Column(Integer, primary_key=True)
+    email = Column(String)
+    role = Column(String)
+    registration_status = Column(String)
+    email_verified = Column(Boolean, default=False)
+    is_active = Column(Boolean, default=True)
+    last_login = Column(String)
+
+
+class Profile(Base):
+    __tablename__ = "profiles"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("accounts.id"))
+    business_name = Column(String)
+
+
+class RecordingCache(PrincipalCache):
+    def __init__(self):
+        super().__init__(use_redis=False)
+        self.invalidated = []
+
+    def invalidate(self, user_id):
+        self.invalidated.append(user_id)
+        super().invalidate(user_id)
+
+
+class TestInvalidationHooks:
+
+    @pytest.fixture
+    def setup(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        cache = RecordingCache()
+        install_principal_invalidation(cache, Account, Profile)
+        session = sessionmaker(bind=engine)()
+        session.add(Account(id=1, email="a@example.com", role="client", registration_status="active"))
+        session.commit()
+        cache.invalidated.clear()
+        yield cache, session
+        session.close()
+
+    def test_role_change_invalidates_after_commit(self, setup):
+        cache, session = setup
+        account = session.get(Account, 1)
+        account.role = "manufacturer"
+        session.flush()
+        assert cache.invalidated == []
+        session.commit()
+        assert cache.invalidated == [1]
+
+    def test_rolled_back_changes_invalidate_nothing(self, setup):
+        cache, session = setup
+        session.get(Account, 1).email_verified = True
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert cache.invalidated == []
+
+    def test_unrelated_user_fields_invalidate_nothing(self, setup):
+        cache, session = setup
+        session.get(Account, 1).last_login = "now"
+        session.commit()
+        assert cache.invalidated == []
+
+    def test_new_manufacturer_profile_invalidates_its_user(self, setup):
+        cache, session = setup
+        session.add(Profile(id=5, user_id=1, business_name="Acme"))
+        session.commit()
+        assert cache.invalidated == [1]
+
+        session.get(Profile, 5).business_name = "Acme Works"
+        session.commit()
+        assert cache.invalidated == [1]
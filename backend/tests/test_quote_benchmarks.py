@@ -0,0 +1,232 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.order import Order
+from app.models.quote import Quote, QuoteStatus, QuoteType
+from app.models.quote_benchmark import QuoteBenchmarkSketch
+from app.services.quantile_sketch import TDigest
+from app.services.quote_benchmarks import (
+    ACCEPTED,
+    ANY,
+    QUOTED,
+    benchmark_groups,
+    lookup_benchmarks,
+    quantity_bucket,
+    quote_dimensions,
+    rebuild_quote_benchmarks,
+)
+from app.services.quote_comparison_service import QuoteComparisonService
+
+
+class TestTDigest:
+
+    def test_quantiles_and_ranks_are_close_to_exact(self):
+        rng = random.Random(3)
+        values = sorted(rng.lognormvariate(8, 1) for _ in range(20_000))
+        digest = TDigest()
+        digest.update(values)
+
+        assert len(digest) <= 100
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            exact = values[int(q * len(values))]
+            assert digest.cdf(exact) == pytest.approx(q, abs=0.005)
+            assert digest.quantile(q) == pytest.approx(exact, rel=0.03)
+        assert (digest.quantile(0), digest.quantile(1)) == (values[0], values[-1])
+
+    def test_merged_and_deserialized_digests_agree(self):
+        rng = random.Random(4)
+        values = [rng.uniform(100, 5000) for _ in range(5000)]
+        left, right = TDigest(), TDigest()
+        left.update(values[:3000])
+        right.update(values[3000:])
+        left.merge(right)
+
+        assert left.count == 5000
+        assert left.quantile(0.5) == pytest.approx(sorted(values)[2500], rel=0.01)
+        restored = TDigest.from_bytes(left.to_bytes())
+        assert restored.quantile(0.5) == left.quantile(0.5)
+        assert (restored.min, restored.max) == (min(values), max(values))
+
+    def test_empty_and_single_value_digests(self):
+        digest = TDigest()
+        assert digest.quantile(0.5) is None and digest.cdf(1) is None
+        digest.add(42)
+        assert digest.quantile(0.9) == 42
+        assert (digest.cdf(41), digest.cdf(42)) == (0.0, 1.0)
+
+
+class TestGroups:
+
+    def test_quote_values_override_the_order_requirements(self):
+        order = Order(
+            industry_category="Automotive", quantity=250,
+            technical_requirements={'manufacturing_process': "CNC  Machining", 'material': "Steel"}
+        )
+        assert quote_dimensions(Quote(material="Aluminum 6061"), order) == (
+            "automotive", "cnc machining", "aluminum 6061", "101-1000"
+        )
+        assert quote_dimensions(Quote(), None) == ('', '', '', '')
+
+    def test_groups_broaden_down_to_the_whole_market(self):
+        groups = benchmark_groups(("automotive", "cnc", "steel", "11-100"))
+        assert groups[0] == ("automotive", "cnc", "steel", "11-100")
+        assert groups[-1] == (ANY, ANY, ANY, ANY)
+        assert len(groups) == 5
+        assert [quantity_bucket(quantity) for quantity in (None, 1, 10, 11, 10_000, 10_001)] == [
+            '', '1', '2-10', '11-100', '1001-10000', '10001+'
+        ]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    # Every table, for the flush hooks that maintain derived tables
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def add_order(db, category="Automotive", process="CNC Machining", material="Steel", quantity=50):
+    order = Order(
+        client_id=1, title="Bracket", description="Bracket", quantity=quantity, industry_category=category,
+        technical_requirements={'manufacturing_process': process, 'material': material},
+        delivery_deadline=datetime.now() + timedelta(days=30)
+    )
+    db.add(order)
+    db.flush()
+    return order
+
+
+def add_quote(db, order, price, delivery_days=14, status=QuoteStatus.SENT, **fields):
+    quote = Quote(
+        order_id=order.id, manufacturer_id=1, subtotal_pln=price, total_price_pln=price,
+        lead_time_days=delivery_days, status=status, **fields
+    )
+    db.add(quote)
+    db.flush()
+    return quote
+
+
+def sketch_counts(db):
+    sketches = QuoteBenchmarkSketch.__table__.c
+    return {
+        (scope, category, process, material, bucket): count
+        for scope, category, process, material, bucket, count in db.execute(select(
+            sketches.scope, sketches.industry_category, sketches.process, sketches.material,
+            sketches.quantity_bucket, sketches.quote_count
+        ))
+    }
+
+
+class TestIncrementalMaintenance:
+
+    def test_sent_and_accepted_quotes_are_counted_once(self, db):
+        order = add_order(db)
+        quote = add_quote(db, order, 1000, status=QuoteStatus.DRAFT)
+        assert sketch_counts(db) == {}
+
+        quote.status = QuoteStatus.SENT
+        db.flush()
+        quote.status = QuoteStatus.VIEWED
+        db.flush()
+        counts = sketch_counts(db)
+        assert counts[(QUOTED, "automotive", "cnc machining", "steel", "11-100")] == 1
+        assert counts[(QUOTED, ANY, ANY, ANY, ANY)] == 1
+        assert len(counts) == 5
+
+        quote.status = QuoteStatus.ACCEPTED
+        db.commit()
+        assert sketch_counts(db)[(ACCEPTED, "automotive", "cnc machining", ANY, ANY)] == 1
+
+    def test_rolled_back_and_production_offer_quotes_are_not_counted(self, db):
+        order = add_order(db)
+        db.commit()
+        add_quote(db, order, 1000)
+        db.rollback()
+        add_quote(db, order, 1000, quote_type=QuoteType.PRODUCTION_OFFER)
+        assert sketch_counts(db) == {}
+
+
+class TestLookup:
+
+    def test_most_specific_group_with_enough_quotes(self, db):
+        steel = add_order(db, material="Steel")
+        titanium = add_order(db, material="Titanium")
+        for price in range(1000, 2000, 100):
+            add_quote(db, steel, price, delivery_days=10)
+        for price in (5000, 6000):
+            add_quote(db, titanium, price, delivery_days=40)
+        db.commit()
+
+        steel_benchmarks = lookup_benchmarks(db, quote_dimensions(Quote(), steel))
+        assert steel_benchmarks[QUOTED].dimensions == ("automotive", "cnc machining", "steel", "11-100")
+        assert steel_benchmarks[QUOTED].average_price == pytest.approx(1450)
+        assert [steel_benchmarks[QUOTED].price_percentile(price) for price in (900, 1450, 1900)] == [0, 50, 100]
+        assert ACCEPTED not in steel_benchmarks
+
+        # Two titanium quotes are too few; the process group has all twelve
+        titanium_benchmark = lookup_benchmarks(db, quote_dimensions(Quote(), titanium))[QUOTED]
+        assert titanium_benchmark.dimensions == ("automotive", "cnc machining", ANY, "11-100")
+        assert titanium_benchmark.quote_count == 12
+        assert titanium_benchmark.average_delivery_days == pytest.approx((10 * 10 + 2 * 40) / 12)
+        assert titanium_benchmark.price_percentile(7000) == 100
+
+    def test_whole_market_when_no_group_has_enough_quotes(self, db):
+        add_quote(db, add_order(db, category="Aerospace"), 3000)
+        db.commit()
+        benchmark = lookup_benchmarks(db, ("medical", '', '', ''))[QUOTED]
+        assert benchmark.dimensions == (ANY, ANY, ANY, ANY)
+        assert benchmark.quote_count == 1
+        assert lookup_benchmarks(db, ("medical", '', '', ''), min_samples=1)[QUOTED].quote_count == 1
+
+
+class TestRebuild:
+
+    def test_rebuild_recomputes_sketches_and_reports_drift(self, db):
+        order = add_order(db)
+        for price in (1000, 2000, 3000):
+            add_quote(db, order, price)
+        add_quote(db, order, 9000, status=QuoteStatus.DRAFT)
+        db.commit()
+        # Bulk updates bypass the flush hook
+        db.query(Quote).filter(Quote.total_price_pln == 9000).update({Quote.status: QuoteStatus.ACCEPTED})
+        db.commit()
+
+        report = rebuild_quote_benchmarks(db, batch_size=2)
+
+        assert report['quotes'] == 4
+        assert report['drifted'] == 10
+        counts = sketch_counts(db)
+        assert counts[(QUOTED, ANY, ANY, ANY, ANY)] == 4
+        assert counts[(ACCEPTED, ANY, ANY, ANY, ANY)] == 1
+        assert lookup_benchmarks(db, quote_dimensions(Quote(), order), min_samples=1)[ACCEPTED].average_price == 9000
+        assert rebuild_quote_benchmarks(db)['drifted'] == 0
+
+
+class TestQuoteComparisonBenchmark:
+
+    def test_quote_is_benchmarked_against_similar_quotes(self, db):
+        order = add_order(db)
+        for price in range(1000, 3000, 100):
+            add_quote(db, order, price, delivery_days=20)
+        cheap = add_quote(db, order, 900, delivery_days=10)
+        db.commit()
+
+        benchmark = QuoteComparisonService().get_quote_benchmark(db, cheap)
+        assert benchmark.sample_size == 21
+        assert benchmark.industry_average_price == pytest.approx((sum(range(1000, 3000, 100)) + 900) / 21, abs=0.01)
+        assert benchmark.market_percentile <= 5
+        assert benchmark.accepted_average_price is None
+        assert benchmark.benchmark_group['material'] == "steel"
+        assert "Faster delivery than similar quotes" in benchmark.competitive_advantage
+
+    def test_without_similar_quotes_only_the_quote_itself_is_assessed(self, db):
+        quote = add_quote(db, add_order(db), 1000, delivery_days=40, status=QuoteStatus.DRAFT)
+        benchmark = QuoteComparisonService().get_quote_benchmark(db, quote)
+        assert (benchmark.industry_average_price, benchmark.market_percentile, benchmark.sample_size) == (None, None, 0)
+        assert "Negotiate shorter delivery timeline" in benchmark.improvement_suggestions
@@ -0,0 +1,134 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.producer import Manufacturer
+from app.models.quote import Quote
+from app.schemas.quote import QuoteFilterCriteria
+from app.services.quote_comparison_service import QuoteComparisonService
+
+
+def make_quote(quote_id, price, delivery_days, rating=None, certifications=None, on_time_rate=0.9):
+    manufacturer = None
+    if rating is not None:
+        manufacturer = SimpleNamespace(
+            business_name=f"Manufacturer {quote_id}", overall_rating=rating,
+            quality_certifications=certifications or [], on_time_delivery_rate=on_time_rate
+        )
+    return SimpleNamespace(id=quote_id, total_price_pln=price, lead_time_days=delivery_days, manufacturer=manufacturer)
+
+
+@pytest.fixture
+def service():
+    return QuoteComparisonService()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    # Every table, for the flush hooks that maintain derived tables
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def add_quotes(db, order_id, *quotes):
+    for manufacturer_id, (price, delivery_days, rating) in enumerate(quotes, start=1):
+        if db.get(Manufacturer, manufacturer_id) is None:
+            db.add(Manufacturer(
+                id=manufacturer_id, user_id=manufacturer_id, business_name=f"Manufacturer {manufacturer_id}",
+                city="Warsaw", capabilities={}, overall_rating=rating, quality_certifications=["ISO 9001"]
+            ))
+        db.add(Quote(
+            order_id=order_id, manufacturer_id=manufacturer_id, subtotal_pln=price,
+            total_price_pln=price, lead_time_days=delivery_days
+        ))
+    db.commit()
+
+
+class TestAnalyzeQuotes:
+
+    def test_scores_against_the_whole_quote_set(self, service):
+        quotes = [
+            make_quote(1, 1000, 30, rating=4.0, certifications=["ISO 9001", "ISO 14001"]),
+            make_quote(2, 2000, 10, rating=5.0),
+            make_quote(3, 1500, 20),
+        ]
+        cheap, fast, unknown = service.analyze_quotes(quotes)
+
+        # price 100, delivery 0, quality 80, reliability 70, compliance 80
+        assert cheap.score == pytest.approx(30 + 0 + 20 + 10.5 + 8)
+        assert (cheap.market_position, fast.market_position, unknown.market_position) == (
+            "lowest", "premium", "market_rate"
+        )
+        assert cheap.savings_vs_average == 500 and fast.savings_vs_average == -500
+        assert fast.delivery_competitiveness == 50.0
+        assert cheap.sustainability_score == 75 and fast.sustainability_score == 50
+        assert unknown.sustainability_score is None
+        assert unknown.quality_score == 60 and unknown.compliance_score == 50
+        assert unknown.risk_assessment["factors"] == ["Unknown manufacturer"]
+        assert cheap.total_cost_of_ownership == pytest.approx(1000 * 1.08 + 1000 * 0.2 * 0.1)
+
+    def test_ranks_follow_the_simple_score_and_keep_ties_in_order(self, service):
+        quotes = [make_quote(1, 2000, 20), make_quote(2, 1000, 10), make_quote(3, 2000, 20)]
+        assert [analytics.rank for analytics in service.analyze_quotes(quotes)] == [2, 1, 3]
+
+    def test_custom_weights(self, service):
+        quotes = [make_quote(1, 1000, 30, rating=1.0), make_quote(2, 2000, 10, rating=5.0)]
+        analytics = service.analyze_quotes(quotes, {"price": 1.0, "delivery": 0, "quality": 0,
+                                                    "reliability": 0, "compliance": 0})
+        assert [a.score for a in analytics] == [100.0, 0.0]
+
+    def test_identical_quotes_score_full_marks_for_price_and_delivery(self, service):
+        analytics = service.analyze_quotes([make_quote(1, 1000, 10), make_quote(2, 1000, 10)])
+        assert analytics[0].score == analytics[1].score
+        assert analytics[0].delivery_competitiveness == 0
+
+    def test_single_quote_analytics_match_the_batch(self, service):
+        quotes = [make_quote(1, 1000, 30, rating=4.0), make_quote(2, 2000, 10, rating=5.0)]
+        assert service.calculate_quote_analytics(quotes[1], quotes) == service.analyze_quotes(quotes)[1]
+
+
+class TestComparisonReport:
+
+    def test_report_ranks_filters_and_summarizes(self, service, db):
+        add_quotes(db, 7, (1000, 30, 3.5), (2000, 10, 5.0), (1500, 45, 2.5))
+        report = service.generate_comparison_report(db, 7)
+
+        assert report.total_quotes == 3
+        scores = [quote.score for quote in report.decision_matrix.quotes]
+        assert scores == sorted(scores, reverse=True)
+        assert report.decision_matrix.recommendation == report.decision_matrix.quotes[0]
+        assert report.cost_breakdown["cost_distribution"] == {"budget_friendly": 1, "market_rate": 1, "premium": 1}
+        assert (report.risk_analysis["medium_risk_quotes"], report.risk_analysis["high_risk_quotes"]) == (2, 1)
+
+        filtered = service.generate_comparison_report(db, 7, filters=QuoteFilterCriteria(min_rating=3.0))
+        assert filtered.total_quotes == 2
+        with pytest.raises(ValueError):
+            service.generate_comparison_report(db, 7, filters=QuoteFilterCriteria(max_price=10))
+        with pytest.raises(ValueError):
+            service.generate_comparison_report(db, 8)
+
+    def test_reports_are_cached_until_a_quote_changes(self, service, db):
+        add_quotes(db, 7, (1000, 30, 3.5), (2000, 10, 5.0))
+        report = service.generate_comparison_report(db, 7)
+        assert service.generate_comparison_report(db, 7) is report
+
+        weights = {"price": 1.0}
+        weighted = service.generate_comparison_report(db, 7, criteria_weights=weights)
+        assert weighted is not report
+        assert service.generate_comparison_report(db, 7, criteria_weights=dict(weights)) is weighted
+
+        quote = db.query(Quote).filter(Quote.total_price_pln == 2000).one()
+        quote.total_price_pln = 900
+        db.commit()
+        updated = service.generate_comparison_report(db, 7)
+        assert updated is not report
+        assert updated.cost_breakdown["lowest_quote"] == 900
+
+        add_quotes(db, 7, (1200, 20, 4.0))
+        assert service.generate_comparison_report(db, 7).total_quotes == 3
+
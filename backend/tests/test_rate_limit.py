@@ -0,0 +1,184 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import (
+    LocalRateLimitBackend,
+    RateLimitEngine,
+    RateLimitPolicy,
+    client_ip_from_headers,
+    default_policies,
+    gcra,
+    route_policy,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # EVALSHA support in fakeredis
+
+POLICIES = {
+    "api": RateLimitPolicy("api", 5, 60),
+    "burst": RateLimitPolicy("burst", 10, 60, burst=2),
+    "matching": RateLimitPolicy("matching", 3, 60),
+}
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def redis_engine(server, max_local_keys=100):
+    """An engine on a shared fake server, as one worker process would see it"""
+    return RateLimitEngine(
+        policies=POLICIES,
+        redis_client=fakeredis.FakeRedis(server=server),
+        async_redis_client=fakeredis.FakeAsyncRedis(server=server),
+        max_local_keys=max_local_keys,
+    )
+
+
+class TestGCRA:
+
+    def test_limit_then_refill(self):
+        policy = POLICIES["api"]
+        tat = None
+        for expected_remaining in (4, 3, 2, 1, 0):
+            result, tat = gcra(tat, 100.0, policy)
+            assert result.allowed and result.remaining == expected_remaining
+
+        result, tat = gcra(tat, 100.0, policy)
+        assert not result.allowed
+        assert result.retry_after == pytest.approx(12.0)
+
+        # One emission interval later exactly one request fits again
+        result, tat = gcra(tat, 112.0, policy)
+        assert result.allowed and result.remaining == 0
+
+    def test_burst_caps_back_to_back_requests(self):
+        policy = POLICIES["burst"]
+        tat = None
+        allowed = 0
+        for _ in range(5):
+            result, new_tat = gcra(tat, 0.0, policy)
+            if result.allowed:
+                allowed += 1
+                tat = new_tat
+        assert allowed == 2
+
+
+class TestLocalBackend:
+
+    def test_bucket_count_is_bounded(self):
+        backend = LocalRateLimitBackend(max_keys=50)
+        for index in range(500):
+            backend.hit([(f"ratelimit:api:10.0.{index // 256}.{index % 256}", POLICIES["api"])])
+        assert len(backend) == 50
+
+    def test_denied_requests_do_not_move_the_bucket(self):
+        backend = LocalRateLimitBackend()
+        checks = [("ratelimit:api:client", POLICIES["api"])]
+        results = [backend.hit(checks)[0] for _ in range(8)]
+        assert [result.allowed for result in results] == [True] * 5 + [False] * 3
+        assert results[-1].retry_after == pytest.approx(results[-2].retry_after, abs=0.5)
+
+
+    def test_lockout_outlasts_the_emission_interval(self, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: clock[0], time=time.time))
+        backend = LocalRateLimitBackend()
+        checks = [("ratelimit:api:client", POLICIES["api"])]
+        for _ in range(5):
+            backend.hit(checks, lockout_seconds=300)
+
+        denied = backend.hit(checks, lockout_seconds=300)[0]
+        assert not denied.allowed and denied.retry_after == 300
+
+        # GCRA alone would allow one request 12 s later
+        clock[0] += 20
+        assert not backend.hit(checks)[0].allowed
+        clock[0] += 280
+        assert [backend.hit(checks)[0].allowed for _ in range(6)] == [True] * 5 + [False]
+
+
+class TestRedisBackend:
+
+    def test_limit_is_shared_between_workers(self, redis_server):
+        workers = [redis_engine(redis_server) for _ in range(3)]
+        results = [workers[index % 3].hit([("api", "10.0.0.1")])[0] for index in range(9)]
+        assert sum(result.allowed for result in results) == 5
+        assert not results[-1].allowed
+        assert results[-1].headers()["Retry-After"] == "12"
+
+    def test_policies_are_checked_in_one_round_trip(self, redis_server):
+        engine = redis_engine(redis_server)
+        results = engine.hit([("api", "10.0.0.1"), ("matching", "user:7")])
+        assert [result.policy.name for result in results] == ["api", "matching"]
+        assert [result.remaining for result in results] == [4, 2]
+        assert RateLimitEngine.most_restrictive(results).policy.name == "matching"
+
+    def test_async_and_sync_clients_share_buckets(self, redis_server):
+        engine = redis_engine(redis_server)
+        engine.hit([("matching", "user:7")])
+        results = asyncio.run(engine.ahit([("matching", "user:7")] * 3))
+        assert [result.allowed for result in results] == [True, True, False]
+
+    def test_buckets_expire(self, redis_server):
+        engine = redis_engine(redis_server)
+        engine.hit([("api", "10.0.0.1")])
+        ttl = fakeredis.FakeRedis(server=redis_server).pttl("ratelimit:api:10.0.0.1")
+        assert 0 < ttl <= 12000
+
+    def test_lockout_denies_for_the_whole_period(self, redis_server):
+        engine = redis_engine(redis_server)
+        results = [engine.hit([("api", "10.0.0.1")], lockout_seconds=300)[0] for _ in range(7)]
+
+        assert [result.allowed for result in results] == [True] * 5 + [False] * 2
+        assert results[5].retry_after == pytest.approx(300)
+        assert 299 < results[6].retry_after <= 300
+        # Other workers see the lockout
+        assert not redis_engine(redis_server).hit([("api", "10.0.0.1")])[0].allowed
+        assert redis_engine(redis_server).hit([("api", "10.0.0.2")])[0].allowed
+
+    def test_falls_back_to_local_buckets_when_redis_fails(self, redis_server):
+        engine = redis_engine(redis_server)
+        redis_server.connected = False
+
+        results = [engine.hit([("api", "10.0.0.1")])[0] for _ in range(6)]
+
+        assert [result.allowed for result in results] == [True] * 5 + [False]
+        assert engine._redis is None
+        assert len(engine.local) == 1
+
+
+class TestRouting:
+
+    @pytest.mark.parametrize("path, policy", [
+        ("/api/v1/auth/login", "auth"),
+        ("/api/v1/auth/me", "api"),
+        ("/api/v1/orders/", "api"),
+        ("/health", "public"),
+    ])
+    def test_route_policy(self, path, policy):
+        assert route_policy(path) == policy
+
+    def test_client_ip_prefers_proxy_headers(self):
+        assert client_ip_from_headers({"x-forwarded-for": "1.2.3.4, 10.0.0.1"}, "10.0.0.1") == "1.2.3.4"
+        assert client_ip_from_headers({"x-real-ip": "5.6.7.8"}, "10.0.0.1") == "5.6.7.8"
+        assert client_ip_from_headers({}, None) == "unknown"
+
+
+class TestPolicies:
+
+    def test_security_limits_come_from_security_config(self):
+        from app.core.security import RateLimiter, SecurityConfig
+
+        policies = default_policies()
+
+        for limit_type, limit in SecurityConfig.RATE_LIMITS.items():
+            policy = policies[RateLimiter.policy_name(limit_type)]
+            assert (policy.limit, policy.period_seconds) == (limit["requests"], limit["window"])
+        assert RateLimiter.policy_name("api") == "api_hourly"
+        assert RateLimiter.policy_name("unknown") == "api_hourly"
@@ -0,0 +1,130 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sqlalchemy import Column, Integer, String, create_engine, event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from app.core.read_replicas import (
+    ReadOnlySessionError,
+    ReadRoutingSession,
+    Replica,
+    ReplicaRouter,
+    RequestRoutingState,
+    _request_state,
+    _track_primary_writes,
+)
+
+Base = declarative_base()
+
+
+class Part(Base):
+    __tablename__ = 'parts'
+    id = Column(Integer, primary_key=True)
+    source = Column(String(20))
+
+
+def make_database(path, source):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Part.__table__.insert(), [{"id": 1, "source": source}])
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path):
+    # The replica is a separate file so the source column shows where a read went
+    primary = make_database(tmp_path / "primary.db", "primary")
+    replica_engine = make_database(tmp_path / "replica.db", "replica")
+    event.listen(primary, "after_cursor_execute", _track_primary_writes)
+    replica = Replica(
+        name="replica_0",
+        engine=replica_engine,
+        async_engine=create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    )
+    primary_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    return primary, primary_async, replica
+
+
+@pytest.fixture
+def request_scope():
+    token = _request_state.set(RequestRoutingState())
+    yield
+    _request_state.reset(token)
+
+
+def read_source(router):
+    session = ReadRoutingSession(router)
+    try:
+        return session.scalar(select(Part.source).where(Part.id == 1))
+    finally:
+        session.close()
+
+
+class TestReplicaRouter:
+
+    def test_reads_go_to_replica_within_lag_tolerance(self, databases):
+        primary, primary_async, replica = databases
+        router = ReplicaRouter(primary, primary_async, [replica], max_lag_seconds=5, lag_probe=lambda r: 1.0)
+
+        assert read_source(router) == "replica"
+        assert router.status()['routed']['replica_0'] == 1
+
+    def test_routing_counts_are_exact_across_threads(self, databases):
+        primary, primary_async, replica = databases
+        router = ReplicaRouter(primary, primary_async, [replica], lag_probe=lambda r: 1.0)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: router.choose(), range(4000)))
+
+        assert router.status()['routed']['replica_0'] == 4000
+
+    def test_lagging_or_failing_replica_falls_back_to_primary(self, databases):
+        primary, primary_async, replica = databases
+        router = ReplicaRouter(primary, primary_async, [replica], max_lag_seconds=5, lag_probe=lambda r: 30.0)
+        assert read_source(router) == "primary"
+
+        def broken(replica):
+            raise ConnectionError("replica down")
+
+        router = ReplicaRouter(primary, primary_async, [replica], lag_check_interval_seconds=0, lag_probe=broken)
+        assert read_source(router) == "primary"
+
+    def test_no_replicas_reads_primary(self, databases):
+        primary, primary_async, _ = databases
+        assert read_source(ReplicaRouter(primary, primary_async)) == "primary"
+
+    def test_request_sticks_to_primary_after_write(self, databases, request_scope):
+        primary, primary_async, replica = databases
+        router = ReplicaRouter(primary, primary_async, [replica], lag_probe=lambda r: 0.0)
+        session = ReadRoutingSession(router)
+        assert session.scalar(select(Part.source)) == "replica"
+
+        with primary.begin() as connection:
+            connection.execute(text("UPDATE parts SET source = 'primary-new' WHERE id = 1"))
+
+        # Same session and new sessions of the request now read the primary
+        assert session.scalar(select(Part.source)) == "primary-new"
+        assert read_source(router) == "primary-new"
+        session.close()
+
+    def test_writes_are_rejected(self, databases):
+        primary, primary_async, replica = databases
+        session = ReadRoutingSession(ReplicaRouter(primary, primary_async, [replica], lag_probe=lambda r: 0.0))
+        session.add(Part(id=2, source="new"))
+        with pytest.raises(ReadOnlySessionError):
+            session.flush()
+        session.close()
+
+    def test_async_sessions_are_routed(self, databases):
+        primary, primary_async, replica = databases
+        router = ReplicaRouter(primary, primary_async, [replica], lag_probe=lambda r: 0.0)
+
+        async def read():
+            async with AsyncSession(sync_session_class=ReadRoutingSession, router=router, use_async=True) as db:
+                return await db.scalar(select(Part.source))
+
+        assert asyncio.run(read()) == "replica"
@@ -0,0 +1,312 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.services.smart_matching_engine import (
+    ManufacturerStats,
+    MatchScore,
+    SmartMatchingEngine,
+    SmartRecommendation,
+)
+from app.core.database import Base
+from app.models.producer import Manufacturer
+from app.models.order import Order, OrderStatus
+from app.models.quote import Quote, QuoteStatus
+
+
+class TestSmartMatchingEngineBatchScoring:
+    """Test suite for prefetched-statistics scoring in the smart matching engine"""
+
+    @pytest.fixture
+    def engine(self):
+        return SmartMatchingEngine()
+
+    @pytest.fixture
+    def db(self):
+        db = Mock(spec=Session)
+        db.query.side_effect = AssertionError("batch scoring must not query per manufacturer")
+        return db
+
+    @pytest.fixture
+    def sample_manufacturer(self):
+        manufacturer = Mock(spec=Manufacturer)
+        manufacturer.id = 1
+        manufacturer.business_name = "Test Manufacturing Co"
+        manufacturer.country = "PL"
+        manufacturer.latitude = 52.2297
+        manufacturer.longitude = 21.0122
+        manufacturer.overall_rating = 4.5
+        manufacturer.quality_rating = 4.0
+        manufacturer.total_orders_completed = 25
+        manufacturer.on_time_delivery_rate = 95.0
+        manufacturer.capacity_utilization_pct = 60.0
+        manufacturer.standard_lead_time_days = 14
+        manufacturer.rush_order_available = True
+        manufacturer.rush_order_lead_time_days = 7
+        manufacturer.min_order_quantity = 10
+        manufacturer.max_order_quantity = 1000
+        manufacturer.last_activity_date = datetime.now() - timedelta(days=2)
+        manufacturer.capabilities = {
+            "manufacturing_processes": ["CNC Machining", "3D Printing"],
+            "materials": ["Aluminum", "Steel"],
+            "industries_served": ["Automotive", "Aerospace"],
+            "certifications": ["ISO 9001", "IATF 16949"]
+        }
+        return manufacturer
+
+    @pytest.fixture
+    def sample_order(self):
+        order = Mock(spec=Order)
+        order.id = 1
+        order.quantity = 100
+        order.delivery_deadline = datetime.now() + timedelta(days=30)
+        order.preferred_country = "PL"
+        order.industry_category = "Automotive"
+        order.technical_requirements = {
+            "manufacturing_process": "CNC Machining",
+            "material": "Aluminum 6061",
+            "certifications": ["ISO 9001"]
+        }
+        return order
+
+    def test_empty_stats_score_as_new_manufacturer(self, engine, db, sample_manufacturer, sample_order):
+        """Manufacturers without history get the same neutral scores as the per-row path"""
+        stats = ManufacturerStats()
+
+        assert engine._calculate_cost_intelligence(db, sample_manufacturer, sample_order, stats) == 0.5
+        assert engine._analyze_recent_performance(db, sample_manufacturer, stats) == 0.5
+        assert engine._analyze_quality_consistency(db, sample_manufacturer, stats) == 0.5
+        assert engine._calculate_historical_success_intelligence(db, sample_manufacturer, sample_order, stats) == 0.5
+
+    def test_stats_drive_historical_scores(self, engine, db, sample_manufacturer, sample_order):
+        """Prefetched counts map onto the same thresholds as the per-row queries"""
+        stats = ManufacturerStats(
+            quote_count=10,
+            priced_quote_count=4,
+            unit_price_sum=3000.0,  # 750 PLN per unit on average
+            recent_quote_count=10,
+            recent_accepted_count=5,
+            recent_accepted_orders=3,
+            industry_orders=4,
+            industry_successful_orders=3
+        )
+
+        assert engine._calculate_cost_intelligence(db, sample_manufacturer, sample_order, stats) == 0.9
+        assert engine._analyze_recent_performance(db, sample_manufacturer, stats) == pytest.approx(0.6)
+        assert engine._analyze_quality_consistency(db, sample_manufacturer, stats) == 0.7
+        assert engine._calculate_historical_success_intelligence(db, sample_manufacturer, sample_order, stats) == 0.75
+
+    def test_unpriced_quotes_score_neutral(self, engine, db, sample_manufacturer, sample_order):
+        """Quotes without a price or order do not count towards the price history"""
+        stats = ManufacturerStats(quote_count=3, priced_quote_count=0)
+
+        assert engine._calculate_cost_intelligence(db, sample_manufacturer, sample_order, stats) == 0.5
+
+    def test_match_score_from_stats_does_not_query(self, engine, db, sample_manufacturer, sample_order):
+        """A full match score can be computed from prefetched stats alone"""
+        match_score = engine._calculate_enhanced_match_score(
+            db, sample_manufacturer, sample_order, stats=ManufacturerStats()
+        )
+
+        assert 0.0 <= match_score.total_score <= 1.0
+        assert match_score.historical_success_score == 0.5
+        db.query.assert_not_called()
+
+    def test_score_candidates_prefetches_once(self, engine, sample_manufacturer, sample_order):
+        """Batch scoring prefetches statistics for all candidates in one call"""
+        engine._prefetch_manufacturer_stats = Mock(return_value={1: ManufacturerStats()})
+        engine.min_confidence_threshold = 0.0
+        engine.min_score_threshold = 0.0
+
+        scored = engine._score_candidates(Mock(spec=Session), sample_order, [sample_manufacturer])
+
+        engine._prefetch_manufacturer_stats.assert_called_once()
+        assert [manufacturer for manufacturer, _ in scored] == [sample_manufacturer]
+
+
+class TestSmartMatchingEngineScoreParity:
+    """Prefetched statistics score exactly like the per-manufacturer queries"""
+
+    @pytest.fixture
+    def db(self):
+        rng = random.Random(5)
+        now = datetime.now()
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            for manufacturer_id in range(1, 7):
+                session.add(Manufacturer(
+                    id=manufacturer_id, user_id=manufacturer_id, business_name=f"Manufacturer {manufacturer_id}",
+                    city="Warsaw", country=rng.choice(["PL", "DE"]),
+                    capabilities={
+                        "manufacturing_processes": ["CNC Machining", rng.choice(["Welding", "3D Printing"])],
+                        "materials": ["Aluminum", "Steel"],
+                        "industries_served": [rng.choice(["Automotive", "Medical"])],
+                        "certifications": ["ISO 9001"],
+                    },
+                    overall_rating=Decimal("4.2"), quality_rating=Decimal("3.9"),
+                    on_time_delivery_rate=rng.uniform(70, 100), total_orders_completed=rng.randint(0, 60),
+                    capacity_utilization_pct=rng.uniform(30, 95), standard_lead_time_days=rng.randint(7, 30),
+                    is_active=True, is_verified=True, stripe_onboarding_completed=True,
+                    last_activity_date=now - timedelta(days=rng.randint(0, 30)),
+                ))
+            # Manufacturer 6 has no quote history
+            for manufacturer_id in range(1, 6):
+                for _ in range(manufacturer_id * 3):
+                    history_order = Order(
+                        client_id=1, title="Historical order", description="Historical order",
+                        technical_requirements={}, quantity=rng.randint(1, 500),
+                        delivery_deadline=now + timedelta(days=30),
+                        industry_category=rng.choice(["Automotive", "Medical"]),
+                        status=rng.choice([OrderStatus.COMPLETED, OrderStatus.DELIVERED, OrderStatus.IN_PRODUCTION]),
+                        created_at=now - timedelta(days=rng.randint(0, 365)),
+                    )
+                    session.add(history_order)
+                    session.flush()
+                    price = Decimal(rng.randint(500, 50000))
+                    session.add(Quote(
+                        order_id=history_order.id, manufacturer_id=manufacturer_id,
+                        subtotal_pln=price, total_price_pln=price, lead_time_days=rng.randint(5, 60),
+                        status=rng.choice([QuoteStatus.ACCEPTED, QuoteStatus.SENT, QuoteStatus.REJECTED]),
+                        created_at=now - timedelta(days=rng.randint(0, 180)),
+                    ))
+            session.add(Order(
+                id=1000, client_id=1, title="Aluminium housings", description="CNC machined housings",
+                technical_requirements={
+                    "manufacturing_process": "CNC Machining", "material": "Aluminum 6061",
+                    "certifications": ["ISO 9001"],
+                },
+                quantity=250, delivery_deadline=now + timedelta(days=40),
+                industry_category="Automotive", preferred_country="PL",
+            ))
+            session.commit()
+            yield session
+
+    def test_batch_scores_equal_per_manufacturer_scores(self, db):
+        engine = SmartMatchingEngine()
+        engine.min_confidence_threshold = 0.0
+        engine.min_score_threshold = 0.0
+        order = db.get(Order, 1000)
+
+        def scores(batch_scoring):
+            db.expire_all()
+            candidates = db.query(Manufacturer).order_by(Manufacturer.id).all()
+            scored = engine._score_candidates(db, order, candidates, batch_scoring=batch_scoring)
+            return {manufacturer.id: score for manufacturer, score in scored}
+
+        per_manufacturer = scores(batch_scoring=False)
+
+        assert len(per_manufacturer) == 6
+        assert scores(batch_scoring=True) == per_manufacturer
+
+
+def make_match_score(total_score, confidence_level=0.8, risk_factors=()):
+    return MatchScore(
+        total_score=total_score, capability_score=0.5, performance_score=0.5, geographic_score=0.5,
+        quality_score=0.5, reliability_score=0.5, cost_efficiency_score=0.5, availability_score=0.5,
+        specialization_score=0.5, historical_success_score=0.5, confidence_level=confidence_level,
+        match_reasons=[], risk_factors=list(risk_factors), recommendation_strength="MODERATE",
+        mismatch_penalties=0.0
+    )
+
+
+class TestSmartMatchingEngineTopK:
+    """Test suite for ranking candidates best first and enriching only the returned ones"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = SmartMatchingEngine()
+        engine.use_result_cache = False
+        return engine
+
+    @pytest.fixture
+    def order(self):
+        order = Mock(spec=Order)
+        order.id = 1
+        return order
+
+    @pytest.fixture
+    def scored(self):
+        scored = []
+        for manufacturer_id, (total, confidence) in enumerate(
+            [(0.6, 0.7), (0.9, 0.5), (0.6, 0.9), (0.9, 0.5), (0.7, 0.3), (0.8, 0.8)], 1
+        ):
+            manufacturer = Mock(spec=Manufacturer)
+            manufacturer.id = manufacturer_id
+            manufacturer.business_name = f"Manufacturer {manufacturer_id}"
+            scored.append((manufacturer, make_match_score(total, confidence)))
+        return scored
+
+    @pytest.fixture
+    def details(self, engine):
+        """Stub the detail helpers and count the manufacturers each one was computed for"""
+        calls = []
+        for helper in ('_estimate_delivery_time', '_estimate_cost_range', '_assess_risks',
+                       '_identify_competitive_advantages', '_identify_potential_concerns',
+                       '_find_similar_projects', '_generate_ai_insights'):
+            def detail(*args, helper=helper):
+                manufacturer = next(arg for arg in args if isinstance(arg, Manufacturer))
+                calls.append((helper, manufacturer.id))
+                return f"{helper} {manufacturer.id}"
+            setattr(engine, helper, detail)
+        return calls
+
+    def test_ranked_candidates_match_a_full_sort(self, engine, order, scored):
+        """Best first by score then confidence, ties in candidate order, as the stable sort was"""
+        engine._score_candidates = Mock(return_value=scored)
+
+        ranked = list(engine._ranked_candidates(Mock(spec=Session), order, []))
+
+        expected = sorted(
+            scored, key=lambda pair: (pair[1].total_score, pair[1].confidence_level), reverse=True
+        )
+        assert [manufacturer.id for manufacturer, _ in ranked] == [2, 4, 6, 5, 3, 1]
+        assert [manufacturer.id for manufacturer, _ in ranked] == [manufacturer.id for manufacturer, _ in expected]
+
+    def test_only_returned_recommendations_get_details(self, engine, order, scored, details):
+        """Filtered candidates are skipped and the rest stop being enriched at max_recommendations"""
+        scored[5][1].risk_factors = ["a", "b", "c", "d"]
+        engine._get_candidate_manufacturers = Mock(return_value=[manufacturer for manufacturer, _ in scored])
+        engine._score_candidates = Mock(return_value=scored)
+
+        recommendations = engine.get_smart_recommendations(
+            Mock(spec=Session), order, max_recommendations=3, enable_ml_predictions=False,
+            batch_scoring=False, vectorized=False, details=['estimated_delivery_time', 'risk_assessment']
+        )
+
+        # 5 is below the confidence filter and 6 has too many risk factors
+        assert [rec.manufacturer_id for rec in recommendations] == [2, 4, 3]
+        assert sorted(details) == sorted(
+            (helper, manufacturer_id)
+            for helper in ('_estimate_delivery_time', '_assess_risks') for manufacturer_id in (2, 4, 3)
+        )
+        assert recommendations[0].estimated_delivery_time == "_estimate_delivery_time 2"
+        assert recommendations[0].estimated_cost_range is None
+
+    def test_expand_recommendation_fills_missing_details(self, engine, order, scored, details):
+        """Details can be computed later, loading the manufacturer, without recomputing the others"""
+        manufacturer, match_score = scored[0]
+        recommendation = SmartRecommendation(
+            manufacturer_id=1, manufacturer_name="Manufacturer 1", match_score=match_score,
+            predicted_success_rate=0.75, estimated_delivery_time=10
+        )
+        db = Mock(spec=Session)
+        engine.catalog = Mock()
+        engine.catalog.get.return_value = manufacturer
+
+        engine.expand_recommendation(db, recommendation, order, include_ai_insights=False)
+
+        engine.catalog.get.assert_called_once_with(db, 1)
+
+        assert recommendation.estimated_delivery_time == 10
+        assert recommendation.similar_past_projects == "_find_similar_projects 1"
+        assert recommendation.ai_insights == {}
+        assert len(details) == 5
+
+    def test_unknown_details_are_rejected(self, engine, order):
+        with pytest.raises(ValueError, match="Unknown recommendation details: price"):
+            engine.get_smart_recommendations(Mock(spec=Session), order, details=['price'])
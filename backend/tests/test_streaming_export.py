@@ -0,0 +1,142 @@
+import asyncio
+import csv
+import enum
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pyarrow.parquet as parquet
+import pytest
+from sqlalchemy import Column, DateTime, Enum, Integer, Numeric, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import StaticPool
+
+from app.services.streaming_export import (
+    ExportColumn,
+    ExportFormat,
+    export_statement,
+    iter_export,
+    stream_export,
+    write_export,
+)
+
+Base = declarative_base()
+
+
+class Stage(enum.Enum):
+    OPEN = "open"
+    CLOSED = "closed"
+
+
+class Part(Base):
+    __tablename__ = "parts"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    price = Column(Numeric(10, 2))
+    stage = Column(Enum(Stage))
+    created_at = Column(DateTime)
+
+
+COLUMNS = [
+    ExportColumn("ID", "id", Part.id, kind="int"),
+    ExportColumn("Name", "name", Part.name),
+    ExportColumn("Price", "price", Part.price, kind="float"),
+    ExportColumn("Stage", "stage", Part.stage),
+    ExportColumn("Created At", "created_at", Part.created_at, kind="timestamp"),
+]
+
+CREATED = datetime(2024, 5, 1, 12, 30)
+
+
+@pytest.fixture
+def db():
+    # One shared connection, since stream_export() reads from the threadpool
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            Part(id=index, name=f'bracket, "type {index}"', price=Decimal("12.50") * index,
+                 stage=Stage.OPEN if index % 2 else Stage.CLOSED, created_at=CREATED)
+            for index in range(1, 26)
+        ])
+        session.commit()
+        yield session
+
+
+def export(db, export_format=ExportFormat.CSV, compress=False, batch_size=10):
+    statement = export_statement(COLUMNS).order_by(Part.id)
+    return list(iter_export(db, statement, COLUMNS, export_format, compress, batch_size))
+
+
+class TestStreamingExport:
+
+    def test_csv_is_written_one_chunk_per_batch(self, db):
+        chunks = export(db)
+
+        assert len(chunks) == 1 + 3  # header, then 25 rows in batches of 10
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        assert rows[0] == ["ID", "Name", "Price", "Stage", "Created At"]
+        assert rows[1] == ["1", 'bracket, "type 1"', "12.50", "open", "2024-05-01T12:30:00"]
+        assert len(rows) == 26
+
+    def test_ndjson_records_use_column_keys(self, db):
+        lines = b"".join(export(db, ExportFormat.NDJSON)).decode().splitlines()
+
+        assert len(lines) == 25
+        assert json.loads(lines[1]) == {
+            "id": 2, "name": 'bracket, "type 2"', "price": "25.00", "stage": "closed",
+            "created_at": "2024-05-01T12:30:00",
+        }
+
+    def test_gzip_is_applied_on_the_fly(self, db):
+        compressed = export(db, compress=True)
+        assert gzip.decompress(b"".join(compressed)) == b"".join(export(db))
+
+    def test_transforms_run_before_encoding(self, db):
+        columns = [ExportColumn("Name", "name", Part.name, lambda name: name.split(",")[0])]
+        data = b"".join(iter_export(db, export_statement(columns).order_by(Part.id), columns))
+        assert data.decode().splitlines()[:2] == ["Name", "bracket"]
+
+    def test_async_stream_matches_the_sync_export(self, db):
+        statement = export_statement(COLUMNS).order_by(Part.id)
+
+        async def collect():
+            return [chunk async for chunk in stream_export(db, statement, COLUMNS, batch_size=10)]
+
+        assert asyncio.run(collect()) == export(db)
+
+    def test_parquet_round_trip(self, db):
+        table = parquet.read_table(io.BytesIO(b"".join(export(db, ExportFormat.PARQUET))))
+
+        assert table.num_rows == 25
+        assert table.column("id").to_pylist()[:3] == [1, 2, 3]
+        assert table.column("price").to_pylist()[0] == 12.5
+        assert table.column("created_at").to_pylist()[0] == CREATED.replace(tzinfo=timezone.utc)
+
+
+class TestWriteExport:
+
+    def test_writes_the_export_to_disk(self, db, tmp_path):
+        path = str(tmp_path / "exports" / "parts.csv.gz")
+        statement = export_statement(COLUMNS).order_by(Part.id)
+
+        result = write_export(db, statement, COLUMNS, path, ExportFormat.CSV, compress=True)
+
+        with open(path, "rb") as output:
+            data = output.read()
+        assert result == {"path": path, "bytes": len(data)}
+        assert gzip.decompress(data) == b"".join(export(db))
+
+    def test_failed_exports_leave_no_file(self, db, tmp_path):
+        path = str(tmp_path / "parts.csv")
+
+        def explode(value):
+            raise RuntimeError("bad row")
+
+        columns = [ExportColumn("Name", "name", Part.name, explode)]
+        with pytest.raises(RuntimeError):
+            write_export(db, export_statement(columns), columns, path)
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,109 @@
+import re
+from unittest.mock import Mock
+
+import pytest
+
+from app.core.threat_scanner import ThreatRule, ThreatScanner
+
+# The patterns SecurityMiddleware used to search one by one
+LEGACY_PATTERNS = [
+    r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION)\b)",
+    r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
+    r"('|\"|`).*(OR|AND|SELECT|INSERT|UPDATE|DELETE).*('|\"|`)",
+    r"<script[^>]*>.*</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"<iframe[^>]*>",
+    r"(\||&|;|\$\(|\`)",
+    r"(cat|ls|ps|whoami|id|uname|wget|curl)\s",
+    r"\.\./",
+    r"\.\.\\",
+    r"/etc/passwd",
+    r"/proc/",
+    r"\$where",
+    r"\$ne",
+    r"\$gt",
+    r"\$regex",
+]
+
+SAMPLES = [
+    "/api/v1/orders/42",
+    "/api/v1/orders?page=2&size=20",
+    "1 OR 1=1",
+    "name' OR 'a'='a",
+    "<script>alert(1)</script>",
+    "<IFRAME src=x>",
+    "javascript:void(0)",
+    "<img onerror =x>",
+    "../../etc/passwd",
+    "..\\windows",
+    "/proc/self/environ",
+    "curl http://evil",
+    "ls\t-la",
+    "part|42",
+    "echo `id`",
+    "$(reboot)",
+    "models",
+    '{"price": {"$gt": 0}}',
+    '{"title": "Machined bracket", "quantity": 100}',
+    "Mozilla/5.0 (X11; Linux x86_64)",
+    "aluminium 6061 housing",
+    "",
+]
+
+
+def per_pattern(text):
+    return any(re.search(pattern, text, re.IGNORECASE) for pattern in LEGACY_PATTERNS)
+
+
+class TestThreatScanner:
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_same_verdict_as_separate_patterns(self, text):
+        assert (ThreatScanner().scan(text) is not None) == per_pattern(text)
+
+    @pytest.mark.parametrize("text, category", [
+        ("../../etc/passwd", "path_traversal"),
+        ("<iframe src=x>", "xss"),
+        ("SELECT", "sql_injection"),
+        ("$regex", "nosql_injection"),
+    ])
+    def test_reports_the_matching_category(self, text, category):
+        assert ThreatScanner().scan(text) == category
+
+    def test_anchors_gate_the_regex(self):
+        rule = ThreatRule("command_injection", r"(\||&|;|\$\(|\`)", ("|", "&", ";", "$(", "`"))
+        rule.regex = Mock(wraps=rule.regex)
+
+        assert not rule.search("aluminium 6061 housing")
+        rule.regex.search.assert_not_called()
+        assert rule.search("part|42")
+
+    def test_header_verdict_cache_is_bounded(self):
+        scanner = ThreatScanner(cache_size=3)
+        for index in range(10):
+            scanner.scan_cached(f"agent-{index}")
+        assert scanner.scan_cached("agent 9; x") == "command_injection"
+        assert len(scanner._cache) == 3
+
+
+class TestBodyScan:
+
+    def test_finds_threats_split_across_chunks(self):
+        scan = ThreatScanner().body_scan()
+        assert scan.feed(b"x" * 5000 + b"<scr") is None
+        assert scan.feed(b"ipt>alert(1)</script>") == "xss"
+
+    def test_decodes_multibyte_characters_split_across_chunks(self):
+        body = "Zażółć ../etc".encode()
+        split = body.index("ż".encode()) + 1
+        scan = ThreatScanner().body_scan()
+        scan.feed(body[:split])
+        assert scan.feed(body[split:]) == "path_traversal"
+
+    def test_stops_at_the_byte_budget(self):
+        scan = ThreatScanner().body_scan(max_bytes=1000)
+        assert scan.feed(b"0" * 900) is None
+        assert scan.feed(b"0" * 200 + b"../") is None
+        assert scan.exhausted
+        assert scan.bytes_scanned == 1000